@@ -0,0 +1,87 @@
+"""
+Helpers shared by the unit tests: Gmail message builders and fake API calls.
+"""
+
+import base64
+from typing import Any, Dict, List, Optional
+
+
+def b64(text: str, encoding: str = "utf-8") -> str:
+    """Encode text as base64url, as Gmail returns message part data."""
+    return base64.urlsafe_b64encode(text.encode(encoding)).decode()
+
+
+def text_part(
+    body: str, mime_type: str = "text/plain", charset: str = "utf-8"
+) -> Dict[str, Any]:
+    """Build a leaf MIME part with a decoded body."""
+    return {
+        "mimeType": mime_type,
+        "headers": [
+            {"name": "Content-Type", "value": f"{mime_type}; charset={charset}"}
+        ],
+        "body": {"data": b64(body, charset)},
+    }
+
+
+def make_message(
+    message_id: str,
+    subject: str = "",
+    body: str = "",
+    sender: str = "alice@example.com",
+    to: str = "bob@example.com",
+    internal_date: int = 0,
+    label_ids: Optional[List[str]] = None,
+    thread_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Build a Gmail message resource in 'full' format."""
+    part = text_part(body)
+    part["headers"] = part["headers"] + [
+        {"name": "From", "value": sender},
+        {"name": "To", "value": to},
+        {"name": "Subject", "value": subject},
+    ]
+    return {
+        "id": message_id,
+        "threadId": thread_id or message_id,
+        "internalDate": str(internal_date),
+        "labelIds": label_ids if label_ids is not None else ["INBOX"],
+        "snippet": body[:50],
+        "payload": part,
+    }
+
+
+class FakeRequest:
+    """Stands in for an HttpRequest; execute() returns a canned response."""
+
+    def __init__(self, response: Any, calls: Optional[List[Any]] = None, **params):
+        self.response = response
+        self.params = params
+        self.headers: Dict[str, str] = {}
+        if calls is not None:
+            calls.append(params)
+
+    def execute(self) -> Any:
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+class FakeBatch:
+    """Stands in for a BatchHttpRequest over FakeRequest objects."""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        for request_id, request in self.requests:
+            try:
+                response = request.execute()
+            except Exception as e:
+                self.callback(request_id, None, e)
+            else:
+                self.callback(request_id, response, None)
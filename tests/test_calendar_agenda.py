@@ -0,0 +1,207 @@
+import base64
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tools.calendar_tools.agenda import (
+    build_agenda,
+    decode_cursor,
+    encode_cursor,
+    merge_timelines,
+)
+from tools.calendar_tools.store import parse_rfc3339
+
+from fakes import FakeBatch, FakeRequest
+
+BASE = datetime(2024, 6, 3, 9, 0, tzinfo=timezone.utc)
+
+
+def event(event_id, minutes, length=30):
+    start = BASE + timedelta(minutes=minutes)
+    return {
+        "id": event_id,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": (start + timedelta(minutes=length)).isoformat()},
+    }
+
+
+class FakeCalendar:
+    """events.list over fixed per-calendar timelines, served through batches."""
+
+    def __init__(self, timelines, failing=()):
+        self.timelines = timelines
+        self.failing = set(failing)
+        self.calls = []
+
+    def events(self):
+        return self
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(callback)
+
+    def list(self, calendarId, timeMin, maxResults, timeMax=None, **params):
+        if calendarId in self.failing:
+            return FakeRequest(RuntimeError("not found"), self.calls)
+        since = parse_rfc3339(timeMin)
+        events = [
+            e
+            for e in self.timelines[calendarId]
+            if parse_rfc3339(e["end"]["dateTime"]) > since
+        ]
+        response = {"items": events[:maxResults]}
+        if len(events) > maxResults:
+            response["nextPageToken"] = "more"
+        return FakeRequest(
+            response, self.calls, calendarId=calendarId, maxResults=maxResults
+        )
+
+
+def collect_pages(service, calendar_ids, page_size, **kwargs):
+    pages = []
+    cursor = ""
+    while True:
+        page = build_agenda(
+            service,
+            calendar_ids,
+            BASE.isoformat(),
+            max_results=page_size,
+            cursor=cursor,
+            **kwargs,
+        )
+        pages.append([(cal, e["id"]) for _, cal, e in page["entries"]])
+        cursor = page["cursor"]
+        if not cursor:
+            return pages
+        assert len(pages) < 50
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(1717405200.0, [("work", "a"), ("home", "a")])
+
+    assert decode_cursor(cursor) == (1717405200.0, [("work", "a"), ("home", "a")])
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not-base64!",
+        encode_cursor(1.0, [])[:-4],
+        base64.urlsafe_b64encode(b'{"start": 1.0, "seen": ["ab"]}').decode(),
+    ],
+)
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_merge_timelines_orders_by_start():
+    timelines = {
+        "work": [event("w1", 0), event("w2", 60)],
+        "home": [event("h1", 30), event("h2", 90)],
+    }
+
+    merged = [(cal, e["id"]) for _, cal, e in merge_timelines(timelines)]
+
+    assert merged == [("work", "w1"), ("home", "h1"), ("work", "w2"), ("home", "h2")]
+
+
+def test_single_page_has_no_cursor():
+    service = FakeCalendar({"work": [event("w1", 0)], "home": [event("h1", 30)]})
+
+    page = build_agenda(service, ["work", "home"], BASE.isoformat())
+
+    assert [e["id"] for _, _, e in page["entries"]] == ["w1", "h1"]
+    assert page["cursor"] is None
+    assert page["errors"] == {}
+
+
+def test_pages_cover_every_event_once_in_order():
+    timelines = {
+        "work": [event(f"w{i}", i * 20) for i in range(7)],
+        "home": [event(f"h{i}", i * 45) for i in range(4)],
+        "team": [event("t0", 100)],
+    }
+    service = FakeCalendar(timelines)
+
+    pages = collect_pages(service, ["work", "home", "team"], page_size=3)
+    flat = [entry for page in pages for entry in page]
+
+    expected = [(cal, e["id"]) for _, cal, e in merge_timelines(timelines)]
+    assert sorted(flat) == sorted(expected)
+    assert len(flat) == len(set(flat))
+    starts = [
+        parse_rfc3339(
+            next(e for e in timelines[cal] if e["id"] == i)["start"]["dateTime"]
+        )
+        for cal, i in flat
+    ]
+    assert starts == sorted(starts)
+    assert all(len(page) <= 3 for page in pages)
+
+
+def test_events_sharing_a_start_time_span_pages():
+    timelines = {
+        "work": [event("a", 0), event("b", 0), event("c", 0)],
+        "home": [event("d", 0), event("e", 60)],
+    }
+    service = FakeCalendar(timelines)
+
+    pages = collect_pages(service, ["work", "home"], page_size=2)
+    flat = [event_id for page in pages for _, event_id in page]
+
+    assert sorted(flat) == ["a", "b", "c", "d", "e"]
+    assert flat[-1] == "e"
+
+
+def test_local_reader_answers_before_remote_calendars():
+    service = FakeCalendar({"remote": [event("r1", 10)]})
+    local = {"local": [event("l1", 0), event("l2", 20)]}
+
+    def reader(calendar_id, time_min, time_max, max_results):
+        return local.get(calendar_id)
+
+    page = build_agenda(
+        service, ["local", "remote"], BASE.isoformat(), local_reader=reader
+    )
+
+    assert [e["id"] for _, _, e in page["entries"]] == ["l1", "r1", "l2"]
+    assert [call["calendarId"] for call in service.calls] == ["remote"]
+
+
+def test_failed_calendar_is_reported_without_hiding_others():
+    service = FakeCalendar({"work": [event("w1", 0)]}, failing=["missing"])
+
+    page = build_agenda(service, ["work", "missing"], BASE.isoformat())
+
+    assert [e["id"] for _, _, e in page["entries"]] == ["w1"]
+    assert list(page["errors"]) == ["missing"]
+
+
+def test_events_in_progress_at_the_cursor_do_not_stall_paging():
+    timelines = {
+        "work": [event(f"L{i}", i, length=600) for i in range(3)]
+        + [event(f"S{i}", 10 + i) for i in range(4)]
+    }
+    service = FakeCalendar(timelines)
+
+    pages = collect_pages(service, ["work"], page_size=2)
+
+    assert [[event_id for _, event_id in page] for page in pages] == [
+        ["L0", "L1"],
+        ["L2", "S0"],
+        ["S1", "S2"],
+        ["S3"],
+    ]
+
+
+def test_same_event_on_several_calendars_is_listed_for_each():
+    timelines = {
+        "a": [event("shared", 0), event("a1", 30)],
+        "b": [event("shared", 0), event("b1", 60)],
+    }
+    service = FakeCalendar(timelines)
+
+    pages = collect_pages(service, ["a", "b"], page_size=1)
+    flat = [entry for page in pages for entry in page]
+
+    assert flat == [("a", "shared"), ("b", "shared"), ("a", "a1"), ("b", "b1")]
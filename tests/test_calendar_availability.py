@@ -0,0 +1,218 @@
+from datetime import datetime, time, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from tools.calendar_tools import tool
+from tools.calendar_tools.availability import (
+    MAX_FREEBUSY_ITEMS,
+    MAX_FREEBUSY_RANGE,
+    BusyIndex,
+    find_availability,
+    find_free_slots,
+    merge_intervals,
+    query_busy,
+    working_windows,
+)
+
+from fakes import FakeRequest
+
+HOUR = 3600.0
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+def ts(year, month, day, hour=0, minute=0, tz=timezone.utc):
+    return datetime(year, month, day, hour, minute, tzinfo=tz).timestamp()
+
+
+def iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+class FakeFreeBusy:
+    """freebusy.query answering from fixed busy periods per calendar."""
+
+    def __init__(self, busy=None, errors=None):
+        self.busy = busy or {}
+        self.errors = errors or {}
+        self.bodies = []
+
+    def freebusy(self):
+        return self
+
+    def query(self, body):
+        self.bodies.append(body)
+        calendars = {}
+        for item in body["items"]:
+            calendar_id = item["id"]
+            if calendar_id in self.errors:
+                calendars[calendar_id] = {
+                    "errors": [{"reason": self.errors[calendar_id]}]
+                }
+                continue
+            calendars[calendar_id] = {
+                "busy": [
+                    {"start": iso(start), "end": iso(end)}
+                    for start, end in self.busy.get(calendar_id, [])
+                    if start < datetime.fromisoformat(body["timeMax"]).timestamp()
+                    and end > datetime.fromisoformat(body["timeMin"]).timestamp()
+                ]
+            }
+        return FakeRequest({"calendars": calendars})
+
+
+@pytest.mark.parametrize(
+    "intervals, buffer, expected",
+    [
+        ([], 0, []),
+        ([(5, 8), (1, 3)], 0, [(1, 3), (5, 8)]),
+        ([(1, 3), (3, 5)], 0, [(1, 5)]),
+        ([(1, 10), (2, 4)], 0, [(1, 10)]),
+        ([(1, 3), (5, 8)], 1, [(0, 9)]),
+    ],
+)
+def test_merge_intervals(intervals, buffer, expected):
+    assert merge_intervals(intervals, buffer) == expected
+
+
+def test_is_free_treats_touching_ranges_as_free():
+    index = BusyIndex([(10, 20), (30, 40)])
+
+    assert index.is_free(0, 10)
+    assert index.is_free(20, 30)
+    assert index.is_free(40, 50)
+    assert not index.is_free(15, 25)
+    assert not index.is_free(25, 35)
+    assert not index.is_free(0, 100)
+
+
+def test_gaps_within_window():
+    index = BusyIndex([(10, 20), (30, 40), (60, 70)])
+
+    assert list(index.gaps(0, 50)) == [(0, 10), (20, 30), (40, 50)]
+    assert list(index.gaps(15, 35)) == [(20, 30)]
+    assert list(index.gaps(12, 18)) == []
+    assert list(index.gaps(40, 60)) == [(40, 60)]
+    assert list(BusyIndex([]).gaps(0, 5)) == [(0, 5)]
+
+
+def test_free_slots_are_aligned_to_the_granularity():
+    start = ts(2024, 6, 3, 9)
+    index = BusyIndex([(start, start + 50 * 60)])
+
+    slots = find_free_slots(index, iter([(start, start + 3 * HOUR)]), HOUR, max_slots=2)
+
+    assert slots == [
+        (start + HOUR, start + 2 * HOUR),
+        (start + 2 * HOUR, start + 3 * HOUR),
+    ]
+
+
+def test_free_slots_stop_at_max_slots_and_skip_short_gaps():
+    start = ts(2024, 6, 3, 9)
+    busy = [(start + 20 * 60, start + 60 * 60)]
+    windows = [(start, start + 4 * HOUR), (start + 24 * HOUR, start + 25 * HOUR)]
+
+    slots = find_free_slots(BusyIndex(busy), iter(windows), 30 * 60, max_slots=3)
+
+    assert [(s - start) / 60 for s, _ in slots] == [60, 90, 120]
+
+
+@pytest.mark.parametrize("duration, max_slots", [(0, 5), (HOUR, 0)])
+def test_free_slots_with_nothing_to_find(duration, max_slots):
+    windows = iter([(0.0, 10 * HOUR)])
+
+    assert find_free_slots(BusyIndex([]), windows, duration, max_slots) == []
+
+
+def test_working_windows_follow_daylight_saving_changes():
+    # 2024-03-10: New York moves from UTC-5 to UTC-4
+    windows = list(
+        working_windows(
+            ts(2024, 3, 8, tz=NEW_YORK),
+            ts(2024, 3, 12, tz=NEW_YORK),
+            time(9),
+            time(17),
+            NEW_YORK,
+        )
+    )
+
+    assert windows == [
+        (ts(2024, 3, 8, 14), ts(2024, 3, 8, 22)),
+        (ts(2024, 3, 11, 13), ts(2024, 3, 11, 21)),
+    ]
+
+
+def test_working_windows_are_clipped_to_the_range():
+    windows = list(
+        working_windows(
+            ts(2024, 6, 3, 12),
+            ts(2024, 6, 4, 10),
+            time(9),
+            time(17),
+            ZoneInfo("UTC"),
+        )
+    )
+
+    assert windows == [
+        (ts(2024, 6, 3, 12), ts(2024, 6, 3, 17)),
+        (ts(2024, 6, 4, 9), ts(2024, 6, 4, 10)),
+    ]
+
+
+def test_query_busy_splits_calendars_and_long_ranges():
+    calendar_ids = [f"user{i}@example.com" for i in range(MAX_FREEBUSY_ITEMS + 1)]
+    time_min = ts(2024, 1, 1)
+    time_max = time_min + MAX_FREEBUSY_RANGE.total_seconds() + HOUR
+    service = FakeFreeBusy(busy={"user0@example.com": [(time_min, time_min + HOUR)]})
+
+    busy, errors = query_busy(service, calendar_ids, time_min, time_max)
+
+    assert len(service.bodies) == 4
+    assert {len(body["items"]) for body in service.bodies} == {MAX_FREEBUSY_ITEMS, 1}
+    assert busy["user0@example.com"] == [(time_min, time_min + HOUR)]
+    assert busy[calendar_ids[-1]] == []
+    assert errors == {}
+
+
+def test_find_availability_avoids_every_calendar_and_reports_errors():
+    day = ts(2024, 6, 3, 9)
+    service = FakeFreeBusy(
+        busy={
+            "alice": [(day, day + HOUR)],
+            "bob": [(day + HOUR, day + 2 * HOUR)],
+        },
+        errors={"carol": "notFound"},
+    )
+
+    result = find_availability(
+        service,
+        ["alice", "bob", "carol"],
+        ts(2024, 6, 3),
+        ts(2024, 6, 4),
+        HOUR,
+        max_slots=1,
+        buffer=15 * 60,
+    )
+
+    assert result["slots"] == [(day + 2.25 * HOUR, day + 3.25 * HOUR)]
+    assert result["busy"] == 1
+    assert result["errors"] == {"carol": "notFound"}
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"time_zone": "Mars/Olympus"}, {"day_start": "17:00", "day_end": "09:00"}],
+)
+def test_find_availability_rejects_invalid_settings(kwargs):
+    with pytest.raises(ValueError):
+        find_availability(FakeFreeBusy(), ["alice"], 0.0, HOUR, HOUR, **kwargs)
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"time_min": "next tuesday"}, {"time_max": "2024-13-45"}]
+)
+def test_find_meeting_slots_reports_malformed_timestamps(kwargs):
+    result = tool.find_meeting_slots(["alice"], **kwargs)
+
+    assert result.startswith("Error: time_min and time_max must be RFC3339")
@@ -0,0 +1,605 @@
+import io
+import re
+from datetime import timedelta
+
+import pytest
+
+from tools.calendar_tools import tool
+from tools.calendar_tools.calendar import (
+    MAX_REPORTED_ERRORS,
+    import_events,
+    iter_event_pages,
+)
+from tools.calendar_tools.ics import (
+    MAX_LINE_OCTETS,
+    escape_text,
+    event_to_lines,
+    fold_line,
+    format_when,
+    iter_ics_events,
+    parse_content_line,
+    parse_duration,
+    parse_when,
+    unescape_text,
+    unfold_lines,
+    write_ics,
+)
+
+from fakes import FakeBatch, FakeRequest
+
+
+def vcalendar(*event_lines):
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", *event_lines, "END:VCALENDAR"]
+    return io.StringIO("\r\n".join(lines) + "\r\n")
+
+
+def test_unfold_lines_joins_continuations():
+    lines = ["DESCRIPTION:first\r\n", " second\r\n", "\tthird\r\n", "\r\n", "UID:1"]
+
+    assert list(unfold_lines(lines)) == ["DESCRIPTION:firstsecondthird", "UID:1"]
+
+
+def test_parse_content_line_with_quoted_parameters():
+    line = 'ATTENDEE;CN="Doe; Jane: PhD";partstat=ACCEPTED:mailto:jane@example.com'
+
+    assert parse_content_line(line) == (
+        "ATTENDEE",
+        {"CN": "Doe; Jane: PhD", "PARTSTAT": "ACCEPTED"},
+        "mailto:jane@example.com",
+    )
+
+
+def test_parse_content_line_keeps_colons_in_the_value():
+    assert parse_content_line("dtstart:20240603T090000Z") == (
+        "DTSTART",
+        {},
+        "20240603T090000Z",
+    )
+    assert parse_content_line("URL:https://example.com/a")[2] == "https://example.com/a"
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["plain", "a, b; c", "back\\slash", "two\nlines", "literal \\n", ""],
+)
+def test_text_escaping_round_trip(text):
+    assert unescape_text(escape_text(text)) == text
+
+
+def test_unescape_text():
+    assert unescape_text(r"a\,b\;c\Nd\\e") == "a,b;c\nd\\e"
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("PT1H30M", timedelta(hours=1, minutes=30)),
+        ("P1D", timedelta(days=1)),
+        ("P2W", timedelta(weeks=2)),
+        ("P1DT12H", timedelta(days=1, hours=12)),
+        ("-PT15M", -timedelta(minutes=15)),
+        ("PT45S", timedelta(seconds=45)),
+    ],
+)
+def test_parse_duration(value, expected):
+    assert parse_duration(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "1H", "PT1X", "P1H"])
+def test_parse_duration_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        parse_duration(value)
+
+
+@pytest.mark.parametrize(
+    "value, params, expected",
+    [
+        ("20240603", {"VALUE": "DATE"}, {"date": "2024-06-03"}),
+        (
+            "20240603T090000Z",
+            {},
+            {"dateTime": "2024-06-03T09:00:00Z", "timeZone": "UTC"},
+        ),
+        (
+            "20240603T090000",
+            {"TZID": "Europe/Paris"},
+            {"dateTime": "2024-06-03T09:00:00", "timeZone": "Europe/Paris"},
+        ),
+        (
+            "20240603T090000",
+            {"TZID": "W. Europe Standard Time"},
+            {"dateTime": "2024-06-03T09:00:00", "timeZone": "America/New_York"},
+        ),
+        (
+            "20240603T090000",
+            {},
+            {"dateTime": "2024-06-03T09:00:00", "timeZone": "America/New_York"},
+        ),
+    ],
+)
+def test_parse_when(value, params, expected):
+    assert parse_when(value, params, "America/New_York") == expected
+
+
+@pytest.mark.parametrize(
+    "when, expected",
+    [
+        ({"date": "2024-06-03"}, "DTSTART;VALUE=DATE:20240603"),
+        (
+            {"dateTime": "2024-06-03T09:00:00Z", "timeZone": "UTC"},
+            "DTSTART:20240603T090000Z",
+        ),
+        ({"dateTime": "2024-06-03T09:00:00+02:00"}, "DTSTART:20240603T070000Z"),
+        (
+            {"dateTime": "2024-06-03T07:00:00Z", "timeZone": "Europe/Paris"},
+            "DTSTART;TZID=Europe/Paris:20240603T090000",
+        ),
+    ],
+)
+def test_format_when(when, expected):
+    assert format_when("DTSTART", when) == expected
+
+
+def test_fold_line_respects_the_octet_limit_without_splitting_characters():
+    line = "DESCRIPTION:" + "é€😀x" * 40
+
+    folded = fold_line(line)
+    physical = folded.split("\r\n")
+
+    assert folded.endswith("\r\n") and physical[-1] == ""
+    assert all(len(p.encode("utf-8")) <= MAX_LINE_OCTETS for p in physical)
+    assert all(p.startswith(" ") for p in physical[1:-1])
+    assert list(unfold_lines(folded.split("\n"))) == [line]
+
+
+def test_short_lines_are_not_folded():
+    assert fold_line("UID:1") == "UID:1\r\n"
+
+
+def test_iter_ics_events_parses_properties():
+    stream = vcalendar(
+        "BEGIN:VEVENT",
+        "UID:abc@example.com",
+        "DTSTART;TZID=Europe/Paris:20240603T090000",
+        "DURATION:PT1H30M",
+        "SUMMARY:Planning\\, Q3",
+        "DESCRIPTION:Agenda:\\nbudget",
+        "RRULE:FREQ=WEEKLY;COUNT=4",
+        "EXDATE;TZID=Europe/Paris:20240610T090000",
+        "STATUS:TENTATIVE",
+        "TRANSP:TRANSPARENT",
+        "ORGANIZER;CN=Ann:mailto:ann@example.com",
+        "ATTENDEE;ROLE=OPT-PARTICIPANT;PARTSTAT=DECLINED:mailto:bob@example.com",
+        "BEGIN:VALARM",
+        "TRIGGER:-PT15M",
+        "DESCRIPTION:Reminder",
+        "END:VALARM",
+        "END:VEVENT",
+    )
+
+    (event,) = iter_ics_events(stream)
+
+    assert event == {
+        "iCalUID": "abc@example.com",
+        "start": {"dateTime": "2024-06-03T09:00:00", "timeZone": "Europe/Paris"},
+        "end": {"dateTime": "2024-06-03T10:30:00", "timeZone": "Europe/Paris"},
+        "summary": "Planning, Q3",
+        "description": "Agenda:\nbudget",
+        "recurrence": [
+            "RRULE:FREQ=WEEKLY;COUNT=4",
+            "EXDATE;TZID=Europe/Paris:20240610T090000",
+        ],
+        "status": "tentative",
+        "transparency": "transparent",
+        "organizer": {"email": "ann@example.com", "displayName": "Ann"},
+        "attendees": [
+            {
+                "email": "bob@example.com",
+                "optional": True,
+                "responseStatus": "declined",
+            }
+        ],
+    }
+
+
+def test_all_day_event_without_end_lasts_one_day():
+    stream = vcalendar(
+        "BEGIN:VEVENT", "UID:1", "DTSTART;VALUE=DATE:20240603", "END:VEVENT"
+    )
+
+    (event,) = iter_ics_events(stream)
+
+    assert event["end"] == {"date": "2024-06-04"}
+
+
+def test_malformed_events_are_reported_when_an_errors_list_is_given():
+    stream = vcalendar(
+        "BEGIN:VEVENT",
+        "UID:broken",
+        "SUMMARY:No start",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "UID:ok",
+        "DTSTART:20240603T090000Z",
+        "END:VEVENT",
+    )
+    errors = []
+
+    events = list(iter_ics_events(stream, errors=errors))
+
+    assert [e["iCalUID"] for e in events] == ["ok"]
+    assert len(errors) == 1 and "broken" in errors[0]
+
+
+def test_malformed_events_raise_without_an_errors_list():
+    stream = vcalendar("BEGIN:VEVENT", "UID:broken", "END:VEVENT")
+
+    with pytest.raises(ValueError):
+        list(iter_ics_events(stream))
+
+
+def test_write_then_read_round_trip():
+    events = [
+        {
+            "id": "evt1",
+            "iCalUID": "evt1@google.com",
+            "updated": "2024-05-01T12:00:00.000Z",
+            "start": {
+                "dateTime": "2024-06-03T09:00:00-04:00",
+                "timeZone": "America/New_York",
+            },
+            "end": {
+                "dateTime": "2024-06-03T10:00:00-04:00",
+                "timeZone": "America/New_York",
+            },
+            "recurrence": ["RRULE:FREQ=DAILY;COUNT=3"],
+            "summary": "Design review; part 2, with ünïcödé",
+            "description": "Line one\nLine two, " + "long text " * 20,
+            "location": "Room 1",
+            "status": "confirmed",
+            "sequence": 2,
+            "organizer": {"email": "ann@example.com", "displayName": "Doe, Ann"},
+            "attendees": [
+                {"email": "bob@example.com", "responseStatus": "accepted"},
+                {"email": "cy@example.com", "optional": True},
+            ],
+        },
+        {
+            "id": "evt2",
+            "start": {"dateTime": "2024-06-04T15:00:00Z", "timeZone": "UTC"},
+            "end": {"dateTime": "2024-06-04T15:30:00Z", "timeZone": "UTC"},
+        },
+        {"id": "evt3", "start": {"date": "2024-06-05"}, "end": {"date": "2024-06-06"}},
+    ]
+    out = io.StringIO(newline="")
+
+    assert write_ics(events, out, calendar_name="Team") == 3
+
+    text = out.getvalue()
+    assert all(
+        len(line.encode("utf-8")) <= MAX_LINE_OCTETS for line in text.split("\r\n")
+    )
+    parsed = list(iter_ics_events(io.StringIO(text, newline="")))
+
+    assert [e["iCalUID"] for e in parsed] == ["evt1@google.com", "evt2", "evt3"]
+    first = parsed[0]
+    for key in ("summary", "description", "location", "status", "sequence"):
+        assert first[key] == events[0][key]
+    assert first["recurrence"] == events[0]["recurrence"]
+    assert first["start"] == {
+        "dateTime": "2024-06-03T09:00:00",
+        "timeZone": "America/New_York",
+    }
+    assert first["organizer"] == events[0]["organizer"]
+    assert first["attendees"] == [
+        {"email": "bob@example.com", "responseStatus": "accepted"},
+        {"email": "cy@example.com", "optional": True},
+    ]
+    assert parsed[1]["start"] == events[1]["start"]
+    assert parsed[1]["end"] == events[1]["end"]
+    assert parsed[2]["start"] == events[2]["start"]
+    assert parsed[2]["end"] == events[2]["end"]
+
+
+def test_event_to_lines_maps_attendees_and_metadata():
+    lines = event_to_lines(
+        {
+            "id": "evt1",
+            "iCalUID": "evt1@google.com",
+            "created": "2024-04-01T08:00:00.000Z",
+            "updated": "2024-05-01T12:00:00-02:00",
+            "start": {"dateTime": "2024-06-03T09:00:00Z", "timeZone": "UTC"},
+            "end": {"dateTime": "2024-06-03T10:00:00Z", "timeZone": "UTC"},
+            "transparency": "transparent",
+            "organizer": {"email": "ann@example.com", "displayName": "Doe, Ann"},
+            "attendees": [
+                {"email": "bob@example.com", "responseStatus": "accepted"},
+                {"email": "cy@example.com", "responseStatus": "needsAction"},
+                {"email": "di@example.com", "responseStatus": "tentative"},
+                {"displayName": "Room without email"},
+                {
+                    "email": "ed@example.com",
+                    "displayName": "Ed",
+                    "optional": True,
+                    "responseStatus": "declined",
+                },
+            ],
+        }
+    )
+
+    assert lines == [
+        "BEGIN:VEVENT",
+        "UID:evt1@google.com",
+        "DTSTAMP:20240501T140000Z",
+        "DTSTART:20240603T090000Z",
+        "DTEND:20240603T100000Z",
+        "TRANSP:TRANSPARENT",
+        "CREATED:20240401T080000Z",
+        "LAST-MODIFIED:20240501T140000Z",
+        'ORGANIZER;CN="Doe, Ann":mailto:ann@example.com',
+        "ATTENDEE;PARTSTAT=ACCEPTED:mailto:bob@example.com",
+        "ATTENDEE;PARTSTAT=NEEDS-ACTION:mailto:cy@example.com",
+        "ATTENDEE;PARTSTAT=TENTATIVE:mailto:di@example.com",
+        "ATTENDEE;CN=Ed;ROLE=OPT-PARTICIPANT;PARTSTAT=DECLINED:mailto:ed@example.com",
+        "END:VEVENT",
+    ]
+
+
+def test_event_to_lines_stamps_events_without_an_update_time():
+    lines = event_to_lines({"id": "evt1", "start": {"date": "2024-06-03"}})
+
+    assert lines[1] == "UID:evt1"
+    assert re.fullmatch(r"DTSTAMP:\d{8}T\d{6}Z", lines[2])
+    assert lines[3] == "DTSTART;VALUE=DATE:20240603"
+
+
+def test_cancelled_occurrence_is_exported_with_its_recurrence_id():
+    original = {"dateTime": "2024-06-10T09:00:00+02:00", "timeZone": "Europe/Paris"}
+    lines = event_to_lines(
+        {
+            "id": "series_20240610T070000Z",
+            "iCalUID": "series@google.com",
+            "recurringEventId": "series",
+            "status": "cancelled",
+            "originalStartTime": original,
+        }
+    )
+
+    assert "DTSTART;TZID=Europe/Paris:20240610T090000" in lines
+    assert "RECURRENCE-ID;TZID=Europe/Paris:20240610T090000" in lines
+    assert "STATUS:CANCELLED" in lines
+    assert not any(line.startswith("DTEND") for line in lines)
+
+    (event,) = iter_ics_events(io.StringIO("\r\n".join(lines) + "\r\n"))
+    assert event["status"] == "cancelled"
+    assert event["originalStartTime"] == {
+        "dateTime": "2024-06-10T09:00:00",
+        "timeZone": "Europe/Paris",
+    }
+
+
+def test_write_ics_without_events_writes_an_empty_calendar():
+    out = io.StringIO(newline="")
+
+    assert write_ics(iter(()), out) == 0
+    assert out.getvalue() == (
+        "BEGIN:VCALENDAR\r\nVERSION:2.0\r\n"
+        "PRODID:-//MIST//Google Calendar export//EN\r\nEND:VCALENDAR\r\n"
+    )
+
+
+class FakeCalendar:
+    """events.list pages and events.import over in-memory events."""
+
+    def __init__(self, events=(), page_size=2, failing_page=None):
+        self.items = list(events)
+        self.page_size = page_size
+        self.failing_page = failing_page
+        self.list_calls = []
+        self.batches = []
+        self.imported = []
+
+    def events(self):
+        return self
+
+    def list(self, pageToken=None, **params):
+        self.list_calls.append(params)
+        start = int(pageToken or 0)
+        if (
+            self.failing_page is not None
+            and start // self.page_size == self.failing_page
+        ):
+            return FakeRequest(ConnectionError("connection reset"))
+        response = {"items": self.items[start : start + self.page_size]}
+        if start + self.page_size < len(self.items):
+            response["nextPageToken"] = str(start + self.page_size)
+        return FakeRequest(response)
+
+    def import_(self, calendarId, body):
+        if body.get("summary") == "reject":
+            return FakeRequest(ValueError("Invalid start time"))
+        self.imported.append(body)
+        return FakeRequest({"id": f"imported-{len(self.imported)}", **body})
+
+    def new_batch_http_request(self, callback):
+        calendar = self
+
+        class RecordingBatch(FakeBatch):
+            def execute(self):
+                calendar.batches.append([key for key, _ in self.requests])
+                super().execute()
+
+        return RecordingBatch(callback)
+
+
+def timed(uid, day, **fields):
+    return {
+        "id": uid,
+        "iCalUID": uid,
+        "start": {"dateTime": f"2024-06-{day:02d}T09:00:00Z", "timeZone": "UTC"},
+        "end": {"dateTime": f"2024-06-{day:02d}T10:00:00Z", "timeZone": "UTC"},
+        **fields,
+    }
+
+
+def test_event_pages_are_requested_lazily():
+    calendar = FakeCalendar([timed(f"e{i}", i + 1) for i in range(5)])
+
+    pages = iter_event_pages(calendar, "primary", time_min="2024-06-01T00:00:00Z")
+    first = next(pages)
+
+    assert [e["id"] for e in first] == ["e0", "e1"]
+    assert calendar.list_calls == [
+        {
+            "calendarId": "primary",
+            "singleEvents": False,
+            "maxResults": 1000,
+            "timeMin": "2024-06-01T00:00:00Z",
+        }
+    ]
+    assert sum(len(page) for page in pages) == 3
+    assert len(calendar.list_calls) == 3
+
+
+def test_import_events_is_chunked_at_the_batch_size():
+    calendar = FakeCalendar()
+
+    stats = import_events(
+        calendar, "primary", (timed(f"e{i}", i + 1) for i in range(5)), batch_size=2
+    )
+
+    assert stats == {"imported": 5, "failed": 0, "errors": {}}
+    assert calendar.batches == [["e0", "e1"], ["e2", "e3"], ["e4"]]
+
+
+def test_changed_occurrences_never_share_a_batch_with_their_series():
+    calendar = FakeCalendar()
+    original = {"dateTime": "2024-06-10T09:00:00Z"}
+    events = [
+        timed("series", 3, recurrence=["RRULE:FREQ=WEEKLY"]),
+        timed("other", 4),
+        timed("series", 11, originalStartTime=original),
+    ]
+
+    stats = import_events(calendar, "primary", events)
+
+    assert stats["imported"] == 3
+    assert calendar.batches == [
+        ["series", "other"],
+        ["series@2024-06-10T09:00:00Z"],
+    ]
+
+
+def test_import_errors_are_reported_per_event():
+    calendar = FakeCalendar()
+    events = [
+        timed("ok", 3),
+        {"summary": "no uid", "start": {"date": "2024-06-03"}},
+        timed("bad", 4, summary="reject"),
+    ]
+
+    stats = import_events(calendar, "primary", events)
+
+    assert stats == {
+        "imported": 1,
+        "failed": 2,
+        "errors": {"#2": "Event has no iCalUID", "bad": "Invalid start time"},
+    }
+
+
+def test_reported_import_errors_are_capped():
+    events = [{"summary": "no uid"}] * (MAX_REPORTED_ERRORS + 5)
+
+    stats = import_events(FakeCalendar(), "primary", events)
+
+    assert stats["failed"] == MAX_REPORTED_ERRORS + 5
+    assert len(stats["errors"]) == MAX_REPORTED_ERRORS
+
+
+@pytest.fixture
+def calendar_api(monkeypatch):
+    def use(calendar):
+        monkeypatch.setattr(tool, "service", calendar)
+        monkeypatch.setattr(tool.settings, "calendar_store_enabled", False)
+        return calendar
+
+    return use
+
+
+def test_export_then_import_round_trip(tmp_path, calendar_api):
+    events = [
+        timed("e1@example.com", 3, summary="Planning, Q3"),
+        timed("e2@example.com", 4, recurrence=["RRULE:FREQ=DAILY;COUNT=2"]),
+        {"id": "e3", "start": {"date": "2024-06-05"}, "end": {"date": "2024-06-06"}},
+    ]
+    calendar_api(FakeCalendar(events))
+    path = tmp_path / "export" / "team.ics"
+
+    result = tool.export_calendar_ics("team@example.com", str(path))
+
+    assert result == f"Exported 3 events from calendar team@example.com to {path}."
+    assert [p.name for p in path.parent.iterdir()] == ["team.ics"]
+
+    target = calendar_api(FakeCalendar())
+    result = tool.import_calendar_ics("primary", str(path))
+
+    assert result == "Imported 3 events into calendar primary.\n"
+    assert [e["iCalUID"] for e in target.imported] == [
+        "e1@example.com",
+        "e2@example.com",
+        "e3",
+    ]
+    assert target.imported[0]["summary"] == "Planning, Q3"
+    assert target.imported[1]["recurrence"] == ["RRULE:FREQ=DAILY;COUNT=2"]
+
+
+def test_failed_export_leaves_no_file_behind(tmp_path, calendar_api):
+    calendar_api(
+        FakeCalendar([timed(f"e{i}", i + 1) for i in range(5)], failing_page=1)
+    )
+    path = tmp_path / "team.ics"
+
+    with pytest.raises(ConnectionError):
+        tool.export_calendar_ics("primary", str(path))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_import_reports_unreadable_events_and_failures(tmp_path, calendar_api):
+    path = tmp_path / "in.ics"
+    path.write_text(
+        "\r\n".join(
+            [
+                "BEGIN:VCALENDAR",
+                "BEGIN:VEVENT",
+                "UID:ok",
+                "DTSTART:20240603T090000Z",
+                "END:VEVENT",
+                "BEGIN:VEVENT",
+                "UID:rejected",
+                "DTSTART:20240604T090000Z",
+                "SUMMARY:reject",
+                "END:VEVENT",
+                "BEGIN:VEVENT",
+                "UID:broken",
+                "END:VEVENT",
+                "END:VCALENDAR",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    calendar_api(FakeCalendar())
+
+    result = tool.import_calendar_ics("primary", str(path))
+
+    assert result.startswith("Imported 1 events into calendar primary.")
+    assert "1 events failed to import:\n- rejected: Invalid start time" in result
+    assert "1 events could not be read:\n- " in result and "broken" in result
+
+
+def test_import_reports_a_missing_file(tmp_path, calendar_api):
+    calendar_api(FakeCalendar())
+
+    result = tool.import_calendar_ics("primary", str(tmp_path / "missing.ics"))
+
+    assert result.startswith("Could not read ")
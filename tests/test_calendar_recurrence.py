@@ -0,0 +1,365 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from tools.calendar_tools.recurrence import (
+    ExpansionCache,
+    RecurrenceError,
+    RecurrenceRule,
+    expand_event,
+    get_events_expanded,
+)
+from tools.calendar_tools.store import parse_rfc3339
+
+from fakes import FakeBatch, FakeRequest
+
+
+def timed_master(start, end, *recurrence, time_zone="America/New_York"):
+    return {
+        "id": "series",
+        "etag": '"1"',
+        "summary": "Standup",
+        "start": {"dateTime": start, "timeZone": time_zone},
+        "end": {"dateTime": end, "timeZone": time_zone},
+        "recurrence": list(recurrence),
+    }
+
+
+def expand(master, time_min=0.0, time_max=None):
+    return list(expand_event(master, time_min, time_max))
+
+
+def start_dates(instances):
+    return [(i["start"].get("dateTime") or i["start"]["date"])[:10] for i in instances]
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def test_wall_clock_time_is_kept_across_daylight_saving():
+    master = timed_master(
+        "2024-03-04T09:00:00-05:00",
+        "2024-03-04T09:30:00-05:00",
+        "RRULE:FREQ=WEEKLY;COUNT=3",
+    )
+
+    instances = expand(master)
+
+    assert [i["id"] for i in instances] == [
+        "series_20240304T140000Z",
+        "series_20240311T130000Z",
+        "series_20240318T130000Z",
+    ]
+    assert instances[1]["start"] == {
+        "dateTime": "2024-03-11T09:00:00-04:00",
+        "timeZone": "America/New_York",
+    }
+    assert instances[1]["end"]["dateTime"] == "2024-03-11T09:30:00-04:00"
+
+
+def test_instances_look_like_api_instances():
+    master = timed_master(
+        "2024-06-03T09:00:00-04:00",
+        "2024-06-03T09:30:00-04:00",
+        "RRULE:FREQ=DAILY;COUNT=1",
+    )
+
+    (instance,) = expand(master)
+
+    assert instance["recurringEventId"] == "series"
+    assert instance["originalStartTime"] == instance["start"]
+    assert instance["summary"] == "Standup"
+    assert "recurrence" not in instance
+    assert "etag" not in instance
+
+
+def test_excluded_dates_still_count_towards_count():
+    master = timed_master(
+        "2024-03-04T09:00:00-05:00",
+        "2024-03-04T09:30:00-05:00",
+        "RRULE:FREQ=DAILY;COUNT=5",
+        "EXDATE;TZID=America/New_York:20240305T090000,20240307T090000",
+    )
+
+    assert start_dates(expand(master)) == ["2024-03-04", "2024-03-06", "2024-03-08"]
+
+
+def test_exdate_in_utc_matches_local_occurrence():
+    master = timed_master(
+        "2024-03-04T09:00:00-05:00",
+        "2024-03-04T09:30:00-05:00",
+        "RRULE:FREQ=DAILY;COUNT=3",
+        "EXDATE:20240305T140000Z",
+    )
+
+    assert start_dates(expand(master)) == ["2024-03-04", "2024-03-06"]
+
+
+def test_negative_month_day_is_the_last_day_of_each_month():
+    master = timed_master(
+        "2024-01-31T17:00:00-05:00",
+        "2024-01-31T18:00:00-05:00",
+        "RRULE:FREQ=MONTHLY;BYMONTHDAY=-1;COUNT=4",
+    )
+
+    assert start_dates(expand(master)) == [
+        "2024-01-31",
+        "2024-02-29",
+        "2024-03-31",
+        "2024-04-30",
+    ]
+
+
+def test_monthly_rule_skips_months_without_the_start_day():
+    master = timed_master(
+        "2024-01-31T17:00:00-05:00",
+        "2024-01-31T18:00:00-05:00",
+        "RRULE:FREQ=MONTHLY;COUNT=3",
+    )
+
+    assert start_dates(expand(master)) == ["2024-01-31", "2024-03-31", "2024-05-31"]
+
+
+@pytest.mark.parametrize(
+    "byday, start, expected",
+    [
+        ("-1FR", "2024-01-26", ["2024-01-26", "2024-02-23", "2024-03-29"]),
+        ("2MO", "2024-01-08", ["2024-01-08", "2024-02-12", "2024-03-11"]),
+    ],
+)
+def test_monthly_weekday_ordinals(byday, start, expected):
+    master = timed_master(
+        f"{start}T10:00:00-05:00",
+        f"{start}T11:00:00-05:00",
+        f"RRULE:FREQ=MONTHLY;BYDAY={byday};COUNT=3",
+    )
+
+    assert start_dates(expand(master)) == expected
+
+
+def test_weekly_rule_with_several_days_and_interval():
+    master = timed_master(
+        "2024-06-03T09:00:00-04:00",
+        "2024-06-03T09:30:00-04:00",
+        "RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;COUNT=4",
+    )
+
+    assert start_dates(expand(master)) == [
+        "2024-06-03",
+        "2024-06-06",
+        "2024-06-17",
+        "2024-06-20",
+    ]
+
+
+def test_until_is_inclusive():
+    master = timed_master(
+        "2024-03-04T09:00:00-05:00",
+        "2024-03-04T09:30:00-05:00",
+        "RRULE:FREQ=DAILY;UNTIL=20240306T140000Z",
+    )
+
+    assert start_dates(expand(master)) == ["2024-03-04", "2024-03-05", "2024-03-06"]
+
+
+def test_rdate_adds_occurrences_without_duplicates():
+    master = timed_master(
+        "2024-06-03T09:00:00-04:00",
+        "2024-06-03T09:30:00-04:00",
+        "RRULE:FREQ=WEEKLY;COUNT=2",
+        "RDATE;TZID=America/New_York:20240605T090000,20240610T090000",
+    )
+
+    assert start_dates(expand(master)) == ["2024-06-03", "2024-06-05", "2024-06-10"]
+
+
+def test_window_of_an_old_endless_series():
+    master = timed_master(
+        "2000-01-03T09:00:00-05:00",
+        "2000-01-03T09:30:00-05:00",
+        "RRULE:FREQ=DAILY",
+    )
+
+    instances = expand(master, utc(2024, 6, 3, 13, 15), utc(2024, 6, 5, 13, 0))
+
+    # The first occurrence is still running at time_min
+    assert [i["id"] for i in instances] == [
+        "series_20240603T130000Z",
+        "series_20240604T130000Z",
+    ]
+
+
+def test_all_day_series():
+    master = {
+        "id": "holiday",
+        "start": {"date": "2024-02-29"},
+        "end": {"date": "2024-03-01"},
+        "recurrence": ["RRULE:FREQ=YEARLY;COUNT=2"],
+    }
+
+    instances = expand(master)
+
+    # No February 29 in 2025, 2026 or 2027; the next one is 2028
+    assert [i["id"] for i in instances] == ["holiday_20240229", "holiday_20280229"]
+    assert instances[1]["end"] == {"date": "2028-03-01"}
+
+
+@pytest.mark.parametrize(
+    "rule",
+    [
+        "FREQ=HOURLY",
+        "FREQ=DAILY;BYSETPOS=1",
+        "FREQ=WEEKLY;BYDAY=2MO",
+        "FREQ=YEARLY;BYDAY=MO",
+        "FREQ=DAILY;COUNT=x",
+        "FREQ=DAILY;BYDAY=XX",
+        "FREQ",
+    ],
+)
+def test_rules_that_cannot_be_expanded_locally(rule):
+    with pytest.raises(RecurrenceError):
+        RecurrenceRule(rule)
+
+
+def test_several_rrules_are_rejected():
+    master = timed_master(
+        "2024-06-03T09:00:00-04:00",
+        "2024-06-03T09:30:00-04:00",
+        "RRULE:FREQ=DAILY;COUNT=2",
+        "RRULE:FREQ=WEEKLY;COUNT=2",
+    )
+
+    with pytest.raises(RecurrenceError):
+        expand(master)
+
+
+class FakeSeriesCalendar:
+    """
+    events.list and events.instances over one weekly series and its exceptions.
+
+    The time window and search filters only apply to listings without an
+    iCalUID, as in the API.
+    """
+
+    def __init__(self, master, exceptions, failing_uids=()):
+        self.master = master
+        self.exceptions = exceptions
+        self.failing_uids = set(failing_uids)
+        self.calls = []
+
+    def events(self):
+        return self
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(callback)
+
+    def list(self, calendarId, iCalUID=None, q=None, **params):
+        if iCalUID is not None:
+            if iCalUID in self.failing_uids:
+                return FakeRequest(RuntimeError("backend error"), self.calls)
+            items = [self.master, *self.exceptions]
+            return FakeRequest({"items": items}, self.calls, iCalUID=iCalUID)
+
+        since = parse_rfc3339(params["timeMin"])
+        until = parse_rfc3339(params["timeMax"])
+        items = [self.master] + [
+            e
+            for e in self.exceptions
+            if e.get("status") == "cancelled"
+            or (
+                parse_rfc3339(e["end"]["dateTime"]) > since
+                and parse_rfc3339(e["start"]["dateTime"]) < until
+                and (q is None or q.lower() in e.get("summary", "").lower())
+            )
+        ]
+        return FakeRequest({"items": items}, self.calls, q=q)
+
+    def instances(self, calendarId, eventId, timeMin, maxResults, timeMax=None):
+        expanded = expand_event(
+            self.master, parse_rfc3339(timeMin), parse_rfc3339(timeMax)
+        )
+        replaced = {e["originalStartTime"]["dateTime"] for e in self.exceptions}
+        items = [
+            i for i in expanded if i["originalStartTime"]["dateTime"] not in replaced
+        ]
+        return FakeRequest({"items": items}, self.calls, eventId=eventId)
+
+
+def weekly_series():
+    master = timed_master(
+        "2024-06-03T09:00:00-04:00",
+        "2024-06-03T09:30:00-04:00",
+        "RRULE:FREQ=WEEKLY;COUNT=4",
+    )
+    master["iCalUID"] = "series@google.com"
+    return master
+
+
+def exception(original, start, end, **fields):
+    return {
+        "id": f"series_{original}",
+        "recurringEventId": "series",
+        "originalStartTime": {"dateTime": f"{original}T09:00:00-04:00"},
+        "start": {"dateTime": start},
+        "end": {"dateTime": end},
+        **fields,
+    }
+
+
+def expanded_starts(service, query=None):
+    events = get_events_expanded(
+        service,
+        "primary",
+        max_results=10,
+        time_min="2024-06-01T00:00:00Z",
+        time_max="2024-06-22T00:00:00Z",
+        search_query=query,
+        cache=ExpansionCache(),
+    )
+    return [e["start"]["dateTime"][:10] for e in events]
+
+
+def test_occurrence_moved_out_of_the_window_is_not_generated():
+    moved = exception(
+        "2024-06-10", "2024-07-01T09:00:00-04:00", "2024-07-01T09:30:00-04:00"
+    )
+    service = FakeSeriesCalendar(weekly_series(), [moved])
+
+    assert expanded_starts(service) == ["2024-06-03", "2024-06-17"]
+
+
+def test_occurrence_renamed_away_from_the_search_is_not_generated():
+    renamed = exception(
+        "2024-06-10",
+        "2024-06-10T09:00:00-04:00",
+        "2024-06-10T09:30:00-04:00",
+        summary="Retro",
+    )
+    service = FakeSeriesCalendar(weekly_series(), [renamed])
+
+    assert expanded_starts(service, query="Standup") == ["2024-06-03", "2024-06-17"]
+
+
+def test_moved_occurrence_inside_the_window_is_listed_once():
+    moved = exception(
+        "2024-06-10",
+        "2024-06-11T15:00:00-04:00",
+        "2024-06-11T15:30:00-04:00",
+        summary="Standup",
+    )
+    service = FakeSeriesCalendar(weekly_series(), [moved])
+
+    assert expanded_starts(service) == ["2024-06-03", "2024-06-11", "2024-06-17"]
+
+
+def test_series_with_unlisted_exceptions_are_expanded_by_the_api():
+    moved = exception(
+        "2024-06-10", "2024-07-01T09:00:00-04:00", "2024-07-01T09:30:00-04:00"
+    )
+    service = FakeSeriesCalendar(
+        weekly_series(), [moved], failing_uids=["series@google.com"]
+    )
+
+    assert expanded_starts(service) == ["2024-06-03", "2024-06-17"]
+    assert any(call.get("eventId") == "series" for call in service.calls)
@@ -0,0 +1,301 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from tools.calendar_tools import tool
+from tools.calendar_tools.store import (
+    EventStore,
+    event_timestamp,
+    parse_rfc3339,
+    sync_calendar,
+)
+
+from fakes import FakeRequest
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def at(hours):
+    return (NOW + timedelta(hours=hours)).isoformat().replace("+00:00", "Z")
+
+
+def event(event_id, hours, length=1, **fields):
+    return {
+        "id": event_id,
+        "status": "confirmed",
+        "summary": event_id,
+        "start": {"dateTime": at(hours)},
+        "end": {"dateTime": at(hours + length)},
+        **fields,
+    }
+
+
+def cancelled(event_id, **fields):
+    return {"id": event_id, "status": "cancelled", **fields}
+
+
+class FakeCalendar:
+    """
+    events.list with syncToken support over an in-memory change log.
+
+    Every change gets a version; sync token 'v<n>' returns the changes made
+    after version n. Tokens listed in 'expired' are answered with 410 Gone.
+    """
+
+    def __init__(self, events, page_size=2):
+        self.log = list(events)
+        self.page_size = page_size
+        self.expired = set()
+        self.error = None
+        self.calls = []
+
+    def change(self, *events):
+        self.log.extend(events)
+
+    def events(self):
+        return self
+
+    def list(self, calendarId, singleEvents, maxResults, pageToken=None, **params):
+        self.calls.append(params)
+        if self.error is not None:
+            return FakeRequest(self.error)
+        token = params.get("syncToken")
+        if token in self.expired:
+            return FakeRequest(HttpError(httplib2.Response({"status": 410}), b"Gone"))
+
+        if token is not None:
+            items = self.log[int(token[1:]) :]
+        else:
+            latest = {}
+            for item in self.log:
+                latest[item["id"]] = item
+            time_min = parse_rfc3339(params["timeMin"])
+            items = [
+                item
+                for item in latest.values()
+                if item["status"] != "cancelled"
+                and event_timestamp(item["end"]) > time_min
+            ]
+
+        start = int(pageToken or 0)
+        response = {"items": items[start : start + self.page_size]}
+        if start + self.page_size < len(items):
+            response["nextPageToken"] = str(start + self.page_size)
+        else:
+            response["nextSyncToken"] = f"v{len(self.log)}"
+        return FakeRequest(response)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EventStore(str(tmp_path / "events.sqlite3"))
+
+
+@pytest.fixture
+def calendar():
+    return FakeCalendar(
+        [
+            event("old", -24 * 40),
+            event("a", 1),
+            event("b", 3, summary="Budget review", location="Room 100%"),
+            event("c", 26, description="quarterly planning"),
+        ]
+    )
+
+
+def ids(events):
+    return [e["id"] for e in events]
+
+
+def test_parse_rfc3339():
+    assert parse_rfc3339("1970-01-01T01:00:00Z") == 3600
+    assert parse_rfc3339("1970-01-01T02:00:00+01:00") == 3600
+    # Naive timestamps are taken as UTC
+    assert parse_rfc3339("1970-01-01T01:00:00") == 3600
+
+
+def test_event_timestamp_of_dates_is_local_midnight():
+    expected = datetime(2024, 6, 3).timestamp()
+
+    assert event_timestamp({"date": "2024-06-03"}) == expected
+    assert event_timestamp({}) == 0.0
+
+
+def test_full_sync_stores_every_page_and_the_sync_token(calendar, store):
+    stats = sync_calendar(calendar, store, "primary", past_days=30)
+
+    assert stats == {"mode": "full", "upserted": 3, "deleted": 0}
+    assert len(calendar.calls) == 2
+    assert "timeMin" in calendar.calls[0]
+    state = store.get_calendar_state("primary")
+    assert state["sync_token"] == "v4"
+    assert state["window_start"] == pytest.approx(time.time() - 30 * 86400, abs=5)
+    assert store.count("primary") == 3
+
+
+def test_incremental_sync_applies_changes_since_the_token(calendar, store):
+    sync_calendar(calendar, store, "primary")
+    calendar.change(
+        event("a", 2, summary="Moved"),
+        cancelled("b"),
+        event("d", 5),
+    )
+
+    stats = sync_calendar(calendar, store, "primary")
+
+    assert stats == {"mode": "incremental", "upserted": 2, "deleted": 1}
+    assert calendar.calls[-1] == {"syncToken": "v4"}
+    assert store.get_calendar_state("primary")["sync_token"] == "v7"
+    assert store.get_event("primary", "a")["summary"] == "Moved"
+    assert store.get_event("primary", "b") is None
+    assert ids(store.list_events("primary", time.time())) == ["a", "d", "c"]
+
+
+def test_expired_sync_token_forces_a_full_resync(calendar, store):
+    sync_calendar(calendar, store, "primary")
+    # Left over from before the token expired and never cancelled since
+    store.apply_changes("primary", [event("ghost", 4)])
+    calendar.expired.add("v4")
+
+    stats = sync_calendar(calendar, store, "primary")
+
+    assert stats["mode"] == "full"
+    assert store.get_event("primary", "ghost") is None
+    assert store.count("primary") == 3
+    assert store.get_calendar_state("primary")["sync_token"] == "v4"
+
+
+def test_other_errors_keep_the_stored_state(calendar, store):
+    sync_calendar(calendar, store, "primary")
+    calendar.error = HttpError(httplib2.Response({"status": 503}), b"Unavailable")
+
+    with pytest.raises(HttpError):
+        sync_calendar(calendar, store, "primary")
+
+    assert store.count("primary") == 3
+    assert store.get_calendar_state("primary")["sync_token"] == "v4"
+
+
+def test_recent_syncs_are_skipped_until_marked_stale(calendar, store):
+    sync_calendar(calendar, store, "primary")
+
+    assert sync_calendar(calendar, store, "primary", min_interval=60) == {
+        "mode": "skipped",
+        "upserted": 0,
+        "deleted": 0,
+    }
+
+    store.mark_stale("primary")
+
+    assert sync_calendar(calendar, store, "primary", min_interval=60)["mode"] == (
+        "incremental"
+    )
+
+
+def test_calendars_are_stored_separately(calendar, store):
+    sync_calendar(calendar, store, "primary")
+    sync_calendar(FakeCalendar([event("x", 1)]), store, "team")
+
+    assert store.count() == 4
+    assert ids(store.list_events("team", time.time())) == ["x"]
+
+    store.clear("team")
+
+    assert store.get_calendar_state("team") is None
+    assert store.count() == 3
+
+
+def test_list_events_returns_overlapping_events_in_start_order(store):
+    store.apply_changes(
+        "primary",
+        [event("late", 5), event("running", -1, length=2), event("ended", -3)],
+        sync_token="t",
+        window_start=0,
+    )
+    now = time.time()
+
+    assert ids(store.list_events("primary", now)) == ["running", "late"]
+    assert ids(store.list_events("primary", now, now + 3600)) == ["running"]
+    assert ids(store.list_events("primary", 0, max_results=2)) == ["ended", "running"]
+
+
+def test_list_events_matches_every_query_term(calendar, store):
+    sync_calendar(calendar, store, "primary")
+    now = time.time()
+
+    assert ids(store.list_events("primary", now, query="budget ROOM")) == ["b"]
+    assert ids(store.list_events("primary", now, query="budget lunch")) == []
+    assert ids(store.list_events("primary", now, query="Quarterly")) == ["c"]
+    # LIKE wildcards in the query are matched literally
+    assert ids(store.list_events("primary", now, query="100%")) == ["b"]
+    assert ids(store.list_events("primary", now, query="%")) == ["b"]
+    assert ids(store.list_events("primary", now, query="_")) == []
+
+
+def test_covers_needs_a_completed_sync_reaching_back_far_enough(calendar, store):
+    assert not store.covers("primary", time.time())
+
+    sync_calendar(calendar, store, "primary", past_days=30)
+
+    assert store.covers("primary", time.time())
+    assert store.covers("primary", time.time() - 29 * 86400)
+    assert not store.covers("primary", time.time() - 31 * 86400)
+
+
+def test_delete_event_removes_its_instances(store):
+    store.apply_changes(
+        "primary",
+        [
+            event("series_1", 1, recurringEventId="series"),
+            event("series_2", 25, recurringEventId="series"),
+            event("other", 2),
+        ],
+        sync_token="t",
+        window_start=0,
+    )
+
+    store.delete_event("primary", "series")
+
+    assert ids(store.list_events("primary", 0)) == ["other"]
+
+
+def test_upsert_event_ignores_calendars_that_were_never_synced(store):
+    store.upsert_event("primary", event("a", 1))
+
+    assert store.count() == 0
+
+
+@pytest.fixture
+def local_store(calendar, tmp_path, monkeypatch):
+    monkeypatch.setattr(tool.settings, "calendar_store_enabled", True)
+    monkeypatch.setattr(tool.settings, "calendar_sync_interval", 60)
+    monkeypatch.setattr(tool.settings, "cache_dir", str(tmp_path))
+    monkeypatch.setattr(tool, "service", calendar)
+    return calendar
+
+
+def test_reads_are_served_from_the_store(local_store):
+    first = tool.find_events("primary", max_results=10, query="budget")
+    calls = len(local_store.calls)
+
+    second = tool.find_events("primary", max_results=10)
+
+    assert ids(first) == ["b"]
+    assert ids(second) == ["a", "b", "c"]
+    # The second read fell within the sync interval and made no API call
+    assert len(local_store.calls) == calls
+
+
+def test_changes_made_through_the_api_are_recorded(local_store):
+    tool.find_events("primary")
+
+    tool.record_event_change("primary", event("new", 2))
+    tool.record_event_change("primary", deleted_event_id="b")
+
+    store = tool.get_event_store(tool.settings.cache_dir)
+    assert store.get_event("primary", "new") is not None
+    assert store.get_event("primary", "b") is None
+    assert store.get_calendar_state("primary")["last_sync"] is None
@@ -0,0 +1,204 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from tools.calendar_tools import tool
+from tools.calendar_tools.calendar import (
+    build_event_patch,
+    update_event,
+    update_events_batch,
+)
+
+from fakes import FakeBatch, FakeRequest
+
+
+class PatchRequest(FakeRequest):
+    """events.patch that honours If-Match against the stored ETag."""
+
+    def __init__(self, calendar, key, patch):
+        super().__init__(None)
+        self.calendar = calendar
+        self.key = key
+        self.patch = patch
+
+    def execute(self):
+        self.calendar.executed.append((self.key, self.patch, dict(self.headers)))
+        event = self.calendar.events_by_key[self.key]
+        expected = self.headers.get("If-Match")
+        if expected and expected != event["etag"]:
+            raise HttpError(httplib2.Response({"status": 412}), b"Precondition Failed")
+        event.update(self.patch)
+        version = int(event["etag"].strip('"')) + 1
+        event["etag"] = f'"{version}"'
+        return dict(event)
+
+
+class FakeCalendar:
+    """events.patch over stored events; any other events call fails the test."""
+
+    def __init__(self, *events):
+        self.events_by_key = {
+            f"{calendar_id}/{event['id']}": {**event, "etag": '"1"'}
+            for calendar_id, event in events
+        }
+        self.executed = []
+        self.batches = 0
+
+    def events(self):
+        return self
+
+    def patch(self, calendarId, eventId, body):
+        return PatchRequest(self, f"{calendarId}/{eventId}", body)
+
+    def new_batch_http_request(self, callback):
+        self.batches += 1
+        return FakeBatch(callback)
+
+    def __getattr__(self, name):
+        raise AssertionError(f"unexpected events.{name} call")
+
+
+@pytest.fixture
+def calendar():
+    return FakeCalendar(
+        ("primary", {"id": "e1", "summary": "Standup", "attendees": [{}] * 200}),
+        ("primary", {"id": "e2", "summary": "Review"}),
+        ("team", {"id": "e1", "summary": "Offsite"}),
+    )
+
+
+def test_build_event_patch_holds_only_changed_fields():
+    assert build_event_patch() == {}
+    assert build_event_patch(
+        summary="New", start_datetime="2024-06-03T09:00:00Z", location="Room 2"
+    ) == {
+        "summary": "New",
+        "start": {"dateTime": "2024-06-03T09:00:00Z"},
+        "location": "Room 2",
+    }
+
+
+def test_update_event_sends_one_patch_with_the_changed_fields(calendar):
+    event = update_event(calendar, "primary", "e1", summary="Daily standup")
+
+    assert event["summary"] == "Daily standup"
+    assert len(event["attendees"]) == 200
+    assert calendar.executed == [("primary/e1", {"summary": "Daily standup"}, {})]
+
+
+def test_update_event_sends_the_etag_as_if_match(calendar):
+    event = update_event(calendar, "primary", "e1", location="Room 1", etag='"1"')
+
+    assert calendar.executed[0][2] == {"If-Match": '"1"'}
+    assert event["etag"] == '"2"'
+
+
+def test_update_event_with_a_stale_etag_fails(calendar):
+    update_event(calendar, "primary", "e1", summary="Changed elsewhere")
+
+    with pytest.raises(HttpError) as error:
+        update_event(calendar, "primary", "e1", summary="Mine", etag='"1"')
+
+    assert error.value.resp.status == 412
+    assert calendar.events_by_key["primary/e1"]["summary"] == "Changed elsewhere"
+
+
+def test_update_events_batch_patches_events_in_one_batch(calendar):
+    events, errors = update_events_batch(
+        calendar,
+        [
+            {"calendar_id": "primary", "event_id": "e1", "patch": {"summary": "A"}},
+            {
+                "calendar_id": "team",
+                "event_id": "e1",
+                "patch": {"summary": "B"},
+                "etag": '"1"',
+            },
+            {
+                "calendar_id": "primary",
+                "event_id": "e2",
+                "patch": {"summary": "C"},
+                "etag": '"7"',
+            },
+        ],
+    )
+
+    assert calendar.batches == 1
+    assert {key: event["summary"] for key, event in events.items()} == {
+        "primary/e1": "A",
+        "team/e1": "B",
+    }
+    assert list(errors) == ["primary/e2"]
+    assert calendar.events_by_key["primary/e2"]["summary"] == "Review"
+
+
+def test_update_events_batch_rejects_repeated_events(calendar):
+    with pytest.raises(ValueError, match="primary/e1"):
+        update_events_batch(
+            calendar,
+            [
+                {"calendar_id": "primary", "event_id": "e1", "patch": {"summary": "A"}},
+                {"calendar_id": "team", "event_id": "e1", "patch": {"summary": "B"}},
+                {
+                    "calendar_id": "primary",
+                    "event_id": "e1",
+                    "patch": {"location": "C"},
+                },
+            ],
+        )
+
+    assert calendar.batches == 0 and calendar.executed == []
+
+
+@pytest.fixture
+def api(calendar, monkeypatch):
+    monkeypatch.setattr(tool, "service", calendar)
+    monkeypatch.setattr(tool.settings, "calendar_store_enabled", False)
+    return calendar
+
+
+def test_update_event_tool_reports_a_concurrent_change(api):
+    tool.update_event_tool("primary", "e1", title="Changed elsewhere")
+
+    result = tool.update_event_tool("primary", "e1", title="Mine", etag='"1"')
+
+    assert "was changed since it was read" in result
+    assert api.events_by_key["primary/e1"]["summary"] == "Changed elsewhere"
+
+
+def test_update_event_tool_returns_the_new_etag(api):
+    result = tool.update_event_tool("primary", "e2", location="Room 3", etag='"1"')
+
+    assert "New Location: Room 3" in result
+    assert 'New ETag: "2"' in result
+
+
+def test_bulk_update_events(api):
+    result = tool.bulk_update_events(
+        [
+            {"calendar_id": "primary", "event_id": "e1", "title": "A"},
+            {"calendar_id": "team", "event_id": "e1", "title": "B", "etag": '"9"'},
+        ]
+    )
+
+    assert result.startswith("Updated 1 of 2 events.")
+    assert "Failed updates:\n- team/e1:" in result
+
+
+def test_bulk_update_events_needs_a_change_per_update(api):
+    result = tool.bulk_update_events([{"calendar_id": "primary", "event_id": "e1"}])
+
+    assert result.startswith("Each update needs")
+    assert api.executed == []
+
+
+def test_bulk_update_events_reports_repeated_events(api):
+    result = tool.bulk_update_events(
+        [
+            {"calendar_id": "primary", "event_id": "e1", "title": "A"},
+            {"calendar_id": "primary", "event_id": "e1", "location": "B"},
+        ]
+    )
+
+    assert result.startswith("Error: Events updated more than once: primary/e1.")
+    assert api.executed == []
@@ -0,0 +1,206 @@
+import hashlib
+import os
+
+import pytest
+
+from tools.gmail_tools import attachments, tool
+from tools.gmail_tools.attachments import (
+    AttachmentStore,
+    decode_to_spool,
+    download_attachment,
+    get_attachment_store,
+    list_attachments,
+)
+
+from fakes import FakeRequest, b64, text_part
+
+
+def attachment_part(part_id, filename, content, attachment_id=None):
+    """A MIME part carrying an attachment, inline or by attachment ID."""
+    body = {"size": len(content)}
+    if attachment_id:
+        body["attachmentId"] = attachment_id
+    else:
+        body["data"] = b64(content)
+    return {
+        "partId": part_id,
+        "filename": filename,
+        "mimeType": "application/pdf",
+        "body": body,
+    }
+
+
+def sha256(content):
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class FakeGmail:
+    """messages.attachments.get over in-memory attachment data."""
+
+    def __init__(self, data=None, error=None):
+        self.data = data or {}
+        self.error = error
+        self.calls = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def attachments(self):
+        return self
+
+    def get(self, **params):
+        if self.error is not None:
+            return FakeRequest(self.error, self.calls, **params)
+        return FakeRequest({"data": self.data[params["id"]]}, self.calls, **params)
+
+
+def test_list_attachments_walks_nested_parts_in_order():
+    payload = {
+        "mimeType": "multipart/mixed",
+        "parts": [
+            {
+                "mimeType": "multipart/alternative",
+                "parts": [text_part("Hi"), text_part("<p>Hi</p>", "text/html")],
+            },
+            attachment_part("1", "a.pdf", "A", attachment_id="att-a"),
+            {
+                "mimeType": "multipart/mixed",
+                "parts": [attachment_part("2.0", "b.pdf", "B")],
+            },
+            {"partId": "3", "filename": "empty.txt", "body": {"size": 0}},
+        ],
+    }
+
+    found = list_attachments(payload)
+
+    assert [(a["part_id"], a["filename"]) for a in found] == [
+        ("1", "a.pdf"),
+        ("2.0", "b.pdf"),
+    ]
+    assert found[0]["attachment_id"] == "att-a" and found[0]["data"] is None
+    assert found[1]["data"] == b64("B")
+
+
+@pytest.mark.parametrize("content", ["", "x", "xy", "xyz", "a" * 1000])
+def test_decode_to_spool_hashes_chunked_unpadded_data(content, monkeypatch):
+    monkeypatch.setattr(attachments, "DECODE_CHUNK_CHARS", 8)
+    data = b64(content).rstrip("=")
+
+    spool, digest, size = decode_to_spool(data)
+
+    assert spool.read() == content.encode()
+    assert digest == sha256(content)
+    assert size == len(content)
+
+
+def test_identical_attachments_share_one_file(tmp_path):
+    store = AttachmentStore(str(tmp_path))
+
+    first = store.store("m1", "1", "a.pdf", "application/pdf", b64("same"))
+    second = store.store("m2", "3", "copy.pdf", "application/pdf", b64("same"))
+
+    assert first["path"] == second["path"] == store.path_for(sha256("same"))
+    assert not first["deduplicated"] and second["deduplicated"]
+    with open(first["path"], "rb") as f:
+        assert f.read() == b"same"
+    assert store.lookup("m2", "3")["filename"] == "copy.pdf"
+
+
+def test_lookup_misses_when_the_file_is_gone(tmp_path):
+    store = AttachmentStore(str(tmp_path))
+    entry = store.store("m1", "1", "a.pdf", "application/pdf", b64("data"))
+
+    os.remove(entry["path"])
+
+    assert store.lookup("m1", "1") is None
+    assert store.lookup("m1", "2") is None
+
+
+def test_download_fetches_once_then_uses_the_cache(tmp_path):
+    gmail = FakeGmail({"att-a": b64("remote")})
+    store = AttachmentStore(str(tmp_path))
+    attachment = list_attachments(
+        attachment_part("1", "a.pdf", "remote", attachment_id="att-a")
+    )[0]
+
+    first = download_attachment(gmail, store, "m1", attachment)
+    second = download_attachment(gmail, store, "m1", attachment)
+
+    assert not first["cached"] and second["cached"]
+    assert second["path"] == first["path"]
+    assert gmail.calls == [
+        {"userId": "me", "messageId": "m1", "id": "att-a", "fields": "data"}
+    ]
+
+
+def test_inline_attachments_need_no_download(tmp_path):
+    gmail = FakeGmail()
+    attachment = list_attachments(attachment_part("1", "a.pdf", "inline"))[0]
+
+    entry = download_attachment(gmail, AttachmentStore(str(tmp_path)), "m1", attachment)
+
+    assert entry["size"] == len("inline")
+    assert gmail.calls == []
+
+
+def test_stores_are_shared_per_cache_dir(tmp_path):
+    store = get_attachment_store(str(tmp_path))
+
+    assert get_attachment_store(str(tmp_path)) is store
+    assert store.root == os.path.join(str(tmp_path), "attachments")
+
+
+@pytest.fixture
+def mailbox(tmp_path, monkeypatch):
+    message = {
+        "id": "m1",
+        "payload": {
+            "mimeType": "multipart/mixed",
+            "parts": [
+                text_part("See attached"),
+                attachment_part("1", "Report.pdf", "report", attachment_id="att-r"),
+                attachment_part("2", "notes.txt", "notes"),
+            ],
+        },
+    }
+    gmail = FakeGmail({"att-r": b64("report")})
+    monkeypatch.setattr(tool, "service", gmail)
+    monkeypatch.setattr(tool, "load_message", lambda message_id: message)
+    monkeypatch.setattr(tool.gmail_settings, "cache_dir", str(tmp_path))
+    return gmail
+
+
+def test_list_email_attachments(mailbox):
+    result = tool.list_email_attachments("m1")
+
+    assert result.startswith("Message m1 has 2 attachments:\n")
+    assert "1. Report.pdf\n   Type: application/pdf\n   Size: 6 bytes" in result
+
+
+def test_download_email_attachments_filters_by_name(mailbox):
+    first = tool.download_email_attachments("m1", filenames=["report.PDF"])
+    second = tool.download_email_attachments("m1", filenames=["report.pdf"])
+
+    assert first.startswith("Saved 1 attachments from message m1:\n")
+    assert f"SHA-256: {sha256('report')}" in first
+    assert "Source: Gmail" in first and "Source: cache" in second
+    assert len(mailbox.calls) == 1
+
+
+def test_download_email_attachments_reports_failures(mailbox):
+    mailbox.error = RuntimeError("Backend Error")
+
+    result = tool.download_email_attachments("m1")
+
+    assert "1. Report.pdf\n   Error: Backend Error" in result
+    assert "2. notes.txt\n   Path:" in result
+
+
+def test_download_email_attachments_without_matches(mailbox):
+    assert (
+        tool.download_email_attachments("m1", filenames=["other.pdf"])
+        == "No matching attachments found in message m1."
+    )
@@ -0,0 +1,204 @@
+import pytest
+
+from tools.gmail_tools import tool
+from tools.gmail_tools.gmail import BodyCache, get_threads_with_bodies
+
+from fakes import FakeBatch, FakeRequest, make_message
+
+
+def revision(message, history_id):
+    return {**message, "historyId": history_id}
+
+
+def metadata(message):
+    """The thread index view of a message: headers only."""
+    return {
+        "id": message["id"],
+        "threadId": message["threadId"],
+        "historyId": message["historyId"],
+        "payload": {"headers": message["payload"]["headers"]},
+    }
+
+
+class FakeGmail:
+    """threads.get (metadata) and messages.get (full) over in-memory messages."""
+
+    def __init__(self, *messages):
+        self.messages_by_id = {message["id"]: message for message in messages}
+        self.thread_calls = []
+        self.message_calls = []
+        self.batches = 0
+
+    def users(self):
+        return self
+
+    def threads(self):
+        return Threads(self)
+
+    def messages(self):
+        return Messages(self)
+
+    def new_batch_http_request(self, callback):
+        self.batches += 1
+        return FakeBatch(callback)
+
+
+class Threads:
+    def __init__(self, gmail):
+        self.gmail = gmail
+
+    def get(self, **params):
+        messages = [
+            metadata(message)
+            for message in self.gmail.messages_by_id.values()
+            if message["threadId"] == params["id"]
+        ]
+        response = {"id": params["id"], "messages": messages}
+        if not messages:
+            response = LookupError("Not Found")
+        return FakeRequest(response, self.gmail.thread_calls, **params)
+
+
+class Messages:
+    def __init__(self, gmail):
+        self.gmail = gmail
+
+    def get(self, **params):
+        message = self.gmail.messages_by_id.get(params["id"])
+        response = message if message is not None else LookupError("Gone")
+        return FakeRequest(response, self.gmail.message_calls, **params)
+
+
+def test_bodies_are_cached_per_revision_and_byte_budget():
+    cache = BodyCache()
+    message = revision(make_message("m1", body="Hello"), "10")
+
+    assert cache.parse(message) == "Hello"
+    cache.put("m1", "10", 1024, "cached")
+
+    assert cache.get("m1", "10", 1024) == "cached"
+    assert cache.get("m1", "11", 1024) is None
+    assert cache.get("m1", "10", 2048) is None
+
+
+def test_messages_without_a_history_id_are_not_cached():
+    cache = BodyCache()
+
+    cache.put("m1", None, 1024, "body")
+
+    assert cache.get("m1", None, 1024) is None
+
+
+def test_least_recently_used_bodies_are_evicted():
+    cache = BodyCache(max_entries=2)
+    cache.put("a", "1", 10, "A")
+    cache.put("b", "1", 10, "B")
+    cache.get("a", "1", 10)
+
+    cache.put("c", "1", 10, "C")
+
+    assert cache.get("b", "1", 10) is None
+    assert cache.get("a", "1", 10) == "A"
+    assert cache.get("c", "1", 10) == "C"
+
+
+@pytest.fixture
+def gmail():
+    return FakeGmail(
+        revision(make_message("m1", body="First", thread_id="t1"), "10"),
+        revision(make_message("m2", body="Reply", thread_id="t1"), "11"),
+        revision(make_message("m3", body="Other", thread_id="t2"), "12"),
+    )
+
+
+def test_first_read_fetches_all_bodies_in_one_batch(gmail):
+    threads, errors = get_threads_with_bodies(
+        gmail, ["t1", "t2", "missing"], cache=BodyCache()
+    )
+
+    assert {key: [body for _, body in entries] for key, entries in threads.items()} == {
+        "t1": ["First", "Reply"],
+        "t2": ["Other"],
+    }
+    assert errors == {"missing": "Not Found"}
+    assert {call["format"] for call in gmail.thread_calls} == {"metadata"}
+    assert sorted(call["id"] for call in gmail.message_calls) == ["m1", "m2", "m3"]
+    assert gmail.batches == 2
+
+
+def test_cached_bodies_are_not_downloaded_again(gmail):
+    cache = BodyCache()
+    get_threads_with_bodies(gmail, ["t1"], cache=cache)
+    gmail.message_calls.clear()
+    # A new reply arrives in the thread
+    gmail.messages_by_id["m4"] = revision(
+        make_message("m4", body="Late", thread_id="t1"), "13"
+    )
+
+    threads, _ = get_threads_with_bodies(gmail, ["t1"], cache=cache)
+
+    assert [body for _, body in threads["t1"]] == ["First", "Reply", "Late"]
+    assert [call["id"] for call in gmail.message_calls] == ["m4"]
+
+
+def test_changed_messages_are_downloaded_again(gmail):
+    cache = BodyCache()
+    get_threads_with_bodies(gmail, ["t2"], cache=cache)
+    gmail.messages_by_id["m3"] = revision(
+        make_message("m3", body="Edited", thread_id="t2"), "20"
+    )
+
+    threads, _ = get_threads_with_bodies(gmail, ["t2"], cache=cache)
+
+    assert threads["t2"][0][1] == "Edited"
+
+
+def test_bodies_that_fail_to_download_are_marked(gmail, monkeypatch):
+    original = Messages.get
+
+    def get(self, **params):
+        if params["id"] == "m2":
+            return FakeRequest(RuntimeError("Backend Error"))
+        return original(self, **params)
+
+    monkeypatch.setattr(Messages, "get", get)
+
+    threads, errors = get_threads_with_bodies(gmail, ["t1"], cache=BodyCache())
+
+    assert errors == {}
+    assert [body for _, body in threads["t1"]] == [
+        "First",
+        "(Body unavailable: Backend Error)",
+    ]
+
+
+class Mirror:
+    def __init__(self, *messages):
+        self.messages = messages
+
+    def is_thread_complete(self, thread_id):
+        return any(message["threadId"] == thread_id for message in self.messages)
+
+    def get_thread_messages(self, thread_id):
+        return [m for m in self.messages if m["threadId"] == thread_id]
+
+
+def test_fetch_threads_reads_complete_threads_from_the_mirror(gmail, monkeypatch):
+    mirror = Mirror(revision(make_message("m3", body="Local", thread_id="t2"), "12"))
+    monkeypatch.setattr(tool, "service", gmail)
+    monkeypatch.setattr(tool, "get_synced_mirror", lambda: mirror)
+    monkeypatch.setattr(tool, "body_cache", BodyCache())
+
+    threads, errors = tool.fetch_threads(["t1", "t2"])
+
+    assert threads["t2"][0][1] == "Local"
+    assert [body for _, body in threads["t1"]] == ["First", "Reply"]
+    assert [call["id"] for call in gmail.thread_calls] == ["t1"]
+    assert errors == {}
+
+
+def test_get_email_thread_reports_missing_threads(gmail, monkeypatch):
+    monkeypatch.setattr(tool, "service", gmail)
+    monkeypatch.setattr(tool, "get_synced_mirror", lambda: None)
+
+    assert tool.get_email_thread("missing") == "Error: Not Found"
@@ -0,0 +1,174 @@
+import pytest
+
+from tools.gmail_tools import tool
+from tools.gmail_tools.gmail import LabelCache, bulk_modify_messages_labels
+
+from fakes import FakeRequest
+
+
+class FakeGmail:
+    """messages.batchModify and paged messages.list; batchModify fails on `poison`."""
+
+    def __init__(self, matching=0, page_size=2, poison=()):
+        self.refs = [{"id": f"q{i}"} for i in range(matching)]
+        self.page_size = page_size
+        self.poison = set(poison)
+        self.modified = []
+        self.pages = 0
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def labels(self):
+        return self
+
+    def batchModify(self, userId, body):
+        if self.poison & set(body["ids"]):
+            return FakeRequest(RuntimeError("Backend Error"))
+        self.modified.append(body)
+        return FakeRequest({})
+
+    def list(self, userId, maxResults=None, q=None, pageToken=None):
+        if q is None:
+            return FakeRequest(
+                {
+                    "labels": [
+                        {"id": "INBOX", "name": "INBOX"},
+                        {"id": "UNREAD", "name": "UNREAD"},
+                        {"id": "Label_1", "name": "Receipts"},
+                    ]
+                }
+            )
+        self.pages += 1
+        start = int(pageToken or 0)
+        end = start + self.page_size
+        response = {"messages": self.refs[start:end]}
+        if end < len(self.refs):
+            response["nextPageToken"] = str(end)
+        return FakeRequest(response)
+
+
+def test_chunks_hold_at_most_chunk_size_ids():
+    service = FakeGmail()
+
+    reports = bulk_modify_messages_labels(
+        service, [f"m{i}" for i in range(5)], remove_labels=["UNREAD"], chunk_size=2
+    )
+
+    assert [report["count"] for report in reports] == [2, 2, 1]
+    assert [body["ids"] for body in service.modified] == [
+        ["m0", "m1"],
+        ["m2", "m3"],
+        ["m4"],
+    ]
+    assert service.modified[0]["addLabelIds"] == []
+    assert service.modified[0]["removeLabelIds"] == ["UNREAD"]
+
+
+def test_chunk_size_is_capped_at_the_api_limit():
+    service = FakeGmail()
+
+    reports = bulk_modify_messages_labels(
+        service, (f"m{i}" for i in range(1500)), add_labels=["X"], chunk_size=5000
+    )
+
+    assert [report["count"] for report in reports] == [1000, 500]
+
+
+def test_repeated_ids_are_modified_once():
+    service = FakeGmail()
+
+    bulk_modify_messages_labels(service, ["a", "b", "a", "c", "b"], add_labels=["X"])
+
+    assert service.modified[0]["ids"] == ["a", "b", "c"]
+
+
+def test_a_failed_chunk_does_not_stop_the_others():
+    service = FakeGmail(poison={"m2"})
+
+    reports = bulk_modify_messages_labels(
+        service, [f"m{i}" for i in range(5)], add_labels=["X"], chunk_size=2
+    )
+
+    assert reports[1] == {"count": 2, "error": "Backend Error", "ids": ["m2", "m3"]}
+    assert reports[0]["error"] is None and reports[2]["error"] is None
+    assert [body["ids"] for body in service.modified] == [["m0", "m1"], ["m4"]]
+
+
+def test_no_ids_make_no_calls():
+    service = FakeGmail()
+
+    assert bulk_modify_messages_labels(service, [], add_labels=["X"]) == []
+    assert service.modified == []
+
+
+@pytest.fixture
+def gmail(monkeypatch):
+    def install(**kwargs):
+        service = FakeGmail(**kwargs)
+        monkeypatch.setattr(tool, "service", service)
+        monkeypatch.setattr(tool, "label_cache", LabelCache())
+        return service
+
+    return install
+
+
+def test_bulk_modify_labels_resolves_names_and_reports_batches(gmail):
+    service = gmail()
+
+    result = tool.bulk_modify_labels(["m1", "m2"], add_labels=["receipts"])
+
+    assert result.startswith("Modified labels on 2 of 2 messages in 1 batch(es).\n")
+    assert "Added: Label_1\n" in result
+    assert "Batch 1/1 (2 messages): ok" in result
+    assert service.modified[0]["addLabelIds"] == ["Label_1"]
+
+
+def test_bulk_modify_labels_lists_failed_ids(gmail):
+    gmail(poison={"m1"})
+
+    result = tool.bulk_modify_labels(["m1", "m2"], remove_labels=["UNREAD"])
+
+    assert result.startswith("Modified labels on 0 of 2 messages")
+    assert "failed: Backend Error" in result
+    assert "Failed message IDs:\nm1, m2\n" in result
+
+
+def test_bulk_modify_labels_rejects_unknown_labels(gmail):
+    service = gmail()
+
+    result = tool.bulk_modify_labels(["m1"], add_labels=["Nope"])
+
+    assert result == "Error: No label found with ID or name 'Nope'"
+    assert service.modified == []
+
+
+def test_query_matches_are_streamed_and_truncation_is_reported(gmail):
+    service = gmail(matching=5, page_size=2)
+
+    result = tool.bulk_mark_read(["m1"], query="is:unread", max_messages=3)
+
+    assert service.modified[0]["ids"] == ["m1", "q0", "q1", "q2"]
+    assert service.pages == 2
+    assert "More than 3 messages matched the query" in result
+
+
+def test_query_that_fits_reports_no_truncation(gmail):
+    gmail(matching=3, page_size=2)
+
+    result = tool.bulk_archive(query="in:inbox", max_messages=3)
+
+    assert result.startswith("Modified labels on 3 of 3 messages")
+    assert "More than" not in result
+
+
+def test_nothing_matched(gmail):
+    gmail()
+
+    assert (
+        tool.bulk_archive(query="in:inbox")
+        == "No messages matched; nothing was modified."
+    )
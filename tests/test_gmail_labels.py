@@ -0,0 +1,176 @@
+import pytest
+
+from tools.gmail_tools import gmail, tool
+from tools.gmail_tools.gmail import LabelCache, create_label, delete_label, update_label
+
+from fakes import FakeRequest
+
+
+class FakeGmail:
+    """labels.* and messages.modify over in-memory labels."""
+
+    def __init__(self, labels):
+        self.labels_by_user = {"me": list(labels)}
+        self.list_calls = 0
+        self.modifies = []
+
+    def users(self):
+        return self
+
+    def labels(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, userId):
+        self.list_calls += 1
+        return FakeRequest({"labels": list(self.labels_by_user.get(userId, []))})
+
+    def get(self, userId, id):
+        for label in self.labels_by_user[userId]:
+            if label["id"] == id:
+                return FakeRequest(dict(label))
+        return FakeRequest(LookupError("Not Found"))
+
+    def create(self, userId, body):
+        label = {"id": f"Label_{len(self.labels_by_user[userId])}", **body}
+        self.labels_by_user[userId].append(label)
+        return FakeRequest(label)
+
+    def update(self, userId, id, body):
+        return FakeRequest(body)
+
+    def delete(self, userId, id):
+        return FakeRequest(None)
+
+    def modify(self, userId, id, body):
+        self.modifies.append((id, body))
+        return FakeRequest(
+            {"id": id, "payload": {"headers": [{"name": "Subject", "value": "Hi"}]}}
+        )
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(gmail.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def service():
+    return FakeGmail(
+        [
+            {"id": "INBOX", "name": "INBOX", "type": "system"},
+            {"id": "Label_1", "name": "Receipts", "type": "user"},
+        ]
+    )
+
+
+def test_labels_are_cached_until_the_ttl_expires(service, clock):
+    cache = LabelCache(ttl=300)
+
+    assert len(cache.get_all(service)) == 2
+    clock[0] += 299
+    cache.get_all(service)
+    assert service.list_calls == 1
+
+    clock[0] += 1
+    cache.get_all(service)
+    assert service.list_calls == 2
+
+
+def test_labels_are_cached_per_user(service, clock):
+    cache = LabelCache()
+    service.labels_by_user["other@example.com"] = [{"id": "X", "name": "X"}]
+
+    cache.get_all(service)
+    assert cache.get_all(service, "other@example.com") == [{"id": "X", "name": "X"}]
+    cache.invalidate("other@example.com")
+    cache.get_all(service)
+
+    assert service.list_calls == 2
+
+
+def test_lookup_by_id_or_case_insensitive_name(service, clock):
+    cache = LabelCache()
+
+    assert cache.get(service, "Label_1")["name"] == "Receipts"
+    assert cache.get(service, " receipts ")["id"] == "Label_1"
+    assert service.list_calls == 1
+
+
+def test_lookup_miss_refetches_once(service, clock):
+    cache = LabelCache()
+    cache.get_all(service)
+    # Created in another client after the cache was filled
+    service.labels_by_user["me"].append({"id": "Label_2", "name": "Travel"})
+
+    assert cache.get(service, "Travel")["id"] == "Label_2"
+    assert service.list_calls == 2
+
+    assert cache.get(service, "Nope") is None
+    assert service.list_calls == 3
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda service: create_label(service, "Travel"),
+        lambda service: update_label(service, "Label_1", name="Bills"),
+        lambda service: delete_label(service, "Label_1"),
+    ],
+)
+def test_label_changes_invalidate_the_cache(service, clock, monkeypatch, change):
+    cache = LabelCache()
+    monkeypatch.setattr(gmail, "label_cache", cache)
+    cache.get_all(service)
+
+    change(service)
+    cache.get_all(service)
+
+    assert service.list_calls == 2
+
+
+@pytest.fixture
+def labels_api(service, clock, monkeypatch):
+    monkeypatch.setattr(tool, "service", service)
+    monkeypatch.setattr(tool, "label_cache", LabelCache())
+    return service
+
+
+def test_add_label_by_name_makes_only_the_modify_call(labels_api):
+    tool.list_available_labels()
+
+    result = tool.add_label_to_message("m1", "receipts")
+
+    assert "Added Label: Receipts (Label_1)" in result
+    assert labels_api.modifies == [
+        ("m1", {"addLabelIds": ["Label_1"], "removeLabelIds": []})
+    ]
+    assert labels_api.list_calls == 1
+
+
+def test_remove_label_by_id(labels_api):
+    result = tool.remove_label_from_message("m1", "INBOX")
+
+    assert "Removed Label: INBOX (INBOX)" in result
+    assert labels_api.modifies == [
+        ("m1", {"addLabelIds": [], "removeLabelIds": ["INBOX"]})
+    ]
+
+
+def test_unknown_labels_are_reported(labels_api):
+    result = tool.add_label_to_message("m1", "Nope")
+
+    assert result == "Error: No label found with ID or name 'Nope'"
+    assert labels_api.modifies == []
+
+
+def test_resolve_label_ids_passes_unknown_names_through(labels_api):
+    assert tool.resolve_label_ids(["receipts", "INBOX", "Nope "]) == [
+        "Label_1",
+        "INBOX",
+        "Nope",
+    ]
@@ -0,0 +1,108 @@
+from tools.gmail_tools.mime import (
+    TRUNCATION_NOTICE,
+    extract_body,
+    extract_body_text,
+    html_to_text,
+)
+
+from fakes import b64, text_part
+
+
+def multipart(*parts, mime_type="multipart/mixed"):
+    return {"mimeType": mime_type, "parts": list(parts)}
+
+
+def attachment(name):
+    return {
+        "mimeType": "text/plain",
+        "filename": name,
+        "body": {"data": b64("attachment text"), "attachmentId": "att1"},
+    }
+
+
+def test_plain_text_is_preferred_over_html():
+    payload = multipart(
+        text_part("<p>HTML version</p>", "text/html"),
+        text_part("Plain version"),
+        mime_type="multipart/alternative",
+    )
+
+    assert extract_body(payload) == ("Plain version", False)
+
+
+def test_html_is_converted_when_there_is_no_plain_part():
+    html = (
+        "<html><head><style>p {color: red}</style></head>"
+        "<body><p>Hello&nbsp;<b>world</b></p><script>x()</script>"
+        "<div>second   line</div></body></html>"
+    )
+    payload = multipart(text_part(html, "text/html"))
+
+    body, truncated = extract_body(payload)
+
+    assert body == "Hello\xa0world\n\nsecond line"
+    assert not truncated
+
+
+def test_nested_parts_are_read_in_document_order_and_attachments_skipped():
+    payload = multipart(
+        multipart(text_part("first "), text_part("second ")),
+        attachment("notes.txt"),
+        text_part("third"),
+    )
+
+    assert extract_body(payload)[0] == "first second third"
+
+
+def test_each_part_uses_its_own_charset():
+    payload = multipart(
+        text_part("café ", charset="iso-8859-1"),
+        text_part("naïve", charset="utf-8"),
+    )
+
+    assert extract_body(payload)[0] == "café naïve"
+
+
+def test_unknown_charset_falls_back_to_utf8():
+    payload = text_part("ok")
+    payload["headers"] = [
+        {"name": "Content-Type", "value": "text/plain; charset=x-unknown"}
+    ]
+
+    assert extract_body(payload)[0] == "ok"
+
+
+def test_byte_budget_cuts_long_bodies():
+    payload = text_part("a" * 1000)
+
+    body, truncated = extract_body(payload, max_bytes=100)
+
+    assert body == "a" * 100
+    assert truncated
+
+
+def test_budget_never_splits_a_multibyte_character():
+    payload = text_part("é" * 10)  # two bytes each
+
+    body, truncated = extract_body(payload, max_bytes=5)
+
+    assert body == "éé"
+    assert truncated
+
+
+def test_budget_spans_parts():
+    payload = multipart(text_part("12345"), text_part("67890"))
+
+    assert extract_body(payload, max_bytes=7) == ("1234567", True)
+
+
+def test_extract_body_text_marks_truncation():
+    assert extract_body_text(text_part("a" * 20), max_bytes=10).endswith(
+        TRUNCATION_NOTICE
+    )
+    assert extract_body_text(text_part("short")) == "short"
+    assert extract_body_text(None) == ""
+
+
+def test_html_to_text_collapses_blank_lines():
+    assert html_to_text("<p>a</p><p></p><p></p><p>b</p>") == "a\n\nb"
@@ -0,0 +1,85 @@
+import pytest
+
+from tools.gmail_tools.mirror import MailStore, build_fts_query
+
+from fakes import make_message
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("budget", '"budget"'),
+        ('"q3 report"', '"q3 report"'),
+        ("budg*", '"budg" *'),
+        ("from:alice", 'sender : "alice"'),
+        ('subject:"q3 report"', 'subject : "q3 report"'),
+        ("TO:bob", 'recipients : "bob"'),
+        ("alpha OR beta", '"alpha" OR "beta"'),
+        ("alpha NOT beta", '"alpha" NOT "beta"'),
+        ("http://example.com", '"http://example.com"'),
+        ("*", ""),
+        ("", ""),
+    ],
+)
+def test_build_fts_query(query, expected):
+    assert build_fts_query(query) == expected
+
+
+def test_build_fts_query_escapes_quotes():
+    assert build_fts_query('it"s') == '"it""s"'
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MailStore(str(tmp_path / "mirror.sqlite3"))
+    if not store.fts_enabled:
+        pytest.skip("SQLite was built without FTS5")
+    return store
+
+
+def test_full_text_search_ranks_subject_matches_first(store):
+    store.upsert_messages(
+        [
+            make_message("body", subject="Hello", body="the budget is attached"),
+            make_message("subject", subject="Budget for Q3", body="see inside"),
+            make_message("other", subject="Lunch", body="pizza"),
+        ]
+    )
+
+    results = store.full_text_search("budget")
+
+    assert [r["id"] for r in results] == ["subject", "body"]
+    assert "[budget]" in results[1]["snippet"]
+
+
+def test_full_text_search_field_scope_and_prefix(store):
+    store.upsert_messages(
+        [
+            make_message("a", sender="alice@example.com", body="quarterly numbers"),
+            make_message("b", sender="carol@example.com", body="alice sent numbers"),
+        ]
+    )
+
+    assert [r["id"] for r in store.full_text_search("from:alice")] == ["a"]
+    assert {r["id"] for r in store.full_text_search("quart*")} == {"a"}
+
+
+def test_full_text_search_follows_updates_and_deletes(store):
+    store.upsert_messages([make_message("a", subject="draft", body="first")])
+    store.upsert_messages([make_message("a", subject="final", body="second")])
+
+    assert store.full_text_search("first") == []
+    assert [r["id"] for r in store.full_text_search("second")] == ["a"]
+
+    store.delete_messages(["a"])
+    assert store.full_text_search("second") == []
+
+
+def test_index_is_backfilled_when_reopened(tmp_path, store):
+    store.upsert_messages([make_message("a", body="needle")])
+    with store._lock, store._conn:
+        store._conn.execute("DELETE FROM messages_fts")
+
+    reopened = MailStore(store.db_path)
+
+    assert [r["id"] for r in reopened.full_text_search("needle")] == ["a"]
@@ -0,0 +1,317 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from tools.gmail_tools import mirror
+from tools.gmail_tools.mirror import (
+    MailStore,
+    full_sync,
+    incremental_sync,
+    sync_mailbox,
+)
+
+from fakes import FakeBatch, FakeRequest, make_message
+
+DAY_MILLIS = 24 * 60 * 60 * 1000
+
+
+class FakeGmail:
+    """Gmail threads, messages and history over an in-memory mailbox."""
+
+    def __init__(self, mailbox, history_id=100):
+        self.mailbox = mailbox
+        self.history_id = history_id
+        self.history_pages = []
+        self.history_expired = False
+        # Number of times a get of each ID fails before it succeeds
+        self.failures = {}
+        self.history_calls = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return MessagesResource(self)
+
+    def threads(self):
+        return ThreadsResource(self)
+
+    def history(self):
+        return HistoryResource(self)
+
+    def getProfile(self, userId):
+        return FakeRequest({"historyId": str(self.history_id)})
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(callback)
+
+    def attempt(self, item_id, response):
+        if self.failures.get(item_id):
+            self.failures[item_id] -= 1
+            return FakeRequest(RuntimeError("Rate limit exceeded"))
+        return FakeRequest(response)
+
+
+class MessagesResource:
+    def __init__(self, gmail):
+        self.gmail = gmail
+
+    def get(self, userId, id, **params):
+        for messages in self.gmail.mailbox.values():
+            for message in messages:
+                if message["id"] == id:
+                    return self.gmail.attempt(id, message)
+        return FakeRequest(RuntimeError("Not Found"))
+
+
+class ThreadsResource:
+    def __init__(self, gmail):
+        self.gmail = gmail
+
+    def list(self, userId, maxResults, q, pageToken=None):
+        mailbox = self.gmail.mailbox
+        # Threads are listed by their latest message, newest first
+        ids = sorted(
+            mailbox, key=lambda t: -max(int(m["internalDate"]) for m in mailbox[t])
+        )
+        start = int(pageToken or 0)
+        response = {"threads": [{"id": i} for i in ids[start : start + maxResults]]}
+        if start + maxResults < len(ids):
+            response["nextPageToken"] = str(start + maxResults)
+        return FakeRequest(response)
+
+    def get(self, userId, id, **params):
+        return self.gmail.attempt(id, {"id": id, "messages": self.gmail.mailbox[id]})
+
+
+class HistoryResource:
+    def __init__(self, gmail):
+        self.gmail = gmail
+
+    def list(self, userId, startHistoryId, maxResults, pageToken=None):
+        self.gmail.history_calls.append((startHistoryId, pageToken))
+        if self.gmail.history_expired:
+            return FakeRequest(
+                HttpError(httplib2.Response({"status": 404}), b"Not Found")
+            )
+        return FakeRequest(self.gmail.history_pages[int(pageToken or 0)])
+
+
+def message(message_id, thread_id=None, day=1):
+    return make_message(message_id, internal_date=day * DAY_MILLIS, thread_id=thread_id)
+
+
+def history_page(history_id, records, next_page=None):
+    page = {"historyId": str(history_id), "history": records}
+    if next_page is not None:
+        page["nextPageToken"] = next_page
+    return page
+
+
+def added(message_id):
+    return {"messagesAdded": [{"message": {"id": message_id}}]}
+
+
+def deleted(message_id):
+    return {"messagesDeleted": [{"message": {"id": message_id}}]}
+
+
+def relabelled(message_id, label_ids):
+    return {"labelsAdded": [{"message": {"id": message_id, "labelIds": label_ids}}]}
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(mirror, "FETCH_RETRY_DELAY", 0)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MailStore(str(tmp_path / "mirror.sqlite3"))
+
+
+@pytest.fixture
+def gmail():
+    return FakeGmail(
+        {
+            "t1": [message("t1", day=1), message("m2", "t1", day=3)],
+            "t2": [message("t2", day=2)],
+        }
+    )
+
+
+def test_full_sync_mirrors_every_thread(gmail, store):
+    stats = full_sync(gmail, store)
+
+    assert stats == {"mode": "full", "added": 3, "deleted": 0, "updated": 0}
+    assert store.count() == 3
+    assert store.get_state("history_id") == "100"
+    assert store.is_thread_complete("t1") and store.is_thread_complete("t2")
+    assert [m["id"] for m in store.get_thread_messages("t1")] == ["t1", "m2"]
+    # Every thread was pulled, so the whole mailbox is covered
+    assert store.covers() and store.covers("2024/01/01")
+
+
+def test_partial_full_sync_covers_only_recent_messages(gmail, store):
+    full_sync(gmail, store, max_threads=1)
+
+    assert store.count() == 2
+    assert store.get_state("covered_since") == str(3 * DAY_MILLIS)
+    assert not store.covers()
+    assert not store.covers("1970/01/02")
+
+
+def test_full_sync_retries_failed_threads(gmail, store):
+    gmail.failures = {"t2": 2}
+
+    full_sync(gmail, store)
+
+    assert store.count() == 3
+
+
+def test_full_sync_leaves_the_mirror_unchanged_when_threads_keep_failing(gmail, store):
+    store.upsert_messages([message("old")])
+    store.set_state("history_id", "50")
+    gmail.failures = {"t2": mirror.FETCH_RETRIES + 1}
+
+    with pytest.raises(RuntimeError, match="t2"):
+        full_sync(gmail, store)
+
+    assert store.get_message("old") is not None
+    assert store.get_state("history_id") == "50"
+
+
+def test_incremental_sync_applies_history(gmail, store):
+    full_sync(gmail, store)
+    gmail.mailbox["t3"] = [message("t3", day=4)]
+    gmail.mailbox["t1"].append(message("m4", "t1", day=5))
+    gmail.history_pages = [
+        history_page(110, [added("t3"), deleted("t2")], next_page="1"),
+        history_page(120, [added("m4"), relabelled("m2", ["INBOX", "STARRED"])]),
+    ]
+
+    stats = incremental_sync(gmail, store, "100")
+
+    assert stats == {
+        "mode": "incremental",
+        "added": 2,
+        "deleted": 1,
+        "updated": 1,
+        "failed": 0,
+    }
+    assert gmail.history_calls == [("100", None), ("100", "1")]
+    assert store.get_state("history_id") == "120"
+    assert store.get_message("t2") is None
+    assert store.get_message("m2")["labelIds"] == ["INBOX", "STARRED"]
+    assert store.is_thread_complete("t3")
+    assert [m["id"] for m in store.get_thread_messages("t1")] == ["t1", "m2", "m4"]
+
+
+def test_messages_added_then_deleted_are_not_fetched(gmail, store):
+    full_sync(gmail, store)
+    gmail.history_pages = [history_page(110, [added("gone"), deleted("gone")])]
+
+    stats = incremental_sync(gmail, store, "100")
+
+    assert stats["added"] == 0 and stats["failed"] == 0
+    assert store.get_state("history_id") == "110"
+
+
+def test_reply_to_an_unknown_thread_marks_it_incomplete(gmail, store):
+    full_sync(gmail, store)
+    gmail.mailbox["t9"] = [message("m9", "t9", day=4)]
+    gmail.history_pages = [history_page(110, [added("m9")])]
+
+    incremental_sync(gmail, store, "100")
+
+    assert store.has_thread("t9")
+    assert not store.is_thread_complete("t9")
+
+
+def test_incremental_sync_retries_failed_fetches(gmail, store):
+    full_sync(gmail, store)
+    gmail.mailbox["t3"] = [message("t3", day=4)]
+    gmail.failures = {"t3": 1}
+    gmail.history_pages = [history_page(110, [added("t3")])]
+
+    stats = incremental_sync(gmail, store, "100")
+
+    assert stats["added"] == 1 and stats["failed"] == 0
+    assert store.get_state("history_id") == "110"
+
+
+def test_failed_fetches_keep_the_history_id_for_a_replay(gmail, store):
+    full_sync(gmail, store)
+    gmail.mailbox["t3"] = [message("t3", day=4)]
+    gmail.mailbox["t4"] = [message("t4", day=5)]
+    gmail.failures = {"t3": mirror.FETCH_RETRIES + 1}
+    gmail.history_pages = [history_page(110, [added("t3"), added("t4")])]
+
+    stats = incremental_sync(gmail, store, "100")
+
+    assert stats["added"] == 1 and stats["failed"] == 1
+    assert store.get_state("history_id") == "100"
+
+    # The next sync replays the same changes and picks up the message
+    stats = incremental_sync(gmail, store, "100")
+
+    assert stats["failed"] == 0
+    assert store.get_message("t3") is not None
+    assert store.get_state("history_id") == "110"
+
+
+def test_sync_mailbox_starts_with_a_full_sync(gmail, store):
+    stats = sync_mailbox(gmail, store)
+
+    assert stats["mode"] == "full"
+    assert stats["history_id"] == "100"
+    assert store.get_state("last_sync") is not None
+
+
+def test_sync_mailbox_continues_incrementally(gmail, store):
+    sync_mailbox(gmail, store)
+    gmail.history_pages = [history_page(105, [])]
+
+    stats = sync_mailbox(gmail, store)
+
+    assert stats["mode"] == "incremental"
+    assert stats["history_id"] == "105"
+
+
+def test_expired_history_id_triggers_a_full_resync(gmail, store):
+    sync_mailbox(gmail, store)
+    store.upsert_messages([message("stale")])
+    gmail.history_expired = True
+    gmail.history_id = 500
+
+    stats = sync_mailbox(gmail, store)
+
+    assert stats["mode"] == "full"
+    assert stats["history_id"] == "500"
+    assert store.get_message("stale") is None
+    assert store.count() == 3
+
+
+def test_other_history_errors_are_raised(gmail, store):
+    sync_mailbox(gmail, store)
+
+    class Unavailable(HistoryResource):
+        def list(self, **params):
+            return FakeRequest(
+                HttpError(httplib2.Response({"status": 503}), b"Unavailable")
+            )
+
+    gmail.history = lambda: Unavailable(gmail)
+
+    with pytest.raises(HttpError):
+        sync_mailbox(gmail, store)
+    assert store.get_state("history_id") == "100"
+
+
+def test_recent_syncs_are_skipped_within_the_interval(gmail, store):
+    sync_mailbox(gmail, store)
+
+    stats = sync_mailbox(gmail, store, min_interval=60)
+
+    assert stats == {"mode": "skipped", "added": 0, "deleted": 0, "updated": 0}
+    assert gmail.history_calls == []
@@ -0,0 +1,272 @@
+import base64
+import email
+import socket
+import time
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from tools.gmail_tools import outbox as outbox_module
+from tools.gmail_tools import tool
+from tools.gmail_tools.outbox import (
+    BACKOFF_MAX,
+    KIND_DRAFT,
+    KIND_SEND,
+    STATUS_FAILED,
+    STATUS_QUEUED,
+    STATUS_SENDING,
+    STATUS_SENT,
+    Outbox,
+    backoff_delay,
+    is_retryable,
+    new_message_id,
+)
+
+from fakes import FakeRequest
+
+
+def http_error(status):
+    return HttpError(httplib2.Response({"status": status}), b"")
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (http_error(429), True),
+        (http_error(503), True),
+        (http_error(400), False),
+        (http_error(403), False),
+        (ConnectionResetError(), True),
+        (socket.timeout(), True),
+        (FileNotFoundError("credentials.json"), False),
+        (PermissionError("token.json"), False),
+        (ValueError("bad message"), False),
+    ],
+)
+def test_is_retryable(error, expected):
+    assert is_retryable(error) is expected
+
+
+class UnreachableService:
+    def users(self):
+        raise AssertionError("queueing must not call the Gmail API")
+
+
+def test_queue_email_needs_no_api_call(tmp_path, monkeypatch):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"), UnreachableService)
+    monkeypatch.setattr(outbox, "start", lambda: None)
+    monkeypatch.setattr(tool, "service", UnreachableService())
+    monkeypatch.setattr(tool, "get_mail_outbox", lambda: outbox)
+
+    result = tool.queue_email(
+        "send", "bob@example.com", "Hello", "Hi Bob", "", "", "key-1"
+    )
+
+    (entry,) = outbox.recent()
+    assert entry["id"] in result
+    row = outbox._conn.execute("SELECT raw FROM outbox").fetchone()
+    message = email.message_from_bytes(base64.urlsafe_b64decode(row["raw"]))
+    assert message["From"] is None
+    assert message["To"] == "bob@example.com"
+    assert message["Message-ID"].strip() == entry["message_id_header"]
+
+
+@pytest.mark.parametrize("attempts", [0, 1, 4, 20])
+def test_backoff_delay_is_capped(attempts):
+    for _ in range(20):
+        assert 0 <= backoff_delay(attempts) <= min(BACKOFF_MAX, 2.0 * 2**attempts)
+
+
+class FakeGmail:
+    """
+    messages.send and drafts.create with scripted failures.
+
+    A failure listed as 'lost' is raised after the message reached Gmail, as
+    when the response to a successful call never arrives.
+    """
+
+    def __init__(self, outcomes=()):
+        self.outcomes = list(outcomes)
+        self.delivered = []
+        self.sends = 0
+        self.lookups = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def drafts(self):
+        return self
+
+    def _deliver(self, raw):
+        self.sends += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else None
+        if outcome == "lost":
+            self.delivered.append(raw)
+            return FakeRequest(http_error(503))
+        if outcome is not None:
+            return FakeRequest(outcome)
+        self.delivered.append(raw)
+        return FakeRequest({"id": f"gmail-{len(self.delivered)}"})
+
+    def send(self, userId, body):
+        return self._deliver(body["raw"])
+
+    def create(self, userId, body):
+        return self._deliver(body["message"]["raw"])
+
+    def list(self, userId, q, maxResults):
+        self.lookups.append(q)
+        message_id = q.split("rfc822msgid:")[1]
+        for i, raw in enumerate(self.delivered, 1):
+            if message_id in base64.urlsafe_b64decode(raw).decode():
+                key = "drafts" if q.startswith("rfc822msgid:") else "messages"
+                return FakeRequest({key: [{"id": f"gmail-{i}"}]})
+        return FakeRequest({})
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(outbox_module, "backoff_delay", lambda attempts: 0)
+
+
+def new_outbox(tmp_path, gmail, **kwargs):
+    return Outbox(str(tmp_path / "outbox.sqlite3"), lambda: gmail, **kwargs)
+
+
+def queue(outbox, kind=KIND_SEND, idempotency_key=None):
+    queue_id, message_id_header = new_message_id()
+    raw = base64.urlsafe_b64encode(
+        f"Message-ID: {message_id_header}\r\n\r\nHi".encode()
+    ).decode()
+    return outbox.enqueue(
+        kind,
+        raw,
+        message_id_header,
+        {"to": "bob@example.com"},
+        queue_id=queue_id,
+        idempotency_key=idempotency_key,
+    )
+
+
+def wait_for(outbox, queue_id, statuses=(STATUS_SENT, STATUS_FAILED)):
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        entry = outbox.get(queue_id)
+        if entry["status"] in statuses:
+            outbox.stop(timeout=5)
+            return entry
+        time.sleep(0.005)
+    outbox.stop(timeout=5)
+    raise AssertionError(f"entry stuck in {outbox.get(queue_id)['status']}")
+
+
+def test_queued_message_is_sent_by_a_worker(tmp_path):
+    gmail = FakeGmail()
+    outbox = new_outbox(tmp_path, gmail)
+
+    entry = wait_for(outbox, queue(outbox)["id"])
+
+    assert entry["status"] == STATUS_SENT
+    assert entry["attempts"] == 1
+    assert entry["result_id"] == "gmail-1"
+    # A first attempt has nothing to look up
+    assert gmail.lookups == []
+
+
+def test_retryable_errors_are_retried(tmp_path):
+    gmail = FakeGmail([http_error(429), http_error(503)])
+    outbox = new_outbox(tmp_path, gmail)
+
+    entry = wait_for(outbox, queue(outbox)["id"])
+
+    assert entry["status"] == STATUS_SENT
+    assert entry["attempts"] == 3
+    assert entry["error"] is None
+    assert gmail.sends == 3 and len(gmail.delivered) == 1
+    assert len(gmail.lookups) == 2
+    assert gmail.lookups[0].startswith("in:sent rfc822msgid:")
+    assert "<" not in gmail.lookups[0]
+
+
+def test_lost_send_response_is_not_delivered_twice(tmp_path):
+    gmail = FakeGmail(["lost"])
+    outbox = new_outbox(tmp_path, gmail)
+
+    entry = wait_for(outbox, queue(outbox)["id"])
+
+    assert entry["status"] == STATUS_SENT
+    assert entry["result_id"] == "gmail-1"
+    assert gmail.sends == 1 and len(gmail.delivered) == 1
+
+
+def test_lost_draft_response_is_not_saved_twice(tmp_path):
+    gmail = FakeGmail(["lost"])
+    outbox = new_outbox(tmp_path, gmail)
+
+    entry = wait_for(outbox, queue(outbox, kind=KIND_DRAFT)["id"])
+
+    assert entry["status"] == STATUS_SENT
+    assert gmail.sends == 1 and len(gmail.delivered) == 1
+    assert gmail.lookups[0].startswith("rfc822msgid:")
+
+
+def test_permanent_errors_fail_at_once(tmp_path):
+    gmail = FakeGmail([http_error(400)])
+    outbox = new_outbox(tmp_path, gmail)
+
+    entry = wait_for(outbox, queue(outbox)["id"])
+
+    assert entry["status"] == STATUS_FAILED
+    assert entry["attempts"] == 1
+    assert "400" in entry["error"]
+    assert gmail.sends == 1
+
+
+def test_entry_fails_after_max_attempts(tmp_path):
+    gmail = FakeGmail([http_error(503)] * 10)
+    outbox = new_outbox(tmp_path, gmail, max_attempts=3)
+
+    entry = wait_for(outbox, queue(outbox)["id"])
+
+    assert entry["status"] == STATUS_FAILED
+    assert entry["attempts"] == 3
+    assert gmail.sends == 3 and gmail.delivered == []
+
+
+def test_idempotency_key_returns_the_existing_entry(tmp_path):
+    outbox = new_outbox(tmp_path, FakeGmail())
+    outbox.start = lambda: None
+
+    first = queue(outbox, idempotency_key="key-1")
+    second = queue(outbox, idempotency_key="key-1")
+    other = queue(outbox, idempotency_key="key-2")
+
+    assert second["id"] == first["id"]
+    assert other["id"] != first["id"]
+    assert outbox.counts() == {STATUS_QUEUED: 2}
+
+
+def test_restart_requeues_interrupted_sends(tmp_path):
+    gmail = FakeGmail()
+    outbox = new_outbox(tmp_path, gmail)
+    outbox.start = lambda: None
+    queue_id = queue(outbox)["id"]
+    # The process died after claiming the entry
+    outbox._finish(queue_id, status=STATUS_SENDING)
+
+    restarted = new_outbox(tmp_path, gmail)
+
+    entry = restarted.get(queue_id)
+    assert entry["status"] == STATUS_QUEUED
+    assert entry["attempts"] == 1
+
+    restarted.start()
+    entry = wait_for(restarted, queue_id)
+
+    # The interrupted send may have gone out, so it is looked up first
+    assert entry["status"] == STATUS_SENT
+    assert len(gmail.lookups) == 1
@@ -0,0 +1,108 @@
+import pytest
+
+from tools.gmail_tools import tool
+from tools.gmail_tools.gmail import MessagePager
+
+from fakes import FakeRequest
+
+
+class FakeGmail:
+    """messages.list over a fixed list of IDs, paged with numeric tokens."""
+
+    def __init__(self, total: int):
+        self.ids = [f"m{i}" for i in range(total)]
+        self.calls = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, userId, maxResults, q, pageToken=None):
+        start = int(pageToken or 0)
+        response = {
+            "messages": [{"id": i} for i in self.ids[start : start + maxResults]]
+        }
+        if start + maxResults < len(self.ids):
+            response["nextPageToken"] = str(start + maxResults)
+        return FakeRequest(response, self.calls, pageToken=pageToken, size=maxResults)
+
+
+def ids(messages):
+    return [message["id"] for message in messages]
+
+
+def test_pages_are_requested_lazily():
+    service = FakeGmail(25)
+    pager = MessagePager(service, max_results=25, query="is:unread")
+    iterator = iter(pager)
+
+    next(iterator)
+
+    assert len(service.calls) == 1
+
+
+def test_cursor_resumes_mid_page():
+    service = FakeGmail(25)
+    first = MessagePager(service, max_results=7)
+
+    assert ids(first) == [f"m{i}" for i in range(7)]
+    assert first.cursor == "7:7:0"
+
+    second = MessagePager(service, max_results=7, cursor=first.cursor)
+    assert ids(second) == [f"m{i}" for i in range(7, 14)]
+
+
+def test_cursor_keeps_the_page_size_it_was_created_with():
+    service = FakeGmail(25)
+    first = MessagePager(service, max_results=10)
+    list(first)
+
+    # A smaller follow-up page still walks the original pages
+    second = MessagePager(service, max_results=3, cursor=first.cursor)
+    assert ids(second) == ["m10", "m11", "m12"]
+    assert second.cursor == "10:10:3"
+
+    third = MessagePager(service, max_results=3, cursor=second.cursor)
+    assert ids(third) == ["m13", "m14", "m15"]
+    assert all(call["size"] == 10 for call in service.calls)
+
+
+def test_cursor_is_none_when_exhausted():
+    service = FakeGmail(5)
+    pager = MessagePager(service, max_results=10)
+
+    assert len(ids(pager)) == 5
+    assert pager.cursor is None
+
+
+def test_paging_visits_every_message_once():
+    service = FakeGmail(23)
+    seen, cursor = [], None
+    while True:
+        pager = MessagePager(service, max_results=4, cursor=cursor)
+        seen.extend(ids(pager))
+        cursor = pager.cursor
+        if not cursor:
+            break
+
+    assert seen == service.ids
+
+
+@pytest.mark.parametrize(
+    "cursor", ["garbage", "x:tok:0", "10:tok:-1", "0:tok:0", "10:tok"]
+)
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError, match="Invalid page token"):
+        MessagePager(None, cursor=cursor)
+
+
+@pytest.mark.parametrize("page_token", ["garbage", "mirror:", "mirror:-5", "mirror:x"])
+def test_search_tools_reject_malformed_page_tokens(page_token):
+    assert tool.search_emails(subject="budget", page_token=page_token) == (
+        f"Error: invalid page_token '{page_token}'"
+    )
+    assert tool.query_emails("budget", page_token=page_token) == (
+        f"Error: invalid page_token '{page_token}'"
+    )
@@ -0,0 +1,362 @@
+import base64
+import http.client
+import json
+import threading
+import urllib.error
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tools.gmail_tools import push, tool
+from tools.gmail_tools.push import (
+    MAX_PUSH_BODY,
+    FakePublisher,
+    MailWatcher,
+    NotificationReceiver,
+    decode_push_message,
+    encode_push_message,
+)
+
+from fakes import FakeRequest
+
+
+class RunningReceiver:
+    running = True
+    url = "http://127.0.0.1:8765/gmail/push"
+
+
+def watcher(topic_name="", expires_in=None, last_error=None):
+    mail_watcher = MailWatcher(lambda: None, lambda service, history_id: None)
+    mail_watcher.receiver = RunningReceiver()
+    mail_watcher.topic_name = topic_name
+    if expires_in is not None:
+        mail_watcher.expiration = datetime.now(timezone.utc) + expires_in
+    mail_watcher.last_error = last_error
+    return mail_watcher
+
+
+@pytest.mark.parametrize(
+    "kwargs, expected",
+    [
+        ({}, False),
+        ({"topic_name": "projects/p/topics/t"}, False),
+        ({"topic_name": "projects/p/topics/t", "expires_in": timedelta(days=1)}, True),
+        (
+            {"topic_name": "projects/p/topics/t", "expires_in": -timedelta(minutes=1)},
+            False,
+        ),
+        (
+            {
+                "topic_name": "projects/p/topics/t",
+                "expires_in": timedelta(days=1),
+                "last_error": "Sync failed: timeout",
+            },
+            False,
+        ),
+    ],
+)
+def test_watching_needs_a_live_watch_registration(kwargs, expected):
+    mail_watcher = watcher(**kwargs)
+
+    assert mail_watcher.active
+    assert mail_watcher.watching is expected
+
+
+@pytest.fixture
+def mirror_syncs(monkeypatch):
+    syncs = []
+
+    def sync_mailbox(service, store, user_id, max_threads, min_interval):
+        syncs.append(min_interval)
+        return {"history_id": None}
+
+    monkeypatch.setattr(tool.gmail_settings, "gmail_mirror_enabled", True)
+    monkeypatch.setattr(tool.gmail_settings, "gmail_mirror_sync_interval", 60)
+    monkeypatch.setattr(tool.gmail_settings, "gmail_push_fallback_sync_interval", 900)
+    monkeypatch.setattr(tool, "get_mail_store", lambda cache_dir: object())
+    monkeypatch.setattr(tool, "sync_mailbox", sync_mailbox)
+    return syncs
+
+
+def test_reads_keep_polling_while_only_the_receiver_runs(monkeypatch, mirror_syncs):
+    monkeypatch.setattr(tool, "mail_watcher", watcher())
+
+    assert tool.get_synced_mirror() is not None
+    assert mirror_syncs == [60]
+
+
+def test_reads_fall_back_to_rare_syncs_while_watching(monkeypatch, mirror_syncs):
+    monkeypatch.setattr(
+        tool,
+        "mail_watcher",
+        watcher("projects/p/topics/t", expires_in=timedelta(days=1)),
+    )
+
+    tool.get_synced_mirror()
+
+    assert mirror_syncs == [900]
+
+
+def test_reads_poll_again_once_the_watch_expires(monkeypatch, mirror_syncs):
+    monkeypatch.setattr(
+        tool,
+        "mail_watcher",
+        watcher("projects/p/topics/t", expires_in=-timedelta(seconds=1)),
+    )
+
+    tool.get_synced_mirror()
+
+    assert mirror_syncs == [60]
+
+
+def test_push_message_round_trip():
+    body = json.dumps(encode_push_message("me@example.com", 1234)).encode()
+
+    assert decode_push_message(body) == {
+        "emailAddress": "me@example.com",
+        "historyId": 1234,
+    }
+
+
+def encoded(data):
+    return json.dumps({"message": {"data": base64.b64encode(data).decode()}})
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"not json",
+        b"{}",
+        json.dumps({"message": {}}).encode(),
+        json.dumps({"message": {"data": "%%%"}}).encode(),
+        encoded(b"not json").encode(),
+        encoded(json.dumps({"emailAddress": "me@example.com"}).encode()).encode(),
+        encoded(json.dumps({"historyId": "abc"}).encode()).encode(),
+    ],
+)
+def test_malformed_push_messages_are_rejected(body):
+    assert decode_push_message(body) is None
+
+
+@pytest.fixture
+def receiver():
+    received = []
+    receiver = NotificationReceiver(
+        lambda email_address, history_id: received.append((email_address, history_id)),
+        port=0,
+        token="s3cret",
+    )
+    receiver.received = received
+    receiver.start()
+    yield receiver
+    receiver.stop()
+
+
+def post(receiver, path, body=b"", headers=None):
+    host, port = receiver._server.server_address[:2]
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    try:
+        connection.request("POST", path, body=body, headers=headers or {})
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+def test_receiver_passes_notifications_to_the_handler(receiver):
+    status = FakePublisher(receiver.url, token="s3cret").publish("me@example.com", 42)
+
+    assert status == 204
+    assert receiver.received == [("me@example.com", 42)]
+
+
+def test_receiver_rejects_a_wrong_token(receiver):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        FakePublisher(receiver.url, token="guess").publish("me@example.com", 42)
+
+    assert error.value.code == 403
+    assert receiver.received == []
+
+
+def test_receiver_only_serves_its_path(receiver):
+    assert post(receiver, "/other?token=s3cret") == 404
+    assert receiver.received == []
+
+
+def test_receiver_refuses_oversized_bodies(receiver):
+    # Refused on the header alone, before any of the body is read
+    status = post(
+        receiver,
+        "/gmail/push?token=s3cret",
+        headers={"Content-Length": str(MAX_PUSH_BODY + 1)},
+    )
+
+    assert status == 413
+    assert receiver.received == []
+
+
+def test_receiver_acknowledges_malformed_bodies_without_handling_them(receiver):
+    assert post(receiver, "/gmail/push?token=s3cret", b"garbage") == 204
+    assert receiver.received == []
+
+
+class SyncRecorder:
+    """on_change callback that records historyIds and can be held or failed."""
+
+    def __init__(self, failures=0):
+        self.applied = []
+        self.failures = failures
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+        self.done = threading.Condition()
+
+    def __call__(self, service, history_id):
+        self.started.set()
+        self.release.wait(5)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("history.list timed out")
+        with self.done:
+            self.applied.append(history_id)
+            self.done.notify_all()
+
+    def wait_for(self, count):
+        with self.done:
+            assert self.done.wait_for(lambda: len(self.applied) >= count, 5)
+
+
+@pytest.fixture
+def running_watcher():
+    watchers = []
+
+    def start(on_change, **kwargs):
+        mail_watcher = MailWatcher(lambda: None, on_change)
+        mail_watcher.start(None, port=0, **kwargs)
+        watchers.append(mail_watcher)
+        return mail_watcher
+
+    yield start
+    for mail_watcher in watchers:
+        mail_watcher.stop()
+
+
+def test_published_notifications_trigger_a_sync(running_watcher):
+    sync = SyncRecorder()
+    mail_watcher = running_watcher(sync)
+
+    FakePublisher(mail_watcher.receiver.url).publish("me@example.com", 10)
+    sync.wait_for(1)
+
+    assert sync.applied == [10]
+    assert mail_watcher.notifications == 1
+    assert mail_watcher.syncs == 1
+    assert mail_watcher.status()["history_id"] == 10
+
+
+def test_notification_bursts_collapse_into_one_sync(running_watcher):
+    sync = SyncRecorder()
+    sync.release.clear()
+    mail_watcher = running_watcher(sync)
+
+    mail_watcher.notify("me@example.com", 10)
+    assert sync.started.wait(5)
+    # These arrive while the first sync is still running
+    for history_id in (11, 13, 12):
+        mail_watcher.notify("me@example.com", history_id)
+    sync.release.set()
+    sync.wait_for(2)
+
+    assert sync.applied == [10, 13]
+    assert mail_watcher.notifications == 4
+
+
+def test_already_applied_history_is_ignored():
+    mail_watcher = MailWatcher(lambda: None, lambda service, history_id: None)
+    mail_watcher.mark_applied("20")
+
+    mail_watcher.queue_sync(15)
+    mail_watcher.queue_sync(20)
+
+    assert mail_watcher._pending_history_id == 0
+
+    mail_watcher.queue_sync(21)
+
+    assert mail_watcher._pending_history_id == 21
+
+
+def test_failed_sync_is_retried_for_the_same_history(running_watcher, monkeypatch):
+    monkeypatch.setattr(push, "SYNC_RETRY_DELAY", 0.01)
+    sync = SyncRecorder(failures=2)
+    mail_watcher = running_watcher(sync)
+
+    mail_watcher.notify("me@example.com", 10)
+    sync.wait_for(1)
+
+    assert sync.applied == [10]
+    assert mail_watcher.syncs == 1
+    assert mail_watcher.last_error is None
+
+
+class FakeWatchService:
+    def __init__(self, history_id=77, expires_in=timedelta(days=7)):
+        expiration = datetime.now(timezone.utc) + expires_in
+        self.response = {
+            "historyId": str(history_id),
+            "expiration": str(int(expiration.timestamp() * 1000)),
+        }
+        self.watches = []
+        self.stops = 0
+
+    def users(self):
+        return self
+
+    def watch(self, userId, body):
+        self.watches.append(body)
+        return FakeRequest(self.response)
+
+    def stop(self, userId):
+        self.stops += 1
+        return FakeRequest({})
+
+
+def test_watch_registration_applies_history_up_to_its_history_id():
+    sync = SyncRecorder()
+    mail_watcher = MailWatcher(lambda: None, sync)
+    service = FakeWatchService()
+
+    mail_watcher.start(
+        service, topic_name="projects/p/topics/t", label_ids=["INBOX"], port=0
+    )
+    try:
+        sync.wait_for(1)
+
+        assert service.watches == [
+            {
+                "topicName": "projects/p/topics/t",
+                "labelIds": ["INBOX"],
+                "labelFilterBehavior": "include",
+            }
+        ]
+        assert sync.applied == [77]
+        assert mail_watcher.watching
+        assert mail_watcher._renew_timer is not None
+    finally:
+        mail_watcher.stop(service)
+
+    assert service.stops == 1
+    assert not mail_watcher.active and not mail_watcher.watching
+
+
+def test_failed_renewal_stops_counting_as_watching(running_watcher):
+    mail_watcher = running_watcher(SyncRecorder())
+    mail_watcher.topic_name = "projects/p/topics/t"
+    mail_watcher.expiration = datetime.now(timezone.utc) + timedelta(hours=1)
+
+    def unreachable():
+        raise ConnectionError("no network")
+
+    mail_watcher.service_factory = unreachable
+    mail_watcher._renew()
+
+    assert "no network" in mail_watcher.last_error
+    assert not mail_watcher.watching
@@ -0,0 +1,102 @@
+import pytest
+
+from tools.gmail_tools.gmail import QueryCache, canonicalize_query
+
+from fakes import FakeRequest
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("is:unread  from:bob", "from:bob is:unread"),
+        ("from:bob is:unread from:bob", "from:bob is:unread"),
+        ('subject:"q3  report" from:bob', 'from:bob subject:"q3  report"'),
+        ('"two words" alpha', '"two words" alpha'),
+        ("b OR a", "b OR a"),
+        ("from:bob AND budget", "from:bob AND budget"),
+        ("meeting AROUND 5 budget", "meeting AROUND 5 budget"),
+        ("{b a} c", "{b a} c"),
+        ("(b a) c", "(b a) c"),
+        ("   ", ""),
+    ],
+)
+def test_canonicalize_query(query, expected):
+    assert canonicalize_query(query) == expected
+
+
+def test_equivalent_queries_share_a_canonical_form():
+    assert canonicalize_query("a b c") == canonicalize_query("c  a b a")
+
+
+class FakeProfile:
+    def __init__(self, history_id):
+        self.history_id = history_id
+        self.calls = []
+
+    def users(self):
+        return self
+
+    def getProfile(self, userId):
+        return FakeRequest({"historyId": str(self.history_id)}, self.calls)
+
+
+def test_results_are_reused_until_history_advances():
+    service = FakeProfile(10)
+    cache = QueryCache(check_interval=0)
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        return len(fetches)
+
+    assert cache.get_or_fetch(service, "q", fetch) == 1
+    assert cache.get_or_fetch(service, "q", fetch) == 1
+
+    service.history_id = 11
+    assert cache.get_or_fetch(service, "q", fetch) == 2
+
+
+def test_profile_is_checked_at_most_once_per_interval():
+    service = FakeProfile(10)
+    cache = QueryCache(check_interval=3600)
+
+    for _ in range(3):
+        cache.get_or_fetch(service, "q", lambda: "result")
+
+    assert len(service.calls) == 1
+
+
+def test_observed_history_drops_entries_and_older_ids_are_ignored():
+    service = FakeProfile(10)
+    cache = QueryCache(check_interval=3600)
+    cache.get_or_fetch(service, "q", lambda: "old")
+
+    cache.observe_history(9)
+    assert cache.get_or_fetch(service, "q", lambda: "new") == "old"
+
+    cache.observe_history(12)
+    assert cache.get_or_fetch(service, "q", lambda: "new") == "new"
+
+
+def test_least_recently_used_entry_is_evicted():
+    service = FakeProfile(10)
+    cache = QueryCache(max_entries=2, check_interval=3600)
+    for key in ("a", "b"):
+        cache.get_or_fetch(service, key, lambda: key)
+    cache.get_or_fetch(service, "a", lambda: "refetched")
+    cache.get_or_fetch(service, "c", lambda: "c")
+
+    assert cache.get_or_fetch(service, "a", lambda: "refetched") == "a"
+    assert cache.get_or_fetch(service, "b", lambda: "refetched") == "refetched"
+
+
+def test_result_fetched_during_a_change_is_not_cached():
+    service = FakeProfile(10)
+    cache = QueryCache(check_interval=3600)
+
+    def fetch():
+        cache.invalidate()
+        return "stale"
+
+    assert cache.get_or_fetch(service, "q", fetch) == "stale"
+    assert cache.get_or_fetch(service, "q", lambda: "fresh") == "fresh"
@@ -0,0 +1,134 @@
+import pytest
+
+from tools.gmail_tools import tool
+from tools.gmail_tools.gmail import (
+    SUMMARY_FIELDS,
+    SUMMARY_HEADERS,
+    get_headers_dict,
+    get_message,
+)
+
+from fakes import FakeBatch, FakeRequest
+
+
+def metadata_message(message_id, **headers):
+    """A messages.get response in 'metadata' format, trimmed by SUMMARY_FIELDS."""
+    return {
+        "id": message_id,
+        "threadId": message_id,
+        "snippet": f"preview of {message_id}",
+        "payload": {
+            "headers": [
+                {"name": name, "value": value} for name, value in headers.items()
+            ]
+        },
+    }
+
+
+class FakeGmail:
+    def __init__(self, messages):
+        self.messages_by_id = {message["id"]: message for message in messages}
+        self.calls = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def get(self, **params):
+        message = self.messages_by_id.get(params["id"])
+        response = message if message is not None else LookupError("Not Found")
+        return FakeRequest(response, self.calls, **params)
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(callback)
+
+
+def test_get_message_requests_only_the_given_headers_and_fields():
+    service = FakeGmail([metadata_message("m1", Subject="Hi")])
+
+    message = get_message(
+        service,
+        "m1",
+        message_format="metadata",
+        metadata_headers=SUMMARY_HEADERS,
+        fields=SUMMARY_FIELDS,
+    )
+
+    assert message["id"] == "m1"
+    assert service.calls == [
+        {
+            "userId": "me",
+            "id": "m1",
+            "format": "metadata",
+            "metadataHeaders": ["From", "Subject", "Date"],
+            "fields": "id,threadId,snippet,payload/headers",
+        }
+    ]
+
+
+def test_metadata_headers_are_only_sent_with_the_metadata_format():
+    service = FakeGmail([metadata_message("m1")])
+
+    get_message(service, "m1", message_format="minimal", metadata_headers=["From"])
+
+    assert service.calls == [{"userId": "me", "id": "m1", "format": "minimal"}]
+
+
+def test_get_headers_dict_tolerates_trimmed_messages():
+    assert get_headers_dict({"id": "m1"}) == {}
+    assert get_headers_dict({"id": "m1", "payload": {}}) == {}
+
+
+@pytest.fixture
+def gmail(monkeypatch):
+    service = FakeGmail(
+        [
+            metadata_message(
+                "m1",
+                From="alice@example.com",
+                Subject="Budget",
+                Date="Mon, 3 Jun 2024 09:00:00 +0000",
+            ),
+            metadata_message("m2"),
+        ]
+    )
+    monkeypatch.setattr(tool, "service", service)
+    return service
+
+
+def test_summaries_are_built_from_metadata_only(gmail):
+    result = tool.format_message_summaries([{"id": "m1"}, {"id": "m2"}])
+
+    assert {call["format"] for call in gmail.calls} == {"metadata"}
+    assert all(call["fields"] == SUMMARY_FIELDS for call in gmail.calls)
+    assert result == (
+        "\nMessage ID: m1\n"
+        "From: alice@example.com\n"
+        "Subject: Budget\n"
+        "Date: Mon, 3 Jun 2024 09:00:00 +0000\n"
+        "Preview: preview of m1\n"
+        "\nMessage ID: m2\n"
+        "From: Unknown\n"
+        "Subject: No Subject\n"
+        "Date: Unknown Date\n"
+        "Preview: preview of m2\n"
+    )
+
+
+def test_summaries_report_messages_that_failed(gmail):
+    result = tool.format_message_summaries([{"id": "gone"}, {"threadId": "no id"}])
+
+    assert result == "\nMessage ID: gone\nError: Not Found\n"
+
+
+def test_summaries_from_the_mirror_make_no_api_call(gmail):
+    class Mirror:
+        def get_messages(self, message_ids):
+            return {"m1": metadata_message("m1", Subject="Local")}
+
+    result = tool.format_message_summaries([{"id": "m1"}], store=Mirror())
+
+    assert "Subject: Local" in result
+    assert gmail.calls == []
@@ -0,0 +1,242 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tools.google_api import auth
+from tools.google_api.auth import REFRESH_RETRY_DELAY, CredentialManager
+
+
+class FakeCredentials:
+    def __init__(self, token="t0", valid=True, refresh_token="r", expires_in=None):
+        self.token = token
+        self.valid = valid
+        self.refresh_token = refresh_token
+        self.expiry = None
+        if expires_in is not None:
+            self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + expires_in
+        self.refreshes = 0
+        self.failure = None
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def refresh(self, request):
+        self.entered.set()
+        self.release.wait(5)
+        if self.failure is not None:
+            raise self.failure
+        self.refreshes += 1
+        self.token = f"t{self.refreshes}"
+        self.valid = True
+        self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(
+            hours=1
+        )
+
+    def to_json(self):
+        return json.dumps({"token": self.token, "refresh_token": self.refresh_token})
+
+
+class CountingLock:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.arrivals = 0
+
+    def __enter__(self):
+        self.arrivals += 1
+        self.lock.acquire()
+
+    def __exit__(self, *exc_info):
+        self.lock.release()
+
+
+class FakeTimer:
+    def __init__(self, delay, function):
+        self.delay = delay
+        self.function = function
+        self.daemon = False
+        self.started = False
+        self.cancelled = False
+
+    def start(self):
+        self.started = True
+
+    def cancel(self):
+        self.cancelled = True
+
+
+@pytest.fixture
+def timers(monkeypatch):
+    created = []
+
+    def make_timer(delay, function):
+        timer = FakeTimer(delay, function)
+        created.append(timer)
+        return timer
+
+    monkeypatch.setattr(auth.threading, "Timer", make_timer)
+    return created
+
+
+def manager_with(tmp_path, creds):
+    manager = CredentialManager(
+        str(tmp_path / "credentials.json"), str(tmp_path / "token.json"), ["scope"]
+    )
+    manager._creds = creds
+    return manager
+
+
+def test_get_returns_valid_credentials_without_refreshing(tmp_path, timers):
+    creds = FakeCredentials()
+    manager = manager_with(tmp_path, creds)
+
+    assert manager.get() is creds
+    assert creds.refreshes == 0
+    assert not (tmp_path / "token.json").exists()
+
+
+def test_get_refreshes_expired_credentials_and_persists_them(tmp_path, timers):
+    creds = FakeCredentials(valid=False)
+    manager = manager_with(tmp_path, creds)
+
+    assert manager.get() is creds
+
+    assert creds.refreshes == 1
+    token = json.loads((tmp_path / "token.json").read_text())
+    assert token == {"token": "t1", "refresh_token": "r"}
+    assert [p.name for p in tmp_path.iterdir()] == ["token.json"]
+
+
+def test_concurrent_refreshes_share_one_token_request(tmp_path, timers):
+    creds = FakeCredentials(valid=False)
+    creds.release.clear()
+    manager = manager_with(tmp_path, creds)
+    manager._refresh_lock = lock = CountingLock()
+    results = []
+
+    first = threading.Thread(target=lambda: results.append(manager.refresh()))
+    first.start()
+    assert creds.entered.wait(5)
+    # Everyone else arrives while the first refresh is still in flight
+    others = [
+        threading.Thread(target=lambda: results.append(manager.refresh()))
+        for _ in range(4)
+    ]
+    for thread in others:
+        thread.start()
+    while lock.arrivals < 5:
+        time.sleep(0.001)
+    creds.release.set()
+    for thread in [first, *others]:
+        thread.join(5)
+
+    assert creds.refreshes == 1
+    assert len(results) == 5 and all(r is creds for r in results)
+
+
+def test_sequential_refreshes_each_request_a_token(tmp_path, timers):
+    creds = FakeCredentials()
+    manager = manager_with(tmp_path, creds)
+
+    manager.refresh()
+    manager.refresh()
+
+    assert creds.refreshes == 2
+
+
+def test_refresh_without_refresh_token_reauthorizes(tmp_path, timers, monkeypatch):
+    creds = FakeCredentials(valid=False, refresh_token=None)
+    fresh = FakeCredentials(token="new", refresh_token=None)
+    manager = manager_with(tmp_path, creds)
+    monkeypatch.setattr(manager, "_authorize", lambda: fresh)
+
+    assert manager.refresh() is fresh
+
+    assert manager.get() is fresh
+    assert json.loads((tmp_path / "token.json").read_text())["token"] == "new"
+
+
+def test_refresh_is_scheduled_ahead_of_expiry(tmp_path, timers):
+    creds = FakeCredentials(expires_in=timedelta(hours=1))
+    manager = manager_with(tmp_path, creds)
+
+    manager._schedule_refresh()
+
+    (timer,) = timers
+    assert timer.started and timer.daemon
+    assert (
+        3600 - manager.refresh_margin - 5 < timer.delay <= 3600 - manager.refresh_margin
+    )
+
+
+def test_refresh_is_scheduled_immediately_inside_the_margin(tmp_path, timers):
+    creds = FakeCredentials(expires_in=timedelta(seconds=30))
+    manager = manager_with(tmp_path, creds)
+
+    manager._schedule_refresh()
+
+    assert timers[0].delay == 0.0
+
+
+def test_no_refresh_is_scheduled_without_refresh_token_or_expiry(tmp_path, timers):
+    manager_with(tmp_path, FakeCredentials(refresh_token=None))._schedule_refresh()
+    manager_with(tmp_path, FakeCredentials())._schedule_refresh()
+
+    assert timers == []
+
+
+def test_rescheduling_cancels_the_previous_timer(tmp_path, timers):
+    creds = FakeCredentials(expires_in=timedelta(hours=1))
+    manager = manager_with(tmp_path, creds)
+
+    manager._schedule_refresh()
+    manager.refresh()
+
+    assert len(timers) == 2
+    assert timers[0].cancelled and not timers[1].cancelled
+    assert manager._timer is timers[1]
+
+    manager.close()
+    assert timers[1].cancelled and manager._timer is None
+
+
+def test_background_refresh_failure_retries_later(tmp_path, timers, capsys):
+    creds = FakeCredentials(expires_in=timedelta(hours=1))
+    creds.failure = RuntimeError("network down")
+    manager = manager_with(tmp_path, creds)
+
+    manager._background_refresh()
+
+    (timer,) = timers
+    assert timer.delay == REFRESH_RETRY_DELAY
+    assert timer.function == manager._background_refresh
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "network down" in captured.err
+
+
+def test_get_loads_the_token_file_once(tmp_path, timers, monkeypatch):
+    creds = FakeCredentials(expires_in=timedelta(hours=1))
+    loads = []
+    manager = CredentialManager(
+        str(tmp_path / "credentials.json"), str(tmp_path / "token.json"), ["scope"]
+    )
+    monkeypatch.setattr(manager, "_load", lambda: loads.append(1) or creds)
+
+    assert manager.get() is creds
+    assert manager.get() is creds
+
+    assert loads == [1]
+    assert len(timers) == 1
+
+
+def test_get_credential_manager_is_shared_per_key(monkeypatch):
+    monkeypatch.setattr(auth, "_managers", {})
+
+    first = auth.get_credential_manager("c.json", "t.json", ["a", "b"])
+
+    assert auth.get_credential_manager("c.json", "t.json", ["a", "b"]) is first
+    assert auth.get_credential_manager("c.json", "t.json", ["a"]) is not first
+    assert auth.get_credential_manager("c.json", "t2.json", ["a", "b"]) is not first
@@ -0,0 +1,179 @@
+import pytest
+
+from tools.gmail_tools import tool
+from tools.gmail_tools.gmail import get_messages_batch
+from tools.google_api import MAX_BATCH_SIZE, execute_batch
+
+from fakes import FakeBatch, FakeRequest, make_message
+
+
+class FakeService:
+    """Records the chunks sent through new_batch_http_request."""
+
+    def __init__(self, failing_batches=()):
+        self.batches = []
+        self.failing_batches = set(failing_batches)
+
+    def new_batch_http_request(self, callback):
+        service = self
+
+        class RecordingBatch(FakeBatch):
+            def execute(self):
+                service.batches.append([key for key, _ in self.requests])
+                if len(service.batches) - 1 in service.failing_batches:
+                    raise ConnectionError("batch endpoint unreachable")
+                super().execute()
+
+        return RecordingBatch(callback)
+
+
+class FakeGmail(FakeService):
+    """messages.get over a fixed set of messages."""
+
+    def __init__(self, messages, failing_batches=()):
+        super().__init__(failing_batches)
+        self.messages_by_id = {message["id"]: message for message in messages}
+        self.params = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def get(self, **params):
+        message = self.messages_by_id.get(params["id"])
+        if message is None:
+            return FakeRequest(LookupError("Not Found"), self.params, **params)
+        return FakeRequest(message, self.params, **params)
+
+
+def requests_for(keys):
+    return [(key, FakeRequest({"key": key})) for key in keys]
+
+
+def test_requests_are_chunked_at_the_batch_size():
+    service = FakeService()
+    keys = [f"k{i}" for i in range(7)]
+
+    results, errors = execute_batch(service, requests_for(keys), batch_size=3)
+
+    assert service.batches == [["k0", "k1", "k2"], ["k3", "k4", "k5"], ["k6"]]
+    assert results == {key: {"key": key} for key in keys}
+    assert errors == {}
+
+
+def test_batch_size_is_capped_at_the_api_limit():
+    service = FakeService()
+    keys = [f"k{i}" for i in range(MAX_BATCH_SIZE + 1)]
+
+    execute_batch(service, requests_for(keys), batch_size=1000)
+
+    assert [len(batch) for batch in service.batches] == [MAX_BATCH_SIZE, 1]
+
+
+def test_duplicate_keys_are_requested_once():
+    service = FakeService()
+    requests = [
+        ("a", FakeRequest("first")),
+        ("b", FakeRequest("b")),
+        ("a", FakeRequest("second")),
+    ]
+
+    results, errors = execute_batch(service, requests)
+
+    assert service.batches == [["a", "b"]]
+    assert results == {"a": "first", "b": "b"}
+
+
+def test_item_failures_do_not_hide_other_responses():
+    service = FakeService()
+    requests = [
+        ("ok", FakeRequest("fine")),
+        ("bad", FakeRequest(ValueError("invalid id"))),
+    ]
+
+    results, errors = execute_batch(service, requests)
+
+    assert results == {"ok": "fine"}
+    assert errors == {"bad": "invalid id"}
+
+
+def test_a_failed_chunk_marks_only_its_own_items():
+    service = FakeService(failing_batches={1})
+    keys = [f"k{i}" for i in range(5)]
+
+    results, errors = execute_batch(service, requests_for(keys), batch_size=2)
+
+    assert sorted(results) == ["k0", "k1", "k4"]
+    assert errors == {
+        "k2": "batch endpoint unreachable",
+        "k3": "batch endpoint unreachable",
+    }
+
+
+def test_no_batch_is_sent_for_no_requests():
+    service = FakeService()
+
+    assert execute_batch(service, []) == ({}, {})
+    assert service.batches == []
+
+
+def test_get_messages_batch_passes_request_options():
+    service = FakeGmail([make_message("m1"), make_message("m2")])
+
+    messages, errors = get_messages_batch(
+        service,
+        ["m1", "m2"],
+        message_format="metadata",
+        metadata_headers=["Subject"],
+        fields="id,payload/headers",
+    )
+
+    assert sorted(messages) == ["m1", "m2"]
+    assert errors == {}
+    assert service.params[0] == {
+        "userId": "me",
+        "id": "m1",
+        "format": "metadata",
+        "metadataHeaders": ["Subject"],
+        "fields": "id,payload/headers",
+    }
+
+
+def test_get_messages_batch_leaves_the_default_format_out():
+    service = FakeGmail([make_message("m1")])
+
+    get_messages_batch(service, ["m1"])
+
+    assert service.params == [{"userId": "me", "id": "m1"}]
+
+
+@pytest.fixture
+def gmail(monkeypatch):
+    service = FakeGmail(
+        [
+            make_message("m1", subject="First"),
+            make_message("m2", subject="Second"),
+        ]
+    )
+    monkeypatch.setattr(tool, "service", service)
+    monkeypatch.setattr(tool, "get_synced_mirror", lambda: None)
+    return service
+
+
+def test_get_emails_fetches_all_messages_in_one_batch(gmail):
+    result = tool.get_emails(["m1", "m2", "m1"])
+
+    assert gmail.batches == [["m1", "m2"]]
+    assert result.startswith("Retrieved 2 emails:")
+    assert "Subject: First" in result and "Subject: Second" in result
+    assert "Failed to retrieve" not in result
+
+
+def test_get_emails_reports_failed_messages(gmail):
+    result = tool.get_emails(["m1", "gone"])
+
+    assert result.startswith("Retrieved 1 emails:")
+    assert "Failed to retrieve 1 emails:" in result
+    assert "--- Email 1 (ID: gone) ---\nError: Not Found" in result
@@ -0,0 +1,156 @@
+import json
+
+import pytest
+
+from tools.google_api import client, discovery
+from tools.google_api.discovery import (
+    DISCOVERY_CACHE_VERSION,
+    clear_discovery_cache,
+    load_discovery_document,
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_cache(monkeypatch):
+    monkeypatch.setattr(discovery, "_documents", {})
+
+
+@pytest.fixture
+def bundled(monkeypatch):
+    """Count lookups of the documents bundled with the client library."""
+    lookups = []
+
+    def get_static_doc(service_name, version):
+        lookups.append((service_name, version))
+        return json.dumps({"name": service_name, "version": version})
+
+    monkeypatch.setattr(discovery, "get_static_doc", get_static_doc)
+    return lookups
+
+
+def cache_path(cache_dir, name="gmail.v1.json"):
+    return cache_dir / "discovery" / name
+
+
+def test_document_is_cached_in_memory_and_on_disk(tmp_path, bundled):
+    document = load_discovery_document("gmail", "v1", str(tmp_path))
+
+    assert document == {"name": "gmail", "version": "v1"}
+    entry = json.loads(cache_path(tmp_path).read_text())
+    assert entry["cache_version"] == DISCOVERY_CACHE_VERSION
+    assert entry["document"] == document
+
+    assert load_discovery_document("gmail", "v1", str(tmp_path)) is document
+    assert bundled == [("gmail", "v1")]
+
+
+def test_disk_cache_is_used_by_a_new_process(tmp_path, bundled, monkeypatch):
+    load_discovery_document("gmail", "v1", str(tmp_path))
+    monkeypatch.setattr(discovery, "_documents", {})
+
+    document = load_discovery_document("gmail", "v1", str(tmp_path))
+
+    assert document == {"name": "gmail", "version": "v1"}
+    assert bundled == [("gmail", "v1")]
+
+
+@pytest.mark.parametrize(
+    "entry",
+    [
+        {"cache_version": DISCOVERY_CACHE_VERSION, "library_version": "0.0.1"},
+        {"cache_version": 0, "library_version": discovery.GOOGLEAPICLIENT_VERSION},
+    ],
+)
+def test_entries_from_other_versions_are_ignored(tmp_path, bundled, entry):
+    path = cache_path(tmp_path)
+    path.parent.mkdir()
+    path.write_text(json.dumps({**entry, "document": {"name": "stale"}}))
+
+    document = load_discovery_document("gmail", "v1", str(tmp_path))
+
+    assert document["name"] == "gmail"
+    assert json.loads(path.read_text())["document"]["name"] == "gmail"
+
+
+def test_corrupt_entries_are_replaced(tmp_path, bundled):
+    path = cache_path(tmp_path)
+    path.parent.mkdir()
+    path.write_text("{not json")
+
+    assert load_discovery_document("gmail", "v1", str(tmp_path))["name"] == "gmail"
+    assert json.loads(path.read_text())["document"]["name"] == "gmail"
+
+
+def test_unwritable_cache_only_warns(tmp_path, bundled, capsys):
+    blocker = tmp_path / "cache"
+    blocker.write_text("a file where the cache directory should be")
+
+    document = load_discovery_document("gmail", "v1", str(blocker))
+
+    assert document["name"] == "gmail"
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "Could not write discovery cache" in captured.err
+
+
+def test_unbundled_documents_are_downloaded(tmp_path, monkeypatch):
+    downloads = []
+    monkeypatch.setattr(discovery, "get_static_doc", lambda name, version: None)
+    monkeypatch.setattr(
+        discovery,
+        "_fetch_discovery_document",
+        lambda name, version: downloads.append(name) or '{"name": "people"}',
+    )
+
+    load_discovery_document("people", "v1", str(tmp_path))
+    monkeypatch.setattr(discovery, "_documents", {})
+    load_discovery_document("people", "v1", str(tmp_path))
+
+    assert downloads == ["people"]
+
+
+def test_clear_discovery_cache(tmp_path, bundled):
+    load_discovery_document("gmail", "v1", str(tmp_path))
+    load_discovery_document("tasks", "v1", str(tmp_path))
+
+    clear_discovery_cache(str(tmp_path))
+    load_discovery_document("gmail", "v1", str(tmp_path))
+
+    assert bundled == [("gmail", "v1"), ("tasks", "v1"), ("gmail", "v1")]
+    assert [p.name for p in cache_path(tmp_path).parent.iterdir()] == ["gmail.v1.json"]
+
+
+@pytest.fixture
+def builds(tmp_path, bundled, monkeypatch):
+    built = []
+
+    def build_from_document(document, credentials):
+        built.append(document["name"])
+        return object()
+
+    monkeypatch.setattr(client, "_services", {})
+    monkeypatch.setattr(client, "get_credentials", lambda *args: "creds")
+    monkeypatch.setattr(client, "build_from_document", build_from_document)
+    return built
+
+
+def test_built_services_are_reused(tmp_path, builds):
+    first = client.get_google_service("gmail", "v1", cache_dir=str(tmp_path))
+
+    second = client.get_google_service("gmail", "v1", cache_dir=str(tmp_path))
+    other = client.get_google_service("tasks", "v1", cache_dir=str(tmp_path))
+
+    assert second is first and other is not first
+    assert builds == ["gmail", "tasks"]
+
+
+def test_uncached_services_are_private(tmp_path, builds):
+    shared = client.get_google_service("gmail", "v1", cache_dir=str(tmp_path))
+
+    private = client.get_google_service(
+        "gmail", "v1", cache_dir=str(tmp_path), use_cache=False
+    )
+
+    assert private is not shared
+    assert client.get_google_service("gmail", "v1", cache_dir=str(tmp_path)) is shared
+    assert builds == ["gmail", "gmail"]
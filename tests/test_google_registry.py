@@ -0,0 +1,111 @@
+import importlib
+import threading
+
+import pytest
+
+from tools.google_api import registry
+from tools.google_api.registry import LazyService, get_service, register_service
+
+
+class Service:
+    def __init__(self):
+        self.calls = 0
+
+    def users(self):
+        self.calls += 1
+        return "users"
+
+
+def test_service_is_built_on_first_attribute_access():
+    builds = []
+    lazy = LazyService("gmail", lambda: builds.append(1) or Service())
+
+    assert not lazy.is_built
+    assert builds == []
+    assert repr(lazy) == "<LazyService 'gmail' (pending)>"
+
+    assert lazy.users() == "users"
+    assert lazy.users() == "users"
+
+    assert builds == [1]
+    assert lazy.is_built
+    assert repr(lazy) == "<LazyService 'gmail' (built)>"
+
+
+def test_failed_builds_are_retried():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise FileNotFoundError("credentials.json")
+        return Service()
+
+    lazy = LazyService("calendar", factory)
+
+    with pytest.raises(FileNotFoundError):
+        lazy.get()
+    assert not lazy.is_built
+
+    assert isinstance(lazy.get(), Service)
+    assert len(attempts) == 2
+
+
+def test_concurrent_first_calls_build_once():
+    builds = []
+    release = threading.Event()
+
+    def factory():
+        builds.append(1)
+        release.wait(5)
+        return Service()
+
+    lazy = LazyService("tasks", factory)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(lazy.get())) for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert builds == [1]
+    assert len(results) == 5 and all(r is results[0] for r in results)
+
+
+def test_reset_rebuilds_on_next_use():
+    lazy = LazyService("gmail", Service)
+    first = lazy.get()
+
+    lazy.reset()
+
+    assert not lazy.is_built
+    assert lazy.get() is not first
+
+
+def test_register_service_returns_the_existing_proxy(monkeypatch):
+    monkeypatch.setattr(registry, "_services", {})
+
+    lazy = register_service("gmail", Service)
+
+    assert register_service("gmail", lambda: None) is lazy
+    assert isinstance(get_service("gmail"), Service)
+    with pytest.raises(KeyError):
+        get_service("drive")
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "tools.gmail_tools.tool",
+        "tools.calendar_tools.tool",
+        "tools.tasks_tools.tool",
+    ],
+)
+def test_importing_the_tools_builds_no_service(module):
+    tool = importlib.import_module(module)
+
+    assert isinstance(tool.service, LazyService)
+    assert not tool.service.is_built
@@ -0,0 +1,169 @@
+import pytest
+
+from tools.tasks_tools import tool
+from tools.tasks_tools.tasks import (
+    MAX_PAGE_SIZE,
+    get_tasks,
+    iter_task_lists,
+    iter_tasks,
+    list_task_lists,
+)
+
+from fakes import FakeRequest
+
+
+class Pages:
+    """A list endpoint over in-memory items, paged with numeric tokens."""
+
+    def __init__(self, items, page_size):
+        self.items = items
+        self.page_size = page_size
+        self.calls = []
+
+    def list(self, pageToken=None, **params):
+        start = int(pageToken or 0)
+        end = start + min(self.page_size, params["maxResults"])
+        response = {"items": self.items[start:end]}
+        if end < len(self.items):
+            response["nextPageToken"] = str(end)
+        return FakeRequest(response, self.calls, pageToken=pageToken, **params)
+
+
+class FakeTasks:
+    def __init__(self, tasks=0, task_lists=0, page_size=2):
+        self.task_pages = Pages(
+            [{"id": f"t{i}", "title": f"Task {i}"} for i in range(tasks)], page_size
+        )
+        self.list_pages = Pages(
+            [{"id": f"l{i}", "title": f"List {i}"} for i in range(task_lists)],
+            page_size,
+        )
+
+    def tasks(self):
+        return self.task_pages
+
+    def tasklists(self):
+        return self.list_pages
+
+
+def test_iter_tasks_follows_every_page():
+    service = FakeTasks(tasks=5)
+
+    tasks = list(iter_tasks(service, "list1"))
+
+    assert [task["id"] for task in tasks] == ["t0", "t1", "t2", "t3", "t4"]
+    assert [call["pageToken"] for call in service.task_pages.calls] == [
+        None,
+        "2",
+        "4",
+    ]
+    assert service.task_pages.calls[0] == {
+        "pageToken": None,
+        "tasklist": "list1",
+        "maxResults": MAX_PAGE_SIZE,
+        "showCompleted": True,
+        "showHidden": False,
+        "showDeleted": False,
+    }
+
+
+def test_iter_tasks_requests_pages_only_as_they_are_consumed():
+    service = FakeTasks(tasks=5)
+
+    tasks = iter_tasks(service, "list1")
+    next(tasks)
+    next(tasks)
+
+    assert len(service.task_pages.calls) == 1
+
+
+def test_iter_tasks_passes_filters_and_wraps_the_field_mask():
+    service = FakeTasks(tasks=1)
+
+    list(
+        iter_tasks(
+            service,
+            "list1",
+            updated_min="2024-06-01T00:00:00Z",
+            page_size=500,
+            fields="id,title",
+        )
+    )
+
+    call = service.task_pages.calls[0]
+    assert call["maxResults"] == MAX_PAGE_SIZE
+    assert call["updatedMin"] == "2024-06-01T00:00:00Z"
+    assert call["fields"] == "nextPageToken,items(id,title)"
+
+
+@pytest.mark.parametrize("max_results, pages", [(None, 3), (1, 1), (3, 2), (4, 2)])
+def test_get_tasks_stops_at_max_results(max_results, pages):
+    service = FakeTasks(tasks=5)
+
+    tasks = get_tasks(service, "list1", max_results=max_results)
+
+    assert len(tasks) == (max_results or 5)
+    assert len(service.task_pages.calls) == pages
+
+
+def test_get_tasks_sizes_pages_to_max_results():
+    service = FakeTasks(tasks=5, page_size=MAX_PAGE_SIZE)
+
+    get_tasks(service, "list1", max_results=3)
+
+    assert service.task_pages.calls[0]["maxResults"] == 3
+
+
+def test_task_lists_follow_every_page():
+    service = FakeTasks(task_lists=3)
+
+    assert [tl["id"] for tl in list_task_lists(service)] == ["l0", "l1", "l2"]
+    assert [tl["id"] for tl in list_task_lists(service, max_results=1)] == ["l0"]
+    assert len(service.list_pages.calls) == 3
+
+
+def test_iter_task_lists_wraps_the_field_mask():
+    service = FakeTasks(task_lists=1)
+
+    list(iter_task_lists(service, fields="id"))
+
+    assert service.list_pages.calls[0]["fields"] == "nextPageToken,items(id)"
+
+
+@pytest.fixture
+def api(monkeypatch):
+    service = FakeTasks(tasks=5, task_lists=3)
+    monkeypatch.setattr(tool, "service", service)
+    monkeypatch.setattr(tool.settings, "tasks_store_enabled", False)
+    return service
+
+
+def test_list_tasks_tool_reads_all_pages_with_summary_fields(api):
+    result = tool.list_tasks_tool("list1")
+
+    assert result.startswith("Found 5 tasks:\n")
+    assert "Title: Task 4\nStatus: Unknown\nID: t4\n" in result
+    assert {call["fields"] for call in api.task_pages.calls} == {
+        f"nextPageToken,items({tool.TASK_SUMMARY_FIELDS})"
+    }
+
+
+def test_list_tasks_tool_limits_results(api):
+    result = tool.list_tasks_tool("list1", max_results=2)
+
+    assert result.startswith("Found 2 tasks:\n")
+    assert len(api.task_pages.calls) == 1
+
+
+def test_get_task_list_streams_every_page(api):
+    result = tool.get_task_list("list1")
+
+    assert result.startswith("Task List (ID: list1)\n")
+    assert result.count("Title: ") == 5
+
+
+def test_list_task_lists_tool(api):
+    result = tool.list_task_lists_tool()
+
+    assert result.startswith("Found 3 task lists:\n")
+    assert "\nTitle: List 2\nID: l2\n" in result
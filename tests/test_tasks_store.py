@@ -0,0 +1,275 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from tools.tasks_tools.store import (
+    FULL_SYNC_INTERVAL,
+    SYNC_OVERLAP,
+    TaskStore,
+    parse_rfc3339,
+    sync_task_list,
+)
+
+from fakes import FakeRequest
+
+
+def task(task_id, updated, **fields):
+    return {
+        "id": task_id,
+        "title": task_id,
+        "status": "needsAction",
+        "updated": updated,
+        **fields,
+    }
+
+
+class FakeTasks:
+    """tasks.list over an in-memory list, paged with numeric tokens."""
+
+    def __init__(self, items, page_size=2, missing=False):
+        self.items = items
+        self.page_size = page_size
+        self.missing = missing
+        self.calls = []
+
+    def tasks(self):
+        return self
+
+    def list(self, pageToken=None, **params):
+        if self.missing:
+            error = HttpError(httplib2.Response({"status": 404}), b"Not Found")
+            return FakeRequest(error, self.calls, **params)
+        items = [
+            t
+            for t in self.items
+            if (params["showDeleted"] or not t.get("deleted"))
+            and (params["showHidden"] or not t.get("hidden"))
+            and (
+                "updatedMin" not in params
+                or parse_rfc3339(t["updated"]) >= parse_rfc3339(params["updatedMin"])
+            )
+        ]
+        start = int(pageToken or 0)
+        response = {"items": items[start : start + self.page_size]}
+        if start + self.page_size < len(items):
+            response["nextPageToken"] = str(start + self.page_size)
+        return FakeRequest(response, self.calls, pageToken=pageToken, **params)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TaskStore(str(tmp_path / "tasks.sqlite3"))
+
+
+def ids(tasks):
+    return [t["id"] for t in tasks]
+
+
+def test_watermark_is_the_newest_update_of_a_sync(store):
+    store.apply_changes(
+        "L",
+        [task("a", "2024-06-03T10:00:00.000Z"), task("b", "2024-06-03T12:00:00.000Z")],
+        replace=True,
+    )
+
+    state = store.get_list_state("L")
+    assert state["watermark"] == parse_rfc3339("2024-06-03T12:00:00Z")
+    assert state["last_full_sync"] is not None
+    assert state["last_sync"] is not None
+
+
+def test_watermark_never_moves_backwards(store):
+    store.apply_changes("L", [task("a", "2024-06-03T12:00:00.000Z")], replace=True)
+    full_sync_time = store.get_list_state("L")["last_full_sync"]
+
+    store.apply_changes("L", [task("b", "2024-06-03T11:00:00.000Z")], synced=True)
+    store.apply_changes("L", [], synced=True)
+
+    state = store.get_list_state("L")
+    assert state["watermark"] == parse_rfc3339("2024-06-03T12:00:00Z")
+    assert state["last_full_sync"] == full_sync_time
+
+
+def test_unsynced_writes_do_not_advance_the_watermark(store):
+    store.apply_changes("L", [task("a", "2024-06-03T10:00:00.000Z")], replace=True)
+
+    store.upsert_task("L", task("b", "2024-06-04T10:00:00.000Z"))
+
+    assert store.get_task("L", "b") is not None
+    assert store.get_list_state("L")["watermark"] == parse_rfc3339(
+        "2024-06-03T10:00:00Z"
+    )
+
+
+def test_upsert_task_ignores_lists_never_synced(store):
+    store.upsert_task("L", task("a", "2024-06-03T10:00:00.000Z"))
+
+    assert store.count("L") == 0
+    assert store.get_list_state("L") is None
+
+
+def test_deleted_tasks_are_removed_and_still_advance_the_watermark(store):
+    store.apply_changes(
+        "L",
+        [task("a", "2024-06-03T10:00:00.000Z"), task("b", "2024-06-03T10:00:00.000Z")],
+        replace=True,
+    )
+
+    stats = store.apply_changes(
+        "L", [task("a", "2024-06-03T11:00:00.000Z", deleted=True)], synced=True
+    )
+
+    assert stats == {"upserted": 0, "deleted": 1}
+    assert ids(store.list_tasks("L")) == ["b"]
+    assert store.get_list_state("L")["watermark"] == parse_rfc3339(
+        "2024-06-03T11:00:00Z"
+    )
+
+
+def test_replace_drops_tasks_missing_from_the_full_sync(store):
+    store.apply_changes("L", [task("a", "2024-06-03T10:00:00.000Z")], replace=True)
+    store.apply_changes("M", [task("m", "2024-06-03T10:00:00.000Z")], replace=True)
+
+    store.apply_changes("L", [task("b", "2024-06-03T10:00:00.000Z")], replace=True)
+
+    assert ids(store.list_tasks("L")) == ["b"]
+    assert store.count() == 2
+
+
+def test_delete_task_removes_its_subtasks(store):
+    store.apply_changes(
+        "L",
+        [
+            task("a", "2024-06-03T10:00:00.000Z"),
+            task("a1", "2024-06-03T10:00:00.000Z", parent="a"),
+            task("b", "2024-06-03T10:00:00.000Z"),
+        ],
+        replace=True,
+    )
+
+    store.delete_task("L", "a")
+
+    assert ids(store.list_tasks("L")) == ["b"]
+
+
+def test_list_tasks_orders_subtasks_after_their_parent(store):
+    store.apply_changes(
+        "L",
+        [
+            task("b", "2024-06-03T10:00:00.000Z", position="002"),
+            task("a2", "2024-06-03T10:00:00.000Z", parent="a", position="002"),
+            task("a", "2024-06-03T10:00:00.000Z", position="001"),
+            task("a1", "2024-06-03T10:00:00.000Z", parent="a", position="001"),
+        ],
+        replace=True,
+    )
+
+    assert ids(store.list_tasks("L")) == ["a", "a1", "a2", "b"]
+    assert ids(store.list_tasks("L", max_results=2)) == ["a", "a1"]
+
+
+def test_list_tasks_filters(store):
+    store.apply_changes(
+        "L",
+        [
+            task("open", "2024-06-03T10:00:00.000Z", position="1"),
+            task("done", "2024-06-03T11:00:00.000Z", position="2", status="completed"),
+            task(
+                "cleared",
+                "2024-06-03T12:00:00.000Z",
+                position="3",
+                status="completed",
+                hidden=True,
+            ),
+        ],
+        replace=True,
+    )
+
+    assert ids(store.list_tasks("L")) == ["open", "done"]
+    assert ids(store.list_tasks("L", show_hidden=True)) == ["open", "done", "cleared"]
+    assert ids(store.list_tasks("L", show_completed=False)) == ["open"]
+    since = parse_rfc3339("2024-06-03T11:00:00Z")
+    assert ids(store.list_tasks("L", show_hidden=True, updated_min=since)) == [
+        "done",
+        "cleared",
+    ]
+
+
+def test_first_sync_is_full_and_reads_hidden_tasks(store):
+    service = FakeTasks(
+        [
+            task("a", "2024-06-03T10:00:00.000Z"),
+            task("b", "2024-06-03T11:00:00.000Z", hidden=True),
+            task("c", "2024-06-03T12:00:00.000Z"),
+        ]
+    )
+
+    result = sync_task_list(service, store, "L")
+
+    assert result == {"mode": "full", "upserted": 3, "deleted": 0}
+    assert [call["pageToken"] for call in service.calls] == [None, "2"]
+    assert all(call["showHidden"] for call in service.calls)
+    assert all("updatedMin" not in call for call in service.calls)
+
+
+def test_later_syncs_fetch_changes_since_the_watermark(store):
+    service = FakeTasks(
+        [task("a", "2024-06-03T10:00:00.000Z"), task("b", "2024-06-03T12:00:00.000Z")]
+    )
+    sync_task_list(service, store, "L")
+    service.items = [
+        task("a", "2024-06-03T10:00:00.000Z"),
+        task("b", "2024-06-03T13:00:00.000Z", deleted=True),
+        task("c", "2024-06-03T13:30:00.000Z"),
+    ]
+    service.calls.clear()
+
+    result = sync_task_list(service, store, "L")
+
+    assert result == {"mode": "incremental", "upserted": 1, "deleted": 1}
+    (call,) = service.calls
+    assert call["showDeleted"] and call["showHidden"]
+    assert parse_rfc3339(call["updatedMin"]) == (
+        parse_rfc3339("2024-06-03T12:00:00Z") - SYNC_OVERLAP
+    )
+    assert ids(store.list_tasks("L")) == ["a", "c"]
+    assert store.get_list_state("L")["watermark"] == parse_rfc3339(
+        "2024-06-03T13:30:00Z"
+    )
+
+
+def test_recent_syncs_are_skipped_until_marked_stale(store):
+    service = FakeTasks([task("a", "2024-06-03T10:00:00.000Z")])
+    sync_task_list(service, store, "L")
+    service.calls.clear()
+
+    assert sync_task_list(service, store, "L", min_interval=60)["mode"] == "skipped"
+    assert service.calls == []
+
+    store.mark_stale("L")
+    assert sync_task_list(service, store, "L", min_interval=60)["mode"] == (
+        "incremental"
+    )
+
+
+def test_old_full_sync_is_redone_in_full(store, monkeypatch):
+    service = FakeTasks([task("a", "2024-06-03T10:00:00.000Z")])
+    sync_task_list(service, store, "L")
+    last_full_sync = store.get_list_state("L")["last_full_sync"]
+
+    monkeypatch.setattr(
+        "tools.tasks_tools.store.time.time",
+        lambda: last_full_sync + FULL_SYNC_INTERVAL + 1,
+    )
+
+    assert sync_task_list(service, store, "L")["mode"] == "full"
+
+
+def test_missing_list_is_dropped_from_the_store(store):
+    sync_task_list(FakeTasks([task("a", "2024-06-03T10:00:00.000Z")]), store, "L")
+
+    with pytest.raises(HttpError):
+        sync_task_list(FakeTasks([], missing=True), store, "L")
+
+    assert store.count("L") == 0
+    assert store.get_list_state("L") is None
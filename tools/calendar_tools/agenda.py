@@ -0,0 +1,280 @@
+"""
+Merged agenda across several calendars.
+
+Every calendar is queried in the same batch request (or read from the local
+event store), and the per-calendar results, each already in start order, are
+k-way merged into one timeline. Pages are resumed with a cursor holding the
+start time of the last event returned, so no per-calendar page tokens need to
+be carried between calls.
+"""
+
+import base64
+import heapq
+import json
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from tools.calendar_tools.calendar import CalendarService
+from tools.calendar_tools.store import (
+    MAX_EVENTS_PAGE_SIZE,
+    event_timestamp,
+    parse_rfc3339,
+)
+from tools.google_api import execute_batch
+
+# Local reader: (calendar_id, time_min, time_max, max_results) -> events or None
+LocalReader = Callable[[str, float, Optional[float], int], Optional[List[Dict]]]
+
+AgendaEntry = Tuple[float, str, Dict[str, Any]]
+# Events are told apart by calendar too: an invitation has the same event ID
+# on every attendee's calendar
+EventKey = Tuple[str, str]
+
+
+def encode_cursor(start: float, seen: List[EventKey]) -> str:
+    """
+    Build an opaque agenda cursor.
+
+    Args:
+        start: Start time of the last returned event, in epoch seconds
+        seen: (calendar ID, event ID) of the returned events starting at
+            exactly that time
+
+    Returns:
+        Cursor string
+    """
+    data = json.dumps({"start": start, "seen": [list(key) for key in seen]})
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, List[EventKey]]:
+    """
+    Read an agenda cursor.
+
+    Args:
+        cursor: Cursor from encode_cursor
+
+    Returns:
+        Tuple of (start time in epoch seconds, (calendar ID, event ID) of the
+        events to skip at that time)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        seen = []
+        for key in data["seen"]:
+            if not isinstance(key, list):
+                raise TypeError(key)
+            calendar_id, event_id = key
+            seen.append((str(calendar_id), str(event_id)))
+        return float(data["start"]), seen
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid page token: {cursor}") from e
+
+
+def _to_rfc3339(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def fetch_calendar_events(
+    service: CalendarService,
+    calendar_ids: List[str],
+    time_min: float,
+    time_max: Optional[float],
+    max_results: int,
+) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, str], List[str]]:
+    """
+    List events of several calendars in one batch request.
+
+    Args:
+        service: Calendar API service instance
+        calendar_ids: Calendars to query
+        time_min: Only events ending after this time, in epoch seconds
+        time_max: Only events starting before this time, in epoch seconds (optional)
+        max_results: Maximum number of events per calendar
+
+    Returns:
+        Tuple of (events by calendar ID, errors by calendar ID, IDs of the
+        calendars that had more events than returned)
+    """
+    params: Dict[str, Any] = {
+        "singleEvents": True,
+        "orderBy": "startTime",
+        "timeMin": _to_rfc3339(time_min),
+        "maxResults": max_results,
+    }
+    if time_max is not None:
+        params["timeMax"] = _to_rfc3339(time_max)
+
+    events_api = service.events()
+    requests = (
+        (calendar_id, events_api.list(calendarId=calendar_id, **params))
+        for calendar_id in calendar_ids
+    )
+    responses, errors = execute_batch(service, requests)
+
+    events = {
+        calendar_id: response.get("items", [])
+        for calendar_id, response in responses.items()
+    }
+    truncated = [
+        calendar_id
+        for calendar_id, response in responses.items()
+        if response.get("nextPageToken")
+    ]
+    return events, errors, truncated
+
+
+def merge_timelines(
+    timelines: Dict[str, List[Dict[str, Any]]],
+) -> Iterator[AgendaEntry]:
+    """
+    K-way merge per-calendar event lists into one timeline.
+
+    Args:
+        timelines: Event lists by calendar ID, each ordered by start time
+
+    Returns:
+        Iterator of (start time, calendar ID, event) in start order
+    """
+    streams: List[Iterable[AgendaEntry]] = [
+        _timeline_entries(calendar_id, events)
+        for calendar_id, events in timelines.items()
+    ]
+    return heapq.merge(*streams, key=lambda entry: entry[0])
+
+
+def _timeline_entries(
+    calendar_id: str, events: List[Dict[str, Any]]
+) -> Iterator[AgendaEntry]:
+    # A function, not a nested generator expression, so that each stream
+    # keeps its own calendar ID instead of the comprehension's last one
+    for event in events:
+        yield event_timestamp(event.get("start", {})), calendar_id, event
+
+
+def build_agenda(
+    service: CalendarService,
+    calendar_ids: List[str],
+    time_min: str,
+    time_max: str = "",
+    max_results: int = 25,
+    cursor: str = "",
+    local_reader: Optional[LocalReader] = None,
+) -> Dict[str, Any]:
+    """
+    Build one page of the merged agenda of several calendars.
+
+    Args:
+        service: Calendar API service instance
+        calendar_ids: Calendars to include
+        time_min: Start of the agenda in RFC3339 format
+        time_max: End of the agenda in RFC3339 format (optional)
+        max_results: Maximum number of events on the page (default: 25)
+        cursor: Cursor returned with the previous page (optional)
+        local_reader: Returns a calendar's events from a local store, or None
+            when the store cannot answer (optional)
+
+    Returns:
+        Dict with 'entries' ((start, calendar ID, event) tuples), 'errors'
+        by calendar ID and 'cursor' for the next page (None on the last page)
+    """
+    start = parse_rfc3339(time_min)
+    end = parse_rfc3339(time_max) if time_max else None
+    seen: List[EventKey] = []
+    if cursor:
+        start, seen = decode_cursor(cursor)
+    skip = set(seen)
+
+    def is_past(event_start: float, calendar_id: str, event: Dict[str, Any]) -> bool:
+        # Events that began before the cursor were on earlier pages
+        return bool(cursor) and (
+            event_start < start
+            or (event_start == start and (calendar_id, event.get("id", "")) in skip)
+        )
+
+    timelines: Dict[str, List[Dict[str, Any]]] = {}
+    errors: Dict[str, str] = {}
+    truncated: List[str] = []
+    # Each calendar could supply the whole page, plus the skipped events
+    limit = max_results + len(seen)
+    pending = list(dict.fromkeys(calendar_ids))
+    while pending:
+        for calendar_id in pending:
+            timelines.pop(calendar_id, None)
+        remote: List[str] = []
+        fetched_truncated: List[str] = []
+        for calendar_id in pending:
+            events = (
+                local_reader(calendar_id, start, end, limit)
+                if local_reader is not None
+                else None
+            )
+            if events is None:
+                remote.append(calendar_id)
+            else:
+                timelines[calendar_id] = events
+                if len(events) >= limit:
+                    fetched_truncated.append(calendar_id)
+        if remote:
+            fetched, fetch_errors, remote_truncated = fetch_calendar_events(
+                service, remote, start, end, limit
+            )
+            timelines.update(fetched)
+            errors.update(fetch_errors)
+            fetched_truncated.extend(remote_truncated)
+
+        # Events still running at the cursor also count towards the limit, so
+        # a truncated calendar may hold too few new events to fill the page
+        pending = []
+        for calendar_id in fetched_truncated:
+            new_events = sum(
+                not is_past(event_timestamp(e.get("start", {})), calendar_id, e)
+                for e in timelines[calendar_id]
+            )
+            if new_events >= max_results:
+                truncated.append(calendar_id)
+            elif limit < MAX_EVENTS_PAGE_SIZE:
+                pending.append(calendar_id)
+            else:
+                del timelines[calendar_id]
+                errors[calendar_id] = (
+                    "Too many events in progress at the page start to page through"
+                )
+        limit = min(limit * 2, MAX_EVENTS_PAGE_SIZE)
+
+    # Past the last event fetched from a truncated calendar, that calendar
+    # may have events this page has not seen, so the page must stop there
+    horizon = min(
+        (
+            event_timestamp(timelines[calendar_id][-1].get("start", {}))
+            for calendar_id in truncated
+            if timelines.get(calendar_id)
+        ),
+        default=None,
+    )
+
+    entries: List[AgendaEntry] = []
+    more = False
+    for entry in merge_timelines(timelines):
+        event_start, calendar_id, event = entry
+        if is_past(event_start, calendar_id, event):
+            continue
+        if len(entries) == max_results or (
+            horizon is not None and event_start > horizon
+        ):
+            more = True
+            break
+        entries.append(entry)
+
+    next_cursor = None
+    if entries and (more or truncated):
+        last_start = entries[-1][0]
+        at_last = [(e[1], e[2].get("id", "")) for e in entries if e[0] == last_start]
+        if last_start == start:
+            at_last = seen + at_last
+        next_cursor = encode_cursor(last_start, at_last)
+
+    return {"entries": entries, "errors": errors, "cursor": next_cursor}
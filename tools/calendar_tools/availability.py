@@ -0,0 +1,302 @@
+"""
+Free/busy lookup and free slot search.
+
+Busy periods of all the requested calendars are fetched with freebusy.query,
+converted to epoch seconds, widened by the buffer and merged into one sorted
+array of disjoint intervals. Free slots are found by a single sweep over that
+array and the working-hours windows, so the cost is O(n log n) in the number
+of busy periods plus the number of days searched, independent of how many
+slots are requested.
+"""
+
+import bisect
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from tools.calendar_tools.calendar import CalendarService
+from tools.calendar_tools.store import parse_rfc3339
+
+# freebusy.query accepts at most this many calendars per request
+MAX_FREEBUSY_ITEMS = 50
+# Longest time range freebusy.query accepts in one request
+MAX_FREEBUSY_RANGE = timedelta(days=60)
+
+Interval = Tuple[float, float]
+
+
+def _to_rfc3339(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def query_busy(
+    service: CalendarService,
+    calendar_ids: List[str],
+    time_min: float,
+    time_max: float,
+) -> Tuple[Dict[str, List[Interval]], Dict[str, str]]:
+    """
+    Get the busy periods of calendars or attendees.
+
+    Requests are split to stay within the per-request calendar and time range
+    limits of freebusy.query.
+
+    Args:
+        service: Calendar API service instance
+        calendar_ids: Calendar IDs or attendee email addresses
+        time_min: Start of the range, in epoch seconds
+        time_max: End of the range, in epoch seconds
+
+    Returns:
+        Tuple of (busy intervals in epoch seconds by calendar ID, error
+        messages by calendar ID)
+    """
+    ids = list(dict.fromkeys(calendar_ids))
+    busy: Dict[str, List[Interval]] = {calendar_id: [] for calendar_id in ids}
+    errors: Dict[str, str] = {}
+    step = MAX_FREEBUSY_RANGE.total_seconds()
+
+    for offset in range(0, len(ids), MAX_FREEBUSY_ITEMS):
+        chunk = ids[offset : offset + MAX_FREEBUSY_ITEMS]
+        range_start = time_min
+        while range_start < time_max:
+            range_end = min(range_start + step, time_max)
+            body = {
+                "timeMin": _to_rfc3339(range_start),
+                "timeMax": _to_rfc3339(range_end),
+                "items": [{"id": calendar_id} for calendar_id in chunk],
+            }
+            response = service.freebusy().query(body=body).execute()
+
+            for calendar_id, calendar in response.get("calendars", {}).items():
+                if calendar.get("errors"):
+                    reasons = {e.get("reason", "unknown") for e in calendar["errors"]}
+                    errors[calendar_id] = ", ".join(sorted(reasons))
+                for period in calendar.get("busy", []):
+                    busy.setdefault(calendar_id, []).append(
+                        (parse_rfc3339(period["start"]), parse_rfc3339(period["end"]))
+                    )
+            range_start = range_end
+
+    return busy, errors
+
+
+def merge_intervals(intervals: Sequence[Interval], buffer: float = 0) -> List[Interval]:
+    """
+    Merge intervals into a sorted list of disjoint intervals.
+
+    Args:
+        intervals: (start, end) pairs in any order
+        buffer: Seconds added before and after every interval (default: 0)
+
+    Returns:
+        Sorted disjoint intervals; touching intervals are joined
+    """
+    merged: List[Interval] = []
+    for start, end in sorted((s - buffer, e + buffer) for s, e in intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class BusyIndex:
+    """
+    Sorted array of disjoint busy intervals with bisect lookups.
+    """
+
+    def __init__(self, intervals: Sequence[Interval], buffer: float = 0) -> None:
+        merged = merge_intervals(intervals, buffer)
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def is_free(self, start: float, end: float) -> bool:
+        """
+        Check whether a range overlaps no busy interval.
+
+        Args:
+            start: Range start, in epoch seconds
+            end: Range end, in epoch seconds
+
+        Returns:
+            True if the range is free
+        """
+        # The only interval that can overlap is the first one ending after start
+        i = bisect.bisect_right(self.ends, start)
+        return i == len(self.starts) or self.starts[i] >= end
+
+    def gaps(self, start: float, end: float) -> Iterator[Interval]:
+        """
+        Iterate over the free ranges within a window.
+
+        Args:
+            start: Window start, in epoch seconds
+            end: Window end, in epoch seconds
+
+        Returns:
+            Iterator of free (start, end) ranges in order
+        """
+        i = bisect.bisect_right(self.ends, start)
+        cursor = start
+        while cursor < end:
+            if i == len(self.starts) or self.starts[i] >= end:
+                yield cursor, end
+                return
+            if self.starts[i] > cursor:
+                yield cursor, self.starts[i]
+            cursor = max(cursor, self.ends[i])
+            i += 1
+
+
+def parse_clock(value: str) -> time:
+    """
+    Parse a wall-clock time such as '09:00'.
+
+    Args:
+        value: Time in HH:MM format
+
+    Returns:
+        Parsed time
+
+    Raises:
+        ValueError: If the value is not a valid HH:MM time
+    """
+    return datetime.strptime(value.strip(), "%H:%M").time()
+
+
+def working_windows(
+    time_min: float,
+    time_max: float,
+    day_start: time,
+    day_end: time,
+    tz: ZoneInfo,
+    weekdays: Sequence[int] = (0, 1, 2, 3, 4),
+) -> Iterator[Interval]:
+    """
+    Iterate over the working-hours windows within a range.
+
+    Windows are built from local wall-clock times, so they follow daylight
+    saving changes of the time zone.
+
+    Args:
+        time_min: Range start, in epoch seconds
+        time_max: Range end, in epoch seconds
+        day_start: Start of the working day, local time
+        day_end: End of the working day, local time
+        tz: Time zone of the working hours
+        weekdays: Working days, Monday being 0 (default: Monday to Friday)
+
+    Returns:
+        Iterator of (start, end) windows in epoch seconds, clipped to the range
+    """
+    day: date = datetime.fromtimestamp(time_min, tz).date()
+    last: date = datetime.fromtimestamp(time_max, tz).date()
+    while day <= last:
+        if day.weekday() in weekdays:
+            start = datetime.combine(day, day_start, tz).timestamp()
+            end = datetime.combine(day, day_end, tz).timestamp()
+            start, end = max(start, time_min), min(end, time_max)
+            if start < end:
+                yield start, end
+        day += timedelta(days=1)
+
+
+def find_free_slots(
+    busy: BusyIndex,
+    windows: Iterator[Interval],
+    duration: float,
+    max_slots: int = 5,
+    granularity: float = 15 * 60,
+) -> List[Interval]:
+    """
+    Find the first free slots of a given length.
+
+    Slot starts are rounded up to the granularity; within a long free range,
+    slots follow each other back to back.
+
+    Args:
+        busy: Busy periods to avoid
+        windows: Windows slots must fall in, in order
+        duration: Slot length in seconds
+        max_slots: Maximum number of slots to return (default: 5)
+        granularity: Seconds slot starts are aligned to (default: 900)
+
+    Returns:
+        Free (start, end) slots in epoch seconds, in order
+    """
+    slots: List[Interval] = []
+    if duration <= 0 or max_slots <= 0:
+        return slots
+
+    for window_start, window_end in windows:
+        for gap_start, gap_end in busy.gaps(window_start, window_end):
+            start = gap_start
+            if granularity > 0:
+                start = -(-gap_start // granularity) * granularity
+            while start + duration <= gap_end:
+                slots.append((start, start + duration))
+                if len(slots) == max_slots:
+                    return slots
+                start += duration
+    return slots
+
+
+def find_availability(
+    service: CalendarService,
+    calendar_ids: List[str],
+    time_min: float,
+    time_max: float,
+    duration: float,
+    max_slots: int = 5,
+    day_start: str = "09:00",
+    day_end: str = "17:00",
+    time_zone: str = "UTC",
+    weekdays: Sequence[int] = (0, 1, 2, 3, 4),
+    buffer: float = 0,
+    granularity: float = 15 * 60,
+) -> Dict[str, Any]:
+    """
+    Find slots when all the given calendars are free.
+
+    Args:
+        service: Calendar API service instance
+        calendar_ids: Calendar IDs or attendee email addresses
+        time_min: Start of the search, in epoch seconds
+        time_max: End of the search, in epoch seconds
+        duration: Slot length in seconds
+        max_slots: Maximum number of slots to return (default: 5)
+        day_start: Start of the working day as HH:MM (default: '09:00')
+        day_end: End of the working day as HH:MM (default: '17:00')
+        time_zone: IANA time zone of the working hours (default: 'UTC')
+        weekdays: Working days, Monday being 0 (default: Monday to Friday)
+        buffer: Seconds kept free before and after busy periods (default: 0)
+        granularity: Seconds slot starts are aligned to (default: 900)
+
+    Returns:
+        Dict with 'slots' ((start, end) pairs in epoch seconds), 'busy'
+        (number of merged busy periods) and 'errors' by calendar ID
+
+    Raises:
+        ValueError: If the working hours or time zone are invalid
+    """
+    try:
+        tz = ZoneInfo(time_zone)
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise ValueError(f"Unknown time zone: {time_zone}") from e
+    start_clock, end_clock = parse_clock(day_start), parse_clock(day_end)
+    if start_clock >= end_clock:
+        raise ValueError("The working day must end after it starts.")
+
+    busy_by_calendar, errors = query_busy(service, calendar_ids, time_min, time_max)
+    index = BusyIndex(
+        [period for periods in busy_by_calendar.values() for period in periods],
+        buffer,
+    )
+    windows = working_windows(time_min, time_max, start_clock, end_clock, tz, weekdays)
+    slots = find_free_slots(index, windows, duration, max_slots, granularity)
+    return {"slots": slots, "busy": len(index), "errors": errors}
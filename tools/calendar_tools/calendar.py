@@ -2,13 +2,37 @@
 This module provides utilities for authenticating with and using the Google Calendar API.
 """
 
+from collections import Counter
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, TypeAlias, Union
-
-from tools.google_api import get_google_service, settings
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeAlias,
+    Union,
+)
+
+from tools.google_api import (
+    MAX_BATCH_SIZE,
+    execute_batch,
+    get_google_service,
+    settings,
+)
 
 CalendarService: TypeAlias = Any
 
+# Accepted values of the sendUpdates parameter
+SEND_UPDATES_OPTIONS = ("all", "externalOnly", "none")
+# Events per events.list page when streaming a whole calendar
+EVENT_PAGE_SIZE = 1000
+# Import errors kept in full; further errors are only counted
+MAX_REPORTED_ERRORS = 100
+
 
 def get_calendar_service() -> Any:
     """
@@ -20,6 +44,7 @@ def get_calendar_service() -> Any:
         credentials_path=settings.credentials_path,
         token_path=settings.token_path,
         scopes=settings.scopes,
+        cache_dir=settings.cache_dir,
     )
 
 
@@ -60,10 +85,8 @@ def get_events(
         List of event objects
     """
     # If no time_min provided, use current time
-    if time_min is None:
-        time_min = (
-            datetime.now(timezone.utc).isoformat() + "Z"
-        )  # 'Z' indicates UTC time
+    if not time_min:
+        time_min = datetime.now(timezone.utc).isoformat()
 
     # Build the request parameters
     request_params = {
@@ -84,9 +107,117 @@ def get_events(
     return events_result.get("items", [])
 
 
-def create_event(
+def iter_event_pages(
     service: Any,
     calendar_id: str,
+    time_min: Optional[str] = None,
+    time_max: Optional[str] = None,
+    page_size: int = EVENT_PAGE_SIZE,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream the events of a calendar one events.list page at a time.
+
+    Recurring events are returned once, with their recurrence rules, followed
+    by their modified and cancelled occurrences as separate events.
+
+    Args:
+        service: Calendar API service instance
+        calendar_id: ID of the calendar
+        time_min: Only events ending after this RFC3339 time (optional)
+        time_max: Only events starting before this RFC3339 time (optional)
+        page_size: Events per page (default: 1000)
+
+    Returns:
+        Iterator of event lists; the next page is only requested once the
+        previous one has been consumed
+    """
+    params: Dict[str, Any] = {
+        "calendarId": calendar_id,
+        "singleEvents": False,
+        "maxResults": page_size,
+    }
+    if time_min:
+        params["timeMin"] = time_min
+    if time_max:
+        params["timeMax"] = time_max
+
+    page_token = None
+    while True:
+        response = service.events().list(pageToken=page_token, **params).execute()
+        yield response.get("items", [])
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
+
+
+def import_events(
+    service: Any,
+    calendar_id: str,
+    events: Iterable[Dict[str, Any]],
+    batch_size: int = MAX_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Import a stream of events through events.import, in batches.
+
+    Only one batch is held in memory at a time. Importing is keyed by
+    iCalUID, so importing the same events again updates them in place. A
+    changed occurrence of a recurring event is never sent in the same batch
+    as its series, since batch items may run in any order.
+
+    Args:
+        service: Calendar API service instance
+        calendar_id: ID of the calendar to import into
+        events: Event bodies, each with an iCalUID
+        batch_size: Events per batch request (default: 100)
+
+    Returns:
+        Dict with 'imported' and 'failed' counts and up to 100 error
+        messages in 'errors', keyed by '<iCalUID>', '<iCalUID>@<original
+        start>' for changed occurrences, or '#<position>' for events
+        without an iCalUID
+    """
+    events_api = service.events()
+    stats: Dict[str, Any] = {"imported": 0, "failed": 0, "errors": {}}
+    chunk: List[Tuple[str, Any]] = []
+    chunk_uids: Set[str] = set()
+
+    def fail(key: str, error: str) -> None:
+        stats["failed"] += 1
+        if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+            stats["errors"][key] = error
+
+    def flush() -> None:
+        if not chunk:
+            return
+        results, errors = execute_batch(service, chunk, batch_size)
+        stats["imported"] += len(results)
+        for key, error in errors.items():
+            fail(key, error)
+        chunk.clear()
+        chunk_uids.clear()
+
+    for position, event in enumerate(events, start=1):
+        uid = event.get("iCalUID")
+        if not uid:
+            fail(f"#{position}", "Event has no iCalUID")
+            continue
+        original = event.get("originalStartTime")
+        if original is not None:
+            if uid in chunk_uids:
+                flush()
+            when = original.get("dateTime") or original.get("date")
+            key = f"{uid}@{when}"
+        else:
+            key = uid
+        chunk.append((key, events_api.import_(calendarId=calendar_id, body=event)))
+        chunk_uids.add(uid)
+        if len(chunk) >= batch_size:
+            flush()
+    flush()
+    return stats
+
+
+def build_event_body(
     summary: str,
     start_datetime: str,
     end_datetime: str,
@@ -96,11 +227,9 @@ def create_event(
     timezone: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
-    Create a new calendar event.
+    Build the body of a new calendar event.
 
     Args:
-        service: Calendar API service instance
-        calendar_id: ID of the calendar to create the event in
         summary: Title of the event
         start_datetime: Start time in RFC3339 format
         end_datetime: End time in RFC3339 format
@@ -110,7 +239,7 @@ def create_event(
         timezone: Timezone for the event (optional)
 
     Returns:
-        Created event object
+        Event body for events.insert
     """
     # Create the event body
     event = {
@@ -144,6 +273,47 @@ def create_event(
         # Add to the event - need Dict type casting for proper type handling
         event["attendees"] = attendee_list  # type: ignore
 
+    return event
+
+
+def create_event(
+    service: Any,
+    calendar_id: str,
+    summary: str,
+    start_datetime: str,
+    end_datetime: str,
+    description: Optional[str] = None,
+    location: Optional[str] = None,
+    attendees: Optional[Union[List[str], List[Dict[str, str]]]] = None,
+    timezone: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Create a new calendar event.
+
+    Args:
+        service: Calendar API service instance
+        calendar_id: ID of the calendar to create the event in
+        summary: Title of the event
+        start_datetime: Start time in RFC3339 format
+        end_datetime: End time in RFC3339 format
+        description: Event description (optional)
+        location: Event location (optional)
+        attendees: List of attendee email addresses or already formatted attendee dicts (optional)
+        timezone: Timezone for the event (optional)
+
+    Returns:
+        Created event object
+    """
+    event = build_event_body(
+        summary,
+        start_datetime,
+        end_datetime,
+        description,
+        location,
+        attendees,
+        timezone,
+    )
+
     # Create the event with notifications
     return (
         service.events()
@@ -156,6 +326,206 @@ def create_event(
     )
 
 
+def find_events_by_ical_uid(
+    service: Any,
+    calendar_id: str,
+    ical_uids: List[str],
+) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Look up which iCalendar UIDs already exist in a calendar, in batches.
+
+    Args:
+        service: Calendar API service instance
+        calendar_id: ID of the calendar to look in
+        ical_uids: iCalendar UIDs to look up
+
+    Returns:
+        Tuple of (event ID by iCalUID for the UIDs found, error messages by
+        iCalUID)
+    """
+    events_api = service.events()
+    requests = (
+        (
+            uid,
+            events_api.list(
+                calendarId=calendar_id,
+                iCalUID=uid,
+                showDeleted=False,
+                maxResults=1,
+                fields="items(id)",
+            ),
+        )
+        for uid in ical_uids
+    )
+    responses, errors = execute_batch(service, requests)
+    found = {
+        uid: response["items"][0]["id"]
+        for uid, response in responses.items()
+        if response.get("items")
+    }
+    return found, errors
+
+
+def insert_events_batch(
+    service: Any,
+    calendar_id: str,
+    events: List[Tuple[str, Dict[str, Any]]],
+    send_updates: str = "none",
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """
+    Create many events through the batch endpoint.
+
+    Args:
+        service: Calendar API service instance
+        calendar_id: ID of the calendar to create the events in
+        events: (key, event body) pairs; keys identify results and errors
+        send_updates: Who is notified: 'all', 'externalOnly' or 'none'
+            (default: 'none')
+
+    Returns:
+        Tuple of (created events, error messages), both by key
+
+    Raises:
+        ValueError: If send_updates is not an accepted value
+    """
+    if send_updates not in SEND_UPDATES_OPTIONS:
+        raise ValueError(
+            f"send_updates must be one of {', '.join(SEND_UPDATES_OPTIONS)}"
+        )
+
+    events_api = service.events()
+    requests = (
+        (
+            key,
+            events_api.insert(
+                calendarId=calendar_id, body=body, sendUpdates=send_updates
+            ),
+        )
+        for key, body in events
+    )
+    return execute_batch(service, requests)
+
+
+def create_events_bulk(
+    service: Any,
+    calendar_id: str,
+    events: List[Dict[str, Any]],
+    send_updates: str = "none",
+) -> Dict[str, Any]:
+    """
+    Create many events in batches, skipping those whose iCalUID exists.
+
+    Events sharing an iCalUID with an earlier event in the list, or with an
+    event already in the calendar, are not created again.
+
+    Args:
+        service: Calendar API service instance
+        calendar_id: ID of the calendar to create the events in
+        events: Event bodies, with an optional iCalUID each
+        send_updates: Who is notified: 'all', 'externalOnly' or 'none'
+            (default: 'none')
+
+    Returns:
+        Dict with 'created' (events), 'duplicates' (event ID of the existing
+        event, or None for repeats within the list) and 'errors' (messages),
+        all keyed by iCalUID, or by '#<position>' for events without one
+
+    Raises:
+        ValueError: If send_updates is not an accepted value
+    """
+    if send_updates not in SEND_UPDATES_OPTIONS:
+        raise ValueError(
+            f"send_updates must be one of {', '.join(SEND_UPDATES_OPTIONS)}"
+        )
+
+    keyed: Dict[str, Dict[str, Any]] = {}
+    duplicates: Dict[str, Optional[str]] = {}
+    for position, event in enumerate(events, start=1):
+        key = event.get("iCalUID") or f"#{position}"
+        if key in keyed:
+            duplicates[key] = None
+        else:
+            keyed[key] = event
+
+    uids = [key for key, event in keyed.items() if event.get("iCalUID")]
+    existing, errors = find_events_by_ical_uid(service, calendar_id, uids)
+    duplicates.update(existing)
+
+    pending = [
+        (key, event)
+        for key, event in keyed.items()
+        if key not in existing and key not in errors
+    ]
+    created, insert_errors = insert_events_batch(
+        service, calendar_id, pending, send_updates
+    )
+    errors.update(insert_errors)
+    return {"created": created, "duplicates": duplicates, "errors": errors}
+
+
+def build_event_patch(
+    summary: Optional[str] = None,
+    start_datetime: Optional[str] = None,
+    end_datetime: Optional[str] = None,
+    description: Optional[str] = None,
+    location: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Build a patch body holding only the fields being changed.
+
+    Args:
+        summary: New title of the event (optional)
+        start_datetime: New start time in RFC3339 format (optional)
+        end_datetime: New end time in RFC3339 format (optional)
+        description: New event description (optional)
+        location: New event location (optional)
+
+    Returns:
+        Patch body for events.patch
+    """
+    patch: Dict[str, Any] = {}
+    if summary:
+        patch["summary"] = summary
+    if start_datetime:
+        patch["start"] = {"dateTime": start_datetime}
+    if end_datetime:
+        patch["end"] = {"dateTime": end_datetime}
+    if description:
+        patch["description"] = description
+    if location:
+        patch["location"] = location
+    return patch
+
+
+def patch_event_request(
+    service: Any,
+    calendar_id: str,
+    event_id: str,
+    patch: Dict[str, Any],
+    etag: Optional[str] = None,
+) -> Any:
+    """
+    Build an events.patch request, conditional on the event's ETag if given.
+
+    Args:
+        service: Calendar API service instance
+        calendar_id: ID of the calendar containing the event
+        event_id: ID of the event to update
+        patch: Fields to change
+        etag: ETag the event must still have (optional)
+
+    Returns:
+        HttpRequest to execute directly or through a batch
+    """
+    request = service.events().patch(
+        calendarId=calendar_id, eventId=event_id, body=patch
+    )
+    if etag:
+        # The API answers 412 Precondition Failed if the event changed since
+        request.headers["If-Match"] = etag
+    return request
+
+
 def update_event(
     service: Any,
     calendar_id: str,
@@ -165,9 +535,10 @@ def update_event(
     end_datetime: Optional[str] = None,
     description: Optional[str] = None,
     location: Optional[str] = None,
+    etag: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
-    Update an existing calendar event.
+    Update an existing calendar event, sending only the changed fields.
 
     Args:
         service: Calendar API service instance
@@ -178,31 +549,63 @@ def update_event(
         end_datetime: New end time in RFC3339 format (optional)
         description: New event description (optional)
         location: New event location (optional)
+        etag: ETag the event must still have; the update fails with status
+            412 if someone else changed it (optional)
 
     Returns:
         Updated event object
+
+    Raises:
+        HttpError: With status 412 if the event no longer matches the ETag
     """
-    # Get the current event
-    event = service.events().get(calendarId=calendar_id, eventId=event_id).execute()
+    patch = build_event_patch(
+        summary, start_datetime, end_datetime, description, location
+    )
+    return patch_event_request(service, calendar_id, event_id, patch, etag).execute()
 
-    # Update fields if provided
-    if summary:
-        event["summary"] = summary
-    if start_datetime:
-        event["start"]["dateTime"] = start_datetime
-    if end_datetime:
-        event["end"]["dateTime"] = end_datetime
-    if description:
-        event["description"] = description
-    if location:
-        event["location"] = location
 
-    # Update the event
-    return (
-        service.events()
-        .update(calendarId=calendar_id, eventId=event_id, body=event)
-        .execute()
+def update_events_batch(
+    service: Any,
+    updates: List[Dict[str, Any]],
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """
+    Apply many event patches through the batch endpoint.
+
+    Args:
+        service: Calendar API service instance
+        updates: Dicts with calendar_id, event_id and patch, plus an optional
+            etag the event must still have
+
+    Returns:
+        Tuple of (updated events, error messages), both keyed by
+        '<calendar_id>/<event_id>'
+
+    Raises:
+        ValueError: If an event is updated more than once; a batch cannot
+            order its calls, so the patches must be combined first
+    """
+    keys = [f"{update['calendar_id']}/{update['event_id']}" for update in updates]
+    duplicates = sorted(key for key, count in Counter(keys).items() if count > 1)
+    if duplicates:
+        raise ValueError(
+            f"Events updated more than once: {', '.join(duplicates)}. "
+            "Combine the changes to each event into one update."
+        )
+
+    requests = (
+        (
+            key,
+            patch_event_request(
+                service,
+                update["calendar_id"],
+                update["event_id"],
+                update["patch"],
+                update.get("etag"),
+            ),
+        )
+        for key, update in zip(keys, updates)
     )
+    return execute_batch(service, requests)
 
 
 def delete_event(service: Any, calendar_id: str, event_id: str) -> None:
@@ -1,3 +1,18 @@
-from tools.google_api import settings as google_settings
+from tools.google_api import GoogleApiSettings
 
-settings = google_settings
+
+class CalendarSettings(GoogleApiSettings):
+    """
+    Calendar-specific settings on top of the shared Google API configuration.
+    """
+
+    # Local SQLite event store, kept current with syncToken incremental syncs
+    calendar_store_enabled: bool = False
+    calendar_sync_interval: int = 60  # Seconds before reads trigger a sync
+    calendar_sync_past_days: int = 30  # Days of past events kept locally
+
+    # Fetch recurring series once and expand their occurrences locally
+    calendar_expand_recurring: bool = False
+
+
+settings = CalendarSettings()
@@ -0,0 +1,489 @@
+"""
+Streaming iCalendar (RFC 5545) reading and writing.
+
+Content lines are unfolded and parsed one at a time, and each VEVENT is
+yielded as a Calendar API event body as soon as its END line is read.
+Writing works the other way round, one event at a time, so files of any size
+are processed in bounded memory.
+"""
+
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+ContentLine = Tuple[str, Dict[str, str], str]
+
+ICS_DURATION = re.compile(
+    r"^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$"
+)
+ICS_ESCAPE = re.compile(r"\\([\\;,nN])")
+
+# Recurrence lines are passed to the Calendar API as they appear in the file
+RECURRENCE_PROPERTIES = ("RRULE", "EXRULE", "RDATE", "EXDATE")
+
+ICS_PRODID = "-//MIST//Google Calendar export//EN"
+# Longest content line in octets, excluding the line break
+MAX_LINE_OCTETS = 75
+
+# Attendee PARTSTAT values and the matching Calendar API responseStatus
+PARTSTATS = {
+    "NEEDS-ACTION": "needsAction",
+    "ACCEPTED": "accepted",
+    "DECLINED": "declined",
+    "TENTATIVE": "tentative",
+}
+
+
+def unfold_lines(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Join folded content lines.
+
+    Args:
+        lines: Raw lines, with or without line endings
+
+    Returns:
+        Iterator of unfolded, non-empty content lines
+    """
+    current: Optional[str] = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t"):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_content_line(line: str) -> ContentLine:
+    """
+    Split a content line into its name, parameters and value.
+
+    Args:
+        line: Unfolded content line such as 'DTSTART;TZID=Europe/Paris:2024...'
+
+    Returns:
+        Tuple of (upper-case name, parameters by upper-case name, value)
+    """
+    in_quotes = False
+    separators: List[int] = []
+    colon = len(line)
+    for index, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif not in_quotes and char == ";":
+            separators.append(index)
+        elif not in_quotes and char == ":":
+            colon = index
+            break
+
+    head, value = line[:colon], line[colon + 1 :]
+    bounds = [i for i in separators if i < colon] + [colon]
+    name = head[: bounds[0]].upper()
+    params: Dict[str, str] = {}
+    for start, end in zip(bounds, bounds[1:]):
+        key, _, param_value = line[start + 1 : end].partition("=")
+        params[key.upper()] = param_value.strip('"')
+    return name, params, value
+
+
+def unescape_text(value: str) -> str:
+    """
+    Decode an iCalendar TEXT value.
+
+    Args:
+        value: Escaped value
+
+    Returns:
+        Plain text
+    """
+    return ICS_ESCAPE.sub(
+        lambda match: "\n" if match.group(1) in "nN" else match.group(1), value
+    )
+
+
+def parse_duration(value: str) -> timedelta:
+    """
+    Parse an iCalendar DURATION value such as 'PT1H30M' or 'P1D'.
+
+    Args:
+        value: Duration value
+
+    Returns:
+        Duration
+
+    Raises:
+        ValueError: If the value is not a valid duration
+    """
+    match = ICS_DURATION.match(value.strip())
+    if match is None:
+        raise ValueError(f"Invalid duration: {value}")
+    duration = timedelta(
+        weeks=int(match.group("weeks") or 0),
+        days=int(match.group("days") or 0),
+        hours=int(match.group("hours") or 0),
+        minutes=int(match.group("minutes") or 0),
+        seconds=int(match.group("seconds") or 0),
+    )
+    return -duration if match.group("sign") == "-" else duration
+
+
+def _is_time_zone(name: str) -> bool:
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+
+def parse_when(
+    value: str, params: Dict[str, str], default_time_zone: str
+) -> Dict[str, Any]:
+    """
+    Convert a DTSTART, DTEND or RECURRENCE-ID value to a Calendar API time.
+
+    Times in a TZID that is not an IANA zone, and floating times, are read in
+    the default time zone.
+
+    Args:
+        value: DATE or DATE-TIME value
+        params: Parameters of the property
+        default_time_zone: IANA zone for floating times
+
+    Returns:
+        A 'date' object for all-day values, else a 'dateTime' object with
+        its 'timeZone' ('UTC' for UTC times)
+
+    Raises:
+        ValueError: If the value is not a valid date or time
+    """
+    value = value.strip()
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return {"date": datetime.strptime(value[:8], "%Y%m%d").date().isoformat()}
+    if value.endswith("Z"):
+        # Recurring events need a timeZone even for UTC times
+        parsed = datetime.strptime(value, "%Y%m%dT%H%M%SZ")
+        return {"dateTime": parsed.isoformat() + "Z", "timeZone": "UTC"}
+
+    parsed = datetime.strptime(value, "%Y%m%dT%H%M%S")
+    tzid = params.get("TZID", "")
+    time_zone = tzid if tzid and _is_time_zone(tzid) else default_time_zone
+    return {"dateTime": parsed.isoformat(), "timeZone": time_zone}
+
+
+def _shift(when: Dict[str, Any], delta: timedelta) -> Dict[str, Any]:
+    """Move a Calendar API time by a duration, keeping its form."""
+    if "date" in when:
+        day = date.fromisoformat(when["date"]) + timedelta(days=delta.days)
+        return {"date": day.isoformat()}
+    value = when["dateTime"]
+    utc = value.endswith("Z")
+    shifted = datetime.fromisoformat(value.rstrip("Z")) + delta
+    result = dict(when)
+    result["dateTime"] = shifted.isoformat() + ("Z" if utc else "")
+    return result
+
+
+def _mailbox(value: str) -> str:
+    return value[7:] if value.lower().startswith("mailto:") else value
+
+
+def event_from_lines(
+    lines: List[Tuple[str, ContentLine]], default_time_zone: str = "UTC"
+) -> Dict[str, Any]:
+    """
+    Build a Calendar API event body from the properties of one VEVENT.
+
+    Args:
+        lines: (raw line, parsed line) pairs of the VEVENT's own properties
+        default_time_zone: IANA zone for floating times (default: 'UTC')
+
+    Returns:
+        Event body with iCalUID, start, end and whichever of summary,
+        description, location, status, transparency, sequence, attendees,
+        organizer, recurrence and originalStartTime the VEVENT carries
+
+    Raises:
+        ValueError: If DTSTART is missing or a value is malformed
+    """
+    event: Dict[str, Any] = {}
+    duration: Optional[timedelta] = None
+    for raw, (name, params, value) in lines:
+        if name == "UID":
+            event["iCalUID"] = value
+        elif name in ("SUMMARY", "DESCRIPTION", "LOCATION"):
+            event[name.lower()] = unescape_text(value)
+        elif name == "DTSTART":
+            event["start"] = parse_when(value, params, default_time_zone)
+        elif name == "DTEND":
+            event["end"] = parse_when(value, params, default_time_zone)
+        elif name == "DURATION":
+            duration = parse_duration(value)
+        elif name == "RECURRENCE-ID":
+            event["originalStartTime"] = parse_when(value, params, default_time_zone)
+        elif name in RECURRENCE_PROPERTIES:
+            event.setdefault("recurrence", []).append(raw)
+        elif name == "STATUS" and value.upper() in (
+            "CONFIRMED",
+            "TENTATIVE",
+            "CANCELLED",
+        ):
+            event["status"] = value.lower()
+        elif name == "TRANSP":
+            event["transparency"] = (
+                "transparent" if value.upper() == "TRANSPARENT" else "opaque"
+            )
+        elif name == "SEQUENCE" and value.strip().isdigit():
+            event["sequence"] = int(value)
+        elif name == "ORGANIZER":
+            event["organizer"] = {"email": _mailbox(value)}
+            if params.get("CN"):
+                event["organizer"]["displayName"] = params["CN"]
+        elif name == "ATTENDEE":
+            attendee: Dict[str, Any] = {"email": _mailbox(value)}
+            if params.get("CN"):
+                attendee["displayName"] = params["CN"]
+            if params.get("ROLE", "").upper() == "OPT-PARTICIPANT":
+                attendee["optional"] = True
+            if params.get("PARTSTAT", "").upper() in PARTSTATS:
+                attendee["responseStatus"] = PARTSTATS[params["PARTSTAT"].upper()]
+            event.setdefault("attendees", []).append(attendee)
+
+    if "start" not in event:
+        raise ValueError(f"Event {event.get('iCalUID', '')} has no DTSTART")
+    if "end" not in event:
+        if duration is None:
+            duration = timedelta(days=1) if "date" in event["start"] else timedelta()
+        event["end"] = _shift(event["start"], duration)
+    return event
+
+
+def iter_ics_events(
+    lines: Iterable[str],
+    default_time_zone: str = "UTC",
+    errors: Optional[List[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Parse the VEVENTs of an iCalendar stream one at a time.
+
+    Components nested in a VEVENT, such as VALARM, are skipped.
+
+    Args:
+        lines: Lines of the file, e.g. an open text file
+        default_time_zone: IANA zone for floating times (default: 'UTC')
+        errors: List that malformed events are reported to; without one,
+            they raise (optional)
+
+    Returns:
+        Iterator of Calendar API event bodies
+
+    Raises:
+        ValueError: If an event is malformed and no errors list is given
+    """
+    current: Optional[List[Tuple[str, ContentLine]]] = None
+    nested = 0
+    for raw in unfold_lines(lines):
+        parsed = parse_content_line(raw)
+        name, _, value = parsed
+        if name == "BEGIN":
+            if current is not None:
+                nested += 1
+            elif value.upper() == "VEVENT":
+                current = []
+        elif name == "END":
+            if nested:
+                nested -= 1
+            elif current is not None and value.upper() == "VEVENT":
+                try:
+                    yield event_from_lines(current, default_time_zone)
+                except ValueError as e:
+                    if errors is None:
+                        raise
+                    errors.append(str(e))
+                current = None
+        elif current is not None and not nested:
+            current.append((raw, parsed))
+
+
+def escape_text(value: str) -> str:
+    """
+    Encode plain text as an iCalendar TEXT value.
+
+    Args:
+        value: Plain text
+
+    Returns:
+        Escaped value
+    """
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold_line(line: str) -> str:
+    """
+    Fold a content line at 75 octets, without splitting UTF-8 sequences.
+
+    Args:
+        line: Unfolded content line
+
+    Returns:
+        The line with CRLF line breaks, continuation lines starting with a space
+    """
+    parts: List[str] = []
+    current: List[str] = []
+    size = 0
+    limit = MAX_LINE_OCTETS
+    for char in line:
+        width = len(char.encode("utf-8"))
+        if size + width > limit:
+            parts.append("".join(current))
+            current, size = [], 0
+            # Continuation lines lose one octet to the leading space
+            limit = MAX_LINE_OCTETS - 1
+        current.append(char)
+        size += width
+    parts.append("".join(current))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _quote_param(value: str) -> str:
+    return f'"{value}"' if any(c in value for c in ";:,") else value
+
+
+def format_when(name: str, when: Dict[str, Any]) -> str:
+    """
+    Convert a Calendar API time to a DTSTART, DTEND or RECURRENCE-ID line.
+
+    Args:
+        name: Property name
+        when: The 'start', 'end' or 'originalStartTime' object
+
+    Returns:
+        Unfolded content line
+    """
+    if when.get("date"):
+        return f"{name};VALUE=DATE:{when['date'].replace('-', '')}"
+
+    parsed = datetime.fromisoformat(when["dateTime"].replace("Z", "+00:00"))
+    zone = when.get("timeZone", "")
+    if zone and zone != "UTC" and _is_time_zone(zone):
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(ZoneInfo(zone))
+        return f"{name};TZID={zone}:{parsed.strftime('%Y%m%dT%H%M%S')}"
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return f"{name}:{parsed.strftime('%Y%m%dT%H%M%SZ')}"
+
+
+def _utc_stamp(value: str) -> str:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def event_to_lines(event: Dict[str, Any]) -> List[str]:
+    """
+    Convert a Calendar API event to the content lines of a VEVENT.
+
+    Args:
+        event: Event object as returned by events.list
+
+    Returns:
+        Unfolded content lines from BEGIN:VEVENT to END:VEVENT
+    """
+    stamp = event.get("updated") or datetime.now(timezone.utc).isoformat()
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{event.get('iCalUID') or event.get('id', '')}",
+        f"DTSTAMP:{_utc_stamp(stamp)}",
+    ]
+    # Cancelled occurrences of a series may only carry their original start
+    start = event.get("start") or event.get("originalStartTime")
+    if start:
+        lines.append(format_when("DTSTART", start))
+    if event.get("end"):
+        lines.append(format_when("DTEND", event["end"]))
+    if event.get("originalStartTime"):
+        lines.append(format_when("RECURRENCE-ID", event["originalStartTime"]))
+    lines.extend(event.get("recurrence", []))
+
+    for key in ("summary", "description", "location"):
+        if event.get(key):
+            lines.append(f"{key.upper()}:{escape_text(event[key])}")
+    if event.get("status"):
+        lines.append(f"STATUS:{event['status'].upper()}")
+    if event.get("transparency") == "transparent":
+        lines.append("TRANSP:TRANSPARENT")
+    if event.get("sequence"):
+        lines.append(f"SEQUENCE:{event['sequence']}")
+    if event.get("created"):
+        lines.append(f"CREATED:{_utc_stamp(event['created'])}")
+    if event.get("updated"):
+        lines.append(f"LAST-MODIFIED:{_utc_stamp(event['updated'])}")
+
+    organizer = event.get("organizer", {})
+    if organizer.get("email"):
+        params = ""
+        if organizer.get("displayName"):
+            params = f";CN={_quote_param(organizer['displayName'])}"
+        lines.append(f"ORGANIZER{params}:mailto:{organizer['email']}")
+
+    statuses = {status: partstat for partstat, status in PARTSTATS.items()}
+    for attendee in event.get("attendees", []):
+        if not attendee.get("email"):
+            continue
+        params = ""
+        if attendee.get("displayName"):
+            params += f";CN={_quote_param(attendee['displayName'])}"
+        if attendee.get("optional"):
+            params += ";ROLE=OPT-PARTICIPANT"
+        if attendee.get("responseStatus") in statuses:
+            params += f";PARTSTAT={statuses[attendee['responseStatus']]}"
+        lines.append(f"ATTENDEE{params}:mailto:{attendee['email']}")
+
+    lines.append("END:VEVENT")
+    return lines
+
+
+def write_ics(
+    events: Iterable[Dict[str, Any]],
+    out: TextIO,
+    calendar_name: str = "",
+) -> int:
+    """
+    Write events as an iCalendar file, one event at a time.
+
+    Time zones are referenced by their IANA names without VTIMEZONE
+    components, which Google Calendar and other common clients resolve.
+
+    Args:
+        events: Event objects as returned by events.list
+        out: Text stream to write to, opened with newline=""
+        calendar_name: Calendar name to record in X-WR-CALNAME (optional)
+
+    Returns:
+        Number of events written
+    """
+    header = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{ICS_PRODID}"]
+    if calendar_name:
+        header.append(f"X-WR-CALNAME:{escape_text(calendar_name)}")
+    for line in header:
+        out.write(fold_line(line))
+
+    count = 0
+    for event in events:
+        for line in event_to_lines(event):
+            out.write(fold_line(line))
+        count += 1
+
+    out.write(fold_line("END:VCALENDAR"))
+    return count
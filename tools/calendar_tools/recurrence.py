@@ -0,0 +1,648 @@
+"""
+Local expansion of recurring Calendar events.
+
+Listing events with singleEvents=True makes the API expand every recurring
+series server-side, so a long range over a standing meeting transfers one
+near-identical event per occurrence. Listing with singleEvents=False returns
+each series once, with its RRULE/EXDATE/RDATE lines, plus the modified and
+cancelled occurrences as separate events. The occurrences are then generated
+here, lazily and in start order, and only over the requested window.
+
+The common RFC 5545 rule parts are supported: FREQ=DAILY/WEEKLY/MONTHLY/
+YEARLY with INTERVAL, COUNT, UNTIL, WKST, BYDAY (with ordinals for monthly
+and yearly rules), BYMONTHDAY and BYMONTH. Series using any other part are
+expanded by the API through events.instances instead.
+"""
+
+import heapq
+import threading
+from calendar import monthrange
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from tools.calendar_tools.calendar import CalendarService
+from tools.calendar_tools.store import event_timestamp, parse_rfc3339
+from tools.google_api import execute_batch
+
+EXPANSION_CACHE_SIZE = 512
+# Consecutive rule periods without an occurrence before a rule is given up
+MAX_EMPTY_PERIODS = 1000
+
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+SUPPORTED_PARTS = {
+    "FREQ",
+    "INTERVAL",
+    "COUNT",
+    "UNTIL",
+    "WKST",
+    "BYDAY",
+    "BYMONTHDAY",
+    "BYMONTH",
+}
+
+
+class RecurrenceError(ValueError):
+    """Raised for recurrence rules that cannot be expanded locally."""
+
+
+def _parse_ical_time(
+    value: str, tz: Optional[tzinfo]
+) -> Tuple[Optional[float], Optional[date]]:
+    """
+    Parse an iCalendar DATE or DATE-TIME value.
+
+    Returns:
+        Tuple of (epoch seconds, None) for a DATE-TIME, or (None, date) for a
+        DATE; floating times are read in tz, or in local time without one
+    """
+    if len(value) == 8:
+        return None, datetime.strptime(value, "%Y%m%d").date()
+    if value.endswith("Z"):
+        parsed = datetime.strptime(value, "%Y%m%dT%H%M%SZ")
+        return parsed.replace(tzinfo=timezone.utc).timestamp(), None
+    parsed = datetime.strptime(value, "%Y%m%dT%H%M%S")
+    return _timestamp(parsed, tz), None
+
+
+def _timestamp(local: datetime, tz: Optional[tzinfo]) -> float:
+    """Epoch seconds of a wall-clock time in tz, or in local time without one."""
+    return local.replace(tzinfo=tz).timestamp() if tz is not None else local.timestamp()
+
+
+def _load_zone(name: str) -> Optional[tzinfo]:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+class RecurrenceRule:
+    """
+    A parsed RRULE.
+    """
+
+    def __init__(self, value: str, tz: Optional[tzinfo] = None) -> None:
+        parts: Dict[str, str] = {}
+        for item in value.split(";"):
+            if "=" not in item:
+                raise RecurrenceError(f"Malformed rule part: {item}")
+            key, part_value = item.split("=", 1)
+            parts[key.upper()] = part_value.upper()
+
+        unsupported = set(parts) - SUPPORTED_PARTS
+        if unsupported:
+            raise RecurrenceError(f"Unsupported rule parts: {sorted(unsupported)}")
+
+        self.freq = parts.get("FREQ", "")
+        if self.freq not in FREQUENCIES:
+            raise RecurrenceError(f"Unsupported frequency: {self.freq}")
+
+        try:
+            self.interval = max(1, int(parts.get("INTERVAL", "1")))
+            self.count = int(parts["COUNT"]) if "COUNT" in parts else None
+            self.by_month = (
+                [int(m) for m in parts["BYMONTH"].split(",")]
+                if "BYMONTH" in parts
+                else []
+            )
+            self.by_month_day = (
+                [int(d) for d in parts["BYMONTHDAY"].split(",")]
+                if "BYMONTHDAY" in parts
+                else []
+            )
+            self.by_day: List[Tuple[Optional[int], int]] = []
+            if "BYDAY" in parts:
+                for item in parts["BYDAY"].split(","):
+                    ordinal = int(item[:-2]) if item[:-2] else None
+                    self.by_day.append((ordinal, WEEKDAYS[item[-2:]]))
+            self.week_start = WEEKDAYS[parts.get("WKST", "MO")]
+            self.until_ts, self.until_date = (
+                _parse_ical_time(parts["UNTIL"], tz)
+                if "UNTIL" in parts
+                else (None, None)
+            )
+        except (KeyError, ValueError) as e:
+            raise RecurrenceError(f"Malformed rule: {value}") from e
+
+        has_ordinals = any(ordinal is not None for ordinal, _ in self.by_day)
+        if has_ordinals and self.freq in ("DAILY", "WEEKLY"):
+            raise RecurrenceError("BYDAY ordinals need a monthly or yearly rule")
+        if self.freq == "YEARLY" and self.by_day and not self.by_month:
+            raise RecurrenceError("Yearly BYDAY rules need BYMONTH")
+
+    def _matches_month_day(self, day: date) -> bool:
+        """Whether a date is selected by BYMONTHDAY."""
+        month_length = monthrange(day.year, day.month)[1]
+        return any(
+            day.day == (d if d > 0 else month_length + d + 1) for d in self.by_month_day
+        )
+
+    def _month_days(self, year: int, month: int, default_day: int) -> List[int]:
+        """Days of a month selected by BYMONTHDAY and BYDAY."""
+        month_length = monthrange(year, month)[1]
+        days: Set[int] = set()
+        for day in self.by_month_day:
+            day = day if day > 0 else month_length + day + 1
+            if 1 <= day <= month_length:
+                days.add(day)
+
+        if self.by_day:
+            first_weekday = monthrange(year, month)[0]
+            weekday_days: Set[int] = set()
+            for ordinal, weekday in self.by_day:
+                matches = list(
+                    range((weekday - first_weekday) % 7 + 1, month_length + 1, 7)
+                )
+                if ordinal is None:
+                    weekday_days.update(matches)
+                else:
+                    index = ordinal - 1 if ordinal > 0 else ordinal
+                    if -len(matches) <= index < len(matches):
+                        weekday_days.add(matches[index])
+            days = days & weekday_days if self.by_month_day else weekday_days
+        elif not self.by_month_day and default_day <= month_length:
+            days.add(default_day)
+        return sorted(days)
+
+    def _period_dates(self, start: date, period: int) -> List[date]:
+        """Candidate dates of the period'th period after the one holding start."""
+        step = period * self.interval
+        if self.freq == "DAILY":
+            candidates = [start + timedelta(days=step)]
+            if self.by_month_day:
+                candidates = [d for d in candidates if self._matches_month_day(d)]
+            if self.by_day:
+                weekdays = {weekday for _, weekday in self.by_day}
+                candidates = [d for d in candidates if d.weekday() in weekdays]
+        elif self.freq == "WEEKLY":
+            week = start - timedelta(days=(start.weekday() - self.week_start) % 7)
+            week += timedelta(weeks=step)
+            weekdays = [weekday for _, weekday in self.by_day] or [start.weekday()]
+            candidates = sorted(
+                week + timedelta(days=(weekday - self.week_start) % 7)
+                for weekday in set(weekdays)
+            )
+        elif self.freq == "MONTHLY":
+            months = start.year * 12 + start.month - 1 + step
+            year, month = divmod(months, 12)
+            candidates = [
+                date(year, month + 1, day)
+                for day in self._month_days(year, month + 1, start.day)
+            ]
+        else:
+            year = start.year + step
+            candidates = [
+                date(year, month, day)
+                for month in sorted(self.by_month or [start.month])
+                for day in self._month_days(year, month, start.day)
+            ]
+
+        if self.by_month and self.freq != "YEARLY":
+            candidates = [d for d in candidates if d.month in self.by_month]
+        return candidates
+
+    def _first_period(self, start: date, not_before: date) -> int:
+        """Index of a period at or shortly before the one holding not_before."""
+        if self.count is not None or not_before <= start:
+            # COUNT is counted from the first occurrence, so nothing is skipped
+            return 0
+        if self.freq == "DAILY":
+            units = (not_before - start).days
+        elif self.freq == "WEEKLY":
+            units = (not_before - start).days // 7
+        elif self.freq == "MONTHLY":
+            units = (not_before.year - start.year) * 12 + not_before.month - start.month
+        else:
+            units = not_before.year - start.year
+        return max(0, units // self.interval - 1)
+
+    def occurrences(
+        self,
+        dtstart: datetime,
+        tz: Optional[tzinfo],
+        not_before: Optional[date] = None,
+    ) -> Iterator[datetime]:
+        """
+        Generate occurrence start times in order.
+
+        Args:
+            dtstart: Wall-clock start of the first occurrence
+            tz: Time zone of the wall-clock times; None for local time
+            not_before: Date before which occurrences may be skipped (optional)
+
+        Returns:
+            Iterator of wall-clock occurrence starts, from dtstart onwards
+        """
+        start = dtstart.date()
+        period = self._first_period(start, not_before) if not_before else 0
+        produced = 0
+        empty = 0
+        while empty < MAX_EMPTY_PERIODS:
+            try:
+                candidates = self._period_dates(start, period)
+            except (ValueError, OverflowError):
+                return
+            period += 1
+            empty = 0 if candidates else empty + 1
+            for day in candidates:
+                occurrence = datetime.combine(day, dtstart.time())
+                if occurrence < dtstart:
+                    continue
+                if self.until_date is not None and day > self.until_date:
+                    return
+                if (
+                    self.until_ts is not None
+                    and _timestamp(occurrence, tz) > self.until_ts
+                ):
+                    return
+                yield occurrence
+                produced += 1
+                if self.count is not None and produced >= self.count:
+                    return
+
+
+def _event_zone(when: Dict[str, Any]) -> Optional[tzinfo]:
+    """Time zone a timed event's wall-clock times are expressed in."""
+    zone = _load_zone(when["timeZone"]) if when.get("timeZone") else None
+    if zone is None:
+        zone = datetime.fromisoformat(when["dateTime"].replace("Z", "+00:00")).tzinfo
+    return zone
+
+
+def expand_event(
+    master: Dict[str, Any],
+    time_min: float,
+    time_max: Optional[float] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Generate the occurrences of a recurring event overlapping a window.
+
+    Occurrences are shaped like the instances the API returns: IDs such as
+    '<id>_20240603T070000Z', with recurringEventId and originalStartTime.
+    Modified and cancelled occurrences are not known here; callers drop the
+    generated occurrences they replace.
+
+    Args:
+        master: Recurring event with its 'recurrence' lines
+        time_min: Only occurrences ending after this time, in epoch seconds
+        time_max: Only occurrences starting before this time, in epoch
+            seconds (optional)
+
+    Returns:
+        Iterator of event instances in start order
+
+    Raises:
+        RecurrenceError: If the recurrence cannot be expanded locally
+    """
+    start, end = master.get("start", {}), master.get("end", {})
+    all_day = "date" in start
+    if all_day:
+        tz = None
+        dtstart = datetime.strptime(start["date"], "%Y-%m-%d")
+        dtend = datetime.strptime(end.get("date", start["date"]), "%Y-%m-%d")
+    elif start.get("dateTime"):
+        tz = _event_zone(start)
+        dtstart = datetime.fromisoformat(start["dateTime"].replace("Z", "+00:00"))
+        dtstart = dtstart.astimezone(tz).replace(tzinfo=None)
+        dtend = datetime.fromisoformat(
+            end.get("dateTime", start["dateTime"]).replace("Z", "+00:00")
+        )
+        dtend = dtend.astimezone(tz).replace(tzinfo=None)
+    else:
+        raise RecurrenceError("Event has no start time")
+    duration = dtend - dtstart
+
+    rules: List[RecurrenceRule] = []
+    excluded_times: Set[float] = set()
+    excluded_dates: Set[date] = set()
+    extra: List[datetime] = []
+    for line in master.get("recurrence", []):
+        name, _, value = line.partition(":")
+        name, *params = name.split(";")
+        name = name.upper()
+        param_values = {
+            key.upper(): param_value
+            for key, _, param_value in (p.partition("=") for p in params)
+        }
+        value_tz = _load_zone(param_values["TZID"]) if "TZID" in param_values else tz
+
+        if name == "RRULE":
+            rules.append(RecurrenceRule(value, tz))
+        elif name in ("EXDATE", "RDATE"):
+            for item in value.split(","):
+                try:
+                    timestamp, day = _parse_ical_time(item.strip(), value_tz)
+                except ValueError as e:
+                    raise RecurrenceError(f"Malformed {name}: {item}") from e
+                if name == "EXDATE":
+                    if timestamp is not None:
+                        excluded_times.add(timestamp)
+                    else:
+                        excluded_dates.add(day)
+                elif timestamp is not None:
+                    local = datetime.fromtimestamp(timestamp, tz)
+                    extra.append(local.replace(tzinfo=None))
+                else:
+                    extra.append(datetime.combine(day, dtstart.time()))
+        else:
+            raise RecurrenceError(f"Unsupported recurrence line: {line}")
+    if len(rules) > 1:
+        raise RecurrenceError("Events with several RRULEs are not supported")
+
+    # Occurrences starting before this date cannot reach the window
+    not_before = (
+        datetime.fromtimestamp(time_min) - duration - timedelta(days=1)
+    ).date()
+    streams: List[Iterator[datetime]] = [iter(sorted(set(extra)))]
+    if rules:
+        streams.append(rules[0].occurrences(dtstart, tz, not_before))
+    else:
+        streams.append(iter([dtstart]))
+
+    instance_base = {
+        key: value
+        for key, value in master.items()
+        if key not in ("recurrence", "etag", "id", "start", "end")
+    }
+    previous = None
+    for occurrence in heapq.merge(*streams):
+        if occurrence == previous:
+            continue
+        previous = occurrence
+
+        occurrence_ts = _timestamp(occurrence, tz)
+        if time_max is not None and occurrence_ts >= time_max:
+            return
+        if occurrence_ts in excluded_times or occurrence.date() in excluded_dates:
+            continue
+        occurrence_end = occurrence + duration
+        if _timestamp(occurrence_end, tz) <= time_min:
+            continue
+
+        if all_day:
+            start_when: Dict[str, Any] = {"date": occurrence.date().isoformat()}
+            end_when: Dict[str, Any] = {"date": occurrence_end.date().isoformat()}
+            suffix = occurrence.strftime("%Y%m%d")
+        else:
+            start_when = {"dateTime": occurrence.replace(tzinfo=tz).isoformat()}
+            end_when = {"dateTime": occurrence_end.replace(tzinfo=tz).isoformat()}
+            if start.get("timeZone"):
+                start_when["timeZone"] = start["timeZone"]
+                end_when["timeZone"] = end.get("timeZone", start["timeZone"])
+            utc = datetime.fromtimestamp(occurrence_ts, timezone.utc)
+            suffix = utc.strftime("%Y%m%dT%H%M%SZ")
+
+        instance = dict(instance_base)
+        instance["id"] = f"{master['id']}_{suffix}"
+        instance["recurringEventId"] = master["id"]
+        instance["originalStartTime"] = dict(start_when)
+        instance["start"] = start_when
+        instance["end"] = end_when
+        yield instance
+
+
+class ExpansionCache:
+    """
+    LRU cache of expanded occurrences.
+
+    Entries are keyed by the series' ID and etag, which changes whenever the
+    series is edited, together with the window and the number of occurrences
+    taken, so a cached expansion is only reused for the same revision.
+    """
+
+    def __init__(self, max_entries: int = EXPANSION_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self._expansions: OrderedDict[Tuple, List[Dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def expand(
+        self,
+        calendar_id: str,
+        master: Dict[str, Any],
+        time_min: float,
+        time_max: Optional[float],
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the first occurrences of a series in a window, expanding on a miss.
+
+        Args:
+            calendar_id: ID of the calendar holding the series
+            master: Recurring event with its 'recurrence' lines
+            time_min: Only occurrences ending after this time, in epoch seconds
+            time_max: Only occurrences starting before this time, in epoch
+                seconds (optional)
+            limit: Maximum number of occurrences
+
+        Returns:
+            Event instances in start order
+
+        Raises:
+            RecurrenceError: If the recurrence cannot be expanded locally
+        """
+        key = (
+            calendar_id,
+            master.get("id"),
+            master.get("etag") or master.get("updated"),
+            time_min,
+            time_max,
+            limit,
+        )
+        with self._lock:
+            instances = self._expansions.get(key)
+            if instances is not None:
+                self._expansions.move_to_end(key)
+                return instances
+
+        instances = list(islice(expand_event(master, time_min, time_max), limit))
+        with self._lock:
+            self._expansions[key] = instances
+            self._expansions.move_to_end(key)
+            while len(self._expansions) > self.max_entries:
+                self._expansions.popitem(last=False)
+        return instances
+
+    def clear(self) -> None:
+        """Drop all cached expansions."""
+        with self._lock:
+            self._expansions.clear()
+
+
+expansion_cache = ExpansionCache()
+
+
+def _original_start(event: Dict[str, Any]) -> Tuple[str, float]:
+    """Series ID and original start of a modified or cancelled occurrence."""
+    return (
+        event["recurringEventId"],
+        event_timestamp(event.get("originalStartTime", {})),
+    )
+
+
+def _series_exceptions(
+    service: CalendarService, calendar_id: str, masters: List[Dict[str, Any]]
+) -> Tuple[Set[Tuple[str, float]], Set[str]]:
+    """
+    List the modified and cancelled occurrences of recurring series.
+
+    A series and its exceptions share one iCalUID, so listing by iCalUID
+    returns every exception wherever it was moved to, in one batch request
+    for all the series.
+
+    Args:
+        service: Calendar API service instance
+        calendar_id: ID of the calendar holding the series
+        masters: Recurring events
+
+    Returns:
+        Tuple of ((series ID, original start) pairs of the exceptions, IDs of
+        the series whose exceptions could not be listed)
+    """
+    unknown = {master["id"] for master in masters if not master.get("iCalUID")}
+    uids = {
+        master["iCalUID"]: master["id"] for master in masters if master.get("iCalUID")
+    }
+    events_api = service.events()
+    requests = (
+        (
+            uid,
+            events_api.list(
+                calendarId=calendar_id,
+                iCalUID=uid,
+                singleEvents=False,
+                maxResults=2500,
+                fields="nextPageToken,items(recurringEventId,originalStartTime)",
+            ),
+        )
+        for uid in uids
+    )
+    responses, errors = execute_batch(service, requests)
+
+    exceptions: Set[Tuple[str, float]] = set()
+    for uid, response in responses.items():
+        if response.get("nextPageToken"):
+            unknown.add(uids[uid])
+            continue
+        exceptions.update(
+            _original_start(event)
+            for event in response.get("items", [])
+            if event.get("recurringEventId")
+        )
+    unknown.update(uids[uid] for uid in errors)
+    return exceptions, unknown
+
+
+def get_events_expanded(
+    service: CalendarService,
+    calendar_id: str,
+    max_results: int = 10,
+    time_min: Optional[str] = None,
+    time_max: Optional[str] = None,
+    search_query: Optional[str] = None,
+    cache: ExpansionCache = expansion_cache,
+) -> List[Dict[str, Any]]:
+    """
+    Get events from a calendar, expanding recurring events locally.
+
+    Behaves like get_events, but recurring series are fetched once and their
+    occurrences generated locally over the window. The modified and cancelled
+    occurrences of each series are listed by iCalUID, without the window and
+    search filters, so an occurrence moved out of the window or no longer
+    matching the search never reappears at its original time.
+
+    Args:
+        service: Calendar API service instance
+        calendar_id: ID of the calendar to get events from
+        max_results: Maximum number of events to return (default: 10)
+        time_min: Start time for events in RFC3339 format (default: now)
+        time_max: End time for events in RFC3339 format
+        search_query: Free text search terms to find events that match
+        cache: Expansion cache to use (default: the shared cache)
+
+    Returns:
+        List of event objects ordered by start time
+    """
+    if not time_min:
+        time_min = datetime.now(timezone.utc).isoformat()
+    start = parse_rfc3339(time_min)
+    end = parse_rfc3339(time_max) if time_max else None
+
+    params: Dict[str, Any] = {
+        "calendarId": calendar_id,
+        "singleEvents": False,
+        "timeMin": time_min,
+        "maxResults": 2500,
+    }
+    if time_max:
+        params["timeMax"] = time_max
+    if search_query:
+        params["q"] = search_query
+
+    masters: List[Dict[str, Any]] = []
+    singles: List[Dict[str, Any]] = []
+    replaced: Set[Tuple[str, float]] = set()
+    page_token = None
+    while True:
+        if page_token:
+            params["pageToken"] = page_token
+        response = service.events().list(**params).execute()
+        for event in response.get("items", []):
+            if event.get("recurringEventId"):
+                # A modified or cancelled occurrence replaces the generated one
+                replaced.add(_original_start(event))
+            if event.get("status") == "cancelled":
+                continue
+            if event.get("recurrence"):
+                masters.append(event)
+            else:
+                singles.append(event)
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            break
+
+    exceptions, unknown = _series_exceptions(service, calendar_id, masters)
+    replaced |= exceptions
+
+    # Occurrences of other series can only push a series' own ones out
+    limit = max_results + len(replaced)
+    timelines: List[List[Dict[str, Any]]] = [singles]
+    for master in masters:
+        try:
+            if master["id"] in unknown:
+                # The API expands series whose exceptions could not be listed
+                raise RecurrenceError("Exceptions of the series are unknown")
+            instances = cache.expand(calendar_id, master, start, end, limit)
+        except RecurrenceError:
+            instance_params = {
+                "calendarId": calendar_id,
+                "eventId": master["id"],
+                "timeMin": time_min,
+                "maxResults": limit,
+            }
+            if time_max:
+                instance_params["timeMax"] = time_max
+            response = service.events().instances(**instance_params).execute()
+            instances = [
+                instance
+                for instance in response.get("items", [])
+                if instance.get("status") != "cancelled"
+            ]
+        timelines.append(
+            [
+                instance
+                for instance in instances
+                if (master["id"], event_timestamp(instance["originalStartTime"]))
+                not in replaced
+            ]
+        )
+
+    for timeline in timelines:
+        timeline.sort(key=lambda event: event_timestamp(event.get("start", {})))
+    merged = heapq.merge(
+        *timelines, key=lambda event: event_timestamp(event.get("start", {}))
+    )
+    return list(islice(merged, max_results))
@@ -0,0 +1,529 @@
+"""
+Local SQLite store of calendar events, kept current with syncToken syncs.
+
+A full sync pulls every event instance from a lookback window onwards and
+keeps the syncToken returned with the last page. Later syncs send that token
+and receive only the events changed since, including cancellations. When
+Google expires the token (HTTP 410 Gone) the calendar is fully resynced.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError  # type: ignore
+
+from tools.calendar_tools.calendar import CalendarService
+
+EVENT_STORE_DB_NAME = "calendar_events.sqlite3"
+
+# events.list returns at most 2500 events per page
+MAX_EVENTS_PAGE_SIZE = 2500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    summary TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    location TEXT NOT NULL DEFAULT '',
+    event_json TEXT NOT NULL,
+    PRIMARY KEY (calendar_id, id)
+);
+CREATE INDEX IF NOT EXISTS events_start ON events (calendar_id, start_ts);
+
+CREATE TABLE IF NOT EXISTS calendars (
+    id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    window_start REAL NOT NULL DEFAULT 0,
+    last_sync REAL
+);
+"""
+
+
+def parse_rfc3339(value: str) -> float:
+    """
+    Convert an RFC3339 timestamp to epoch seconds.
+
+    Args:
+        value: Timestamp such as '2024-06-03T10:00:00-07:00' or '...Z'
+
+    Returns:
+        Seconds since the epoch
+    """
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def event_timestamp(when: Dict[str, Any]) -> float:
+    """
+    Convert an event start or end to epoch seconds.
+
+    All-day dates are taken at local midnight.
+
+    Args:
+        when: The event's 'start' or 'end' object
+
+    Returns:
+        Seconds since the epoch
+    """
+    if when.get("dateTime"):
+        return parse_rfc3339(when["dateTime"])
+    if when.get("date"):
+        return datetime.strptime(when["date"], "%Y-%m-%d").timestamp()
+    return 0.0
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class EventStore:
+    """
+    SQLite-backed store of expanded event instances for many calendars.
+
+    The connection is shared between threads and serialized with a lock.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self._sync_locks: Dict[str, threading.Lock] = {}
+
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def sync_lock(self, calendar_id: str) -> threading.Lock:
+        """
+        Get the lock held while a calendar syncs, so its syncs never interleave.
+
+        Args:
+            calendar_id: Calendar ID
+
+        Returns:
+            The calendar's sync lock
+        """
+        with self._lock:
+            return self._sync_locks.setdefault(calendar_id, threading.Lock())
+
+    # Calendar state
+
+    def get_calendar_state(self, calendar_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the sync state of a calendar.
+
+        Args:
+            calendar_id: Calendar ID
+
+        Returns:
+            Dict with sync_token, window_start and last_sync, or None if the
+            calendar was never synced
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM calendars WHERE id = ?", (calendar_id,)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def covers(self, calendar_id: str, time_min: float) -> bool:
+        """
+        Check whether the stored events of a calendar reach back to a time.
+
+        Args:
+            calendar_id: Calendar ID
+            time_min: Epoch seconds
+
+        Returns:
+            True if the calendar is synced from time_min or earlier
+        """
+        state = self.get_calendar_state(calendar_id)
+        return (
+            state is not None
+            and state["sync_token"] is not None
+            and state["window_start"] <= time_min
+        )
+
+    # Writes
+
+    def _event_row(self, calendar_id: str, event: Dict[str, Any]) -> Tuple:
+        start_ts = event_timestamp(event.get("start", {}))
+        end_ts = event_timestamp(event.get("end", {})) or start_ts
+        return (
+            calendar_id,
+            event["id"],
+            start_ts,
+            end_ts,
+            event.get("summary", ""),
+            event.get("description", ""),
+            event.get("location", ""),
+            json.dumps(event),
+        )
+
+    def apply_changes(
+        self,
+        calendar_id: str,
+        events: Iterable[Dict[str, Any]],
+        sync_token: Optional[str] = None,
+        window_start: Optional[float] = None,
+        replace: bool = False,
+    ) -> Dict[str, int]:
+        """
+        Apply a batch of event changes in a single transaction.
+
+        Cancelled events are deleted, all others are inserted or replaced.
+
+        Args:
+            calendar_id: Calendar ID
+            events: Event objects from events.list
+            sync_token: Token to resume from next time (optional)
+            window_start: Start of the synced window in epoch seconds (optional)
+            replace: Drop the calendar's stored events first (default: False)
+
+        Returns:
+            Counts of upserted and deleted events
+        """
+        upserts = []
+        deletions = []
+        for event in events:
+            if event.get("status") == "cancelled":
+                deletions.append((calendar_id, event["id"]))
+            else:
+                upserts.append(self._event_row(calendar_id, event))
+
+        with self._lock, self._conn:
+            if replace:
+                self._conn.execute(
+                    "DELETE FROM events WHERE calendar_id = ?", (calendar_id,)
+                )
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO events (
+                    calendar_id, id, start_ts, end_ts, summary, description,
+                    location, event_json
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                upserts,
+            )
+            deleted = self._conn.executemany(
+                "DELETE FROM events WHERE calendar_id = ? AND id = ?", deletions
+            ).rowcount
+
+            if sync_token is not None or window_start is not None:
+                self._conn.execute(
+                    """
+                    INSERT INTO calendars (id, sync_token, window_start, last_sync)
+                    VALUES (?, ?, COALESCE(?, 0), ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        sync_token = COALESCE(excluded.sync_token, sync_token),
+                        window_start = COALESCE(?, window_start),
+                        last_sync = excluded.last_sync
+                    """,
+                    (calendar_id, sync_token, window_start, time.time(), window_start),
+                )
+
+        return {"upserted": len(upserts), "deleted": max(deleted, 0)}
+
+    def upsert_event(self, calendar_id: str, event: Dict[str, Any]) -> None:
+        """
+        Store one event, e.g. as returned by an insert or update call.
+
+        Args:
+            calendar_id: Calendar ID
+            event: Event object
+        """
+        if self.get_calendar_state(calendar_id) is not None:
+            self.apply_changes(calendar_id, [event])
+
+    def delete_event(self, calendar_id: str, event_id: str) -> None:
+        """
+        Remove one event and its expanded instances.
+
+        Args:
+            calendar_id: Calendar ID
+            event_id: Event ID
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM events WHERE calendar_id = ? AND id = ?",
+                (calendar_id, event_id),
+            )
+            self._conn.execute(
+                """
+                DELETE FROM events WHERE calendar_id = ?
+                AND json_extract(event_json, '$.recurringEventId') = ?
+                """,
+                (calendar_id, event_id),
+            )
+
+    def mark_stale(self, calendar_id: str) -> None:
+        """
+        Make the next sync of a calendar run regardless of its interval.
+
+        Args:
+            calendar_id: Calendar ID
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE calendars SET last_sync = NULL WHERE id = ?", (calendar_id,)
+            )
+
+    def clear(self, calendar_id: str) -> None:
+        """
+        Drop the events and sync state of a calendar.
+
+        Args:
+            calendar_id: Calendar ID
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM events WHERE calendar_id = ?", (calendar_id,)
+            )
+            self._conn.execute("DELETE FROM calendars WHERE id = ?", (calendar_id,))
+
+    # Reads
+
+    def get_event(self, calendar_id: str, event_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a stored event.
+
+        Args:
+            calendar_id: Calendar ID
+            event_id: Event ID
+
+        Returns:
+            Event object, or None if it is not stored
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT event_json FROM events WHERE calendar_id = ? AND id = ?",
+                (calendar_id, event_id),
+            ).fetchone()
+        return json.loads(row["event_json"]) if row is not None else None
+
+    def list_events(
+        self,
+        calendar_id: str,
+        time_min: float,
+        time_max: Optional[float] = None,
+        query: Optional[str] = None,
+        max_results: int = 10,
+    ) -> List[Dict[str, Any]]:
+        """
+        List stored events overlapping a time range, ordered by start time.
+
+        Args:
+            calendar_id: Calendar ID
+            time_min: Only events ending after this time, in epoch seconds
+            time_max: Only events starting before this time, in epoch seconds
+                (optional)
+            query: Terms that must all appear in the title, description or
+                location, case-insensitively (optional)
+            max_results: Maximum number of events to return (default: 10)
+
+        Returns:
+            List of event objects
+        """
+        clauses = ["calendar_id = ?", "end_ts > ?"]
+        params: List[Any] = [calendar_id, time_min]
+        if time_max is not None:
+            clauses.append("start_ts < ?")
+            params.append(time_max)
+        for term in (query or "").split():
+            clauses.append(
+                "(summary || ' ' || description || ' ' || location) LIKE ? ESCAPE '\\'"
+            )
+            params.append(f"%{_escape_like(term)}%")
+
+        sql = (
+            "SELECT event_json FROM events WHERE "
+            + " AND ".join(clauses)
+            + " ORDER BY start_ts, id LIMIT ?"
+        )
+        params.append(max_results)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row["event_json"]) for row in rows]
+
+    def count(self, calendar_id: Optional[str] = None) -> int:
+        """
+        Count stored events.
+
+        Args:
+            calendar_id: Only count events of this calendar (optional)
+
+        Returns:
+            Number of stored events
+        """
+        with self._lock:
+            if calendar_id is None:
+                row = self._conn.execute("SELECT COUNT(*) FROM events").fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM events WHERE calendar_id = ?",
+                    (calendar_id,),
+                ).fetchone()
+        return row[0]
+
+
+def _list_all_events(
+    service: CalendarService, calendar_id: str, **params: Any
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Page through events.list; returns (events, nextSyncToken)."""
+    events: List[Dict[str, Any]] = []
+    page_token = None
+    while True:
+        response = (
+            service.events()
+            .list(
+                calendarId=calendar_id,
+                singleEvents=True,
+                maxResults=MAX_EVENTS_PAGE_SIZE,
+                pageToken=page_token,
+                **params,
+            )
+            .execute()
+        )
+        events.extend(response.get("items", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return events, response.get("nextSyncToken")
+
+
+def full_sync(
+    service: CalendarService,
+    store: EventStore,
+    calendar_id: str,
+    past_days: int = 30,
+) -> Dict[str, Any]:
+    """
+    Replace a calendar's stored events with every instance from a window start.
+
+    Args:
+        service: Calendar API service instance
+        store: Event store to update
+        calendar_id: Calendar ID
+        past_days: Days before now the stored window starts (default: 30)
+
+    Returns:
+        Sync statistics
+    """
+    window_start = time.time() - past_days * 86400
+    time_min = datetime.fromtimestamp(window_start, timezone.utc).isoformat()
+    events, sync_token = _list_all_events(service, calendar_id, timeMin=time_min)
+
+    stats = store.apply_changes(
+        calendar_id,
+        events,
+        sync_token=sync_token or "",
+        window_start=window_start,
+        replace=True,
+    )
+    return {"mode": "full", **stats}
+
+
+def incremental_sync(
+    service: CalendarService,
+    store: EventStore,
+    calendar_id: str,
+    sync_token: str,
+) -> Dict[str, Any]:
+    """
+    Apply the changes made to a calendar since a sync token was issued.
+
+    Args:
+        service: Calendar API service instance
+        store: Event store to update
+        calendar_id: Calendar ID
+        sync_token: Token from the previous sync
+
+    Returns:
+        Sync statistics
+
+    Raises:
+        HttpError: With status 410 if the sync token has expired
+    """
+    events, next_token = _list_all_events(service, calendar_id, syncToken=sync_token)
+    stats = store.apply_changes(
+        calendar_id, events, sync_token=next_token or sync_token
+    )
+    return {"mode": "incremental", **stats}
+
+
+def sync_calendar(
+    service: CalendarService,
+    store: EventStore,
+    calendar_id: str,
+    past_days: int = 30,
+    min_interval: float = 0,
+) -> Dict[str, Any]:
+    """
+    Bring a calendar's stored events up to date with a full or incremental sync.
+
+    Args:
+        service: Calendar API service instance
+        store: Event store to update
+        calendar_id: Calendar ID
+        past_days: Days of past events kept by a full sync (default: 30)
+        min_interval: Skip the sync if the last one finished less than this
+            many seconds ago (default: 0)
+
+    Returns:
+        Sync statistics including the mode used ('full', 'incremental' or 'skipped')
+    """
+    with store.sync_lock(calendar_id):
+        state = store.get_calendar_state(calendar_id)
+        if (
+            min_interval
+            and state is not None
+            and state["last_sync"]
+            and time.time() - state["last_sync"] < min_interval
+        ):
+            return {"mode": "skipped", "upserted": 0, "deleted": 0}
+
+        if state is None or not state["sync_token"]:
+            return full_sync(service, store, calendar_id, past_days)
+        try:
+            return incremental_sync(service, store, calendar_id, state["sync_token"])
+        except HttpError as e:
+            if e.resp.status != 410:
+                raise
+            # The sync token is no longer valid; start over
+            store.clear(calendar_id)
+            return full_sync(service, store, calendar_id, past_days)
+
+
+_stores: Dict[str, EventStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_event_store(cache_dir: str) -> EventStore:
+    """
+    Get the shared event store under a cache directory.
+
+    Args:
+        cache_dir: Directory holding the store database
+
+    Returns:
+        Event store instance
+    """
+    db_path = os.path.join(cache_dir, EVENT_STORE_DB_NAME)
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = EventStore(db_path)
+            _stores[db_path] = store
+        return store
@@ -5,18 +5,178 @@ This module provides a Model Context Protocol server for interacting with Google
 It exposes Calendar events as resources and provides tools for managing calendars and events.
 """
 
-from typing import Any, List, Optional
-
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from googleapiclient.errors import HttpError  # type: ignore
+
+from tools.calendar_tools.agenda import build_agenda
+from tools.calendar_tools.availability import find_availability
 from tools.calendar_tools.calendar import (
+    build_event_body,
+    build_event_patch,
     create_event,
+    create_events_bulk,
     delete_event,
     get_calendar_service,
     get_events,
+    import_events,
+    iter_event_pages,
     list_calendars,
     update_event,
+    update_events_batch,
+)
+from tools.calendar_tools.config import settings
+from tools.calendar_tools.ics import iter_ics_events, write_ics
+from tools.calendar_tools.recurrence import get_events_expanded
+from tools.calendar_tools.store import (
+    EventStore,
+    get_event_store,
+    parse_rfc3339,
+    sync_calendar,
 )
+from tools.google_api import register_service
+
+service = register_service("calendar", get_calendar_service)
 
-service = get_calendar_service()
+
+def get_synced_store(calendar_id: str) -> Optional[EventStore]:
+    """
+    Get the local event store, with the calendar synced if it is stale.
+
+    Args:
+        calendar_id: ID of the calendar about to be read
+
+    Returns:
+        The store, or None if it is disabled or the calendar could not be synced
+    """
+    if not settings.calendar_store_enabled:
+        return None
+
+    store = get_event_store(settings.cache_dir)
+    try:
+        sync_calendar(
+            service,
+            store,
+            calendar_id,
+            past_days=settings.calendar_sync_past_days,
+            min_interval=settings.calendar_sync_interval,
+        )
+    except Exception as e:
+        print(
+            f"Warning: Calendar sync failed, using the Calendar API: {e}",
+            file=sys.stderr,
+        )
+        return None
+    return store
+
+
+def find_events(
+    calendar_id: str,
+    max_results: int = 10,
+    time_min: str = "",
+    time_max: str = "",
+    query: str = "",
+    expand_locally: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Get events from the local store when it covers the range, else from the API.
+
+    Args:
+        calendar_id: ID of the calendar
+        max_results: Maximum number of events to return (default: 10)
+        time_min: Start time in RFC3339 format (defaults to now)
+        time_max: End time in RFC3339 format (optional)
+        query: Search terms (optional)
+        expand_locally: Fetch recurring events once and expand their
+            occurrences locally rather than in the API (default: False, or
+            the calendar_expand_recurring setting). Ignored when the local
+            store covers the range, since it already holds every occurrence
+            and answers without any API call
+
+    Returns:
+        List of event objects ordered by start time
+    """
+    start = parse_rfc3339(time_min) if time_min else time.time()
+    store = get_synced_store(calendar_id)
+    if store is not None and store.covers(calendar_id, start):
+        return store.list_events(
+            calendar_id,
+            start,
+            parse_rfc3339(time_max) if time_max else None,
+            query or None,
+            max_results,
+        )
+    if expand_locally or settings.calendar_expand_recurring:
+        return get_events_expanded(
+            service, calendar_id, max_results, time_min or None, time_max, query
+        )
+    return get_events(
+        service, calendar_id, max_results, time_min or None, time_max, query
+    )
+
+
+def record_event_change(
+    calendar_id: str,
+    event: Optional[Dict[str, Any]] = None,
+    deleted_event_id: str = "",
+) -> None:
+    """
+    Apply a change made through the API to the local store.
+
+    The calendar is also marked stale, so the next read picks up anything the
+    change implies that the response does not carry, such as the instances
+    of a recurring series.
+
+    Args:
+        calendar_id: ID of the changed calendar
+        event: Event returned by an insert or update call (optional)
+        deleted_event_id: ID of a deleted event (optional)
+    """
+    if not settings.calendar_store_enabled:
+        return
+
+    store = get_event_store(settings.cache_dir)
+    if deleted_event_id:
+        store.delete_event(calendar_id, deleted_event_id)
+    elif event is not None and not event.get("recurrence"):
+        store.upsert_event(calendar_id, event)
+    store.mark_stale(calendar_id)
+
+
+def read_local_events(
+    calendar_id: str, time_min: float, time_max: Optional[float], max_results: int
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Read events from the local store for the agenda, if it can answer.
+
+    Only calendars the store already holds are used; a calendar that was
+    never synced is left to the batched API query rather than started on a
+    full sync here.
+
+    Args:
+        calendar_id: ID of the calendar
+        time_min: Only events ending after this time, in epoch seconds
+        time_max: Only events starting before this time, in epoch seconds (optional)
+        max_results: Maximum number of events to return
+
+    Returns:
+        List of event objects ordered by start time, or None to use the API
+    """
+    if not settings.calendar_store_enabled:
+        return None
+    if get_event_store(settings.cache_dir).get_calendar_state(calendar_id) is None:
+        return None
+
+    store = get_synced_store(calendar_id)
+    if store is None or not store.covers(calendar_id, time_min):
+        return None
+    return store.list_events(calendar_id, time_min, time_max, None, max_results)
 
 
 # Resource functions
@@ -30,7 +190,7 @@ def get_calendar_events(calendar_id: str) -> str:
     Returns:
         Formatted string with calendar events
     """
-    events = get_events(service, calendar_id)
+    events = find_events(calendar_id)
     result = f"Calendar (ID: {calendar_id})\n"
 
     if not events:
@@ -71,7 +231,10 @@ def get_calendar_event(calendar_id: str, event_id: str) -> str:
     Returns:
         Formatted string with event details
     """
-    event = service.events().get(calendarId=calendar_id, eventId=event_id).execute()
+    store = get_synced_store(calendar_id)
+    event = store.get_event(calendar_id, event_id) if store is not None else None
+    if event is None:
+        event = service.events().get(calendarId=calendar_id, eventId=event_id).execute()
 
     result = f"Event (ID: {event_id})\n"
     result += f"Title: {event.get('summary', 'Untitled')}\n"
@@ -98,6 +261,9 @@ def get_calendar_event(calendar_id: str, event_id: str) -> str:
     if event.get("description"):
         result += f"Description: {event.get('description')}\n"
 
+    if event.get("etag"):
+        result += f"ETag: {event.get('etag')}\n"
+
     # Add attendees if available
     attendees = event.get("attendees", [])
     if attendees:
@@ -174,6 +340,7 @@ def create_event_tool(
         attendees if attendees is not None else [],
         timezone,
     )
+    record_event_change(calendar_id, event)
 
     result = "Event created successfully:\n"
     result += f"ID: {event.get('id', 'Unknown')}\n"
@@ -197,6 +364,199 @@ def create_event_tool(
     return result
 
 
+def bulk_create_events(
+    calendar_id: str,
+    events: Optional[List[Dict[str, Any]]] = None,
+    ics_path: str = "",
+    send_updates: str = "none",
+    default_timezone: str = "UTC",
+) -> str:
+    """
+    Create many events at once from a list, an ICS file, or both.
+
+    Events are created through batch requests. Events whose iCalUID already
+    exists in the calendar, or repeats an earlier event, are skipped.
+
+    Args:
+        calendar_id: ID of the calendar
+        events: Events with title, start_datetime and end_datetime, plus any of
+            description, location, attendees, timezone and ical_uid (defaults
+            to None)
+        ics_path: Path of an iCalendar file to read events from (defaults to
+            empty string)
+        send_updates: Who gets notification emails: "all", "externalOnly" or
+            "none" (defaults to "none")
+        default_timezone: Time zone for ICS times without one (defaults to "UTC")
+
+    Returns:
+        Summary with the result of each event
+    """
+    bodies: List[Dict[str, Any]] = []
+    problems: List[str] = []
+
+    for item in events or []:
+        if not all(item.get(k) for k in ("title", "start_datetime", "end_datetime")):
+            problems.append(f"Missing title, start_datetime or end_datetime: {item}")
+            continue
+        body = build_event_body(
+            item["title"],
+            item["start_datetime"],
+            item["end_datetime"],
+            item.get("description"),
+            item.get("location"),
+            item.get("attendees"),
+            item.get("timezone"),
+        )
+        if item.get("ical_uid"):
+            body["iCalUID"] = item["ical_uid"]
+        bodies.append(body)
+
+    skipped = 0
+    if ics_path:
+        try:
+            with open(os.path.expanduser(ics_path), encoding="utf-8") as ics_file:
+                for body in iter_ics_events(ics_file, default_timezone, problems):
+                    # Cancelled events and changed occurrences of a series
+                    # have nothing to create on their own
+                    if body.get("status") == "cancelled" or body.get(
+                        "originalStartTime"
+                    ):
+                        skipped += 1
+                        continue
+                    # The organizer can only be set when importing
+                    body.pop("organizer", None)
+                    bodies.append(body)
+        except OSError as e:
+            return f"Could not read {ics_path}: {e}"
+
+    if not bodies:
+        return "No events to create.\n" + "".join(f"- {p}\n" for p in problems)
+
+    try:
+        outcome = create_events_bulk(service, calendar_id, bodies, send_updates)
+    except ValueError as e:
+        return str(e)
+
+    created = outcome["created"]
+    for event in created.values():
+        record_event_change(calendar_id, event)
+
+    result = (
+        f"Created {len(created)} of {len(bodies)} events in calendar {calendar_id}.\n"
+    )
+    if outcome["duplicates"]:
+        result += f"Skipped {len(outcome['duplicates'])} duplicates.\n"
+    if skipped:
+        result += f"Skipped {skipped} cancelled or modified occurrences.\n"
+
+    for key, event in created.items():
+        result += f"\nCreated {key}: {event.get('summary', 'Untitled')}\n"
+        result += f"Event ID: {event.get('id')}\n"
+
+    for key, event_id in outcome["duplicates"].items():
+        if event_id:
+            result += f"\nDuplicate {key}: already exists as event {event_id}\n"
+        else:
+            result += f"\nDuplicate {key}: repeated in the input\n"
+
+    for key, error in outcome["errors"].items():
+        result += f"\nFailed {key}: {error}\n"
+
+    if problems:
+        result += "\nEvents that could not be read:\n"
+        result += "".join(f"- {p}\n" for p in problems)
+
+    return result
+
+
+def export_calendar_ics(
+    calendar_id: str,
+    path: str,
+    time_min: str = "",
+    time_max: str = "",
+) -> str:
+    """
+    Export a calendar to an iCalendar (.ics) file.
+
+    Events are written page by page as they are fetched, and recurring events
+    are exported once with their recurrence rules.
+
+    Args:
+        calendar_id: ID of the calendar to export
+        path: Path of the file to write
+        time_min: Only export events ending after this time, in RFC3339 format
+            (defaults to empty string)
+        time_max: Only export events starting before this time, in RFC3339
+            format (defaults to empty string)
+
+    Returns:
+        Number of events exported and the file path
+    """
+    target = os.path.abspath(os.path.expanduser(path))
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+
+    events = (
+        event
+        for page in iter_event_pages(service, calendar_id, time_min, time_max)
+        for event in page
+    )
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as out:
+            count = write_ics(events, out, calendar_id)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return f"Exported {count} events from calendar {calendar_id} to {target}."
+
+
+def import_calendar_ics(
+    calendar_id: str,
+    ics_path: str,
+    default_timezone: str = "UTC",
+) -> str:
+    """
+    Import an iCalendar (.ics) file into a calendar.
+
+    The file is read one event at a time and imported in batches. Events are
+    matched by their UID, so importing a file again updates the events it
+    created instead of duplicating them. No notifications are sent.
+
+    Args:
+        calendar_id: ID of the calendar to import into
+        ics_path: Path of the iCalendar file
+        default_timezone: Time zone for times without one (defaults to "UTC")
+
+    Returns:
+        Number of events imported, and the errors encountered
+    """
+    problems: List[str] = []
+    try:
+        with open(os.path.expanduser(ics_path), encoding="utf-8") as ics_file:
+            events = iter_ics_events(ics_file, default_timezone, problems)
+            stats = import_events(service, calendar_id, events)
+    except OSError as e:
+        return f"Could not read {ics_path}: {e}"
+
+    if settings.calendar_store_enabled:
+        get_event_store(settings.cache_dir).mark_stale(calendar_id)
+
+    result = f"Imported {stats['imported']} events into calendar {calendar_id}.\n"
+    if stats["failed"]:
+        result += f"\n{stats['failed']} events failed to import:\n"
+        for key, error in stats["errors"].items():
+            result += f"- {key}: {error}\n"
+    if problems:
+        result += f"\n{len(problems)} events could not be read:\n"
+        result += "".join(f"- {problem}\n" for problem in problems[:20])
+
+    return result
+
+
 def update_event_tool(
     calendar_id: str,
     event_id: str,
@@ -205,6 +565,7 @@ def update_event_tool(
     end_datetime: str = "",
     description: str = "",
     location: str = "",
+    etag: str = "",
 ) -> str:
     """
     Update an existing calendar event.
@@ -217,20 +578,29 @@ def update_event_tool(
         end_datetime: New end time in RFC3339 format (defaults to empty string)
         description: New event description (defaults to empty string)
         location: New event location (defaults to empty string)
+        etag: ETag from when the event was read; the update is refused if the
+            event changed since (defaults to empty string)
 
     Returns:
         Confirmation message with updated event details
     """
-    event = update_event(
-        service,
-        calendar_id,
-        event_id,
-        title,
-        start_datetime,
-        end_datetime,
-        description,
-        location,
-    )
+    try:
+        event = update_event(
+            service,
+            calendar_id,
+            event_id,
+            title,
+            start_datetime,
+            end_datetime,
+            description,
+            location,
+            etag,
+        )
+    except HttpError as e:
+        if e.resp.status != 412:
+            raise
+        return f"Event (ID: {event_id}) was changed since it was read (ETag {etag}). Read it again and retry the update."
+    record_event_change(calendar_id, event)
 
     result = "Event updated successfully:\n"
     result += f"ID: {event_id}\n"
@@ -245,6 +615,8 @@ def update_event_tool(
         result += f"New Description: {description}\n"
     if location:
         result += f"New Location: {location}\n"
+    if event.get("etag"):
+        result += f"New ETag: {event.get('etag')}\n"
 
     # Add link to the event
     if event.get("htmlLink"):
@@ -253,6 +625,58 @@ def update_event_tool(
     return result
 
 
+def bulk_update_events(updates: List[Dict[str, str]]) -> str:
+    """
+    Update many calendar events in one batch request.
+
+    Args:
+        updates: One dict per event with calendar_id and event_id, plus any of
+            title, start_datetime, end_datetime, description, location and etag
+
+    Returns:
+        Summary of the updated events and of the updates that failed
+    """
+    patches = []
+    for update in updates:
+        patch = build_event_patch(
+            update.get("title"),
+            update.get("start_datetime"),
+            update.get("end_datetime"),
+            update.get("description"),
+            update.get("location"),
+        )
+        if not update.get("calendar_id") or not update.get("event_id") or not patch:
+            return f"Each update needs a calendar_id, an event_id and a field to change: {update}"
+        patches.append(
+            {
+                "calendar_id": update["calendar_id"],
+                "event_id": update["event_id"],
+                "patch": patch,
+                "etag": update.get("etag"),
+            }
+        )
+
+    try:
+        events, errors = update_events_batch(service, patches)
+    except ValueError as e:
+        return f"Error: {e}"
+    for key, event in events.items():
+        record_event_change(key.rsplit("/", 1)[0], event)
+
+    result = f"Updated {len(events)} of {len(patches)} events.\n"
+    for event in events.values():
+        result += f"\nTitle: {event.get('summary', 'Untitled')}\n"
+        result += f"Event ID: {event.get('id')}\n"
+        result += f"ETag: {event.get('etag')}\n"
+
+    if errors:
+        result += "\nFailed updates:\n"
+        for key, error in errors.items():
+            result += f"- {key}: {error}\n"
+
+    return result
+
+
 def delete_event_tool(calendar_id: str, event_id: str) -> str:
     """
     Delete a calendar event.
@@ -265,6 +689,7 @@ def delete_event_tool(calendar_id: str, event_id: str) -> str:
         Confirmation message
     """
     delete_event(service, calendar_id, event_id)
+    record_event_change(calendar_id, deleted_event_id=event_id)
     return f"Event (ID: {event_id}) has been deleted successfully from calendar {calendar_id}."
 
 
@@ -274,6 +699,7 @@ def search_events_tool(
     max_results: int = 10,
     time_min: str = "",
     time_max: str = "",
+    expand_locally: bool = False,
 ) -> str:
     """
     Search for events in a calendar.
@@ -284,11 +710,16 @@ def search_events_tool(
         max_results: Maximum number of events to return
         time_min: Start time in RFC3339 format (defaults to empty string)
         time_max: End time in RFC3339 format (defaults to empty string)
+        expand_locally: Expand recurring events locally instead of fetching
+            every occurrence, useful for long ranges; has no effect when the
+            local event store answers the search (defaults to False)
 
     Returns:
         Formatted list of matching events
     """
-    events = get_events(service, calendar_id, max_results, time_min, time_max, query)
+    events = find_events(
+        calendar_id, max_results, time_min, time_max, query, expand_locally
+    )
 
     result = f"Search results for '{query}' in calendar {calendar_id}:\n"
 
@@ -319,15 +750,209 @@ def search_events_tool(
     return result
 
 
+def sync_local_calendar(calendar_id: str = "primary") -> str:
+    """
+    Bring the local event store up to date for a calendar.
+
+    Args:
+        calendar_id: ID of the calendar to sync (defaults to "primary")
+
+    Returns:
+        Summary of the changes applied
+    """
+    if not settings.calendar_store_enabled:
+        return "The local event store is disabled. Set MIST_GOOGLE_CALENDAR_STORE_ENABLED=true to enable it."
+
+    store = get_event_store(settings.cache_dir)
+    stats = sync_calendar(
+        service, store, calendar_id, past_days=settings.calendar_sync_past_days
+    )
+
+    return f"""
+Calendar {calendar_id} synced ({stats["mode"]} sync):
+Added or updated: {stats["upserted"]}
+Deleted: {stats["deleted"]}
+Events stored: {store.count(calendar_id)}
+"""
+
+
+def get_agenda(
+    calendar_ids: Optional[List[str]] = None,
+    time_min: str = "",
+    time_max: str = "",
+    max_results: int = 25,
+    page_token: str = "",
+) -> str:
+    """
+    Get one timeline of upcoming events across several calendars.
+
+    All calendars are queried in a single batch request and their events are
+    merged by start time.
+
+    Args:
+        calendar_ids: IDs of the calendars to include (defaults to all calendars
+            in the user's calendar list)
+        time_min: Start time in RFC3339 format (defaults to now)
+        time_max: End time in RFC3339 format (optional)
+        max_results: Maximum number of events to return (default: 25)
+        page_token: Token from a previous call to get the next page (optional)
+
+    Returns:
+        Formatted list of events in start order
+    """
+    names: Dict[str, str] = {}
+    if not calendar_ids:
+        calendars = list_calendars(service)
+        calendar_ids = [calendar["id"] for calendar in calendars]
+        names = {
+            calendar["id"]: calendar.get("summary", calendar["id"])
+            for calendar in calendars
+        }
+    if not calendar_ids:
+        return "No calendars found."
+
+    try:
+        agenda = build_agenda(
+            service,
+            calendar_ids,
+            time_min or datetime.now(timezone.utc).isoformat(),
+            time_max,
+            max_results,
+            page_token,
+            read_local_events,
+        )
+    except ValueError as e:
+        return str(e)
+
+    entries = agenda["entries"]
+    result = f"Agenda for {len(calendar_ids)} calendars:\n"
+
+    if not entries:
+        result += "\nNo events found.\n"
+
+    for _, calendar_id, event in entries:
+        result += f"\nTitle: {event.get('summary', 'Untitled')}\n"
+        result += f"Calendar: {names.get(calendar_id, calendar_id)}\n"
+
+        start = event.get("start", {})
+        end = event.get("end", {})
+
+        if "dateTime" in start:
+            result += f"Start: {start.get('dateTime')}\n"
+        elif "date" in start:
+            result += f"Start Date: {start.get('date')}\n"
+
+        if "dateTime" in end:
+            result += f"End: {end.get('dateTime')}\n"
+        elif "date" in end:
+            result += f"End Date: {end.get('date')}\n"
+
+        if event.get("location"):
+            result += f"Location: {event.get('location')}\n"
+
+        result += f"Event ID: {event.get('id')}\n"
+
+    for calendar_id, error in agenda["errors"].items():
+        result += f"\nCould not read calendar {names.get(calendar_id, calendar_id)}: {error}\n"
+
+    if agenda["cursor"]:
+        result += f"\nMore results available. Next page token: {agenda['cursor']}\n"
+
+    return result
+
+
+def find_meeting_slots(
+    attendees: Optional[List[str]] = None,
+    duration_minutes: int = 30,
+    time_min: str = "",
+    time_max: str = "",
+    max_slots: int = 5,
+    working_hours_start: str = "09:00",
+    working_hours_end: str = "17:00",
+    time_zone: str = "UTC",
+    include_weekends: bool = False,
+    buffer_minutes: int = 0,
+) -> str:
+    """
+    Find times when all attendees are free.
+
+    Args:
+        attendees: Calendar IDs or attendee email addresses (defaults to the
+            primary calendar)
+        duration_minutes: Length of the meeting in minutes (default: 30)
+        time_min: Start of the search in RFC3339 format (defaults to now)
+        time_max: End of the search in RFC3339 format (defaults to two weeks
+            after time_min)
+        max_slots: Maximum number of slots to return (default: 5)
+        working_hours_start: Start of the working day as HH:MM (default: "09:00")
+        working_hours_end: End of the working day as HH:MM (default: "17:00")
+        time_zone: IANA time zone of the working hours (default: "UTC")
+        include_weekends: Whether Saturdays and Sundays are working days
+            (default: False)
+        buffer_minutes: Minutes kept free before and after other events
+            (default: 0)
+
+    Returns:
+        Formatted list of free slots
+    """
+    calendar_ids = attendees or ["primary"]
+    try:
+        start = parse_rfc3339(time_min) if time_min else time.time()
+        end = parse_rfc3339(time_max) if time_max else start + 14 * 24 * 60 * 60
+    except ValueError:
+        return "Error: time_min and time_max must be RFC3339 timestamps, such as '2024-06-03T09:00:00Z'"
+    weekdays = range(7) if include_weekends else range(5)
+
+    try:
+        availability = find_availability(
+            service,
+            calendar_ids,
+            start,
+            end,
+            duration_minutes * 60,
+            max_slots,
+            working_hours_start,
+            working_hours_end,
+            time_zone,
+            weekdays,
+            buffer_minutes * 60,
+        )
+    except ValueError as e:
+        return str(e)
+
+    tz = ZoneInfo(time_zone)
+    slots = availability["slots"]
+    result = f"Free {duration_minutes}-minute slots for {', '.join(calendar_ids)}:\n"
+
+    if not slots:
+        result += "\nNo free slots found.\n"
+
+    for slot_start, slot_end in slots:
+        result += f"\nStart: {datetime.fromtimestamp(slot_start, tz).isoformat()}\n"
+        result += f"End: {datetime.fromtimestamp(slot_end, tz).isoformat()}\n"
+
+    for calendar_id, error in availability["errors"].items():
+        result += f"\nCould not read the availability of {calendar_id}: {error}\n"
+
+    return result
+
+
 # Register all tools with MCP
 def register_tools_calendar(mcp: Any):
     """Register all calendar tools with the MCP server."""
     # Register tools
     mcp.tool()(list_calendars_tool)
     mcp.tool()(create_event_tool)
+    mcp.tool()(bulk_create_events)
+    mcp.tool()(export_calendar_ics)
+    mcp.tool()(import_calendar_ics)
     mcp.tool()(update_event_tool)
+    mcp.tool()(bulk_update_events)
     mcp.tool()(delete_event_tool)
     mcp.tool()(search_events_tool)
+    mcp.tool()(get_agenda)
+    mcp.tool()(find_meeting_slots)
+    mcp.tool()(sync_local_calendar)
 
     # Register resources
     mcp.resource("calendar://calendars/{calendar_id}/events")(get_calendar_events)
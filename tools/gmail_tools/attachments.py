@@ -0,0 +1,293 @@
+"""
+Content-addressed on-disk cache of Gmail attachments.
+
+Attachment data is decoded in chunks into a spooled temporary file while it is
+hashed, then stored once per SHA-256 digest. Identical attachments on
+different messages share one file, and callers only ever see paths and
+metadata rather than raw bytes.
+"""
+
+import base64
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+from tools.gmail_tools.gmail import DEFAULT_USER_ID, GmailService
+
+ATTACHMENTS_DIR_NAME = "attachments"
+INDEX_DB_NAME = "index.sqlite3"
+
+# Attachments up to this size are spooled in memory before hitting disk
+SPOOL_MAX_SIZE = 1024 * 1024
+# Base64 characters decoded per step; a multiple of 4 keeps chunks aligned
+DECODE_CHUNK_CHARS = 256 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attachments (
+    message_id TEXT NOT NULL,
+    part_id TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (message_id, part_id)
+);
+CREATE INDEX IF NOT EXISTS attachments_sha256 ON attachments (sha256);
+"""
+
+
+def list_attachments(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    List the attachment parts of a message payload in document order.
+
+    Args:
+        payload: The ``payload`` of a full-format Gmail message
+
+    Returns:
+        Dicts with part_id, filename, mime_type, size, attachment_id and,
+        for small attachments Gmail inlines, data
+    """
+    attachments: List[Dict[str, Any]] = []
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        stack.extend(reversed(part.get("parts", [])))
+
+        body = part.get("body", {})
+        if not part.get("filename") or not (
+            body.get("attachmentId") or body.get("data")
+        ):
+            continue
+        attachments.append(
+            {
+                "part_id": part.get("partId", ""),
+                "filename": part["filename"],
+                "mime_type": part.get("mimeType", "application/octet-stream"),
+                "size": body.get("size", 0),
+                "attachment_id": body.get("attachmentId"),
+                "data": body.get("data"),
+            }
+        )
+    return attachments
+
+
+def decode_to_spool(data: str) -> Tuple[IO[bytes], str, int]:
+    """
+    Decode base64url data chunk by chunk into a spooled temporary file.
+
+    Args:
+        data: base64url encoded content, padded or not
+
+    Returns:
+        Tuple of (spooled file rewound to the start, SHA-256 hex digest, size)
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    digest = hashlib.sha256()
+    size = 0
+    for start in range(0, len(data), DECODE_CHUNK_CHARS):
+        chunk = data[start : start + DECODE_CHUNK_CHARS]
+        chunk += "=" * (-len(chunk) % 4)
+        raw = base64.urlsafe_b64decode(chunk)
+        digest.update(raw)
+        spool.write(raw)
+        size += len(raw)
+    spool.seek(0)
+    return spool, digest.hexdigest(), size
+
+
+class AttachmentStore:
+    """
+    Attachment files stored by SHA-256 digest with a per-message index.
+
+    Files live at ``<root>/<first two hex digits>/<digest>``. The index maps
+    (message ID, MIME part ID) to a digest, so repeat downloads of the same
+    attachment are answered without calling Gmail.
+    """
+
+    def __init__(self, root: str) -> None:
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self._conn = sqlite3.connect(
+            os.path.join(root, INDEX_DB_NAME), check_same_thread=False
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def path_for(self, sha256: str) -> str:
+        """
+        Get the file path of a stored digest.
+
+        Args:
+            sha256: SHA-256 hex digest
+
+        Returns:
+            Absolute path of the cached file
+        """
+        return os.path.abspath(os.path.join(self.root, sha256[:2], sha256))
+
+    def lookup(self, message_id: str, part_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached attachment by message and MIME part.
+
+        Args:
+            message_id: Gmail message ID
+            part_id: MIME part ID of the attachment
+
+        Returns:
+            Attachment metadata including its path, or None if not cached
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM attachments WHERE message_id = ? AND part_id = ?",
+                (message_id, part_id),
+            ).fetchone()
+        if row is None:
+            return None
+
+        entry = dict(row)
+        entry["path"] = self.path_for(entry["sha256"])
+        if not os.path.exists(entry["path"]):
+            return None
+        return entry
+
+    def store(
+        self,
+        message_id: str,
+        part_id: str,
+        filename: str,
+        mime_type: str,
+        data: str,
+    ) -> Dict[str, Any]:
+        """
+        Decode and store attachment data, reusing an identical stored file.
+
+        Args:
+            message_id: Gmail message ID
+            part_id: MIME part ID of the attachment
+            filename: Attachment file name
+            mime_type: Attachment MIME type
+            data: base64url encoded attachment content
+
+        Returns:
+            Attachment metadata including its path and whether it was new
+        """
+        spool, sha256, size = decode_to_spool(data)
+        path = self.path_for(sha256)
+        created = False
+        with spool:
+            if not os.path.exists(path):
+                directory = os.path.dirname(path)
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as target:
+                        shutil.copyfileobj(spool, target)
+                    os.replace(tmp_path, path)
+                    created = True
+                except OSError:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO attachments
+                    (message_id, part_id, sha256, filename, mime_type, size)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (message_id, part_id, sha256, filename, mime_type, size),
+            )
+
+        return {
+            "message_id": message_id,
+            "part_id": part_id,
+            "sha256": sha256,
+            "filename": filename,
+            "mime_type": mime_type,
+            "size": size,
+            "path": path,
+            "deduplicated": not created,
+        }
+
+
+def download_attachment(
+    service: GmailService,
+    store: AttachmentStore,
+    message_id: str,
+    attachment: Dict[str, Any],
+    user_id: str = DEFAULT_USER_ID,
+) -> Dict[str, Any]:
+    """
+    Fetch one attachment into the store unless it is already cached.
+
+    Args:
+        service: Gmail API service instance
+        store: Attachment store to write to
+        message_id: Gmail message ID
+        attachment: Attachment entry from list_attachments
+        user_id: Gmail user ID (default: 'me')
+
+    Returns:
+        Attachment metadata including its path and whether it was cached
+    """
+    cached = store.lookup(message_id, attachment["part_id"])
+    if cached is not None:
+        cached["cached"] = True
+        return cached
+
+    data = attachment.get("data")
+    if not data:
+        response = (
+            service.users()
+            .messages()
+            .attachments()
+            .get(
+                userId=user_id,
+                messageId=message_id,
+                id=attachment["attachment_id"],
+                fields="data",
+            )
+            .execute()
+        )
+        data = response.get("data", "")
+
+    entry = store.store(
+        message_id,
+        attachment["part_id"],
+        attachment["filename"],
+        attachment["mime_type"],
+        data,
+    )
+    entry["cached"] = False
+    return entry
+
+
+_stores: Dict[str, AttachmentStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_attachment_store(cache_dir: str) -> AttachmentStore:
+    """
+    Get the shared attachment store under a cache directory.
+
+    Args:
+        cache_dir: Directory holding the attachment cache
+
+    Returns:
+        Attachment store instance
+    """
+    root = os.path.join(cache_dir, ATTACHMENTS_DIR_NAME)
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = AttachmentStore(root)
+            _stores[root] = store
+        return store
@@ -1,3 +1,38 @@
-from tools.google_api import settings as google_settings
+from tools.gmail_tools.mime import DEFAULT_BODY_MAX_BYTES
+from tools.gmail_tools.push import (
+    DEFAULT_PUSH_HOST,
+    DEFAULT_PUSH_PATH,
+    DEFAULT_PUSH_PORT,
+)
+from tools.google_api import GoogleApiSettings
 
-settings = google_settings
+
+class GmailSettings(GoogleApiSettings):
+    """
+    Gmail-specific settings on top of the shared Google API configuration.
+    """
+
+    # Local SQLite mirror of the mailbox, kept current via history.list
+    gmail_mirror_enabled: bool = False
+    gmail_mirror_max_threads: int = 500  # Threads pulled by a full sync
+    gmail_mirror_sync_interval: int = 60  # Seconds before reads trigger a sync
+
+    # Push notifications: users.watch topic and the local receiver endpoint
+    gmail_push_topic: str = ""  # projects/<project>/topics/<topic>
+    gmail_push_host: str = DEFAULT_PUSH_HOST
+    gmail_push_port: int = DEFAULT_PUSH_PORT
+    gmail_push_path: str = DEFAULT_PUSH_PATH
+    gmail_push_token: str = ""  # Expected ?token= value on push requests
+    # Seconds before reads sync the mirror even while push notifications
+    # arrive, in case some were lost
+    gmail_push_fallback_sync_interval: int = 900
+
+    # Decoded bytes of a message body read before extraction stops
+    gmail_body_max_bytes: int = DEFAULT_BODY_MAX_BYTES
+
+    # Background sending through the persistent outbox
+    gmail_outbox_workers: int = 4
+    gmail_outbox_max_attempts: int = 6  # Attempts before a message is marked failed
+
+
+settings = GmailSettings()
@@ -3,25 +3,65 @@ This module provides utilities for authenticating with and using the Gmail API.
 """
 
 import base64
+import re
+import threading
+import time
+from collections import OrderedDict
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from tools.google_api import get_google_service, settings
+from tools.gmail_tools.mime import DEFAULT_BODY_MAX_BYTES, extract_body_text
+from tools.google_api import execute_batch, get_google_service, settings
 
 # Default settings
 DEFAULT_CREDENTIALS_PATH = "credentials.json"
 DEFAULT_TOKEN_PATH = "token.json"
 DEFAULT_USER_ID = "me"
+# Gmail accepts up to 100 calls per batch request
+GMAIL_BATCH_LIMIT = 100
+
+# messages.list returns at most 500 message references per page
+MAX_LIST_PAGE_SIZE = 500
+
+# messages.batchModify accepts up to 1000 message IDs per call
+BATCH_MODIFY_LIMIT = 1000
+
+# Seconds a cached labels.list response stays fresh
+LABEL_CACHE_TTL = 300
+
+# Parsed message bodies kept in memory by BodyCache
+BODY_CACHE_SIZE = 1000
+
+# Search results kept by QueryCache, and seconds a fetched historyId is trusted
+QUERY_CACHE_SIZE = 256
+HISTORY_CHECK_INTERVAL = 15
+
+# Headers and partial-response mask used for message listings
+SUMMARY_HEADERS = ["From", "Subject", "Date"]
+SUMMARY_FIELDS = "id,threadId,snippet,payload/headers"
+
+# Headers and partial-response mask used to index a thread without bodies
+THREAD_HEADERS = ["From", "To", "Subject", "Date"]
+THREAD_INDEX_FIELDS = "id,historyId,messages(id,threadId,historyId,payload/headers)"
+
+# A search term: a quoted phrase, optionally prefixed, or a run of non-spaces
+QUERY_TERM = re.compile(r'(?:[^\s"]*"[^"]*"[^\s"]*)+|\S+')
+# Operators whose meaning depends on the terms next to them
+ORDERED_OPERATORS = {"OR", "AND", "AROUND"}
 
 # Define a more specific type for the Gmail service
 GmailService = Any
 
 
-def get_gmail_service() -> GmailService:
+def get_gmail_service(use_cache: bool = True) -> GmailService:
     """
     Authenticate with Gmail API and return the service object.
 
+    Args:
+        use_cache: Reuse the shared service; pass False for a private instance
+            to use from another thread (default: True)
+
     Returns:
         Authenticated Gmail API service
     """
@@ -31,6 +71,8 @@ def get_gmail_service() -> GmailService:
         credentials_path=settings.credentials_path,
         token_path=settings.token_path,
         scopes=settings.scopes,
+        cache_dir=settings.cache_dir,
+        use_cache=use_cache,
     )
 
 
@@ -41,30 +83,36 @@ def create_message(
     message_text: str,
     cc: Optional[str] = None,
     bcc: Optional[str] = None,
+    message_id: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Create a message for the Gmail API.
 
     Args:
-        sender: Email sender
+        sender: Email sender; when empty, Gmail fills in the authenticated
+            user's address
         to: Email recipient
         subject: Email subject
         message_text: Email body text
         cc: Carbon copy recipients (optional)
         bcc: Blind carbon copy recipients (optional)
+        message_id: Message-ID header value (optional)
 
     Returns:
         A dictionary containing a base64url encoded email object
     """
     message = MIMEText(message_text)
     message["to"] = to
-    message["from"] = sender
+    if sender:
+        message["from"] = sender
     message["subject"] = subject
 
     if cc:
         message["cc"] = cc
     if bcc:
         message["bcc"] = bcc
+    if message_id:
+        message["Message-ID"] = message_id
 
     # Encode the message
     encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
@@ -121,37 +169,20 @@ def create_multipart_message(
     return {"raw": encoded_message}
 
 
-def parse_message_body(message: Dict[str, Any]) -> str:
+def parse_message_body(
+    message: Dict[str, Any], max_bytes: int = DEFAULT_BODY_MAX_BYTES
+) -> str:
     """
     Parse the body of a Gmail message.
 
     Args:
         message: The Gmail message object
+        max_bytes: Decoded byte budget for the body (default: 256 KiB)
 
     Returns:
         The extracted message body text
     """
-
-    # Helper function to find text/plain parts
-    def get_text_part(parts: List[Dict[str, Any]]) -> str:
-        text = ""
-        for part in parts:
-            if part["mimeType"] == "text/plain":
-                if "data" in part["body"]:
-                    text += base64.urlsafe_b64decode(part["body"]["data"]).decode()
-            elif "parts" in part:
-                text += get_text_part(part["parts"])
-        return text
-
-    # Check if the message is multipart
-    if "parts" in message["payload"]:
-        return get_text_part(message["payload"]["parts"])
-    else:
-        # Handle single part messages
-        if "data" in message["payload"]["body"]:
-            data = message["payload"]["body"]["data"]
-            return base64.urlsafe_b64decode(data).decode()
-        return ""
+    return extract_body_text(message.get("payload"), max_bytes)
 
 
 def get_headers_dict(message: Dict[str, Any]) -> Dict[str, str]:
@@ -165,7 +196,7 @@ def get_headers_dict(message: Dict[str, Any]) -> Dict[str, str]:
         Dictionary of message headers
     """
     headers = {}
-    for header in message["payload"]["headers"]:
+    for header in message.get("payload", {}).get("headers", []):
         headers[header["name"]] = header["value"]
     return headers  # type: ignore
 
@@ -197,7 +228,9 @@ def send_email(
         Sent message object
     """
     message = create_message(sender, to, subject, body, cc, bcc)
-    return service.users().messages().send(userId=user_id, body=message).execute()
+    sent = service.users().messages().send(userId=user_id, body=message).execute()
+    query_cache.invalidate(user_id)
+    return sent
 
 
 def get_labels(
@@ -217,6 +250,374 @@ def get_labels(
     return response.get("labels", [])
 
 
+class LabelCache:
+    """
+    TTL cache of labels.list responses with lookup by label ID or name.
+
+    create_label, update_label and delete_label invalidate the cache, so
+    cached lookups never miss a label changed through this module.
+    """
+
+    def __init__(self, ttl: float = LABEL_CACHE_TTL) -> None:
+        self.ttl = ttl
+        self._labels: Dict[str, List[Dict[str, Any]]] = {}
+        self._fetched_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get_all(
+        self, service: GmailService, user_id: str = DEFAULT_USER_ID
+    ) -> List[Dict[str, Any]]:
+        """
+        Get all labels, calling labels.list only when the cache is stale.
+
+        Args:
+            service: Gmail API service instance
+            user_id: Gmail user ID (default: 'me')
+
+        Returns:
+            List of label objects
+        """
+        with self._lock:
+            fetched_at = self._fetched_at.get(user_id)
+            if fetched_at is not None and time.monotonic() - fetched_at < self.ttl:
+                return self._labels[user_id]
+
+        labels = get_labels(service, user_id)
+        with self._lock:
+            self._labels[user_id] = labels
+            self._fetched_at[user_id] = time.monotonic()
+        return labels
+
+    def get(
+        self, service: GmailService, name_or_id: str, user_id: str = DEFAULT_USER_ID
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find a label by ID, or by case-insensitive name.
+
+        Args:
+            service: Gmail API service instance
+            name_or_id: Label ID or label name
+            user_id: Gmail user ID (default: 'me')
+
+        Returns:
+            Label object, or None if no label matches
+        """
+        wanted = name_or_id.strip()
+        for attempt in range(2):
+            if attempt:
+                # The label may have been created elsewhere; refetch once
+                self.invalidate(user_id)
+            labels = self.get_all(service, user_id)
+            for label in labels:
+                if label.get("id") == wanted:
+                    return label
+            for label in labels:
+                if label.get("name", "").lower() == wanted.lower():
+                    return label
+        return None
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """
+        Drop cached labels for one user, or for every user.
+
+        Args:
+            user_id: Gmail user ID to invalidate (default: all users)
+        """
+        with self._lock:
+            if user_id is None:
+                self._labels.clear()
+                self._fetched_at.clear()
+            else:
+                self._labels.pop(user_id, None)
+                self._fetched_at.pop(user_id, None)
+
+
+label_cache = LabelCache()
+
+
+class BodyCache:
+    """
+    LRU cache of parsed message bodies keyed by message ID and historyId.
+
+    A message's historyId changes whenever the message does, so a cached
+    body is only reused for the exact revision it was parsed from.
+    """
+
+    def __init__(self, max_entries: int = BODY_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self._bodies: OrderedDict[Tuple[str, str, int], str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self, message_id: str, history_id: Optional[str], max_bytes: int
+    ) -> Optional[str]:
+        """
+        Look up a parsed body.
+
+        Args:
+            message_id: Gmail message ID
+            history_id: historyId of the message revision (optional)
+            max_bytes: Byte budget the body was parsed with
+
+        Returns:
+            The cached body, or None on a miss
+        """
+        if not history_id:
+            return None
+        key = (message_id, history_id, max_bytes)
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+            return body
+
+    def put(
+        self, message_id: str, history_id: Optional[str], max_bytes: int, body: str
+    ) -> None:
+        """
+        Store a parsed body, evicting the least recently used entries.
+
+        Args:
+            message_id: Gmail message ID
+            history_id: historyId of the message revision (optional)
+            max_bytes: Byte budget the body was parsed with
+            body: Parsed body text
+        """
+        if not history_id:
+            return
+        with self._lock:
+            self._bodies[(message_id, history_id, max_bytes)] = body
+            self._bodies.move_to_end((message_id, history_id, max_bytes))
+            while len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+
+    def parse(
+        self, message: Dict[str, Any], max_bytes: int = DEFAULT_BODY_MAX_BYTES
+    ) -> str:
+        """
+        Parse the body of a full-format message, reusing a cached result.
+
+        Args:
+            message: The Gmail message object
+            max_bytes: Decoded byte budget for the body (default: 256 KiB)
+
+        Returns:
+            The extracted message body text
+        """
+        message_id = message.get("id", "")
+        history_id = message.get("historyId")
+        body = self.get(message_id, history_id, max_bytes)
+        if body is None:
+            body = parse_message_body(message, max_bytes)
+            self.put(message_id, history_id, max_bytes, body)
+        return body
+
+    def clear(self) -> None:
+        """Drop every cached body."""
+        with self._lock:
+            self._bodies.clear()
+
+
+body_cache = BodyCache()
+
+
+class QueryCache:
+    """
+    LRU cache of search results that is emptied when the mailbox changes.
+
+    The mailbox historyId advances with every change. It is read from
+    getProfile at most once per check interval, and can also be reported by
+    anything that learns it sooner, such as a mirror sync. Mutations made
+    through this module invalidate the cache directly.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = QUERY_CACHE_SIZE,
+        check_interval: float = HISTORY_CHECK_INTERVAL,
+    ) -> None:
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self._entries: OrderedDict[Tuple[str, Any], Any] = OrderedDict()
+        self._history_ids: Dict[str, int] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def observe_history(
+        self, history_id: Any, user_id: str = DEFAULT_USER_ID
+    ) -> None:
+        """
+        Record the mailbox historyId, dropping results if it has advanced.
+
+        Args:
+            history_id: Current mailbox historyId
+            user_id: Gmail user ID (default: 'me')
+        """
+        if not history_id:
+            return
+        history_id = int(history_id)
+        with self._lock:
+            self._checked_at[user_id] = time.monotonic()
+            known = self._history_ids.get(user_id)
+            if known is not None and history_id <= known:
+                return
+            self._history_ids[user_id] = history_id
+            if known is not None:
+                self._drop(user_id)
+
+    def get_or_fetch(
+        self,
+        service: GmailService,
+        key: Any,
+        fetch: Callable[[], Any],
+        user_id: str = DEFAULT_USER_ID,
+    ) -> Any:
+        """
+        Return the cached result for a key, or compute and cache it.
+
+        Args:
+            service: Gmail API service instance
+            key: Hashable key, normally built from a canonical query
+            fetch: Computes the result on a miss
+            user_id: Gmail user ID (default: 'me')
+
+        Returns:
+            The cached or freshly fetched result
+        """
+        with self._lock:
+            checked_at = self._checked_at.get(user_id)
+        if checked_at is None or time.monotonic() - checked_at >= self.check_interval:
+            profile = get_profile(service, user_id)
+            self.observe_history(profile.get("historyId"), user_id)
+
+        entry_key = (user_id, key)
+        with self._lock:
+            if entry_key in self._entries:
+                self._entries.move_to_end(entry_key)
+                return self._entries[entry_key]
+            generation = self._generation
+
+        value = fetch()
+        with self._lock:
+            # Skip storing if the mailbox changed while fetching
+            if generation == self._generation:
+                self._entries[entry_key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """
+        Drop cached results for one user, or for every user.
+
+        Args:
+            user_id: Gmail user ID to invalidate (default: all users)
+        """
+        with self._lock:
+            self._drop(user_id)
+
+    def _drop(self, user_id: Optional[str]) -> None:
+        """Drop entries; caller holds the lock."""
+        self._generation += 1
+        if user_id is None:
+            self._entries.clear()
+        else:
+            for entry_key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[entry_key]
+
+
+query_cache = QueryCache()
+
+
+class MessagePager:
+    """
+    Lazily iterate message references across messages.list pages.
+
+    Pages are requested only as iteration reaches them. Once iteration stops,
+    `cursor` holds an opaque token that resumes right after the last yielded
+    message, or None when the result set is exhausted.
+    """
+
+    def __init__(
+        self,
+        service: GmailService,
+        user_id: str = DEFAULT_USER_ID,
+        max_results: int = 10,
+        query: Optional[str] = None,
+        cursor: Optional[str] = None,
+    ) -> None:
+        self.service = service
+        self.user_id = user_id
+        self.max_results = max_results
+        self.query = query or ""
+        self.cursor: Optional[str] = None
+
+        # Resuming must reuse the page size the cursor was created with
+        self._page_size = min(max(max_results, 1), MAX_LIST_PAGE_SIZE)
+        self._page_token: Optional[str] = None
+        self._offset = 0
+        if cursor:
+            self._page_size, self._page_token, self._offset = self.decode_cursor(cursor)
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[int, Optional[str], int]:
+        """
+        Read a cursor built by a previous pager.
+
+        Args:
+            cursor: Cursor in 'size:token:offset' form
+
+        Returns:
+            Tuple of (page size, messages.list page token or None, offset
+            within that page)
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        try:
+            size, token, offset = cursor.split(":", 2)
+            page_size, page_offset = int(size), int(offset)
+        except ValueError as e:
+            raise ValueError(f"Invalid page token: {cursor}") from e
+        if not 1 <= page_size <= MAX_LIST_PAGE_SIZE or page_offset < 0:
+            raise ValueError(f"Invalid page token: {cursor}")
+        return page_size, token or None, page_offset
+
+    def _encode(self, page_token: Optional[str], offset: int) -> str:
+        return f"{self._page_size}:{page_token or ''}:{offset}"
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        page_token, offset = self._page_token, self._offset
+        yielded = 0
+        self.cursor = None
+
+        while yielded < self.max_results:
+            params: Dict[str, Any] = {
+                "userId": self.user_id,
+                "maxResults": self._page_size,
+                "q": self.query,
+            }
+            if page_token:
+                params["pageToken"] = page_token
+            response = self.service.users().messages().list(**params).execute()
+
+            refs = response.get("messages", [])
+            next_token = response.get("nextPageToken")
+            for index in range(offset, len(refs)):
+                if yielded >= self.max_results:
+                    self.cursor = self._encode(page_token, index)
+                    return
+                yield refs[index]
+                yielded += 1
+
+            if not next_token:
+                self.cursor = None
+                return
+            page_token, offset = next_token, 0
+            self.cursor = self._encode(page_token, 0)
+
+
 def list_messages(
     service: GmailService,
     user_id: str = DEFAULT_USER_ID,
@@ -224,7 +625,7 @@ def list_messages(
     query: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """
-    List messages in the user's mailbox.
+    List messages in the user's mailbox, following pages up to max_results.
 
     Args:
         service: Gmail API service instance
@@ -235,20 +636,10 @@ def list_messages(
     Returns:
         List of message objects
     """
-    response = (
-        service.users()
-        .messages()
-        .list(userId=user_id, maxResults=max_results, q=query or "")
-        .execute()
-    )
-    messages = response.get("messages", [])
-    return messages
+    return list(MessagePager(service, user_id, max_results, query))
 
 
-def search_messages(
-    service: GmailService,
-    user_id: str = DEFAULT_USER_ID,
-    max_results: int = 10,
+def build_search_query(
     is_unread: Optional[bool] = None,
     labels: Optional[List[str]] = None,
     from_email: Optional[str] = None,
@@ -260,34 +651,31 @@ def search_messages(
     is_starred: Optional[bool] = None,
     is_important: Optional[bool] = None,
     in_trash: Optional[bool] = None,
-) -> List[Dict[str, Any]]:
+) -> str:
     """
-    Search for messages in the user's mailbox using various criteria.
+    Build a Gmail search query string from search criteria.
 
     Args:
-        service: Gmail API service instance
-        user_id: Gmail user ID (default: 'me')
-        max_results: Maximum number of messages to return (default: 10)
-        is_unread: If True, only return unread messages (optional)
+        is_unread: If True, only match unread messages (optional)
         labels: List of label names to search for (optional)
         from_email: Sender email address (optional)
         to_email: Recipient email address (optional)
         subject: Subject text to search for (optional)
-        after: Only return messages after this date (format: YYYY/MM/DD) (optional)
-        before: Only return messages before this date (format: YYYY/MM/DD) (optional)
-        has_attachment: If True, only return messages with attachments (optional)
-        is_starred: If True, only return starred messages (optional)
-        is_important: If True, only return important messages (optional)
+        after: Only match messages after this date (format: YYYY/MM/DD) (optional)
+        before: Only match messages before this date (format: YYYY/MM/DD) (optional)
+        has_attachment: If True, only match messages with attachments (optional)
+        is_starred: If True, only match starred messages (optional)
+        is_important: If True, only match important messages (optional)
         in_trash: If True, only search in trash (optional)
 
     Returns:
-        List of message objects matching the search criteria
+        Gmail search query
     """
     query_parts = []
 
     # Handle read/unread status
-    if is_unread is not None:
-        query_parts.append("is:unread" if is_unread else "")  # type: ignore
+    if is_unread:
+        query_parts.append("is:unread")  # type: ignore
 
     # Handle labels
     if labels:
@@ -325,14 +713,96 @@ def search_messages(
         query_parts.append("in:trash")  # type: ignore
 
     # Join all query parts with spaces
-    query = " ".join(query_parts)  # type: ignore
+    return canonicalize_query(" ".join(query_parts))  # type: ignore
+
+
+def canonicalize_query(query: str) -> str:
+    """
+    Normalize a Gmail query so equivalent searches produce the same string.
+
+    Terms are split on whitespace, keeping quoted phrases intact, and empty
+    terms are dropped. Queries made only of implicitly ANDed terms are sorted
+    and deduplicated; queries using OR, AND, AROUND, braces or parentheses
+    keep their term order, since reordering them could change their meaning.
+
+    Args:
+        query: Gmail search query
+
+    Returns:
+        Canonical query string
+    """
+    terms = [term for term in QUERY_TERM.findall(query) if term.strip()]
+    if any(
+        term in ORDERED_OPERATORS or term[0] in "({" or term[-1] in ")}"
+        for term in terms
+    ):
+        return " ".join(terms)
+    return " ".join(sorted(set(terms)))
+
+
+def search_messages(
+    service: GmailService,
+    user_id: str = DEFAULT_USER_ID,
+    max_results: int = 10,
+    is_unread: Optional[bool] = None,
+    labels: Optional[List[str]] = None,
+    from_email: Optional[str] = None,
+    to_email: Optional[str] = None,
+    subject: Optional[str] = None,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    has_attachment: Optional[bool] = None,
+    is_starred: Optional[bool] = None,
+    is_important: Optional[bool] = None,
+    in_trash: Optional[bool] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Search for messages in the user's mailbox using various criteria.
+
+    Args:
+        service: Gmail API service instance
+        user_id: Gmail user ID (default: 'me')
+        max_results: Maximum number of messages to return (default: 10)
+        is_unread: If True, only return unread messages (optional)
+        labels: List of label names to search for (optional)
+        from_email: Sender email address (optional)
+        to_email: Recipient email address (optional)
+        subject: Subject text to search for (optional)
+        after: Only return messages after this date (format: YYYY/MM/DD) (optional)
+        before: Only return messages before this date (format: YYYY/MM/DD) (optional)
+        has_attachment: If True, only return messages with attachments (optional)
+        is_starred: If True, only return starred messages (optional)
+        is_important: If True, only return important messages (optional)
+        in_trash: If True, only search in trash (optional)
+
+    Returns:
+        List of message objects matching the search criteria
+    """
+    query = build_search_query(
+        is_unread=is_unread,
+        labels=labels,
+        from_email=from_email,
+        to_email=to_email,
+        subject=subject,
+        after=after,
+        before=before,
+        has_attachment=has_attachment,
+        is_starred=is_starred,
+        is_important=is_important,
+        in_trash=in_trash,
+    )
 
     # Use the existing list_messages function to perform the search
     return list_messages(service, user_id, max_results, query)
 
 
 def get_message(
-    service: GmailService, message_id: str, user_id: str = DEFAULT_USER_ID
+    service: GmailService,
+    message_id: str,
+    user_id: str = DEFAULT_USER_ID,
+    message_format: str = "full",
+    metadata_headers: Optional[List[str]] = None,
+    fields: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Get a specific message by ID.
@@ -341,14 +811,79 @@ def get_message(
         service: Gmail API service instance
         message_id: Gmail message ID
         user_id: Gmail user ID (default: 'me')
+        message_format: 'full', 'metadata', 'minimal' or 'raw' (default: 'full')
+        metadata_headers: Headers to include when message_format is 'metadata' (optional)
+        fields: Partial response field mask, e.g. 'id,snippet,payload/headers' (optional)
 
     Returns:
         Message object
     """
-    message = service.users().messages().get(userId=user_id, id=message_id).execute()
+    message = _message_get_request(
+        service, message_id, user_id, message_format, metadata_headers, fields
+    ).execute()
     return message
 
 
+def _message_get_request(
+    service: GmailService,
+    message_id: str,
+    user_id: str,
+    message_format: str,
+    metadata_headers: Optional[List[str]],
+    fields: Optional[str],
+) -> Any:
+    """Build a messages.get request, leaving unset options out of the query."""
+    params: Dict[str, Any] = {"userId": user_id, "id": message_id}
+    if message_format != "full":
+        params["format"] = message_format
+    if message_format == "metadata" and metadata_headers:
+        params["metadataHeaders"] = metadata_headers
+    if fields:
+        params["fields"] = fields
+    return service.users().messages().get(**params)
+
+
+def get_messages_batch(
+    service: GmailService,
+    message_ids: List[str],
+    user_id: str = DEFAULT_USER_ID,
+    batch_size: int = GMAIL_BATCH_LIMIT,
+    message_format: str = "full",
+    metadata_headers: Optional[List[str]] = None,
+    fields: Optional[str] = None,
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """
+    Get several messages through the Gmail batch endpoint.
+
+    Args:
+        service: Gmail API service instance
+        message_ids: Gmail message IDs to fetch
+        user_id: Gmail user ID (default: 'me')
+        batch_size: Maximum number of messages per batch request (default: 100)
+        message_format: 'full', 'metadata', 'minimal' or 'raw' (default: 'full')
+        metadata_headers: Headers to include when message_format is 'metadata' (optional)
+        fields: Partial response field mask (optional)
+
+    Returns:
+        Tuple of (message objects by ID, error messages by ID)
+    """
+    requests = (
+        (
+            message_id,
+            _message_get_request(
+                service,
+                message_id,
+                user_id,
+                message_format,
+                metadata_headers,
+                fields,
+            ),
+        )
+        for message_id in message_ids
+    )
+    return execute_batch(service, requests, batch_size)
+
+
 def get_thread(
     service: GmailService, thread_id: str, user_id: str = DEFAULT_USER_ID
 ) -> Dict[str, Any]:
@@ -395,7 +930,9 @@ def create_draft(
     """
     message = create_message(sender, to, subject, body, cc, bcc)
     draft_body = {"message": message}
-    return service.users().drafts().create(userId=user_id, body=draft_body).execute()
+    draft = service.users().drafts().create(userId=user_id, body=draft_body).execute()
+    query_cache.invalidate(user_id)
+    return draft
 
 
 def list_drafts(
@@ -452,7 +989,9 @@ def send_draft(
         Sent message object
     """
     draft = {"id": draft_id}
-    return service.users().drafts().send(userId=user_id, body=draft).execute()
+    sent = service.users().drafts().send(userId=user_id, body=draft).execute()
+    query_cache.invalidate(user_id)
+    return sent
 
 
 def create_label(
@@ -479,7 +1018,9 @@ def create_label(
         "messageListVisibility": "show",
         "type": label_type,
     }
-    return service.users().labels().create(userId=user_id, body=label_body).execute()
+    label = service.users().labels().create(userId=user_id, body=label_body).execute()
+    label_cache.invalidate(user_id)
+    return label
 
 
 def update_label(
@@ -515,12 +1056,14 @@ def update_label(
     if message_list_visibility:
         label["messageListVisibility"] = message_list_visibility
 
-    return (
+    updated = (
         service.users()
         .labels()
         .update(userId=user_id, id=label_id, body=label)
         .execute()
     )
+    label_cache.invalidate(user_id)
+    return updated
 
 
 def delete_label(
@@ -538,6 +1081,7 @@ def delete_label(
         None
     """
     service.users().labels().delete(userId=user_id, id=label_id).execute()
+    label_cache.invalidate(user_id)
 
 
 def modify_message_labels(
@@ -564,12 +1108,14 @@ def modify_message_labels(
         "addLabelIds": add_labels or [],
         "removeLabelIds": remove_labels or [],
     }
-    return (
+    message = (
         service.users()
         .messages()
         .modify(userId=user_id, id=message_id, body=body)
         .execute()
     )
+    query_cache.invalidate(user_id)
+    return message
 
 
 def batch_modify_messages_labels(
@@ -597,7 +1143,67 @@ def batch_modify_messages_labels(
         "addLabelIds": add_labels or [],
         "removeLabelIds": remove_labels or [],
     }
-    service.users().messages().batchModify(userId=user_id, body=body).execute()
+    try:
+        service.users().messages().batchModify(userId=user_id, body=body).execute()
+    finally:
+        # A failed call may still have modified some messages
+        query_cache.invalidate(user_id)
+
+
+def bulk_modify_messages_labels(
+    service: GmailService,
+    message_ids: Iterable[str],
+    add_labels: Optional[List[str]] = None,
+    remove_labels: Optional[List[str]] = None,
+    user_id: str = DEFAULT_USER_ID,
+    chunk_size: int = BATCH_MODIFY_LIMIT,
+) -> List[Dict[str, Any]]:
+    """
+    Modify labels on any number of messages, one batchModify call per chunk.
+
+    Message IDs are consumed lazily, so a MessagePager can be passed directly.
+    A failing chunk does not stop the remaining chunks.
+
+    Args:
+        service: Gmail API service instance
+        message_ids: Message IDs (any iterable, duplicates are skipped)
+        add_labels: List of label IDs to add (optional)
+        remove_labels: List of label IDs to remove (optional)
+        user_id: Gmail user ID (default: 'me')
+        chunk_size: Message IDs per batchModify call (default: 1000)
+
+    Returns:
+        One report per chunk with 'count', 'error' (None on success) and,
+        for failed chunks, the chunk's 'ids'
+    """
+    chunk_size = max(1, min(chunk_size, BATCH_MODIFY_LIMIT))
+    seen: set = set()
+    reports: List[Dict[str, Any]] = []
+
+    def flush(chunk: List[str]) -> None:
+        report: Dict[str, Any] = {"count": len(chunk), "error": None}
+        try:
+            batch_modify_messages_labels(
+                service, chunk, add_labels, remove_labels, user_id
+            )
+        except Exception as e:
+            report["error"] = str(e)
+            report["ids"] = chunk
+        reports.append(report)
+
+    chunk: List[str] = []
+    for message_id in message_ids:
+        if message_id in seen:
+            continue
+        seen.add(message_id)
+        chunk.append(message_id)
+        if len(chunk) == chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    return reports
 
 
 def trash_message(
@@ -614,7 +1220,11 @@ def trash_message(
     Returns:
         Updated message object
     """
-    return service.users().messages().trash(userId=user_id, id=message_id).execute()
+    message = (
+        service.users().messages().trash(userId=user_id, id=message_id).execute()
+    )
+    query_cache.invalidate(user_id)
+    return message
 
 
 def untrash_message(
@@ -631,7 +1241,11 @@ def untrash_message(
     Returns:
         Updated message object
     """
-    return service.users().messages().untrash(userId=user_id, id=message_id).execute()
+    message = (
+        service.users().messages().untrash(userId=user_id, id=message_id).execute()
+    )
+    query_cache.invalidate(user_id)
+    return message
 
 
 def get_message_history(
@@ -639,6 +1253,7 @@ def get_message_history(
     history_id: str,
     user_id: str = DEFAULT_USER_ID,
     max_results: int = 100,
+    page_token: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Get history of changes to the mailbox.
@@ -648,13 +1263,165 @@ def get_message_history(
         history_id: Starting history ID
         user_id: Gmail user ID (default: 'me')
         max_results: Maximum number of history records to return
+        page_token: Token of the history page to fetch (optional)
 
     Returns:
         History object
     """
-    return (
-        service.users()
-        .history()
-        .list(userId=user_id, startHistoryId=history_id, maxResults=max_results)
-        .execute()
+    params: Dict[str, Any] = {
+        "userId": user_id,
+        "startHistoryId": history_id,
+        "maxResults": max_results,
+    }
+    if page_token:
+        params["pageToken"] = page_token
+    return service.users().history().list(**params).execute()
+
+
+def get_profile(service: GmailService, user_id: str = DEFAULT_USER_ID) -> Dict[str, Any]:
+    """
+    Get the mailbox profile (address, message counts and current history ID).
+
+    Args:
+        service: Gmail API service instance
+        user_id: Gmail user ID (default: 'me')
+
+    Returns:
+        Profile object
+    """
+    return service.users().getProfile(userId=user_id).execute()
+
+
+def list_threads(
+    service: GmailService,
+    user_id: str = DEFAULT_USER_ID,
+    max_results: int = 100,
+    query: Optional[str] = None,
+    page_token: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    List one page of threads in the user's mailbox.
+
+    Args:
+        service: Gmail API service instance
+        user_id: Gmail user ID (default: 'me')
+        max_results: Maximum number of threads in the page (default: 100)
+        query: Search query (default: None)
+        page_token: Token of the page to fetch (optional)
+
+    Returns:
+        Response containing 'threads' and, if more exist, 'nextPageToken'
+    """
+    params: Dict[str, Any] = {
+        "userId": user_id,
+        "maxResults": max_results,
+        "q": query or "",
+    }
+    if page_token:
+        params["pageToken"] = page_token
+    return service.users().threads().list(**params).execute()
+
+
+def get_threads_batch(
+    service: GmailService,
+    thread_ids: List[str],
+    user_id: str = DEFAULT_USER_ID,
+    batch_size: int = GMAIL_BATCH_LIMIT,
+    thread_format: str = "full",
+    metadata_headers: Optional[List[str]] = None,
+    fields: Optional[str] = None,
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """
+    Get several threads through the Gmail batch endpoint.
+
+    Args:
+        service: Gmail API service instance
+        thread_ids: Gmail thread IDs to fetch
+        user_id: Gmail user ID (default: 'me')
+        batch_size: Maximum number of threads per batch request (default: 100)
+        thread_format: 'full', 'metadata' or 'minimal' (default: 'full')
+        metadata_headers: Headers to include when thread_format is 'metadata' (optional)
+        fields: Partial response field mask (optional)
+
+    Returns:
+        Tuple of (thread objects by ID, error messages by ID)
+    """
+    threads_api = service.users().threads()
+    params: Dict[str, Any] = {"userId": user_id, "format": thread_format}
+    if metadata_headers:
+        params["metadataHeaders"] = metadata_headers
+    if fields:
+        params["fields"] = fields
+
+    requests = (
+        (thread_id, threads_api.get(id=thread_id, **params))
+        for thread_id in thread_ids
     )
+    return execute_batch(service, requests, batch_size)
+
+
+def get_threads_with_bodies(
+    service: GmailService,
+    thread_ids: List[str],
+    user_id: str = DEFAULT_USER_ID,
+    max_bytes: int = DEFAULT_BODY_MAX_BYTES,
+    cache: Optional[BodyCache] = None,
+) -> Tuple[Dict[str, List[Tuple[Dict[str, Any], str]]], Dict[str, str]]:
+    """
+    Get several threads with parsed message bodies, downloading only new bodies.
+
+    The threads are first fetched in one batch as header-only metadata, which
+    carries each message's historyId. Bodies already in the cache for that
+    revision are reused. All remaining messages, across every thread, are then
+    fetched in full through a second batch.
+
+    Args:
+        service: Gmail API service instance
+        thread_ids: Gmail thread IDs to fetch
+        user_id: Gmail user ID (default: 'me')
+        max_bytes: Decoded byte budget per body (default: 256 KiB)
+        cache: Body cache to use (default: the module-level cache)
+
+    Returns:
+        Tuple of ((message metadata, body) pairs by thread ID,
+        error messages by thread ID)
+    """
+    cache = cache if cache is not None else body_cache
+    index, errors = get_threads_batch(
+        service,
+        thread_ids,
+        user_id=user_id,
+        thread_format="metadata",
+        metadata_headers=THREAD_HEADERS,
+        fields=THREAD_INDEX_FIELDS,
+    )
+
+    bodies: Dict[str, str] = {}
+    missing: List[str] = []
+    for thread in index.values():
+        for message in thread.get("messages", []):
+            body = cache.get(message["id"], message.get("historyId"), max_bytes)
+            if body is None:
+                missing.append(message["id"])
+            else:
+                bodies[message["id"]] = body
+
+    message_errors: Dict[str, str] = {}
+    if missing:
+        full, message_errors = get_messages_batch(service, missing, user_id=user_id)
+        for message_id, message in full.items():
+            bodies[message_id] = cache.parse(message, max_bytes)
+
+    threads: Dict[str, List[Tuple[Dict[str, Any], str]]] = {}
+    for thread_id in thread_ids:
+        if thread_id not in index:
+            continue
+        entries = []
+        for message in index[thread_id].get("messages", []):
+            body = bodies.get(message["id"])
+            if body is None:
+                error = message_errors.get(message["id"], "Message not returned")
+                body = f"(Body unavailable: {error})"
+            entries.append((message, body))
+        threads[thread_id] = entries
+    return threads, errors
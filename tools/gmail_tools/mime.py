@@ -0,0 +1,216 @@
+"""
+Extraction of readable text from Gmail message payloads.
+"""
+
+import base64
+import binascii
+import codecs
+import re
+from email.message import Message
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+
+# Decoded bytes read from a message before extraction stops
+DEFAULT_BODY_MAX_BYTES = 256 * 1024
+
+TRUNCATION_NOTICE = "[Message truncated]"
+
+# Tags whose content is never shown to the reader
+_SKIPPED_TAGS = {"script", "style", "head", "title", "noscript", "template"}
+# Tags that start a new line in the rendered text
+_BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl",
+    "dt", "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li",
+    "main", "nav", "ol", "p", "pre", "section", "table", "td", "th", "tr",
+    "ul",
+}  # fmt: skip
+
+_INLINE_SPACE = re.compile(r"[ \t\r\f\v]+")
+_BLANK_LINES = re.compile(r"\n\s*\n\s*\n+")
+
+
+class _TextExtractor(HTMLParser):
+    """Collect the visible text of an HTML document."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.chunks: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag: str, attrs: Any) -> None:
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self.chunks.append("\n")
+
+    def handle_startendtag(self, tag: str, attrs: Any) -> None:
+        if tag in _BLOCK_TAGS:
+            self.chunks.append("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in _BLOCK_TAGS:
+            self.chunks.append("\n")
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip_depth:
+            self.chunks.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """
+    Convert an HTML document to plain text.
+
+    Scripts and styles are dropped, block elements become line breaks and
+    runs of whitespace are collapsed.
+
+    Args:
+        html: HTML source
+
+    Returns:
+        Readable plain text
+    """
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+
+    lines = (
+        _INLINE_SPACE.sub(" ", line).strip()
+        for line in "".join(parser.chunks).split("\n")
+    )
+    text = "\n".join(lines)
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def _part_charset(part: Dict[str, Any]) -> str:
+    """Return the declared charset of a part, falling back to UTF-8."""
+    for header in part.get("headers", []):
+        if header.get("name", "").lower() == "content-type":
+            message = Message()
+            message["Content-Type"] = header.get("value", "")
+            charset = message.get_content_charset()
+            if charset:
+                try:
+                    return codecs.lookup(charset).name
+                except LookupError:
+                    break
+    return "utf-8"
+
+
+def _decode_part(data: str, charset: str, budget: int) -> Tuple[str, int, bool]:
+    """
+    Decode at most ``budget`` bytes of a base64url part body.
+
+    Only the base64 prefix covering the budget is decoded, so oversized parts
+    cost no more than the budget itself.
+
+    Returns:
+        Tuple of (text, bytes consumed, whether the part was cut short)
+    """
+    # Every 4 base64 characters carry 3 bytes
+    needed = -(-budget // 3) * 4
+    truncated = len(data) > needed
+    if truncated:
+        data = data[:needed]
+    else:
+        data += "=" * (-len(data) % 4)
+
+    try:
+        raw = base64.urlsafe_b64decode(data)
+    except (binascii.Error, ValueError):
+        return "", 0, False
+
+    if len(raw) > budget:
+        raw = raw[:budget]
+        truncated = True
+
+    decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+    # A multi-byte sequence split by the budget is dropped rather than mangled
+    text = decoder.decode(raw, final=not truncated)
+    return text, len(raw), truncated
+
+
+def extract_body(
+    payload: Dict[str, Any], max_bytes: int = DEFAULT_BODY_MAX_BYTES
+) -> Tuple[str, bool]:
+    """
+    Extract the readable body of a Gmail message payload.
+
+    The part tree is walked iteratively in document order. text/plain parts
+    are preferred; HTML parts are converted to text only when the message has
+    no plain-text body. Attachments are skipped and every part is decoded
+    with its own charset. Decoding stops once ``max_bytes`` decoded bytes
+    have been read.
+
+    Args:
+        payload: The ``payload`` of a Gmail message resource
+        max_bytes: Decoded byte budget for the whole body (default: 256 KiB)
+
+    Returns:
+        Tuple of (body text, whether the budget cut the body short)
+    """
+    plain: List[Tuple[str, str]] = []
+    html: List[Tuple[str, str]] = []
+
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        children = part.get("parts")
+        if children:
+            # Reversed so parts are popped in document order
+            stack.extend(reversed(children))
+            continue
+
+        if part.get("filename"):
+            continue
+        data = part.get("body", {}).get("data")
+        if not data:
+            continue
+
+        mime_type = part.get("mimeType", "").lower()
+        if mime_type == "text/plain":
+            plain.append((data, _part_charset(part)))
+        elif mime_type == "text/html":
+            html.append((data, _part_charset(part)))
+
+    selected = plain or html
+    budget = max(0, max_bytes)
+    chunks: List[str] = []
+    truncated = False
+    for data, charset in selected:
+        if budget <= 0:
+            truncated = True
+            break
+        text, consumed, cut = _decode_part(data, charset, budget)
+        chunks.append(text)
+        budget -= consumed
+        if cut:
+            truncated = True
+            break
+
+    body = "".join(chunks)
+    if not plain and html:
+        body = html_to_text(body)
+    return body, truncated
+
+
+def extract_body_text(
+    payload: Optional[Dict[str, Any]], max_bytes: int = DEFAULT_BODY_MAX_BYTES
+) -> str:
+    """
+    Extract the readable body of a payload, marking truncated bodies.
+
+    Args:
+        payload: The ``payload`` of a Gmail message resource
+        max_bytes: Decoded byte budget for the whole body (default: 256 KiB)
+
+    Returns:
+        Body text, ending with a notice when the budget was reached
+    """
+    if not payload:
+        return ""
+    body, truncated = extract_body(payload, max_bytes)
+    if truncated:
+        body = f"{body.rstrip()}\n\n{TRUNCATION_NOTICE}"
+    return body
@@ -0,0 +1,803 @@
+"""
+Local SQLite mirror of the Gmail mailbox, kept current via history.list.
+
+A full sync pulls the most recent threads; afterwards only the changes recorded
+since the stored history ID are applied. When Gmail no longer has that history
+(HTTP 404) the mirror falls back to a full resync.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError  # type: ignore
+
+from tools.gmail_tools.gmail import (
+    DEFAULT_USER_ID,
+    GmailService,
+    get_headers_dict,
+    get_message_history,
+    get_messages_batch,
+    get_profile,
+    get_threads_batch,
+    list_threads,
+    parse_message_body,
+)
+
+MIRROR_DB_NAME = "gmail_mirror.sqlite3"
+
+# Extra rounds for the items of a batch fetch that failed (429, 5xx, ...)
+FETCH_RETRIES = 2
+# Seconds before the first retry round; doubled for each further round
+FETCH_RETRY_DELAY = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    thread_id TEXT NOT NULL,
+    internal_date INTEGER NOT NULL DEFAULT 0,
+    label_ids TEXT NOT NULL DEFAULT ',',
+    sender TEXT NOT NULL DEFAULT '',
+    recipients TEXT NOT NULL DEFAULT '',
+    subject TEXT NOT NULL DEFAULT '',
+    has_attachment INTEGER NOT NULL DEFAULT 0,
+    message_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_thread ON messages (thread_id);
+CREATE INDEX IF NOT EXISTS messages_date ON messages (internal_date);
+
+CREATE TABLE IF NOT EXISTS threads (
+    id TEXT PRIMARY KEY,
+    complete INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    message_id UNINDEXED,
+    sender,
+    recipients,
+    subject,
+    body,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# BM25 column weights: message_id, sender, recipients, subject, body
+FTS_WEIGHTS = (0.0, 4.0, 2.0, 8.0, 1.0)
+
+# Query prefixes mapped to full-text columns
+FTS_FIELDS = {
+    "from": "sender",
+    "to": "recipients",
+    "subject": "subject",
+    "body": "body",
+}
+FTS_OPERATORS = ("AND", "OR", "NOT")
+FTS_TOKEN = re.compile(r'(?:(\w+):)?(?:"([^"]*)"|(\S+))')
+
+# Labels excluded from searches unless explicitly requested, as in Gmail
+HIDDEN_LABELS = ("TRASH", "SPAM")
+
+
+def _label_field(label_ids: Iterable[str]) -> str:
+    """Encode label IDs so a single LIKE '%,ID,%' matches one label."""
+    return "," + "".join(f"{label_id}," for label_id in label_ids)
+
+
+def _has_attachment(payload: Dict[str, Any]) -> bool:
+    """Check whether any MIME part of a payload is an attachment."""
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        if part.get("filename") and part.get("body", {}).get("attachmentId"):
+            return True
+        stack.extend(part.get("parts", []))
+    return False
+
+
+def build_fts_query(query: str) -> str:
+    """
+    Translate a mail search string into an FTS5 MATCH expression.
+
+    Supports bare terms, "quoted phrases", prefix terms ending in '*', the
+    AND/OR/NOT operators and the field scopes from:, to:, subject: and body:.
+
+    Args:
+        query: Search string, e.g. 'from:alice subject:"q3 report" budg*'
+
+    Returns:
+        FTS5 query expression
+    """
+    parts: List[str] = []
+    for match in FTS_TOKEN.finditer(query):
+        field, phrase, word = match.groups()
+        if field and field.lower() not in FTS_FIELDS:
+            # Unknown prefix such as 'http:', search it as plain text
+            word = f"{field}:{word if word is not None else phrase}"
+            field, phrase = None, None
+
+        if phrase is None and word in FTS_OPERATORS and not field:
+            parts.append(word)
+            continue
+
+        text = phrase if phrase is not None else word
+        prefix = phrase is None and text.endswith("*")
+        text = text.rstrip("*") if prefix else text
+        if not text:
+            continue
+
+        term = '"' + text.replace('"', '""') + '"' + (" *" if prefix else "")
+        if field:
+            term = f"{FTS_FIELDS[field.lower()]} : {term}"
+        parts.append(term)
+
+    return " ".join(parts)
+
+
+def _date_to_millis(date_str: str) -> int:
+    """Convert a YYYY/MM/DD date to epoch milliseconds at local midnight."""
+    return int(datetime.strptime(date_str, "%Y/%m/%d").timestamp() * 1000)
+
+
+class MailStore:
+    """
+    SQLite-backed store of full Gmail message objects.
+
+    The connection is shared between threads and serialized with a lock.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        # Held for the duration of a sync so syncs never interleave
+        self.sync_lock = threading.Lock()
+
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+        # Full-text search needs SQLite built with FTS5
+        try:
+            with self._lock, self._conn:
+                self._conn.executescript(FTS_SCHEMA)
+            self.fts_enabled = True
+        except sqlite3.OperationalError:
+            self.fts_enabled = False
+
+        if self.fts_enabled:
+            self._backfill_index()
+
+    # Full-text index
+
+    def _write_index(self, messages: List[Dict[str, Any]]) -> None:
+        """Replace the index entries of stored messages; caller holds the lock."""
+        rows = []
+        for message in messages:
+            row = self._conn.execute(
+                "SELECT rowid FROM messages WHERE id = ?", (message["id"],)
+            ).fetchone()
+            if row is None:
+                continue
+
+            headers = get_headers_dict(message)
+            recipients = " ".join(
+                value for value in (headers.get("To"), headers.get("Cc")) if value
+            )
+            try:
+                body = parse_message_body(message)
+            except Exception:
+                body = message.get("snippet", "")
+            rows.append(
+                (
+                    row[0],
+                    message["id"],
+                    headers.get("From", ""),
+                    recipients,
+                    headers.get("Subject", ""),
+                    body,
+                )
+            )
+
+        # Index rows share the rowid of their message, so updates are lookups
+        self._conn.executemany(
+            "DELETE FROM messages_fts WHERE rowid = ?", [(row[0],) for row in rows]
+        )
+        self._conn.executemany(
+            """
+            INSERT INTO messages_fts (
+                rowid, message_id, sender, recipients, subject, body
+            ) VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+
+    def _backfill_index(self) -> None:
+        """Index stored messages that predate the full-text table."""
+        with self._lock:
+            indexed = self._conn.execute(
+                "SELECT COUNT(*) FROM messages_fts"
+            ).fetchone()[0]
+            if indexed == self.count():
+                return
+            rows = self._conn.execute("SELECT message_json FROM messages").fetchall()
+            with self._conn:
+                self._conn.execute("DELETE FROM messages_fts")
+                self._write_index([json.loads(row["message_json"]) for row in rows])
+
+    def full_text_search(
+        self, query: str, max_results: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Run a ranked full-text search over mirrored messages.
+
+        Args:
+            query: Search string understood by build_fts_query
+            max_results: Maximum number of messages to return (default: 10)
+
+        Returns:
+            Matches ('id', 'threadId', 'snippet'), best BM25 score first
+
+        Raises:
+            RuntimeError: If SQLite was built without FTS5
+            sqlite3.OperationalError: If the query is not valid FTS5 syntax
+        """
+        if not self.fts_enabled:
+            raise RuntimeError("Full-text search requires SQLite with FTS5")
+
+        match = build_fts_query(query)
+        if not match:
+            return []
+
+        weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT m.id, m.thread_id,
+                       snippet(messages_fts, 4, '[', ']', '...', 12) AS excerpt
+                FROM messages_fts AS f
+                JOIN messages AS m ON m.rowid = f.rowid
+                WHERE messages_fts MATCH ?
+                ORDER BY bm25(messages_fts, {weights})
+                LIMIT ?
+                """,
+                (match, max_results),
+            ).fetchall()
+        return [
+            {"id": row["id"], "threadId": row["thread_id"], "snippet": row["excerpt"]}
+            for row in rows
+        ]
+
+    # State
+
+    def get_state(self, key: str) -> Optional[str]:
+        """Get a stored state value such as the last history ID."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM state WHERE key = ?", (key,)
+            ).fetchone()
+        return row["value"] if row else None
+
+    def set_state(self, key: str, value: str) -> None:
+        """Store a state value."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                (key, value),
+            )
+
+    # Writes
+
+    def upsert_messages(self, messages: Iterable[Dict[str, Any]]) -> int:
+        """
+        Insert or update full-format message objects.
+
+        Args:
+            messages: Gmail message objects fetched with format 'full'
+
+        Returns:
+            Number of messages written
+        """
+        messages = list(messages)
+        rows = []
+        for message in messages:
+            headers = get_headers_dict(message)
+            recipients = " ".join(
+                value for value in (headers.get("To"), headers.get("Cc")) if value
+            )
+            rows.append(
+                (
+                    message["id"],
+                    message.get("threadId", message["id"]),
+                    int(message.get("internalDate", 0)),
+                    _label_field(message.get("labelIds", [])),
+                    headers.get("From", ""),
+                    recipients,
+                    headers.get("Subject", ""),
+                    int(_has_attachment(message.get("payload", {}))),
+                    json.dumps(message),
+                )
+            )
+
+        with self._lock, self._conn:
+            # Update in place so the rowid shared with the index stays stable
+            self._conn.executemany(
+                """
+                INSERT INTO messages (
+                    id, thread_id, internal_date, label_ids, sender,
+                    recipients, subject, has_attachment, message_json
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    thread_id = excluded.thread_id,
+                    internal_date = excluded.internal_date,
+                    label_ids = excluded.label_ids,
+                    sender = excluded.sender,
+                    recipients = excluded.recipients,
+                    subject = excluded.subject,
+                    has_attachment = excluded.has_attachment,
+                    message_json = excluded.message_json
+                """,
+                rows,
+            )
+            if self.fts_enabled:
+                self._write_index(messages)
+        return len(rows)
+
+    def set_labels(self, message_id: str, label_ids: List[str]) -> None:
+        """Replace the labels of a stored message."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT message_json FROM messages WHERE id = ?", (message_id,)
+            ).fetchone()
+            if row is None:
+                return
+            message = json.loads(row["message_json"])
+            message["labelIds"] = label_ids
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE messages SET label_ids = ?, message_json = ? WHERE id = ?",
+                    (_label_field(label_ids), json.dumps(message), message_id),
+                )
+
+    def delete_messages(self, message_ids: Iterable[str]) -> int:
+        """Delete messages from the mirror and return how many were removed."""
+        ids = [(message_id,) for message_id in message_ids]
+        with self._lock, self._conn:
+            if self.fts_enabled:
+                self._conn.executemany(
+                    """
+                    DELETE FROM messages_fts
+                    WHERE rowid = (SELECT rowid FROM messages WHERE id = ?)
+                    """,
+                    ids,
+                )
+            before = self._conn.total_changes
+            self._conn.executemany("DELETE FROM messages WHERE id = ?", ids)
+            return self._conn.total_changes - before
+
+    def mark_thread(self, thread_id: str, complete: bool) -> None:
+        """Record whether every message of a thread is present locally."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO threads (id, complete) VALUES (?, ?)",
+                (thread_id, int(complete)),
+            )
+
+    def clear(self) -> None:
+        """Remove all messages, threads and sync state."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages")
+            self._conn.execute("DELETE FROM threads")
+            if self.fts_enabled:
+                self._conn.execute("DELETE FROM messages_fts")
+            self._conn.execute("DELETE FROM state")
+
+    # Reads
+
+    def has_thread(self, thread_id: str) -> bool:
+        """Check whether a thread is known to the mirror."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM threads WHERE id = ?", (thread_id,)
+            ).fetchone()
+        return row is not None
+
+    def is_thread_complete(self, thread_id: str) -> bool:
+        """Check whether every message of a thread is present locally."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT complete FROM threads WHERE id = ?", (thread_id,)
+            ).fetchone()
+        return bool(row and row["complete"])
+
+    def get_message(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """Get a stored message object by ID."""
+        return self.get_messages([message_id]).get(message_id)
+
+    def get_messages(self, message_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get stored message objects by ID; missing IDs are left out."""
+        if not message_ids:
+            return {}
+        placeholders = ",".join("?" for _ in message_ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, message_json FROM messages WHERE id IN ({placeholders})",
+                list(message_ids),
+            ).fetchall()
+        return {row["id"]: json.loads(row["message_json"]) for row in rows}
+
+    def get_thread_messages(self, thread_id: str) -> List[Dict[str, Any]]:
+        """Get the stored messages of a thread, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT message_json FROM messages
+                WHERE thread_id = ? ORDER BY internal_date, id
+                """,
+                (thread_id,),
+            ).fetchall()
+        return [json.loads(row["message_json"]) for row in rows]
+
+    def covers(self, after: Optional[str] = None) -> bool:
+        """
+        Check whether the mirror holds every message from a date onwards.
+
+        Args:
+            after: Date in YYYY/MM/DD format, or None for the whole mailbox
+
+        Returns:
+            True if a search limited to messages after the date is complete
+        """
+        covered_since = self.get_state("covered_since")
+        if covered_since is None:
+            return False
+        if int(covered_since) == 0:
+            return True
+        return after is not None and _date_to_millis(after) >= int(covered_since)
+
+    def count(self) -> int:
+        """Number of messages in the mirror."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def search(
+        self,
+        max_results: int = 10,
+        is_unread: Optional[bool] = None,
+        label_ids: Optional[List[str]] = None,
+        from_email: Optional[str] = None,
+        to_email: Optional[str] = None,
+        subject: Optional[str] = None,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        has_attachment: Optional[bool] = None,
+        is_starred: Optional[bool] = None,
+        is_important: Optional[bool] = None,
+        in_trash: Optional[bool] = None,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Search the mirror with the same criteria as search_messages.
+
+        Args:
+            max_results: Maximum number of messages to return (default: 10)
+            is_unread: If True, only return unread messages (optional)
+            label_ids: Label IDs the messages must carry (optional)
+            from_email: Sender text to match (optional)
+            to_email: Recipient text to match (optional)
+            subject: Subject text to match (optional)
+            after: Only return messages after this date (format: YYYY/MM/DD) (optional)
+            before: Only return messages before this date (format: YYYY/MM/DD) (optional)
+            has_attachment: If True, only return messages with attachments (optional)
+            is_starred: If True, only return starred messages (optional)
+            is_important: If True, only return important messages (optional)
+            in_trash: If True, only search in trash (optional)
+            offset: Number of matches to skip (default: 0)
+
+        Returns:
+            Message references ('id' and 'threadId'), newest first
+        """
+        required = list(label_ids or [])
+        if is_unread:
+            required.append("UNREAD")
+        if is_starred:
+            required.append("STARRED")
+        if is_important:
+            required.append("IMPORTANT")
+        if in_trash:
+            required.append("TRASH")
+
+        clauses: List[str] = []
+        params: List[Any] = []
+        for label_id in required:
+            clauses.append("label_ids LIKE ?")
+            params.append(f"%,{label_id},%")
+        for label_id in HIDDEN_LABELS:
+            if label_id not in required:
+                clauses.append("label_ids NOT LIKE ?")
+                params.append(f"%,{label_id},%")
+
+        for column, value in (
+            ("sender", from_email),
+            ("recipients", to_email),
+            ("subject", subject),
+        ):
+            if value:
+                clauses.append(f"{column} LIKE ?")
+                params.append(f"%{value}%")
+
+        if after:
+            clauses.append("internal_date >= ?")
+            params.append(_date_to_millis(after))
+        if before:
+            clauses.append("internal_date < ?")
+            params.append(_date_to_millis(before))
+        if has_attachment:
+            clauses.append("has_attachment = 1")
+
+        where = " AND ".join(clauses) if clauses else "1"
+        params.extend((max_results, offset))
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT id, thread_id FROM messages WHERE {where}
+                ORDER BY internal_date DESC, id LIMIT ? OFFSET ?
+                """,
+                params,
+            ).fetchall()
+        return [{"id": row["id"], "threadId": row["thread_id"]} for row in rows]
+
+
+def _fetch_with_retries(
+    fetch: Callable[[List[str]], Tuple[Dict[str, Any], Dict[str, str]]],
+    ids: List[str],
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Run a batch fetch, fetching the items that failed again with backoff.
+
+    Args:
+        fetch: Batch fetch returning (results by ID, errors by ID)
+        ids: IDs to fetch
+
+    Returns:
+        Tuple of (results by ID, errors by ID of the items that never succeeded)
+    """
+    results, errors = fetch(ids)
+    for attempt in range(FETCH_RETRIES):
+        if not errors:
+            break
+        time.sleep(FETCH_RETRY_DELAY * 2**attempt)
+        retried, errors = fetch(list(errors))
+        results.update(retried)
+    return results, errors
+
+
+def full_sync(
+    service: GmailService,
+    store: MailStore,
+    user_id: str = DEFAULT_USER_ID,
+    max_threads: int = 500,
+) -> Dict[str, Any]:
+    """
+    Replace the mirror with the most recent threads of the mailbox.
+
+    Args:
+        service: Gmail API service instance
+        store: Mirror to populate
+        user_id: Gmail user ID (default: 'me')
+        max_threads: Maximum number of threads to pull (default: 500)
+
+    Returns:
+        Sync statistics
+
+    Raises:
+        RuntimeError: If some threads could not be fetched; the mirror is left
+            unchanged so the next sync starts over
+    """
+    # Read the history ID first so changes made during the sync are replayed
+    history_id = str(get_profile(service, user_id)["historyId"])
+
+    thread_ids: List[str] = []
+    page_token = None
+    while len(thread_ids) < max_threads:
+        response = list_threads(
+            service,
+            user_id,
+            max_results=min(500, max_threads - len(thread_ids)),
+            page_token=page_token,
+        )
+        thread_ids.extend(thread["id"] for thread in response.get("threads", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            break
+
+    threads, errors = _fetch_with_retries(
+        lambda ids: get_threads_batch(service, ids, user_id), thread_ids
+    )
+    if errors:
+        thread_id, error = next(iter(errors.items()))
+        raise RuntimeError(
+            f"Could not fetch {len(errors)} threads (e.g. {thread_id}: {error})"
+        )
+
+    # Threads are listed by their latest message, so every message newer than
+    # the oldest latest message of a pulled thread is mirrored
+    latest_dates = [
+        max(int(message.get("internalDate", 0)) for message in thread["messages"])
+        for thread in threads.values()
+        if thread.get("messages")
+    ]
+    covered_since = min(latest_dates, default=0) if page_token else 0
+
+    store.clear()
+    added = 0
+    for thread_id, thread in threads.items():
+        added += store.upsert_messages(thread.get("messages", []))
+        store.mark_thread(thread_id, complete=True)
+    store.set_state("covered_since", str(covered_since))
+    store.set_state("history_id", history_id)
+
+    return {"mode": "full", "added": added, "deleted": 0, "updated": 0}
+
+
+def incremental_sync(
+    service: GmailService,
+    store: MailStore,
+    history_id: str,
+    user_id: str = DEFAULT_USER_ID,
+) -> Dict[str, Any]:
+    """
+    Apply the mailbox changes recorded since a history ID.
+
+    Args:
+        service: Gmail API service instance
+        store: Mirror to update
+        history_id: History ID the mirror is current to
+        user_id: Gmail user ID (default: 'me')
+
+    Returns:
+        Sync statistics; 'failed' counts added messages that could not be
+        fetched, in which case the history ID is not advanced and the same
+        changes are replayed by the next sync
+
+    Raises:
+        HttpError: With status 404 if the history ID has expired
+    """
+    added_ids: Dict[str, None] = {}
+    deleted_ids: Dict[str, None] = {}
+    label_updates: Dict[str, List[str]] = {}
+    latest_history_id = history_id
+
+    page_token = None
+    while True:
+        response = get_message_history(
+            service, history_id, user_id, max_results=500, page_token=page_token
+        )
+        for record in response.get("history", []):
+            for item in record.get("messagesAdded", []):
+                message_id = item["message"]["id"]
+                added_ids[message_id] = None
+                deleted_ids.pop(message_id, None)
+            for item in record.get("messagesDeleted", []):
+                message_id = item["message"]["id"]
+                deleted_ids[message_id] = None
+                added_ids.pop(message_id, None)
+                label_updates.pop(message_id, None)
+            for key in ("labelsAdded", "labelsRemoved"):
+                for item in record.get(key, []):
+                    message = item["message"]
+                    label_updates[message["id"]] = message.get("labelIds", [])
+
+        latest_history_id = str(response.get("historyId", latest_history_id))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            break
+
+    fetched, errors = _fetch_with_retries(
+        lambda ids: get_messages_batch(service, ids, user_id), list(added_ids)
+    )
+    for message in fetched.values():
+        thread_id = message.get("threadId", message["id"])
+        if not store.has_thread(thread_id):
+            # Gmail thread IDs equal the ID of the thread's first message
+            store.mark_thread(thread_id, complete=thread_id == message["id"])
+    added = store.upsert_messages(fetched.values())
+
+    updated = 0
+    for message_id, label_ids in label_updates.items():
+        if message_id not in fetched:
+            store.set_labels(message_id, label_ids)
+            updated += 1
+
+    deleted = store.delete_messages(deleted_ids)
+    if not errors:
+        store.set_state("history_id", latest_history_id)
+
+    return {
+        "mode": "incremental",
+        "added": added,
+        "deleted": deleted,
+        "updated": updated,
+        "failed": len(errors),
+    }
+
+
+def sync_mailbox(
+    service: GmailService,
+    store: MailStore,
+    user_id: str = DEFAULT_USER_ID,
+    max_threads: int = 500,
+    min_interval: float = 0,
+) -> Dict[str, Any]:
+    """
+    Bring the mirror up to date, choosing a full or incremental sync.
+
+    Args:
+        service: Gmail API service instance
+        store: Mirror to update
+        user_id: Gmail user ID (default: 'me')
+        max_threads: Maximum number of threads pulled by a full sync (default: 500)
+        min_interval: Skip the sync if the last one finished less than this
+            many seconds ago (default: 0)
+
+    Returns:
+        Sync statistics including the mode used ('full', 'incremental' or 'skipped')
+    """
+    with store.sync_lock:
+        last_sync = store.get_state("last_sync")
+        if min_interval and last_sync and time.time() - float(last_sync) < min_interval:
+            return {"mode": "skipped", "added": 0, "deleted": 0, "updated": 0}
+
+        history_id = store.get_state("history_id")
+        if history_id is None:
+            stats = full_sync(service, store, user_id, max_threads)
+        else:
+            try:
+                stats = incremental_sync(service, store, history_id, user_id)
+            except HttpError as e:
+                if e.resp.status != 404:
+                    raise
+                # The stored history ID is too old; start over
+                stats = full_sync(service, store, user_id, max_threads)
+
+        store.set_state("last_sync", str(time.time()))
+        stats["history_id"] = store.get_state("history_id")
+        return stats
+
+
+_stores: Dict[str, MailStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_mail_store(cache_dir: str) -> MailStore:
+    """
+    Get the shared mirror stored under a cache directory.
+
+    Args:
+        cache_dir: Directory holding the mirror database
+
+    Returns:
+        Mail store instance
+    """
+    db_path = os.path.join(cache_dir, MIRROR_DB_NAME)
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = MailStore(db_path)
+            _stores[db_path] = store
+        return store
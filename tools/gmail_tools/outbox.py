@@ -0,0 +1,475 @@
+"""
+Persistent outbound mail queue drained by a pool of background workers.
+
+Queued messages are stored in SQLite before the tool call returns, so they
+survive restarts. Workers send them with exponential backoff on rate limits
+and server errors. Every queued message carries a Message-ID derived from its
+queue ID; before a retry the worker looks that ID up in the sent folder (or
+among the drafts), so a send or draft whose response was lost is never
+delivered twice.
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from email.utils import make_msgid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError  # type: ignore
+
+from tools.gmail_tools.gmail import DEFAULT_USER_ID, GmailService, query_cache
+
+OUTBOX_DB_NAME = "gmail_outbox.sqlite3"
+
+# Kinds of queued work
+KIND_SEND = "send"
+KIND_DRAFT = "draft"
+
+# Delivery states
+STATUS_QUEUED = "queued"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+# HTTP statuses worth retrying
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# OSErrors about local files rather than the network, never worth retrying
+LOCAL_FILE_ERRORS = (
+    FileNotFoundError,
+    PermissionError,
+    IsADirectoryError,
+    NotADirectoryError,
+)
+# Backoff before retry n is BACKOFF_BASE * 2**n seconds, capped and jittered
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 300.0
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_ATTEMPTS = 6
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    idempotency_key TEXT UNIQUE,
+    kind TEXT NOT NULL,
+    message_id_header TEXT NOT NULL,
+    raw TEXT NOT NULL,
+    summary_json TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    result_id TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (status, next_attempt_at);
+"""
+
+
+def new_message_id() -> Tuple[str, str]:
+    """
+    Create a queue ID and the Message-ID header that identifies it in Gmail.
+
+    Returns:
+        Tuple of (queue ID, Message-ID header value)
+    """
+    queue_id = uuid.uuid4().hex
+    return queue_id, make_msgid(idstring=f"mist.{queue_id}")
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Check whether a failed send may succeed when retried.
+
+    Args:
+        error: Exception raised by the API call
+
+    Returns:
+        True for rate limits, server errors and network failures
+    """
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUSES
+    if isinstance(error, LOCAL_FILE_ERRORS):
+        # e.g. missing credentials; retrying cannot help
+        return False
+    return isinstance(error, (OSError, TimeoutError))
+
+
+def backoff_delay(attempts: int) -> float:
+    """
+    Seconds to wait before the next attempt, with full jitter.
+
+    Args:
+        attempts: Number of attempts made so far
+
+    Returns:
+        Delay in seconds
+    """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempts))
+
+
+class Outbox:
+    """
+    SQLite-backed queue of outgoing messages and drafts.
+
+    Workers each build their own service through ``service_factory``, since
+    one httplib2 connection must not be shared between threads.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        service_factory: Callable[[], GmailService],
+        user_id: str = DEFAULT_USER_ID,
+        workers: int = DEFAULT_WORKERS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ) -> None:
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.db_path = db_path
+        self.service_factory = service_factory
+        self.user_id = user_id
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+            # A send interrupted by a restart is retried; the Message-ID
+            # lookup keeps it from being delivered twice
+            self._conn.execute(
+                """
+                UPDATE outbox SET status = ?, attempts = MAX(attempts, 1)
+                WHERE status = ?
+                """,
+                (STATUS_QUEUED, STATUS_SENDING),
+            )
+
+    # Queue
+
+    def enqueue(
+        self,
+        kind: str,
+        raw: str,
+        message_id_header: str,
+        summary: Dict[str, Any],
+        queue_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Queue a message and wake a worker.
+
+        Args:
+            kind: 'send' to send the message, 'draft' to save it as a draft
+            raw: base64url encoded RFC 2822 message
+            message_id_header: Message-ID header set in the raw message
+            summary: Display fields such as to and subject
+            queue_id: Queue ID matching the Message-ID (optional)
+            idempotency_key: Key that makes repeat submissions return the
+                existing entry instead of queueing again (optional)
+
+        Returns:
+            The queue entry, which may be an earlier one with the same key
+        """
+        now = time.time()
+        queue_id = queue_id or uuid.uuid4().hex
+        with self._lock:
+            if idempotency_key:
+                row = self._conn.execute(
+                    "SELECT * FROM outbox WHERE idempotency_key = ?",
+                    (idempotency_key,),
+                ).fetchone()
+                if row is not None:
+                    return self._entry(row)
+
+            with self._conn:
+                self._conn.execute(
+                    """
+                    INSERT INTO outbox (
+                        id, idempotency_key, kind, message_id_header, raw,
+                        summary_json, status, created_at, updated_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        queue_id,
+                        idempotency_key or None,
+                        kind,
+                        message_id_header,
+                        raw,
+                        json.dumps(summary),
+                        STATUS_QUEUED,
+                        now,
+                        now,
+                    ),
+                )
+            row = self._conn.execute(
+                "SELECT * FROM outbox WHERE id = ?", (queue_id,)
+            ).fetchone()
+            self._wakeup.notify()
+
+        self.start()
+        return self._entry(row)
+
+    def get(self, queue_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get one queue entry.
+
+        Args:
+            queue_id: Queue ID returned by enqueue
+
+        Returns:
+            The entry, or None if the ID is unknown
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM outbox WHERE id = ?", (queue_id,)
+            ).fetchone()
+        return self._entry(row) if row is not None else None
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Get the most recently queued entries.
+
+        Args:
+            limit: Maximum number of entries (default: 20)
+
+        Returns:
+            Entries, newest first
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM outbox ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Count entries per delivery state.
+
+        Returns:
+            Number of entries by status
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS n FROM outbox GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    @staticmethod
+    def _entry(row: sqlite3.Row) -> Dict[str, Any]:
+        entry = dict(row)
+        entry.pop("raw", None)
+        entry["summary"] = json.loads(entry.pop("summary_json"))
+        return entry
+
+    # Workers
+
+    def start(self) -> None:
+        """Start the worker pool if it is not running yet."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._run, name=f"gmail-outbox-{i}", daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the worker pool after in-flight sends finish.
+
+        Args:
+            timeout: Seconds to wait for each worker (optional)
+        """
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """Wait for a due entry and mark it as sending."""
+        with self._lock:
+            while not self._stopping:
+                now = time.time()
+                row = self._conn.execute(
+                    """
+                    SELECT * FROM outbox
+                    WHERE status = ? AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at, created_at LIMIT 1
+                    """,
+                    (STATUS_QUEUED, now),
+                ).fetchone()
+                if row is not None:
+                    with self._conn:
+                        self._conn.execute(
+                            "UPDATE outbox SET status = ?, updated_at = ? WHERE id = ?",
+                            (STATUS_SENDING, now, row["id"]),
+                        )
+                    return row
+
+                upcoming = self._conn.execute(
+                    "SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?",
+                    (STATUS_QUEUED,),
+                ).fetchone()[0]
+                timeout = None if upcoming is None else max(upcoming - now, 0.05)
+                self._wakeup.wait(timeout)
+        return None
+
+    def _finish(self, queue_id: str, **fields: Any) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE outbox SET {assignments} WHERE id = ?",
+                (*fields.values(), queue_id),
+            )
+
+    def _run(self) -> None:
+        service = None
+        while True:
+            row = self._claim()
+            if row is None:
+                return
+            try:
+                if service is None:
+                    service = self.service_factory()
+                self._deliver(service, row)
+            except Exception as e:
+                attempts = row["attempts"] + 1
+                if is_retryable(e) and attempts < self.max_attempts:
+                    self._finish(
+                        row["id"],
+                        status=STATUS_QUEUED,
+                        attempts=attempts,
+                        next_attempt_at=time.time() + backoff_delay(attempts),
+                        error=str(e),
+                    )
+                    with self._lock:
+                        self._wakeup.notify()
+                else:
+                    self._finish(
+                        row["id"], status=STATUS_FAILED, attempts=attempts, error=str(e)
+                    )
+
+    def _deliver(self, service: GmailService, row: sqlite3.Row) -> None:
+        """Send or save one entry, skipping entries that already reached Gmail."""
+        if row["attempts"]:
+            existing = self._find_existing(
+                service, row["kind"], row["message_id_header"]
+            )
+            if existing:
+                self._finish(
+                    row["id"],
+                    status=STATUS_SENT,
+                    attempts=row["attempts"] + 1,
+                    result_id=existing,
+                    error=None,
+                )
+                return
+
+        if row["kind"] == KIND_DRAFT:
+            result = (
+                service.users()
+                .drafts()
+                .create(userId=self.user_id, body={"message": {"raw": row["raw"]}})
+                .execute()
+            )
+        else:
+            result = (
+                service.users()
+                .messages()
+                .send(userId=self.user_id, body={"raw": row["raw"]})
+                .execute()
+            )
+
+        query_cache.invalidate(self.user_id)
+        self._finish(
+            row["id"],
+            status=STATUS_SENT,
+            attempts=row["attempts"] + 1,
+            result_id=result.get("id"),
+            error=None,
+        )
+
+    def _find_existing(
+        self, service: GmailService, kind: str, message_id_header: str
+    ) -> Optional[str]:
+        """Look up a sent message or saved draft by its Message-ID header."""
+        message_id = message_id_header.strip("<>")
+        if kind == KIND_DRAFT:
+            response = (
+                service.users()
+                .drafts()
+                .list(userId=self.user_id, q=f"rfc822msgid:{message_id}", maxResults=1)
+                .execute()
+            )
+            drafts = response.get("drafts", [])
+            return drafts[0]["id"] if drafts else None
+
+        response = (
+            service.users()
+            .messages()
+            .list(
+                userId=self.user_id,
+                q=f"in:sent rfc822msgid:{message_id}",
+                maxResults=1,
+            )
+            .execute()
+        )
+        messages = response.get("messages", [])
+        return messages[0]["id"] if messages else None
+
+
+_outboxes: Dict[str, Outbox] = {}
+_outboxes_lock = threading.Lock()
+
+
+def get_outbox(
+    cache_dir: str,
+    service_factory: Callable[[], GmailService],
+    user_id: str = DEFAULT_USER_ID,
+    workers: int = DEFAULT_WORKERS,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> Outbox:
+    """
+    Get the shared outbox stored under a cache directory.
+
+    Entries left over from a previous run are picked up by the workers.
+
+    Args:
+        cache_dir: Directory holding the outbox database
+        service_factory: Builds a Gmail service private to one worker
+        user_id: Gmail user ID (default: 'me')
+        workers: Number of worker threads (default: 4)
+        max_attempts: Attempts before an entry is marked failed (default: 6)
+
+    Returns:
+        Outbox instance
+    """
+    db_path = os.path.join(cache_dir, OUTBOX_DB_NAME)
+    with _outboxes_lock:
+        outbox = _outboxes.get(db_path)
+        if outbox is None:
+            outbox = Outbox(db_path, service_factory, user_id, workers, max_attempts)
+            _outboxes[db_path] = outbox
+            if outbox.counts().get(STATUS_QUEUED):
+                outbox.start()
+        return outbox
@@ -0,0 +1,457 @@
+"""
+Gmail push notifications delivered through Cloud Pub/Sub.
+
+users.watch asks Gmail to publish a message to a Pub/Sub topic whenever the
+mailbox changes. A push subscription forwards each message to the local HTTP
+receiver defined here, which triggers a history sync only when the reported
+historyId is newer than the last one applied. FakePublisher posts messages in
+the same format, so the pipeline can be exercised without Google Cloud.
+"""
+
+import base64
+import hmac
+import json
+import threading
+import urllib.request
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from tools.gmail_tools.gmail import DEFAULT_USER_ID, GmailService
+
+DEFAULT_PUSH_HOST = "127.0.0.1"
+DEFAULT_PUSH_PORT = 8765
+DEFAULT_PUSH_PATH = "/gmail/push"
+
+# Largest push request body accepted by the receiver
+MAX_PUSH_BODY = 64 * 1024
+# Gmail watches expire after 7 days; renew this long before they do
+WATCH_RENEW_MARGIN = 24 * 60 * 60
+# Seconds before a failed sync is retried; doubled after each further failure
+SYNC_RETRY_DELAY = 5.0
+SYNC_RETRY_MAX_DELAY = 300.0
+
+NotificationHandler = Callable[[str, int], None]
+
+
+def encode_push_message(email_address: str, history_id: int) -> Dict[str, Any]:
+    """
+    Build a Pub/Sub push request body carrying a Gmail notification.
+
+    Args:
+        email_address: Mailbox the notification is about
+        history_id: Mailbox historyId after the change
+
+    Returns:
+        Push request body as sent by a Pub/Sub push subscription
+    """
+    data = json.dumps({"emailAddress": email_address, "historyId": history_id})
+    return {
+        "message": {
+            "data": base64.b64encode(data.encode()).decode(),
+            "publishTime": datetime.now(timezone.utc).isoformat(),
+        },
+        "subscription": "local",
+    }
+
+
+def decode_push_message(body: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Extract the Gmail notification from a Pub/Sub push request body.
+
+    Args:
+        body: Raw request body
+
+    Returns:
+        Dict with emailAddress and historyId, or None if the body is malformed
+    """
+    try:
+        envelope = json.loads(body)
+        data = base64.b64decode(envelope["message"]["data"])
+        notification = json.loads(data)
+        int(notification["historyId"])
+    except (ValueError, KeyError, TypeError):
+        return None
+    return notification
+
+
+class NotificationReceiver:
+    """
+    Local HTTP endpoint for Pub/Sub push deliveries.
+
+    Requests are answered as soon as they are decoded; handling the
+    notification is left to the callback, which must not block for long.
+    """
+
+    def __init__(
+        self,
+        handler: NotificationHandler,
+        host: str = DEFAULT_PUSH_HOST,
+        port: int = DEFAULT_PUSH_PORT,
+        path: str = DEFAULT_PUSH_PATH,
+        token: str = "",
+    ) -> None:
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.path = path
+        self.token = token
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._server is not None
+
+    @property
+    def url(self) -> str:
+        if self._server is not None:
+            host, port = self._server.server_address[:2]
+        else:
+            host, port = self.host, self.port
+        return f"http://{host}:{port}{self.path}"
+
+    def start(self) -> None:
+        """Start serving on a daemon thread."""
+        if self._server is not None:
+            return
+
+        receiver = self
+
+        class PushRequestHandler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                url = urlparse(self.path)
+                if url.path != receiver.path:
+                    self.send_error(404)
+                    return
+                if receiver.token:
+                    token = parse_qs(url.query).get("token", [""])[0]
+                    if not hmac.compare_digest(token, receiver.token):
+                        self.send_error(403)
+                        return
+
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > MAX_PUSH_BODY:
+                    self.send_error(413)
+                    return
+                notification = decode_push_message(self.rfile.read(length))
+                if notification is None:
+                    # Acknowledge anyway so Pub/Sub does not redeliver it forever
+                    self.send_response(204)
+                    self.end_headers()
+                    return
+
+                self.send_response(204)
+                self.end_headers()
+                receiver.handler(
+                    notification.get("emailAddress", ""),
+                    int(notification["historyId"]),
+                )
+
+            def log_message(self, format: str, *args: Any) -> None:
+                # stdout carries the MCP protocol; keep request logs out of it
+                pass
+
+        server = ThreadingHTTPServer((self.host, self.port), PushRequestHandler)
+        server.daemon_threads = True
+        thread = threading.Thread(
+            target=server.serve_forever, name="gmail-push-receiver", daemon=True
+        )
+        self._server, self._thread = server, thread
+        thread.start()
+
+    def stop(self) -> None:
+        """Stop serving."""
+        server, self._server = self._server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class FakePublisher:
+    """
+    Local stand-in for Pub/Sub that posts push requests to a receiver.
+    """
+
+    def __init__(self, url: str, token: str = "") -> None:
+        self.url = f"{url}?token={token}" if token else url
+
+    def publish(self, email_address: str, history_id: int) -> int:
+        """
+        Deliver one Gmail notification.
+
+        Args:
+            email_address: Mailbox the notification is about
+            history_id: Mailbox historyId after the change
+
+        Returns:
+            HTTP status returned by the receiver
+        """
+        body = json.dumps(encode_push_message(email_address, history_id)).encode()
+        request = urllib.request.Request(
+            self.url,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+
+
+class MailWatcher:
+    """
+    Runs the push pipeline: the watch registration, the receiver and syncs.
+
+    Notifications only record the newest historyId; a single sync thread
+    applies it, so a burst of notifications collapses into one sync and
+    notifications for already-applied history are ignored. The sync thread
+    and the watch renewal each use their own service from
+    ``service_factory``, since httplib2 connections are not thread-safe.
+    """
+
+    def __init__(
+        self,
+        service_factory: Callable[[], GmailService],
+        on_change: Callable[[GmailService, int], None],
+    ) -> None:
+        self.service_factory = service_factory
+        self.on_change = on_change
+
+        self.receiver: Optional[NotificationReceiver] = None
+        self.topic_name = ""
+        self.label_ids: List[str] = []
+        self.user_id = DEFAULT_USER_ID
+        self.expiration: Optional[datetime] = None
+        self.notifications = 0
+        self.syncs = 0
+        self.last_error: Optional[str] = None
+
+        self._applied_history_id = 0
+        self._pending_history_id = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._sync_thread: Optional[threading.Thread] = None
+        self._renew_timer: Optional[threading.Timer] = None
+
+    @property
+    def active(self) -> bool:
+        """Whether notifications are being received."""
+        return self.receiver is not None and self.receiver.running
+
+    @property
+    def watching(self) -> bool:
+        """
+        Whether Gmail is expected to notify about every change.
+
+        That needs a running receiver, a users.watch registration that has
+        not expired and no pending sync failure.
+        """
+        return (
+            self.active
+            and bool(self.topic_name)
+            and self.expiration is not None
+            and self.expiration > datetime.now(timezone.utc)
+            and self.last_error is None
+        )
+
+    def start(
+        self,
+        service: GmailService,
+        topic_name: str = "",
+        label_ids: Optional[List[str]] = None,
+        user_id: str = DEFAULT_USER_ID,
+        host: str = DEFAULT_PUSH_HOST,
+        port: int = DEFAULT_PUSH_PORT,
+        path: str = DEFAULT_PUSH_PATH,
+        token: str = "",
+    ) -> Dict[str, Any]:
+        """
+        Start the receiver and, when a topic is given, register users.watch.
+
+        Without a topic only the receiver runs, which is enough to drive the
+        pipeline with FakePublisher.
+
+        Args:
+            service: Gmail API service instance
+            topic_name: Pub/Sub topic as 'projects/<project>/topics/<topic>'
+                (optional)
+            label_ids: Only notify about changes to these labels (optional)
+            user_id: Gmail user ID (default: 'me')
+            host: Receiver bind address (default: '127.0.0.1')
+            port: Receiver port (default: 8765)
+            path: Receiver URL path (default: '/gmail/push')
+            token: Secret expected in the push URL's token parameter (optional)
+
+        Returns:
+            The users.watch response, or an empty dict without a topic
+        """
+        self.stop(service)
+        self.topic_name = topic_name
+        self.label_ids = list(label_ids or [])
+        self.user_id = user_id
+
+        receiver = NotificationReceiver(self.notify, host, port, path, token)
+        receiver.start()
+        self.receiver = receiver
+
+        with self._lock:
+            self._sync_thread = threading.Thread(
+                target=self._run, name="gmail-push-sync", daemon=True
+            )
+            self._sync_thread.start()
+
+        response: Dict[str, Any] = {}
+        if topic_name:
+            try:
+                response = self._watch(service)
+            except Exception:
+                self.stop(service)
+                raise
+        return response
+
+    def stop(self, service: Optional[GmailService] = None) -> None:
+        """
+        Stop the receiver and sync thread, and cancel the Gmail watch.
+
+        Args:
+            service: Gmail API service used to call users.stop (optional)
+        """
+        if self._renew_timer is not None:
+            self._renew_timer.cancel()
+            self._renew_timer = None
+
+        if service is not None and self.topic_name and self.expiration is not None:
+            service.users().stop(userId=self.user_id).execute()
+        self.expiration = None
+
+        if self.receiver is not None:
+            self.receiver.stop()
+            self.receiver = None
+
+        with self._lock:
+            thread, self._sync_thread = self._sync_thread, None
+            self._changed.notify_all()
+        if thread is not None:
+            thread.join()
+
+    def notify(self, email_address: str, history_id: int) -> None:
+        """
+        Record a change notification; called by the receiver.
+
+        Args:
+            email_address: Mailbox the notification is about
+            history_id: Mailbox historyId after the change
+        """
+        with self._lock:
+            self.notifications += 1
+        self.queue_sync(history_id)
+
+    def queue_sync(self, history_id: int) -> None:
+        """
+        Ask the sync thread to bring local state up to a historyId.
+
+        Args:
+            history_id: Mailbox historyId; ignored if it is already applied
+                or queued
+        """
+        with self._lock:
+            if history_id <= max(self._applied_history_id, self._pending_history_id):
+                return
+            self._pending_history_id = history_id
+            self._changed.notify()
+
+    def mark_applied(self, history_id: Any) -> None:
+        """
+        Record a historyId the local state already reflects.
+
+        Args:
+            history_id: Mailbox historyId
+        """
+        if history_id:
+            with self._lock:
+                self._applied_history_id = max(
+                    self._applied_history_id, int(history_id)
+                )
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Describe the pipeline.
+
+        Returns:
+            Receiver URL, watch expiration and notification counters
+        """
+        return {
+            "active": self.active,
+            "url": self.receiver.url if self.receiver is not None else None,
+            "topic_name": self.topic_name,
+            "expiration": self.expiration,
+            "history_id": self._applied_history_id or None,
+            "notifications": self.notifications,
+            "syncs": self.syncs,
+            "last_error": self.last_error,
+        }
+
+    def _watch(self, service: GmailService) -> Dict[str, Any]:
+        """Register or renew users.watch and schedule the next renewal."""
+        body: Dict[str, Any] = {"topicName": self.topic_name}
+        if self.label_ids:
+            body["labelIds"] = self.label_ids
+            body["labelFilterBehavior"] = "include"
+        response = service.users().watch(userId=self.user_id, body=body).execute()
+
+        # Changes up to this historyId may predate the last sync; apply them
+        if response.get("historyId"):
+            self.queue_sync(int(response["historyId"]))
+        expiration = int(response.get("expiration", 0)) / 1000
+        self.expiration = datetime.fromtimestamp(expiration, timezone.utc)
+
+        now = datetime.now(timezone.utc).timestamp()
+        delay = expiration - now - WATCH_RENEW_MARGIN
+        timer = threading.Timer(max(delay, 60.0), self._renew)
+        timer.daemon = True
+        self._renew_timer = timer
+        timer.start()
+        return response
+
+    def _renew(self) -> None:
+        try:
+            self._watch(self.service_factory())
+        except Exception as e:
+            self.last_error = f"Watch renewal failed: {e}"
+
+    def _run(self) -> None:
+        service = None
+        failures = 0
+        current = threading.current_thread()
+        while True:
+            with self._lock:
+                while (
+                    self._sync_thread is current
+                    and self._pending_history_id <= self._applied_history_id
+                ):
+                    self._changed.wait()
+                if self._sync_thread is not current:
+                    return
+                history_id = self._pending_history_id
+
+            try:
+                if service is None:
+                    service = self.service_factory()
+                self.on_change(service, history_id)
+                self.syncs += 1
+                self.last_error = None
+                failures = 0
+                self.mark_applied(history_id)
+            except Exception as e:
+                self.last_error = f"Sync failed: {e}"
+                # The historyId stays pending; retry with backoff, sooner if
+                # a newer notification arrives
+                delay = min(SYNC_RETRY_DELAY * 2**failures, SYNC_RETRY_MAX_DELAY)
+                failures += 1
+                with self._lock:
+                    if self._sync_thread is current:
+                        self._changed.wait(delay)
@@ -5,34 +5,65 @@ This module provides a Model Context Protocol server for interacting with Gmail.
 It exposes Gmail messages as resources and provides tools for composing and sending emails.
 """
 
+import itertools
+import os
 import re
+import sqlite3
+import sys
 from datetime import datetime
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+from tools.gmail_tools.attachments import (
+    download_attachment,
+    get_attachment_store,
+    list_attachments,
+)
 from tools.gmail_tools.config import settings as gmail_settings
 from tools.gmail_tools.gmail import (
+    SUMMARY_FIELDS,
+    SUMMARY_HEADERS,
+    MessagePager,
+    body_cache,
+    build_search_query,
+    bulk_modify_messages_labels,
+    canonicalize_query,
     create_draft,
+    create_message,
     get_gmail_service,
     get_headers_dict,
-    get_labels,
     get_message,
-    get_thread,
-    list_messages,
+    get_messages_batch,
+    get_threads_with_bodies,
+    label_cache,
     modify_message_labels,
-    parse_message_body,
-    search_messages,
+    query_cache,
 )
 from tools.gmail_tools.gmail import send_email as gmail_send_email
-from tools.google_api import settings
+from tools.gmail_tools.mirror import MailStore, get_mail_store, sync_mailbox
+from tools.gmail_tools.outbox import (
+    KIND_DRAFT,
+    KIND_SEND,
+    OUTBOX_DB_NAME,
+    Outbox,
+    get_outbox,
+    new_message_id,
+)
+from tools.gmail_tools.push import MailWatcher
+from tools.google_api import register_service, settings
 
-service = get_gmail_service()
+service = register_service("gmail", get_gmail_service)
 EMAIL_PREVIEW_LENGTH = 200
+# Prefix of the page tokens of searches answered from the local mirror
+MIRROR_CURSOR_PREFIX = "mirror:"
+
+_sender_address: Optional[str] = None
 
 
-def format_message(message: Dict[str, Any]) -> str:
-    """Format a Gmail message for display."""
+def format_message(message: Dict[str, Any], body: Optional[str] = None) -> str:
+    """Format a Gmail message for display, parsing its body unless given."""
     headers = get_headers_dict(message)
-    body = parse_message_body(message)
+    if body is None:
+        body = body_cache.parse(message, max_bytes=gmail_settings.gmail_body_max_bytes)
 
     # Extract relevant headers
     from_header = headers.get("From", "Unknown")
@@ -50,6 +81,160 @@ Date: {date}
 """
 
 
+def get_synced_mirror() -> Optional[MailStore]:
+    """
+    Get the local mailbox mirror, synced if the last sync is stale.
+
+    Returns:
+        The mirror, or None if it is disabled or could not be synced
+    """
+    if not gmail_settings.gmail_mirror_enabled:
+        return None
+
+    store = get_mail_store(gmail_settings.cache_dir)
+    min_interval = gmail_settings.gmail_mirror_sync_interval
+    if mail_watcher.watching:
+        # Push notifications keep the mirror current; poll only rarely, in
+        # case notifications are lost
+        min_interval = max(
+            min_interval, gmail_settings.gmail_push_fallback_sync_interval
+        )
+    try:
+        stats = sync_mailbox(
+            service,
+            store,
+            user_id=gmail_settings.user_id,
+            max_threads=gmail_settings.gmail_mirror_max_threads,
+            min_interval=min_interval,
+        )
+        query_cache.observe_history(stats.get("history_id"), gmail_settings.user_id)
+    except Exception as e:
+        print(
+            f"Warning: Mailbox mirror sync failed, using the Gmail API: {e}",
+            file=sys.stderr,
+        )
+        return None
+    return store
+
+
+def apply_mail_change(push_service: Any, history_id: int) -> None:
+    """
+    Bring local state up to a historyId announced by a push notification.
+
+    Args:
+        push_service: Gmail service private to the push sync thread
+        history_id: Mailbox historyId after the change
+    """
+    query_cache.observe_history(history_id, gmail_settings.user_id)
+    if gmail_settings.gmail_mirror_enabled:
+        sync_mailbox(
+            push_service,
+            get_mail_store(gmail_settings.cache_dir),
+            user_id=gmail_settings.user_id,
+            max_threads=gmail_settings.gmail_mirror_max_threads,
+        )
+
+
+mail_watcher = MailWatcher(
+    lambda: get_gmail_service(use_cache=False), apply_mail_change
+)
+
+
+def format_message_summaries(
+    messages: List[Dict[str, Any]], store: Optional[MailStore] = None
+) -> str:
+    """
+    Fetch and format preview lines for a list of message references.
+
+    Messages are read from the local mirror when one is given. Otherwise only
+    the summary headers and snippet are requested, in batch requests rather
+    than one call per message.
+
+    Args:
+        messages: Message references as returned by list_messages
+        store: Local mailbox mirror to read from (optional)
+
+    Returns:
+        Formatted preview of each message
+    """
+    msg_ids = [msg["id"] for msg in messages if msg.get("id") is not None]
+    if store is not None:
+        fetched, errors = store.get_messages(msg_ids), {}
+    else:
+        fetched, errors = get_messages_batch(
+            service,
+            msg_ids,
+            user_id=settings.user_id,
+            message_format="metadata",
+            metadata_headers=SUMMARY_HEADERS,
+            fields=SUMMARY_FIELDS,
+        )
+
+    result = ""
+    for msg_id in msg_ids:
+        result += f"\nMessage ID: {msg_id}\n"
+        if msg_id not in fetched:
+            result += f"Error: {errors.get(msg_id, 'Message not returned')}\n"
+            continue
+
+        message = fetched[msg_id]
+        headers = get_headers_dict(message)
+
+        # Extract headers with proper error handling
+        from_header = headers.get("From", "Unknown")
+        subject_header = headers.get("Subject", "No Subject")
+        date_header = headers.get("Date", "Unknown Date")
+
+        # Get snippet for preview
+        snippet = message.get("snippet", "")
+
+        result += f"From: {from_header}\n"
+        result += f"Subject: {subject_header}\n"
+        result += f"Date: {date_header}\n"
+        if snippet:
+            result += f"Preview: {snippet}\n"
+
+    return result
+
+
+def run_cached_search(
+    query: str, max_results: int, page_token: str = ""
+) -> Tuple[int, str, Optional[str]]:
+    """
+    Run a Gmail search, reusing the result of an identical earlier search.
+
+    Results are cached per canonical query and page until the mailbox
+    historyId advances.
+
+    Args:
+        query: Gmail search query
+        max_results: Maximum number of results to return
+        page_token: Cursor from a previous call (defaults to empty string)
+
+    Returns:
+        Tuple of (number of matches, formatted summaries, next cursor or None)
+    """
+    query = canonicalize_query(query)
+
+    def fetch() -> Tuple[int, str, Optional[str]]:
+        pager = MessagePager(
+            service,
+            user_id=settings.user_id,
+            max_results=max_results,
+            query=query,
+            cursor=page_token or None,
+        )
+        messages = list(pager)
+        return len(messages), format_message_summaries(messages), pager.cursor
+
+    return query_cache.get_or_fetch(
+        service,
+        (query, max_results, page_token),
+        fetch,
+        user_id=settings.user_id,
+    )
+
+
 def validate_date_format(date_str: str) -> bool:
     """
     Validate that a date string is in the format YYYY/MM/DD.
@@ -75,6 +260,129 @@ def validate_date_format(date_str: str) -> bool:
         return False
 
 
+def validate_page_token(page_token: str) -> bool:
+    """
+    Validate a page token returned by an earlier search.
+
+    Args:
+        page_token: Cursor of a Gmail search or of the local mirror
+
+    Returns:
+        bool: True if valid, False otherwise
+    """
+    if not page_token:
+        return True
+    if page_token.startswith(MIRROR_CURSOR_PREFIX):
+        return page_token[len(MIRROR_CURSOR_PREFIX) :].isdigit()
+    try:
+        MessagePager.decode_cursor(page_token)
+        return True
+    except ValueError:
+        return False
+
+
+def resolve_label_ids(names: List[str]) -> List[str]:
+    """
+    Map Gmail label names to label IDs for local mirror searches.
+
+    Args:
+        names: Label names or IDs
+
+    Returns:
+        Label IDs; names that match no label are passed through unchanged
+    """
+    label_ids = []
+    for name in names:
+        label = label_cache.get(service, name, user_id=settings.user_id)
+        label_ids.append(label["id"] if label else name.strip())
+    return label_ids
+
+
+def load_message(message_id: str) -> Dict[str, Any]:
+    """Get a full message from the local mirror, or from Gmail."""
+    store = get_synced_mirror()
+    message = store.get_message(message_id) if store is not None else None
+    if message is None:
+        message = get_message(service, message_id, user_id=settings.user_id)
+    return message
+
+
+def get_sender_address() -> str:
+    """Get the authenticated user's address, fetched once per process."""
+    global _sender_address
+    if _sender_address is None:
+        _sender_address = (
+            service.users()
+            .getProfile(userId=settings.user_id)
+            .execute()
+            .get("emailAddress")
+        )
+    return _sender_address  # type: ignore
+
+
+def get_mail_outbox() -> Outbox:
+    """Get the outbox whose workers each use a private Gmail service."""
+    return get_outbox(
+        gmail_settings.cache_dir,
+        lambda: get_gmail_service(use_cache=False),
+        user_id=gmail_settings.user_id,
+        workers=gmail_settings.gmail_outbox_workers,
+        max_attempts=gmail_settings.gmail_outbox_max_attempts,
+    )
+
+
+def resume_mail_outbox() -> None:
+    """Restart delivery of messages queued before the server last stopped."""
+    if not os.path.exists(os.path.join(gmail_settings.cache_dir, OUTBOX_DB_NAME)):
+        return
+    try:
+        # get_outbox starts the workers when entries are still queued
+        get_mail_outbox()
+    except Exception as e:
+        print(f"Warning: Could not resume the outbox: {e}", file=sys.stderr)
+
+
+def queue_email(
+    kind: str,
+    to: str,
+    subject: str,
+    body: str,
+    cc: str,
+    bcc: str,
+    idempotency_key: str,
+) -> str:
+    """Queue a message in the outbox and describe the queue entry."""
+    queue_id, message_id_header = new_message_id()
+    # No From header: Gmail fills in the sender when the message is delivered,
+    # so queueing needs no API call
+    message = create_message(
+        "",
+        to,
+        subject,
+        body,
+        cc=cc,
+        bcc=bcc,
+        message_id=message_id_header,
+    )
+    entry = get_mail_outbox().enqueue(
+        kind,
+        message["raw"],
+        message_id_header,
+        {"to": to, "subject": subject},
+        queue_id=queue_id,
+        idempotency_key=idempotency_key or None,
+    )
+
+    action = "sending" if kind == KIND_SEND else "saving as a draft"
+    return f"""
+Email queued for {action} with queue ID: {entry["id"]}
+Status: {entry["status"]}
+To: {entry["summary"]["to"]}
+Subject: {entry["summary"]["subject"]}
+Use get_outbox_status to follow delivery.
+"""
+
+
 # Resources
 def get_email_message(message_id: str) -> str:
     """
@@ -86,11 +394,57 @@ def get_email_message(message_id: str) -> str:
     Returns:
         The formatted email content
     """
-    message = get_message(service, message_id, user_id=settings.user_id)
+    message = load_message(message_id)
     formatted_message = format_message(message)
     return formatted_message
 
 
+def format_thread(thread_id: str, entries: List[Tuple[Dict[str, Any], str]]) -> str:
+    """Format the (message, body) pairs of a thread for display."""
+    result = f"Email Thread (ID: {thread_id})\n"
+    for i, (message, body) in enumerate(entries, 1):
+        result += f"\n--- Message {i} ---\n"
+        result += format_message(message, body)
+    return result
+
+
+def fetch_threads(
+    thread_ids: List[str],
+) -> Tuple[Dict[str, List[Tuple[Dict[str, Any], str]]], Dict[str, str]]:
+    """
+    Get threads with parsed bodies from the mirror, the body cache or Gmail.
+
+    Threads the mirror holds completely are read locally. The rest are fetched
+    together, downloading only the bodies missing from the body cache.
+
+    Args:
+        thread_ids: Gmail thread IDs
+
+    Returns:
+        Tuple of ((message, body) pairs by thread ID, error messages by thread ID)
+    """
+    threads: Dict[str, List[Tuple[Dict[str, Any], str]]] = {}
+    max_bytes = gmail_settings.gmail_body_max_bytes
+
+    store = get_synced_mirror()
+    if store is not None:
+        for thread_id in thread_ids:
+            if store.is_thread_complete(thread_id):
+                threads[thread_id] = [
+                    (message, body_cache.parse(message, max_bytes))
+                    for message in store.get_thread_messages(thread_id)
+                ]
+
+    remaining = [thread_id for thread_id in thread_ids if thread_id not in threads]
+    errors: Dict[str, str] = {}
+    if remaining:
+        fetched, errors = get_threads_with_bodies(
+            service, remaining, user_id=settings.user_id, max_bytes=max_bytes
+        )
+        threads.update(fetched)
+    return threads, errors
+
+
 def get_email_thread(thread_id: str) -> str:
     """
     Get all messages in an email thread by thread ID.
@@ -101,15 +455,10 @@ def get_email_thread(thread_id: str) -> str:
     Returns:
         The formatted thread content with all messages
     """
-    thread = get_thread(service, thread_id, user_id=settings.user_id)
-    messages = thread.get("messages", [])
-
-    result = f"Email Thread (ID: {thread_id})\n"
-    for i, message in enumerate(messages, 1):
-        result += f"\n--- Message {i} ---\n"
-        result += format_message(message)
-
-    return result
+    threads, errors = fetch_threads([thread_id])
+    if thread_id not in threads:
+        return f"Error: {errors.get(thread_id, 'Thread not returned')}"
+    return format_thread(thread_id, threads[thread_id])
 
 
 # Tools
@@ -121,6 +470,8 @@ def compose_email(
     body: str,
     cc: str = "",
     bcc: str = "",
+    background: bool = False,
+    idempotency_key: str = "",
 ) -> str:
     """
     Compose a new email draft.
@@ -131,16 +482,18 @@ def compose_email(
         body: Email body content
         cc: Carbon copy recipients (defaults to empty string)
         bcc: Blind carbon copy recipients (defaults to empty string)
+        background: Queue the email and return at once; workers retry on
+            rate limits and server errors (defaults to False)
+        idempotency_key: With background, a repeated key returns the existing
+            queue entry instead of saving again (defaults to empty string)
 
     Returns:
-        The ID of the created draft and its content
+        The ID of the created draft and its content, or its queue ID when queued
     """
-    sender = (
-        service.users()
-        .getProfile(userId=settings.user_id)
-        .execute()
-        .get("emailAddress")
-    )
+    if background:
+        return queue_email(KIND_DRAFT, to, subject, body, cc, bcc, idempotency_key)
+
+    sender = get_sender_address()
     draft = create_draft(
         service,
         sender=sender,
@@ -169,6 +522,8 @@ def send_email(
     body: str,
     cc: str = "",
     bcc: str = "",
+    background: bool = False,
+    idempotency_key: str = "",
 ) -> str:
     """
     Compose and send an email.
@@ -179,16 +534,18 @@ def send_email(
         body: Email body content
         cc: Carbon copy recipients (defaults to empty string)
         bcc: Blind carbon copy recipients (defaults to empty string)
+        background: Queue the email and return at once; workers retry on
+            rate limits and server errors (defaults to False)
+        idempotency_key: With background, a repeated key returns the existing
+            queue entry instead of sending again (defaults to empty string)
 
     Returns:
-        Content of the sent email
+        Content of the sent email, or its queue ID when queued
     """
-    sender = (
-        service.users()
-        .getProfile(userId=settings.user_id)
-        .execute()
-        .get("emailAddress")
-    )
+    if background:
+        return queue_email(KIND_SEND, to, subject, body, cc, bcc, idempotency_key)
+
+    sender = get_sender_address()
     message = gmail_send_email(
         service,
         sender=sender,
@@ -221,6 +578,7 @@ def search_emails(
     before_date: str = "",
     label: str = "",
     max_results: int = 10,
+    page_token: str = "",
 ) -> str:
     """
     Search for emails using specific search criteria.
@@ -235,6 +593,8 @@ def search_emails(
         before_date: Filter for emails before this date (format: YYYY/MM/DD, defaults to empty string)
         label: Filter by Gmail label (defaults to empty string)
         max_results: Maximum number of results to return
+        page_token: Cursor from a previous call to continue where it stopped
+            (defaults to empty string)
 
     Returns:
         Formatted list of matching emails
@@ -248,90 +608,125 @@ def search_emails(
     if before_date and not validate_date_format(before_date):
         return f"Error: before_date '{before_date}' is not in the required format YYYY/MM/DD"
 
-    # Use search_messages to find matching emails
-    messages = search_messages(
-        service,
-        user_id=settings.user_id,
-        from_email=from_email if from_email else None,
-        to_email=to_email if to_email else None,
-        subject=subject if subject else None,
-        has_attachment=has_attachment,
-        is_unread=is_unread,
-        after=after_date if after_date else None,
-        before=before_date if before_date else None,
-        labels=[label] if label and label.strip() else None,
-        max_results=max_results,
+    if not validate_page_token(page_token):
+        return f"Error: invalid page_token '{page_token}'"
+
+    after = after_date if after_date else None
+    store = get_synced_mirror()
+    local = (
+        store is not None
+        and store.covers(after)
+        and (not page_token or page_token.startswith(MIRROR_CURSOR_PREFIX))
     )
+    if local:
+        # The mirror holds every possible match; answer without the API
+        offset = int(page_token[len(MIRROR_CURSOR_PREFIX) :]) if page_token else 0
+        messages = store.search(
+            from_email=from_email if from_email else None,
+            to_email=to_email if to_email else None,
+            subject=subject if subject else None,
+            has_attachment=has_attachment,
+            is_unread=is_unread,
+            after=after,
+            before=before_date if before_date else None,
+            label_ids=resolve_label_ids([label]) if label and label.strip() else None,
+            max_results=max_results + 1,
+            offset=offset,
+        )
+        cursor = None
+        if len(messages) > max_results:
+            messages = messages[:max_results]
+            cursor = f"{MIRROR_CURSOR_PREFIX}{offset + max_results}"
+        count, summaries = len(messages), format_message_summaries(messages, store)
+    elif page_token.startswith(MIRROR_CURSOR_PREFIX):
+        return "Error: page_token came from the local mirror, which can no longer answer this search. Run the search again without it."
+    else:
+        query = build_search_query(
+            from_email=from_email if from_email else None,
+            to_email=to_email if to_email else None,
+            subject=subject if subject else None,
+            has_attachment=has_attachment,
+            is_unread=is_unread,
+            after=after,
+            before=before_date if before_date else None,
+            labels=[label] if label and label.strip() else None,
+        )
+        count, summaries, cursor = run_cached_search(query, max_results, page_token)
 
-    result = f"Found {len(messages)} messages matching criteria:\n"
+    result = f"Found {count} messages matching criteria:\n"
+    result += summaries
+    if cursor:
+        result += f"\nMore results available. Next page token: {cursor}\n"
 
-    for msg_info in messages:
-        msg_id = msg_info.get("id")
-        if msg_id is None:
-            continue
+    return result
 
-        # Get full message details to properly retrieve headers
-        message = get_message(service, msg_id, user_id=settings.user_id)
-        headers = get_headers_dict(message)
 
-        # Extract headers with proper error handling
-        from_header = headers.get("From", "Unknown")
-        subject_header = headers.get("Subject", "No Subject")
-        date_header = headers.get("Date", "Unknown Date")
+def query_emails(query: str, max_results: int = 10, page_token: str = "") -> str:
+    """
+    Search for emails using a raw Gmail query string.
 
-        # Get snippet for preview
-        snippet = message.get("snippet", "")
+    Args:
+        query: Gmail search query (same syntax as Gmail search box)
+        max_results: Maximum number of results to return
+        page_token: Cursor from a previous call to continue where it stopped
+            (defaults to empty string)
 
-        result += f"\nMessage ID: {msg_id}\n"
-        result += f"From: {from_header}\n"
-        result += f"Subject: {subject_header}\n"
-        result += f"Date: {date_header}\n"
-        if snippet:
-            result += f"Preview: {snippet}\n"
+    Returns:
+        Formatted list of matching emails
+    """
+    if not validate_page_token(page_token) or page_token.startswith(
+        MIRROR_CURSOR_PREFIX
+    ):
+        return f"Error: invalid page_token '{page_token}'"
+
+    count, summaries, cursor = run_cached_search(query, max_results, page_token)
+
+    result = f'Found {count} messages matching query: "{query}"\n'
+    result += summaries
+    if cursor:
+        result += f"\nMore results available. Next page token: {cursor}\n"
 
     return result
 
 
-def query_emails(query: str, max_results: int = 10) -> str:
+def local_search_emails(query: str, max_results: int = 10) -> str:
     """
-    Search for emails using a raw Gmail query string.
+    Full-text search over the local mailbox mirror, ranked by relevance.
 
     Args:
-        query: Gmail search query (same syntax as Gmail search box)
+        query: Search terms. Supports "exact phrases", prefix terms such as
+            invoic*, AND/OR/NOT, and field scopes from:, to:, subject: and body:
         max_results: Maximum number of results to return
 
     Returns:
-        Formatted list of matching emails
+        Formatted list of matching emails, best match first
     """
-    messages = list_messages(
-        service, user_id=settings.user_id, max_results=max_results, query=query
-    )
+    store = get_synced_mirror()
+    if store is None:
+        return "Error: local search needs the mailbox mirror. Set MIST_GOOGLE_GMAIL_MIRROR_ENABLED=true to enable it."
+    if not store.fts_enabled:
+        return "Error: local search requires SQLite with FTS5 support."
 
-    result = f'Found {len(messages)} messages matching query: "{query}"\n'
+    try:
+        matches = store.full_text_search(query, max_results)
+    except sqlite3.OperationalError as e:
+        return f"Error: could not run local search for '{query}': {e}"
 
-    for msg_info in messages:
-        msg_id = msg_info.get("id")
-        if msg_id is None:
-            continue
+    messages = store.get_messages([match["id"] for match in matches])
 
-        # Get full message details to properly retrieve headers
-        message = get_message(service, msg_id, user_id=settings.user_id)
+    result = f'Found {len(matches)} local messages matching: "{query}"\n'
+    for match in matches:
+        message = messages.get(match["id"])
+        if message is None:
+            continue
         headers = get_headers_dict(message)
 
-        # Extract headers with proper error handling
-        from_header = headers.get("From", "Unknown")
-        subject_header = headers.get("Subject", "No Subject")
-        date_header = headers.get("Date", "Unknown Date")
-
-        # Get snippet for preview
-        snippet = message.get("snippet", "")
-
-        result += f"\nMessage ID: {msg_id}\n"
-        result += f"From: {from_header}\n"
-        result += f"Subject: {subject_header}\n"
-        result += f"Date: {date_header}\n"
-        if snippet:
-            result += f"Preview: {snippet}\n"
+        result += f"\nMessage ID: {match['id']}\n"
+        result += f"From: {headers.get('From', 'Unknown')}\n"
+        result += f"Subject: {headers.get('Subject', 'No Subject')}\n"
+        result += f"Date: {headers.get('Date', 'Unknown Date')}\n"
+        if match["snippet"]:
+            result += f"Match: {match['snippet']}\n"
 
     return result
 
@@ -343,7 +738,7 @@ def list_available_labels() -> str:
     Returns:
         Formatted list of labels with their IDs
     """
-    labels = get_labels(service, user_id=settings.user_id)
+    labels = label_cache.get_all(service, user_id=settings.user_id)
 
     result = "Available Gmail Labels:\n"
     for label in labels:
@@ -394,11 +789,17 @@ def add_label_to_message(message_id: str, label_id: str) -> str:
 
     Args:
         message_id: The Gmail message ID
-        label_id: The Gmail label ID to add (use list_available_labels to find label IDs)
+        label_id: The Gmail label ID or name to add (use list_available_labels to find labels)
 
     Returns:
         Confirmation message
     """
+    label = label_cache.get(service, label_id, user_id=settings.user_id)
+    if label is None:
+        return f"Error: No label found with ID or name '{label_id}'"
+    label_id = label["id"]
+    label_name = label.get("name", label_id)
+
     # Add the specified label
     result = modify_message_labels(
         service,
@@ -412,14 +813,6 @@ def add_label_to_message(message_id: str, label_id: str) -> str:
     headers = get_headers_dict(result)
     subject = headers.get("Subject", "No Subject")
 
-    # Get the label name for the confirmation message
-    label_name = label_id
-    labels = get_labels(service, user_id=settings.user_id)
-    for label in labels:
-        if label.get("id") == label_id:
-            label_name = label.get("name", label_id)
-            break
-
     return f"""
 Label added to message:
 ID: {message_id}
@@ -434,18 +827,16 @@ def remove_label_from_message(message_id: str, label_id: str) -> str:
 
     Args:
         message_id: The Gmail message ID
-        label_id: The Gmail label ID to remove (use list_available_labels to find label IDs)
+        label_id: The Gmail label ID or name to remove (use list_available_labels to find labels)
 
     Returns:
         Confirmation message
     """
-    # Get the label name before we remove it
-    label_name = label_id
-    labels = get_labels(service, user_id=settings.user_id)
-    for label in labels:
-        if label.get("id") == label_id:
-            label_name = label.get("name", label_id)
-            break
+    label = label_cache.get(service, label_id, user_id=settings.user_id)
+    if label is None:
+        return f"Error: No label found with ID or name '{label_id}'"
+    label_id = label["id"]
+    label_name = label.get("name", label_id)
 
     # Remove the specified label
     result = modify_message_labels(
@@ -468,6 +859,127 @@ Removed Label: {label_name} ({label_id})
 """
 
 
+def bulk_modify_labels(
+    message_ids: Optional[list[str]] = None,
+    query: str = "",
+    add_labels: Optional[list[str]] = None,
+    remove_labels: Optional[list[str]] = None,
+    max_messages: int = 1000,
+) -> str:
+    """
+    Add or remove labels on many messages at once.
+
+    Args:
+        message_ids: Gmail message IDs to modify (defaults to None)
+        query: Gmail search query selecting messages to modify, used in
+            addition to message_ids (defaults to empty string)
+        add_labels: Label IDs or names to add (defaults to None)
+        remove_labels: Label IDs or names to remove (defaults to None)
+        max_messages: Maximum number of messages matched by query
+            (defaults to 1000)
+
+    Returns:
+        Progress and any per-chunk failures
+    """
+    if not add_labels and not remove_labels:
+        return "Error: Provide add_labels and/or remove_labels."
+
+    resolved: Dict[str, List[str]] = {"add": [], "remove": []}
+    for key, names in (("add", add_labels or []), ("remove", remove_labels or [])):
+        for name in names:
+            label = label_cache.get(service, name, user_id=settings.user_id)
+            if label is None:
+                return f"Error: No label found with ID or name '{name}'"
+            resolved[key].append(label["id"])
+
+    ids: Iterable[str] = message_ids or []
+    pager: Optional[MessagePager] = None
+    if query:
+        # Stream query matches page by page straight into batchModify chunks
+        pager = MessagePager(
+            service, user_id=settings.user_id, max_results=max_messages, query=query
+        )
+        ids = itertools.chain(ids, (msg["id"] for msg in pager))
+
+    reports = bulk_modify_messages_labels(
+        service,
+        ids,
+        add_labels=resolved["add"],
+        remove_labels=resolved["remove"],
+        user_id=settings.user_id,
+    )
+
+    if not reports:
+        return "No messages matched; nothing was modified."
+
+    total = sum(report["count"] for report in reports)
+    modified = sum(report["count"] for report in reports if report["error"] is None)
+    failed = [report for report in reports if report["error"] is not None]
+
+    result = f"Modified labels on {modified} of {total} messages"
+    result += f" in {len(reports)} batch(es).\n"
+    if resolved["add"]:
+        result += f"Added: {', '.join(resolved['add'])}\n"
+    if resolved["remove"]:
+        result += f"Removed: {', '.join(resolved['remove'])}\n"
+
+    for i, report in enumerate(reports, 1):
+        status = "ok" if report["error"] is None else f"failed: {report['error']}"
+        result += f"\nBatch {i}/{len(reports)} ({report['count']} messages): {status}"
+
+    if failed:
+        result += "\n\nFailed message IDs:\n"
+        for report in failed:
+            result += ", ".join(report["ids"]) + "\n"
+
+    if pager is not None and pager.cursor:
+        result += f"\n\nMore than {max_messages} messages matched the query; only the first {max_messages} were modified. Run again or raise max_messages to modify the rest.\n"
+
+    return result
+
+
+def bulk_mark_read(
+    message_ids: Optional[list[str]] = None, query: str = "", max_messages: int = 1000
+) -> str:
+    """
+    Mark many messages as read.
+
+    Args:
+        message_ids: Gmail message IDs to mark as read (defaults to None)
+        query: Gmail search query selecting messages, e.g. "is:unread from:news"
+            (defaults to empty string)
+        max_messages: Maximum number of messages matched by query to modify
+            (defaults to 1000)
+
+    Returns:
+        Progress and any per-chunk failures
+    """
+    return bulk_modify_labels(
+        message_ids, query, remove_labels=["UNREAD"], max_messages=max_messages
+    )
+
+
+def bulk_archive(
+    message_ids: Optional[list[str]] = None, query: str = "", max_messages: int = 1000
+) -> str:
+    """
+    Archive many messages by removing them from the inbox.
+
+    Args:
+        message_ids: Gmail message IDs to archive (defaults to None)
+        query: Gmail search query selecting messages, e.g. "in:inbox from:news"
+            (defaults to empty string)
+        max_messages: Maximum number of messages matched by query to modify
+            (defaults to 1000)
+
+    Returns:
+        Progress and any per-chunk failures
+    """
+    return bulk_modify_labels(
+        message_ids, query, remove_labels=["INBOX"], max_messages=max_messages
+    )
+
+
 def get_emails(message_ids: list[str]) -> str:
     """
     Get the content of multiple email messages by their IDs.
@@ -486,13 +998,23 @@ def get_emails(message_ids: list[str]) -> str:
     retrieved_emails: List[Tuple[str, Dict[str, Any]]] = []
     error_emails: List[Tuple[str, str]] = []
 
-    # Try to get each message
-    for msg_id in message_ids:
-        try:
-            message = get_message(service, msg_id, user_id=gmail_settings.user_id)
-            retrieved_emails.append((msg_id, message))
-        except Exception as e:
-            error_emails.append((msg_id, str(e)))
+    # Serve what the local mirror has, then batch-fetch the rest
+    store = get_synced_mirror()
+    fetched = store.get_messages(message_ids) if store is not None else {}
+    missing = [msg_id for msg_id in message_ids if msg_id not in fetched]
+    errors: Dict[str, str] = {}
+    if missing:
+        remote, errors = get_messages_batch(
+            service, missing, user_id=gmail_settings.user_id
+        )
+        fetched.update(remote)
+        if store is not None:
+            store.upsert_messages(remote.values())
+    for msg_id in dict.fromkeys(message_ids):
+        if msg_id in fetched:
+            retrieved_emails.append((msg_id, fetched[msg_id]))
+        else:
+            error_emails.append((msg_id, errors.get(msg_id, "Message not returned")))
 
     # Build result string after fetching all emails
     result = f"Retrieved {len(retrieved_emails)} emails:\n"
@@ -512,18 +1034,282 @@ def get_emails(message_ids: list[str]) -> str:
     return result
 
 
+def get_email_threads(thread_ids: list[str]) -> str:
+    """
+    Get the messages of several email threads at once.
+
+    Args:
+        thread_ids: A list of Gmail thread IDs
+
+    Returns:
+        The formatted content of all requested threads
+    """
+    if not thread_ids:
+        return "No thread IDs provided."
+
+    unique_ids = list(dict.fromkeys(thread_ids))
+    threads, errors = fetch_threads(unique_ids)
+
+    result = f"Retrieved {len(threads)} threads:\n"
+    for thread_id in unique_ids:
+        if thread_id in threads:
+            result += "\n" + format_thread(thread_id, threads[thread_id])
+
+    failed = [thread_id for thread_id in unique_ids if thread_id not in threads]
+    if failed:
+        result += f"\n\nFailed to retrieve {len(failed)} threads:\n"
+        for i, thread_id in enumerate(failed, 1):
+            result += f"\n--- Thread {i} (ID: {thread_id}) ---\n"
+            result += f"Error: {errors.get(thread_id, 'Thread not returned')}\n"
+
+    return result
+
+
+def list_email_attachments(message_id: str) -> str:
+    """
+    List the attachments of an email message.
+
+    Args:
+        message_id: The Gmail message ID
+
+    Returns:
+        File name, type and size of each attachment
+    """
+    message = load_message(message_id)
+    attachments = list_attachments(message.get("payload", {}))
+    if not attachments:
+        return f"Message {message_id} has no attachments."
+
+    result = f"Message {message_id} has {len(attachments)} attachments:\n"
+    for i, attachment in enumerate(attachments, 1):
+        result += f"""
+{i}. {attachment["filename"]}
+   Type: {attachment["mime_type"]}
+   Size: {attachment["size"]} bytes
+"""
+    return result
+
+
+def download_email_attachments(
+    message_id: str, filenames: Optional[list[str]] = None
+) -> str:
+    """
+    Save the attachments of an email message to the local attachment cache.
+
+    Identical files are stored once, and attachments downloaded before are
+    served from the cache. The files themselves are not returned, only their
+    local paths.
+
+    Args:
+        message_id: The Gmail message ID
+        filenames: Only save attachments with these file names (optional)
+
+    Returns:
+        Local path, size and SHA-256 digest of each saved attachment
+    """
+    message = load_message(message_id)
+    attachments = list_attachments(message.get("payload", {}))
+    if filenames:
+        wanted = {name.lower() for name in filenames}
+        attachments = [a for a in attachments if a["filename"].lower() in wanted]
+    if not attachments:
+        return f"No matching attachments found in message {message_id}."
+
+    store = get_attachment_store(gmail_settings.cache_dir)
+    result = f"Saved {len(attachments)} attachments from message {message_id}:\n"
+    for i, attachment in enumerate(attachments, 1):
+        try:
+            entry = download_attachment(
+                service, store, message_id, attachment, user_id=settings.user_id
+            )
+        except Exception as e:
+            result += f"\n{i}. {attachment['filename']}\n   Error: {str(e)}\n"
+            continue
+
+        source = "cache" if entry["cached"] else "Gmail"
+        result += f"""
+{i}. {entry["filename"]}
+   Path: {entry["path"]}
+   Type: {entry["mime_type"]}
+   Size: {entry["size"]} bytes
+   SHA-256: {entry["sha256"]}
+   Source: {source}
+"""
+    return result
+
+
+def get_outbox_status(queue_id: str = "") -> str:
+    """
+    Report the delivery state of emails queued with background=True.
+
+    Args:
+        queue_id: Queue ID to report on (defaults to the most recent entries)
+
+    Returns:
+        Delivery state, attempts and last error of the queued emails
+    """
+    outbox = get_mail_outbox()
+    if queue_id:
+        entry = outbox.get(queue_id)
+        if entry is None:
+            return f"No queued email found with ID: {queue_id}"
+        entries = [entry]
+        result = ""
+    else:
+        entries = outbox.recent()
+        counts = outbox.counts()
+        summary = ", ".join(f"{status}: {n}" for status, n in sorted(counts.items()))
+        result = f"Outbox: {summary or 'empty'}\n"
+
+    for entry in entries:
+        result += f"""
+Queue ID: {entry["id"]}
+Type: {entry["kind"]}
+Status: {entry["status"]}
+To: {entry["summary"]["to"]}
+Subject: {entry["summary"]["subject"]}
+Attempts: {entry["attempts"]}
+"""
+        if entry["result_id"]:
+            result += f"Gmail ID: {entry['result_id']}\n"
+        if entry["error"]:
+            result += f"Last error: {entry['error']}\n"
+
+    return result
+
+
+def start_mail_watch(label_ids: Optional[list[str]] = None) -> str:
+    """
+    Start receiving Gmail push notifications instead of polling for changes.
+
+    Registers users.watch for MIST_GOOGLE_GMAIL_PUSH_TOPIC and starts the
+    local receiver its Pub/Sub push subscription delivers to. Each
+    notification announcing new history triggers one incremental sync; idle
+    mailboxes cause no API calls at all. Without a configured topic only the
+    receiver is started, for use with a local publisher.
+
+    Args:
+        label_ids: Only watch changes to these labels, by ID or name
+            (defaults to all labels)
+
+    Returns:
+        Receiver URL and watch expiration
+    """
+    labels = resolve_label_ids(label_ids) if label_ids else None
+    try:
+        response = mail_watcher.start(
+            service,
+            topic_name=gmail_settings.gmail_push_topic,
+            label_ids=labels,
+            user_id=gmail_settings.user_id,
+            host=gmail_settings.gmail_push_host,
+            port=gmail_settings.gmail_push_port,
+            path=gmail_settings.gmail_push_path,
+            token=gmail_settings.gmail_push_token,
+        )
+    except Exception as e:
+        return f"Error: Could not start the mail watch: {str(e)}"
+
+    if gmail_settings.gmail_mirror_enabled:
+        store = get_mail_store(gmail_settings.cache_dir)
+        mail_watcher.mark_applied(store.get_state("history_id"))
+
+    status = mail_watcher.status()
+    result = f"""
+Mail watch started.
+Receiver: {status["url"]}
+"""
+    if response:
+        result += f"Topic: {gmail_settings.gmail_push_topic}\n"
+        result += f"History ID: {response.get('historyId')}\n"
+        expires = f"{status['expiration']:%Y-%m-%d %H:%M} UTC"
+        result += f"Expires: {expires} (renewed automatically)\n"
+    else:
+        result += "No MIST_GOOGLE_GMAIL_PUSH_TOPIC configured; only local publishers can deliver notifications.\n"
+    return result
+
+
+def stop_mail_watch() -> str:
+    """
+    Stop Gmail push notifications and the local receiver.
+
+    Returns:
+        Notification and sync counts of the stopped watch
+    """
+    if not mail_watcher.active:
+        return "No mail watch is running."
+
+    status = mail_watcher.status()
+    try:
+        mail_watcher.stop(service)
+    except Exception as e:
+        return f"Error: Could not stop the mail watch: {str(e)}"
+
+    return f"""
+Mail watch stopped.
+Notifications received: {status["notifications"]}
+Syncs triggered: {status["syncs"]}
+"""
+
+
+def sync_local_mailbox() -> str:
+    """
+    Bring the local mailbox mirror up to date with Gmail.
+
+    Returns:
+        Summary of the changes applied
+    """
+    if not gmail_settings.gmail_mirror_enabled:
+        return "The local mailbox mirror is disabled. Set MIST_GOOGLE_GMAIL_MIRROR_ENABLED=true to enable it."
+
+    store = get_mail_store(gmail_settings.cache_dir)
+    stats = sync_mailbox(
+        service,
+        store,
+        user_id=gmail_settings.user_id,
+        max_threads=gmail_settings.gmail_mirror_max_threads,
+    )
+    query_cache.observe_history(stats["history_id"], gmail_settings.user_id)
+
+    result = f"""
+Mailbox mirror synced ({stats["mode"]} sync):
+Added: {stats["added"]}
+Updated: {stats["updated"]}
+Deleted: {stats["deleted"]}
+Messages stored: {store.count()}
+History ID: {stats["history_id"]}
+"""
+    if stats.get("failed"):
+        result += f"Failed to fetch: {stats['failed']} messages (retried on the next sync)\n"
+    return result
+
+
 def register_tools_mail(mcp: Any) -> None:
     """Register all mail tools with the MCP server."""
     mcp.tool()(get_emails)
+    mcp.tool()(get_email_threads)
+    mcp.tool()(list_email_attachments)
+    mcp.tool()(download_email_attachments)
     mcp.tool()(remove_label_from_message)
     mcp.tool()(add_label_to_message)
     mcp.tool()(list_available_labels)
     mcp.tool()(query_emails)
     mcp.tool()(search_emails)
+    mcp.tool()(local_search_emails)
     mcp.tool()(send_email)
     mcp.tool()(compose_email)
+    mcp.tool()(get_outbox_status)
     mcp.tool()(mark_message_read)
+    mcp.tool()(bulk_modify_labels)
+    mcp.tool()(bulk_mark_read)
+    mcp.tool()(bulk_archive)
+    mcp.tool()(sync_local_mailbox)
+    mcp.tool()(start_mail_watch)
+    mcp.tool()(stop_mail_watch)
 
     # Register resources
     mcp.resource("gmail://threads/{thread_id}")(get_email_thread)
     mcp.resource("gmail://messages/{message_id}")(get_email_message)
+
+    # Deliver anything left in the outbox by a previous run
+    resume_mail_outbox()
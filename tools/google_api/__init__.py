@@ -2,7 +2,10 @@
 Google API common utilities for various services.
 """
 
+from .auth import CredentialManager, get_credential_manager
+from .batch import MAX_BATCH_SIZE, execute_batch
 from .client import (
+    DEFAULT_CACHE_DIR,
     DEFAULT_CREDENTIALS_PATH,
     DEFAULT_TOKEN_PATH,
     GOOGLE_API_SCOPES,
@@ -10,14 +13,26 @@ from .client import (
     get_google_service,
 )
 from .config import GoogleApiSettings, get_settings, settings
+from .discovery import clear_discovery_cache, load_discovery_document
+from .registry import LazyService, get_service, register_service
 
 __all__ = [
     "get_credentials",
     "get_google_service",
+    "CredentialManager",
+    "get_credential_manager",
     "GOOGLE_API_SCOPES",
     "DEFAULT_CREDENTIALS_PATH",
     "DEFAULT_TOKEN_PATH",
+    "DEFAULT_CACHE_DIR",
+    "load_discovery_document",
+    "clear_discovery_cache",
     "GoogleApiSettings",
     "get_settings",
     "settings",
+    "execute_batch",
+    "MAX_BATCH_SIZE",
+    "LazyService",
+    "get_service",
+    "register_service",
 ]
@@ -0,0 +1,224 @@
+"""
+Process-wide OAuth credential management with proactive token refresh.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple, Union
+
+from google.auth.external_account_authorized_user import (
+    Credentials as ExternalCredentials,
+)
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow  # type: ignore
+
+# Define a type for the credentials that could be returned
+GoogleCredentials = Union[Credentials, ExternalCredentials]
+
+# Refresh this many seconds before the access token expires
+DEFAULT_REFRESH_MARGIN = 300
+# Delay before retrying a failed background refresh
+REFRESH_RETRY_DELAY = 60
+
+
+class CredentialManager:
+    """
+    Shared holder for one set of OAuth credentials.
+
+    Credentials are loaded from disk once. A daemon timer refreshes the access
+    token ahead of expiry so tool calls never wait on a refresh, concurrent
+    refreshes collapse into a single token request, and the token file is
+    rewritten atomically only when the token actually changes.
+    """
+
+    def __init__(
+        self,
+        credentials_path: str,
+        token_path: str,
+        scopes: List[str],
+        refresh_margin: int = DEFAULT_REFRESH_MARGIN,
+    ) -> None:
+        self.credentials_path = credentials_path
+        self.token_path = token_path
+        self.scopes = list(scopes)
+        self.refresh_margin = refresh_margin
+
+        self._creds: Optional[GoogleCredentials] = None
+        self._load_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._generation = 0
+        self._timer: Optional[threading.Timer] = None
+
+    def get(self) -> GoogleCredentials:
+        """
+        Return valid credentials, loading or refreshing them if required.
+
+        Returns:
+            Google OAuth credentials
+        """
+        creds = self._creds
+        if creds is None:
+            with self._load_lock:
+                if self._creds is None:
+                    self._creds = self._load()
+                    self._schedule_refresh()
+                creds = self._creds
+
+        if not creds.valid:
+            creds = self.refresh()
+        return creds
+
+    def refresh(self) -> GoogleCredentials:
+        """
+        Refresh the access token, sharing the result with concurrent callers.
+
+        Callers that arrive while a refresh is in flight wait for it and reuse
+        its result instead of issuing their own token request.
+
+        Returns:
+            Refreshed Google OAuth credentials
+        """
+        if self._creds is None:
+            return self.get()
+
+        generation = self._generation
+        with self._refresh_lock:
+            creds = self._creds
+            if self._generation != generation and creds.valid:
+                return creds
+
+            if creds.refresh_token:  # type: ignore
+                creds.refresh(Request())  # type: ignore
+            else:
+                creds = self._authorize()
+                self._creds = creds
+            self._generation += 1
+            self._persist(creds)
+
+        self._schedule_refresh()
+        return creds
+
+    def close(self) -> None:
+        """Cancel any scheduled background refresh."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _load(self) -> GoogleCredentials:
+        """Load credentials from the token file, authorizing if needed."""
+        creds = None
+
+        # Look for token file with stored credentials
+        if os.path.exists(self.token_path):
+            try:
+                with open(self.token_path, "r") as token:
+                    token_data = json.load(token)
+                    creds = Credentials.from_authorized_user_info(token_data)  # type: ignore
+            except json.JSONDecodeError:
+                print(
+                    f"Warning: Token file at {self.token_path} is invalid or empty. Will re-authenticate.",
+                    file=sys.stderr,
+                )
+
+        if creds is None:
+            creds = self._authorize()
+            self._persist(creds)
+        elif not creds.valid and creds.refresh_token:  # type: ignore
+            creds.refresh(Request())  # type: ignore
+            self._persist(creds)
+        elif not creds.valid:
+            creds = self._authorize()
+            self._persist(creds)
+
+        return creds
+
+    def _authorize(self) -> GoogleCredentials:
+        """Run the interactive OAuth flow."""
+        # Check if credentials file exists
+        if not os.path.exists(self.credentials_path):
+            raise FileNotFoundError(
+                f"""Credentials file not found at {self.credentials_path}. "
+                Please download your OAuth credentials from Google Cloud Console."""
+            )
+
+        flow = InstalledAppFlow.from_client_secrets_file(  # type: ignore[misc]
+            self.credentials_path, self.scopes
+        )
+        return flow.run_local_server(port=0)  # type: ignore[misc]
+
+    def _persist(self, creds: GoogleCredentials) -> None:
+        """Atomically write the credentials to the token file."""
+        token_json = json.loads(creds.to_json())  # type: ignore
+        directory = os.path.dirname(os.path.abspath(self.token_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as token:
+                json.dump(token_json, token)
+            os.replace(tmp_path, self.token_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _schedule_refresh(self, delay: Optional[float] = None) -> None:
+        """Arm the background timer for the next proactive refresh."""
+        creds = self._creds
+        if creds is None or not getattr(creds, "refresh_token", None):
+            return
+
+        if delay is None:
+            expiry = getattr(creds, "expiry", None)
+            if expiry is None:
+                return
+            # google-auth stores expiry as a naive UTC datetime
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            delay = max(
+                (expiry - now).total_seconds() - self.refresh_margin,
+                0.0,
+            )
+
+        self.close()
+        timer = threading.Timer(delay, self._background_refresh)
+        timer.daemon = True
+        self._timer = timer
+        timer.start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Warning: Background token refresh failed: {e}", file=sys.stderr)
+            self._schedule_refresh(REFRESH_RETRY_DELAY)
+
+
+ManagerKey = Tuple[str, str, Tuple[str, ...]]
+_managers: Dict[ManagerKey, CredentialManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_credential_manager(
+    credentials_path: str, token_path: str, scopes: List[str]
+) -> CredentialManager:
+    """
+    Get the shared credential manager for a credentials/token/scopes triple.
+
+    Args:
+        credentials_path: Path to the credentials JSON file
+        token_path: Path to save/load the token
+        scopes: OAuth scopes to request
+
+    Returns:
+        Process-wide credential manager
+    """
+    key = (credentials_path, token_path, tuple(scopes))
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = CredentialManager(credentials_path, token_path, scopes)
+            _managers[key] = manager
+        return manager
@@ -0,0 +1,62 @@
+"""
+Helpers for sending many Google API calls through the batch HTTP endpoint.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Google batch endpoints accept at most 100 calls per request
+MAX_BATCH_SIZE = 100
+
+BatchResults = Dict[str, Any]
+BatchErrors = Dict[str, str]
+
+
+def execute_batch(
+    service: Any,
+    requests: Iterable[Tuple[str, Any]],
+    batch_size: int = MAX_BATCH_SIZE,
+) -> Tuple[BatchResults, BatchErrors]:
+    """
+    Execute API requests through the batch endpoint, chunked at the batch limit.
+
+    Failures are captured per item, so one bad request never hides the
+    responses of the others. Duplicate keys are only requested once.
+
+    Args:
+        service: Google API service instance that built the requests
+        requests: (key, HttpRequest) pairs; keys identify results and errors
+        batch_size: Maximum number of calls per batch (default: 100)
+
+    Returns:
+        Tuple of (responses by key, error messages by key)
+    """
+    results: BatchResults = {}
+    errors: BatchErrors = {}
+
+    pending: Dict[str, Any] = {}
+    for key, request in requests:
+        pending.setdefault(key, request)
+
+    keys = list(pending)
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+
+    def callback(request_id: str, response: Any, exception: Optional[Exception]):
+        if exception is not None:
+            errors[request_id] = str(exception)
+        else:
+            results[request_id] = response
+
+    for start in range(0, len(keys), batch_size):
+        chunk: List[str] = keys[start : start + batch_size]
+        batch = service.new_batch_http_request(callback=callback)
+        for key in chunk:
+            batch.add(pending[key], request_id=key)
+        try:
+            batch.execute()
+        except Exception as e:
+            # The whole chunk failed (network error, auth failure, ...)
+            for key in chunk:
+                if key not in results:
+                    errors.setdefault(key, str(e))
+
+    return results, errors
@@ -2,23 +2,20 @@
 Common Google API client utilities for authentication and service creation.
 """
 
-import json
-import os
+import threading
 
 # Add these imports where needed
-from typing import Any, List, Union
+from typing import Any, Dict, List, Tuple
 
-from google.auth.external_account_authorized_user import (
-    Credentials as ExternalCredentials,
-)
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow  # type: ignore
-from googleapiclient.discovery import build  # type: ignore
+from googleapiclient.discovery import build_from_document  # type: ignore
+
+from tools.google_api.auth import GoogleCredentials, get_credential_manager
+from tools.google_api.discovery import load_discovery_document
 
 # Default settings
 DEFAULT_CREDENTIALS_PATH = "credentials.json"
 DEFAULT_TOKEN_PATH = "token.json"
+DEFAULT_CACHE_DIR = ".mist_cache"
 
 # Common scopes across services
 GOOGLE_API_SCOPES = [
@@ -37,8 +34,10 @@ GOOGLE_API_SCOPES = [
 ]
 
 
-# Define a type for the credentials that could be returned
-GoogleCredentials = Union[Credentials, ExternalCredentials]
+# Built services keyed by (service, version, scopes, credentials, token)
+ServiceKey = Tuple[str, str, Tuple[str, ...], str, str]
+_services: Dict[ServiceKey, Any] = {}
+_services_lock = threading.Lock()
 
 
 def get_credentials(
@@ -49,6 +48,9 @@ def get_credentials(
     """
     Get Google OAuth credentials for API services.
 
+    Credentials are shared process-wide and refreshed in the background ahead
+    of expiry, so this normally returns without touching disk or network.
+
     Args:
         credentials_path: Path to the credentials JSON file
         token_path: Path to save/load the token
@@ -57,42 +59,7 @@ def get_credentials(
     Returns:
         Google OAuth credentials
     """
-    creds = None
-
-    # Look for token file with stored credentials
-    if os.path.exists(token_path):
-        try:
-            with open(token_path, "r") as token:
-                token_data = json.load(token)
-                creds = Credentials.from_authorized_user_info(token_data)  # type: ignore
-        except json.JSONDecodeError:
-            print(
-                f"Warning: Token file at {token_path} is invalid or empty. Will re-authenticate."
-            )
-
-    # If credentials don't exist or are invalid, authenticate
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:  # type: ignore
-            creds.refresh(Request())  # type: ignore
-        else:
-            # Check if credentials file exists
-            if not os.path.exists(credentials_path):
-                raise FileNotFoundError(
-                    f"""Credentials file not found at {credentials_path}. "
-                    Please download your OAuth credentials from Google Cloud Console."""
-                )
-
-            flow = InstalledAppFlow.from_client_secrets_file(  # type: ignore[misc]
-                credentials_path, scopes
-            )
-            creds = flow.run_local_server(port=0)  # type: ignore[misc]
-
-        # Save credentials for future runs
-        token_json = json.loads(creds.to_json())  # type: ignore
-        with open(token_path, "w") as token:
-            json.dump(token_json, token)
-
-    return creds
+    return get_credential_manager(credentials_path, token_path, scopes).get()
 
 
 def get_google_service(
@@ -101,19 +68,39 @@ def get_google_service(
     credentials_path: str = DEFAULT_CREDENTIALS_PATH,
     token_path: str = DEFAULT_TOKEN_PATH,
     scopes: List[str] = GOOGLE_API_SCOPES,
+    cache_dir: str = DEFAULT_CACHE_DIR,
+    use_cache: bool = True,
 ) -> Any:
     """
     Get an authenticated Google API service.
 
+    Services are built from a cached discovery document, so no network round
+    trip is needed, and built services are reused for identical arguments.
+
     Args:
         service_name: Name of the Google service (e.g., 'gmail', 'tasks')
         version: API version (e.g., 'v1')
         credentials_path: Path to the credentials JSON file
         token_path: Path to save/load the token
         scopes: OAuth scopes to request
+        cache_dir: Directory for the on-disk discovery cache
+        use_cache: Reuse a previously built service (default: True)
 
     Returns:
         Authenticated Google API service
     """
+    key = (service_name, version, tuple(scopes), credentials_path, token_path)
+    if use_cache:
+        with _services_lock:
+            service = _services.get(key)
+        if service is not None:
+            return service
+
     creds = get_credentials(credentials_path, token_path, scopes)
-    return build(service_name, version, credentials=creds)  # type: ignore
+    document = load_discovery_document(service_name, version, cache_dir)
+    service = build_from_document(document, credentials=creds)  # type: ignore
+
+    if use_cache:
+        with _services_lock:
+            service = _services.setdefault(key, service)
+    return service
@@ -9,6 +9,7 @@ from typing import List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from tools.google_api.client import (
+    DEFAULT_CACHE_DIR,
     DEFAULT_CREDENTIALS_PATH,
     DEFAULT_TOKEN_PATH,
     GOOGLE_API_SCOPES,
@@ -25,6 +26,7 @@ class GoogleApiSettings(BaseSettings):
     scopes: List[str] = GOOGLE_API_SCOPES
     user_id: str = "me"  # For Gmail and similar services
     max_results: int = 10
+    cache_dir: str = DEFAULT_CACHE_DIR  # Discovery documents and local stores
 
     # Configure environment variable settings
     model_config = SettingsConfigDict(
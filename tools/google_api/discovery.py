@@ -0,0 +1,130 @@
+"""
+Persistent discovery-document cache for building Google API services offline.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httplib2  # type: ignore
+from googleapiclient.discovery import DISCOVERY_URI, V2_DISCOVERY_URI  # type: ignore
+from googleapiclient.discovery_cache import get_static_doc  # type: ignore
+from googleapiclient.version import __version__ as GOOGLEAPICLIENT_VERSION  # type: ignore
+
+# Bump when the on-disk cache layout changes
+DISCOVERY_CACHE_VERSION = 1
+
+DiscoveryDocument = Dict[str, Any]
+
+_documents: Dict[Tuple[str, str], DiscoveryDocument] = {}
+_documents_lock = threading.Lock()
+
+
+def _cache_file(cache_dir: str, service_name: str, version: str) -> str:
+    return os.path.join(cache_dir, "discovery", f"{service_name}.{version}.json")
+
+
+def _read_cached_document(path: str) -> Optional[DiscoveryDocument]:
+    """Read a cached document, ignoring entries written by other versions."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+    if (
+        entry.get("cache_version") != DISCOVERY_CACHE_VERSION
+        or entry.get("library_version") != GOOGLEAPICLIENT_VERSION
+    ):
+        return None
+    return entry.get("document")
+
+
+def _write_cached_document(path: str, document: DiscoveryDocument) -> None:
+    """Atomically write a document to the on-disk cache."""
+    entry = {
+        "cache_version": DISCOVERY_CACHE_VERSION,
+        "library_version": GOOGLEAPICLIENT_VERSION,
+        "document": document,
+    }
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # The cache is an optimization; a read-only disk must not break builds
+        print(
+            f"Warning: Could not write discovery cache at {path}: {e}", file=sys.stderr
+        )
+
+
+def _fetch_discovery_document(service_name: str, version: str) -> str:
+    """Download a discovery document for services not bundled with the client."""
+    http = httplib2.Http(timeout=30)
+    for uri in (V2_DISCOVERY_URI, DISCOVERY_URI):
+        url = uri.format(api=service_name, apiVersion=version)
+        response, content = http.request(url)
+        if response.status < 400:
+            return content.decode("utf-8")
+    raise ValueError(f"No discovery document found for {service_name} {version}")
+
+
+def load_discovery_document(
+    service_name: str, version: str, cache_dir: str
+) -> DiscoveryDocument:
+    """
+    Load a parsed discovery document, preferring in-process and on-disk caches.
+
+    Lookup order is memory, the on-disk cache, the documents bundled with
+    google-api-python-client and finally the network.
+
+    Args:
+        service_name: Name of the Google service (e.g., 'gmail', 'tasks')
+        version: API version (e.g., 'v1')
+        cache_dir: Directory holding the on-disk cache
+
+    Returns:
+        Parsed discovery document
+    """
+    key = (service_name, version)
+    with _documents_lock:
+        document = _documents.get(key)
+    if document is not None:
+        return document
+
+    path = _cache_file(cache_dir, service_name, version)
+    document = _read_cached_document(path)
+    if document is None:
+        content = get_static_doc(service_name, version)
+        if content is None:
+            content = _fetch_discovery_document(service_name, version)
+        document = json.loads(content)
+        _write_cached_document(path, document)
+
+    with _documents_lock:
+        _documents.setdefault(key, document)
+        return _documents[key]
+
+
+def clear_discovery_cache(cache_dir: Optional[str] = None) -> None:
+    """
+    Drop in-process discovery documents and optionally the on-disk cache.
+
+    Args:
+        cache_dir: Directory holding the on-disk cache to clear (optional)
+    """
+    with _documents_lock:
+        _documents.clear()
+
+    if cache_dir:
+        directory = os.path.join(cache_dir, "discovery")
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(directory, name))
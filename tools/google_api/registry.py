@@ -0,0 +1,104 @@
+"""
+Lazy registry of Google API services shared by the tool modules.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional
+
+ServiceFactory = Callable[[], Any]
+
+
+class LazyService:
+    """
+    Proxy for a Google API service that is built on first use.
+
+    Attribute access is forwarded to the underlying service, so a LazyService can
+    be passed anywhere a built service object is expected. A failed build is not
+    cached; the next call simply tries again.
+    """
+
+    def __init__(self, name: str, factory: ServiceFactory) -> None:
+        self._name = name
+        self._factory = factory
+        self._service: Optional[Any] = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        """Name the service was registered under."""
+        return self._name
+
+    @property
+    def is_built(self) -> bool:
+        """Whether the underlying service has been built yet."""
+        return self._service is not None
+
+    def get(self) -> Any:
+        """
+        Return the underlying service, building it if necessary.
+
+        Returns:
+            Authenticated Google API service
+        """
+        service = self._service
+        if service is None:
+            with self._lock:
+                if self._service is None:
+                    self._service = self._factory()
+                service = self._service
+        return service
+
+    def reset(self) -> None:
+        """Drop the built service so the next call rebuilds it."""
+        with self._lock:
+            self._service = None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.get(), attr)
+
+    def __repr__(self) -> str:
+        state = "built" if self.is_built else "pending"
+        return f"<LazyService {self._name!r} ({state})>"
+
+
+_services: Dict[str, LazyService] = {}
+_services_lock = threading.Lock()
+
+
+def register_service(name: str, factory: ServiceFactory) -> LazyService:
+    """
+    Register a service factory and return its lazy proxy.
+
+    Registering the same name twice returns the existing proxy.
+
+    Args:
+        name: Registry key (e.g., 'gmail', 'calendar')
+        factory: Callable that builds the authenticated service
+
+    Returns:
+        Lazy proxy for the service
+    """
+    with _services_lock:
+        lazy = _services.get(name)
+        if lazy is None:
+            lazy = LazyService(name, factory)
+            _services[name] = lazy
+        return lazy
+
+
+def get_service(name: str) -> Any:
+    """
+    Get a registered service, building it on first use.
+
+    Args:
+        name: Registry key the service was registered under
+
+    Returns:
+        Authenticated Google API service
+
+    Raises:
+        KeyError: If no service is registered under the given name
+    """
+    with _services_lock:
+        lazy = _services[name]
+    return lazy.get()
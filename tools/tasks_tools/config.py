@@ -1,3 +1,14 @@
-from tools.google_api import settings as google_settings
+from tools.google_api import GoogleApiSettings
 
-settings = google_settings
+
+class TasksSettings(GoogleApiSettings):
+    """
+    Tasks-specific settings on top of the shared Google API configuration.
+    """
+
+    # Local SQLite task store, kept current with updatedMin incremental syncs
+    tasks_store_enabled: bool = False
+    tasks_sync_interval: int = 60  # Seconds before reads trigger a sync
+
+
+settings = TasksSettings()
@@ -0,0 +1,462 @@
+"""
+Local SQLite store of tasks, kept current with updatedMin delta syncs.
+
+A full sync pulls every task of a list, hidden and completed ones included.
+Later syncs ask only for the tasks updated since the newest modification time
+seen by the previous sync, with deleted and hidden tasks included so removals
+and cleared tasks reach the store as well. The Tasks API keeps deleted tasks for a
+limited time only, so a list whose last full sync is too old is resynced in
+full.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError  # type: ignore
+
+from tools.tasks_tools.tasks import TaskService, iter_tasks
+
+TASK_STORE_DB_NAME = "tasks.sqlite3"
+
+# Seconds subtracted from the sync watermark when asking for
+# changes, so updates committed out of order are not missed
+SYNC_OVERLAP = 60
+# Seconds after which a list is fully resynced instead of receiving deltas
+FULL_SYNC_INTERVAL = 7 * 86400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    list_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    parent TEXT,
+    position TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '',
+    hidden INTEGER NOT NULL DEFAULT 0,
+    updated_ts REAL NOT NULL DEFAULT 0,
+    task_json TEXT NOT NULL,
+    PRIMARY KEY (list_id, id)
+);
+CREATE INDEX IF NOT EXISTS tasks_updated ON tasks (list_id, updated_ts);
+
+CREATE TABLE IF NOT EXISTS task_lists (
+    id TEXT PRIMARY KEY,
+    watermark REAL,
+    last_full_sync REAL,
+    last_sync REAL
+);
+"""
+
+
+def parse_rfc3339(value: str) -> float:
+    """
+    Convert an RFC3339 timestamp to epoch seconds.
+
+    Args:
+        value: Timestamp such as '2024-06-03T10:00:00.000Z'
+
+    Returns:
+        Seconds since the epoch
+    """
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class TaskStore:
+    """
+    SQLite-backed store of the tasks of many task lists.
+
+    The connection is shared between threads and serialized with a lock.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self._sync_locks: Dict[str, threading.Lock] = {}
+
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def sync_lock(self, list_id: str) -> threading.Lock:
+        """
+        Get the lock held while a task list syncs, so its syncs never interleave.
+
+        Args:
+            list_id: Task list ID
+
+        Returns:
+            The task list's sync lock
+        """
+        with self._lock:
+            return self._sync_locks.setdefault(list_id, threading.Lock())
+
+    # Task list state
+
+    def get_list_state(self, list_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the sync state of a task list.
+
+        Args:
+            list_id: Task list ID
+
+        Returns:
+            Dict with watermark (newest modification time seen by a sync),
+            last_full_sync and last_sync, or None if the list was never synced
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM task_lists WHERE id = ?", (list_id,)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    # Writes
+
+    def _task_row(self, list_id: str, task: Dict[str, Any]) -> Tuple:
+        return (
+            list_id,
+            task["id"],
+            task.get("parent"),
+            task.get("position", ""),
+            task.get("status", ""),
+            int(bool(task.get("hidden"))),
+            parse_rfc3339(task["updated"]) if task.get("updated") else time.time(),
+            json.dumps(task),
+        )
+
+    def apply_changes(
+        self,
+        list_id: str,
+        tasks: Iterable[Dict[str, Any]],
+        synced: bool = False,
+        replace: bool = False,
+    ) -> Dict[str, int]:
+        """
+        Apply a batch of task changes in a single transaction.
+
+        Deleted tasks are removed, all others are inserted or replaced. Only
+        changes recorded as a sync advance the list's watermark, so tasks
+        stored from write responses never hide older remote changes.
+
+        Args:
+            list_id: Task list ID
+            tasks: Task objects from tasks.list
+            synced: Record the changes as a completed sync (default: False)
+            replace: Drop the list's stored tasks first and record a full
+                sync (default: False)
+
+        Returns:
+            Counts of upserted and deleted tasks
+        """
+        upserts = []
+        deletions = []
+        watermark = None
+        for task in tasks:
+            if task.get("deleted"):
+                deletions.append((list_id, task["id"]))
+            else:
+                upserts.append(self._task_row(list_id, task))
+            if task.get("updated"):
+                updated_ts = parse_rfc3339(task["updated"])
+                watermark = max(watermark or updated_ts, updated_ts)
+
+        now = time.time()
+        with self._lock, self._conn:
+            if replace:
+                self._conn.execute("DELETE FROM tasks WHERE list_id = ?", (list_id,))
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO tasks (
+                    list_id, id, parent, position, status, hidden, updated_ts,
+                    task_json
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                upserts,
+            )
+            deleted = self._conn.executemany(
+                "DELETE FROM tasks WHERE list_id = ? AND id = ?", deletions
+            ).rowcount
+
+            if synced or replace:
+                self._conn.execute(
+                    """
+                    INSERT INTO task_lists (id, watermark, last_full_sync, last_sync)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        watermark = MAX(
+                            COALESCE(excluded.watermark, watermark),
+                            COALESCE(watermark, excluded.watermark)
+                        ),
+                        last_full_sync = COALESCE(
+                            excluded.last_full_sync, last_full_sync
+                        ),
+                        last_sync = excluded.last_sync
+                    """,
+                    (list_id, watermark, now if replace else None, now),
+                )
+
+        return {"upserted": len(upserts), "deleted": max(deleted, 0)}
+
+    def upsert_task(self, list_id: str, task: Dict[str, Any]) -> None:
+        """
+        Store one task, e.g. as returned by an insert or update call.
+
+        Args:
+            list_id: Task list ID
+            task: Task object
+        """
+        if self.get_list_state(list_id) is not None:
+            self.apply_changes(list_id, [task])
+
+    def delete_task(self, list_id: str, task_id: str) -> None:
+        """
+        Remove one task and its subtasks.
+
+        Args:
+            list_id: Task list ID
+            task_id: Task ID
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM tasks WHERE list_id = ? AND (id = ? OR parent = ?)",
+                (list_id, task_id, task_id),
+            )
+
+    def mark_stale(self, list_id: str) -> None:
+        """
+        Make the next sync of a task list run regardless of its interval.
+
+        Args:
+            list_id: Task list ID
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE task_lists SET last_sync = NULL WHERE id = ?", (list_id,)
+            )
+
+    def clear(self, list_id: str) -> None:
+        """
+        Drop the tasks and sync state of a task list.
+
+        Args:
+            list_id: Task list ID
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tasks WHERE list_id = ?", (list_id,))
+            self._conn.execute("DELETE FROM task_lists WHERE id = ?", (list_id,))
+
+    # Reads
+
+    def get_task(self, list_id: str, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get one stored task.
+
+        Args:
+            list_id: Task list ID
+            task_id: Task ID
+
+        Returns:
+            Task object, or None if it is not stored
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT task_json FROM tasks WHERE list_id = ? AND id = ?",
+                (list_id, task_id),
+            ).fetchone()
+        return json.loads(row["task_json"]) if row is not None else None
+
+    def list_tasks(
+        self,
+        list_id: str,
+        show_completed: bool = True,
+        show_hidden: bool = False,
+        updated_min: Optional[float] = None,
+        max_results: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        List the stored tasks of a task list, subtasks following their parent.
+
+        Args:
+            list_id: Task list ID
+            show_completed: Include completed tasks (default: True)
+            show_hidden: Include hidden tasks (default: False)
+            updated_min: Only tasks updated at or after these epoch seconds
+                (optional)
+            max_results: Maximum number of tasks to return (default: all)
+
+        Returns:
+            List of task objects
+        """
+        sql = """
+            SELECT t.task_json FROM tasks t
+            LEFT JOIN tasks p ON p.list_id = t.list_id AND p.id = t.parent
+            WHERE t.list_id = ?
+        """
+        params: List[Any] = [list_id]
+        if not show_completed:
+            sql += " AND t.status != 'completed'"
+        if not show_hidden:
+            sql += " AND t.hidden = 0"
+        if updated_min is not None:
+            sql += " AND t.updated_ts >= ?"
+            params.append(updated_min)
+        sql += """
+            ORDER BY COALESCE(p.position, t.position), t.parent IS NOT NULL,
+            t.position
+        """
+        if max_results:
+            sql += " LIMIT ?"
+            params.append(max_results)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row["task_json"]) for row in rows]
+
+    def count(self, list_id: Optional[str] = None) -> int:
+        """
+        Count stored tasks.
+
+        Args:
+            list_id: Only count the tasks of this list (optional)
+
+        Returns:
+            Number of stored tasks
+        """
+        with self._lock:
+            if list_id is None:
+                row = self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM tasks WHERE list_id = ?", (list_id,)
+                ).fetchone()
+        return row[0]
+
+
+def full_sync(service: TaskService, store: TaskStore, list_id: str) -> Dict[str, Any]:
+    """
+    Replace a task list's stored tasks with all of its current tasks.
+
+    Args:
+        service: Tasks API service instance
+        store: Task store to update
+        list_id: Task list ID
+
+    Returns:
+        Sync statistics
+    """
+    tasks = iter_tasks(service, list_id, show_completed=True, show_hidden=True)
+    stats = store.apply_changes(list_id, tasks, replace=True)
+    return {"mode": "full", **stats}
+
+
+def incremental_sync(
+    service: TaskService, store: TaskStore, list_id: str, since: float
+) -> Dict[str, Any]:
+    """
+    Apply the changes made to a task list since a point in time.
+
+    Args:
+        service: Tasks API service instance
+        store: Task store to update
+        list_id: Task list ID
+        since: Epoch seconds of the oldest change to fetch
+
+    Returns:
+        Sync statistics
+    """
+    updated_min = datetime.fromtimestamp(since, timezone.utc).isoformat()
+    tasks = iter_tasks(
+        service,
+        list_id,
+        show_completed=True,
+        show_hidden=True,
+        show_deleted=True,
+        updated_min=updated_min,
+    )
+    stats = store.apply_changes(list_id, tasks, synced=True)
+    return {"mode": "incremental", **stats}
+
+
+def sync_task_list(
+    service: TaskService,
+    store: TaskStore,
+    list_id: str,
+    min_interval: float = 0,
+) -> Dict[str, Any]:
+    """
+    Bring a task list's stored tasks up to date with a full or delta sync.
+
+    Args:
+        service: Tasks API service instance
+        store: Task store to update
+        list_id: Task list ID
+        min_interval: Skip the sync if the last one finished less than this
+            many seconds ago (default: 0)
+
+    Returns:
+        Sync statistics including the mode used ('full', 'incremental' or 'skipped')
+
+    Raises:
+        HttpError: If the task list cannot be read; a list that no longer
+            exists is dropped from the store first
+    """
+    with store.sync_lock(list_id):
+        state = store.get_list_state(list_id)
+        now = time.time()
+        if (
+            min_interval
+            and state is not None
+            and state["last_sync"]
+            and now - state["last_sync"] < min_interval
+        ):
+            return {"mode": "skipped", "upserted": 0, "deleted": 0}
+
+        try:
+            if (
+                state is None
+                or state["watermark"] is None
+                or not state["last_full_sync"]
+                or now - state["last_full_sync"] > FULL_SYNC_INTERVAL
+            ):
+                return full_sync(service, store, list_id)
+            return incremental_sync(
+                service, store, list_id, state["watermark"] - SYNC_OVERLAP
+            )
+        except HttpError as e:
+            if e.resp.status == 404:
+                store.clear(list_id)
+            raise
+
+
+_stores: Dict[str, TaskStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_task_store(cache_dir: str) -> TaskStore:
+    """
+    Get the shared task store under a cache directory.
+
+    Args:
+        cache_dir: Directory holding the store database
+
+    Returns:
+        Task store instance
+    """
+    db_path = os.path.join(cache_dir, TASK_STORE_DB_NAME)
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = TaskStore(db_path)
+            _stores[db_path] = store
+        return store
@@ -2,7 +2,8 @@
 This module provides utilities for authenticating with and using the Google Tasks API.
 """
 
-from typing import Any, Dict, List, Optional
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional
 
 from tools.google_api import get_google_service, settings
 
@@ -10,6 +11,9 @@ DEFAULT_CREDENTIALS_PATH = "credentials.json"
 DEFAULT_TOKEN_PATH = "token.json"
 DEFAULT_USER_ID = "me"
 
+# Largest page the Tasks API returns for tasks and task lists
+MAX_PAGE_SIZE = 100
+
 
 TaskService = Any
 
@@ -27,26 +31,114 @@ def get_tasks_service() -> TaskService:
         credentials_path=settings.credentials_path,
         token_path=settings.token_path,
         scopes=settings.scopes,
+        cache_dir=settings.cache_dir,
     )
 
 
-def list_task_lists(service: Any, max_results: int = 100) -> List[Dict[str, Any]]:
+def iter_task_lists(
+    service: Any,
+    page_size: int = MAX_PAGE_SIZE,
+    fields: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over all task lists of the user, one page at a time.
+
+    Args:
+        service: Tasks API service instance
+        page_size: Task lists per request (default: 100, the API maximum)
+        fields: Task list fields to return, e.g. 'id,title' (optional)
+
+    Returns:
+        Iterator of task list objects; further pages are only requested as
+        the iterator is consumed
+    """
+    params: Dict[str, Any] = {"maxResults": min(page_size, MAX_PAGE_SIZE)}
+    if fields:
+        params["fields"] = f"nextPageToken,items({fields})"
+
+    page_token = None
+    while True:
+        response = service.tasklists().list(pageToken=page_token, **params).execute()
+        yield from response.get("items", [])
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
+
+
+def list_task_lists(
+    service: Any, max_results: Optional[int] = None
+) -> List[Dict[str, Any]]:
     """
     List all task lists for the user.
 
     Args:
         service: Tasks API service instance
-        max_results: Maximum number of task lists to return
+        max_results: Maximum number of task lists to return (default: all)
 
     Returns:
         List of task list objects
     """
-    response = service.tasklists().list(maxResults=max_results).execute()
-    return response.get("items", [])
+    return list(islice(iter_task_lists(service), max_results))
+
+
+def iter_tasks(
+    service: Any,
+    task_list_id: str,
+    show_completed: bool = True,
+    show_hidden: bool = False,
+    show_deleted: bool = False,
+    updated_min: Optional[str] = None,
+    page_size: int = MAX_PAGE_SIZE,
+    fields: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the tasks of a task list, one page at a time.
+
+    Args:
+        service: Tasks API service instance
+        task_list_id: ID of the task list
+        show_completed: Include completed tasks (default: True)
+        show_hidden: Include hidden tasks, such as tasks completed in the
+            Google apps (default: False)
+        show_deleted: Include deleted tasks (default: False)
+        updated_min: Only tasks updated at or after this RFC 3339 time
+            (optional)
+        page_size: Tasks per request (default: 100, the API maximum)
+        fields: Task fields to return, e.g. 'id,title,status' (optional)
+
+    Returns:
+        Iterator of task objects; further pages are only requested as the
+        iterator is consumed
+    """
+    params: Dict[str, Any] = {
+        "tasklist": task_list_id,
+        "maxResults": min(page_size, MAX_PAGE_SIZE),
+        "showCompleted": show_completed,
+        "showHidden": show_hidden,
+        "showDeleted": show_deleted,
+    }
+    if updated_min:
+        params["updatedMin"] = updated_min
+    if fields:
+        params["fields"] = f"nextPageToken,items({fields})"
+
+    page_token = None
+    while True:
+        response = service.tasks().list(pageToken=page_token, **params).execute()
+        yield from response.get("items", [])
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
 
 
 def get_tasks(
-    service: Any, task_list_id: str, max_results: int = 100
+    service: Any,
+    task_list_id: str,
+    max_results: Optional[int] = None,
+    show_completed: bool = True,
+    show_hidden: bool = False,
+    updated_min: Optional[str] = None,
+    fields: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """
     Get all tasks in a specific task list.
@@ -54,15 +146,26 @@ def get_tasks(
     Args:
         service: Tasks API service instance
         task_list_id: ID of the task list
-        max_results: Maximum number of tasks to return
+        max_results: Maximum number of tasks to return (default: all)
+        show_completed: Include completed tasks (default: True)
+        show_hidden: Include hidden tasks (default: False)
+        updated_min: Only tasks updated at or after this RFC 3339 time
+            (optional)
+        fields: Task fields to return, e.g. 'id,title,status' (optional)
 
     Returns:
         List of task objects
     """
-    response = (
-        service.tasks().list(tasklist=task_list_id, maxResults=max_results).execute()
+    tasks = iter_tasks(
+        service,
+        task_list_id,
+        show_completed=show_completed,
+        show_hidden=show_hidden,
+        updated_min=updated_min,
+        page_size=min(max_results or MAX_PAGE_SIZE, MAX_PAGE_SIZE),
+        fields=fields,
     )
-    return response.get("items", [])
+    return list(islice(tasks, max_results))
 
 
 def create_task(
@@ -5,8 +5,16 @@ This module provides a Model Context Protocol server for interacting with Google
 It exposes Tasks as resources and provides tools for managing tasks and task lists.
 """
 
-from typing import Any
-
+import sys
+from typing import Any, Dict, Iterable, List, Optional
+
+from tools.tasks_tools.config import settings
+from tools.tasks_tools.store import (
+    TaskStore,
+    get_task_store,
+    parse_rfc3339,
+    sync_task_list,
+)
 from tools.tasks_tools.tasks import (
     complete_task,
     create_task,
@@ -15,11 +23,129 @@ from tools.tasks_tools.tasks import (
     delete_task_list,
     get_tasks,
     get_tasks_service,
+    iter_tasks,
     list_task_lists,
     update_task,
 )
+from tools.google_api import register_service
+
+service = register_service("tasks", get_tasks_service)
+
+
+# Fields read when tasks are listed, so pages carry no unused data
+TASK_SUMMARY_FIELDS = "id,title,status,notes,due"
+
+
+def get_synced_store(task_list_id: str) -> Optional[TaskStore]:
+    """
+    Get the local task store, with the task list synced if it is stale.
+
+    Args:
+        task_list_id: ID of the task list about to be read
+
+    Returns:
+        The store, or None if it is disabled or the list could not be synced
+    """
+    if not settings.tasks_store_enabled:
+        return None
+
+    store = get_task_store(settings.cache_dir)
+    try:
+        sync_task_list(
+            service, store, task_list_id, min_interval=settings.tasks_sync_interval
+        )
+    except Exception as e:
+        print(f"Warning: Tasks sync failed, using the Tasks API: {e}", file=sys.stderr)
+        return None
+    return store
+
+
+def find_tasks(
+    task_list_id: str,
+    show_completed: bool = True,
+    show_hidden: bool = False,
+    updated_min: str = "",
+    max_results: Optional[int] = None,
+) -> Iterable[Dict[str, Any]]:
+    """
+    Get the tasks of a list from the local store, or from the API without it.
+
+    Args:
+        task_list_id: ID of the task list
+        show_completed: Include completed tasks (default: True)
+        show_hidden: Include hidden tasks (default: False)
+        updated_min: Only tasks updated at or after this RFC 3339 time (optional)
+        max_results: Maximum number of tasks to return (default: all)
+
+    Returns:
+        Task objects in list order
+    """
+    store = get_synced_store(task_list_id)
+    if store is not None:
+        return store.list_tasks(
+            task_list_id,
+            show_completed=show_completed,
+            show_hidden=show_hidden,
+            updated_min=parse_rfc3339(updated_min) if updated_min else None,
+            max_results=max_results,
+        )
+    return get_tasks(
+        service,
+        task_list_id,
+        max_results=max_results,
+        show_completed=show_completed,
+        show_hidden=show_hidden,
+        updated_min=updated_min or None,
+        fields=TASK_SUMMARY_FIELDS,
+    )
+
+
+def record_task_change(
+    task_list_id: str,
+    task: Optional[Dict[str, Any]] = None,
+    deleted_task_id: str = "",
+) -> None:
+    """
+    Apply a change made through the API to the local store.
+
+    The list is also marked stale, so the next read picks up changes the
+    response does not carry, such as moved or deleted subtasks.
+
+    Args:
+        task_list_id: ID of the changed task list
+        task: Task returned by an insert or update call (optional)
+        deleted_task_id: ID of a deleted task (optional)
+    """
+    if not settings.tasks_store_enabled:
+        return
+
+    store = get_task_store(settings.cache_dir)
+    if deleted_task_id:
+        store.delete_task(task_list_id, deleted_task_id)
+    elif task is not None:
+        store.upsert_task(task_list_id, task)
+    store.mark_stale(task_list_id)
+
+
+def format_task_lines(task: Dict[str, Any]) -> List[str]:
+    """
+    Format the summary lines of a task.
+
+    Args:
+        task: Task object
 
-service = get_tasks_service()
+    Returns:
+        Lines with the title, status, notes and due date of the task
+    """
+    lines = [
+        f"Title: {task.get('title', 'Untitled')}",
+        f"Status: {task.get('status', 'Unknown')}",
+    ]
+    if task.get("notes"):
+        lines.append(f"Notes: {task.get('notes')}")
+    if task.get("due"):
+        lines.append(f"Due: {task.get('due')}")
+    return lines
 
 
 # Resources
@@ -33,20 +159,20 @@ def get_task_list(task_list_id: str) -> str:
     Returns:
         Formatted string with task list details
     """
-    tasks = get_tasks(service, task_list_id)
-    result = f"Task List (ID: {task_list_id})\n"
-
-    if not tasks:
-        return result + "\nNo tasks found in this list."
+    store = get_synced_store(task_list_id)
+    if store is not None:
+        tasks: Iterable[Dict[str, Any]] = store.list_tasks(task_list_id)
+    else:
+        tasks = iter_tasks(service, task_list_id, fields=TASK_SUMMARY_FIELDS)
 
+    lines = [f"Task List (ID: {task_list_id})"]
     for task in tasks:
-        result += f"\nTitle: {task.get('title', 'Untitled')}\n"
-        result += f"Status: {task.get('status', 'Unknown')}\n"
-        if task.get("notes"):
-            result += f"Notes: {task.get('notes')}\n"
-        if task.get("due"):
-            result += f"Due: {task.get('due')}\n"
-    return result
+        lines.append("")
+        lines.extend(format_task_lines(task))
+
+    if len(lines) == 1:
+        lines.extend(["", "No tasks found in this list."])
+    return "\n".join(lines) + "\n"
 
 
 def get_task(task_list_id: str, task_id: str) -> str:
@@ -60,7 +186,10 @@ def get_task(task_list_id: str, task_id: str) -> str:
     Returns:
         Formatted string with task details
     """
-    task = service.tasks().get(tasklist=task_list_id, task=task_id).execute()
+    store = get_synced_store(task_list_id)
+    task = store.get_task(task_list_id, task_id) if store is not None else None
+    if task is None:
+        task = service.tasks().get(tasklist=task_list_id, task=task_id).execute()
     result = f"Task (ID: {task_id})\n"
     result += f"Title: {task.get('title', 'Untitled')}\n"
     result += f"Status: {task.get('status', 'Unknown')}\n"
@@ -91,6 +220,48 @@ def list_task_lists_tool() -> str:
     return result
 
 
+def list_tasks_tool(
+    task_list_id: str,
+    show_completed: bool = True,
+    show_hidden: bool = False,
+    updated_min: str = "",
+    max_results: int = 0,
+) -> str:
+    """
+    List the tasks of a task list, following all result pages.
+
+    Args:
+        task_list_id: ID of the task list
+        show_completed: Include completed tasks (defaults to True)
+        show_hidden: Include hidden tasks, such as tasks completed in the Google
+            apps (defaults to False)
+        updated_min: Only tasks updated at or after this RFC 3339 time
+            (defaults to empty string)
+        max_results: Maximum number of tasks to return, 0 for all (defaults to 0)
+
+    Returns:
+        Formatted string with the matching tasks
+    """
+    tasks = list(
+        find_tasks(
+            task_list_id,
+            show_completed=show_completed,
+            show_hidden=show_hidden,
+            updated_min=updated_min,
+            max_results=max_results or None,
+        )
+    )
+    if not tasks:
+        return "No tasks found."
+
+    lines = [f"Found {len(tasks)} tasks:"]
+    for task in tasks:
+        lines.append("")
+        lines.extend(format_task_lines(task))
+        lines.append(f"ID: {task.get('id', 'Unknown')}")
+    return "\n".join(lines) + "\n"
+
+
 def create_task_tool(
     task_list_id: str,
     title: str,
@@ -110,6 +281,7 @@ def create_task_tool(
         Confirmation message with task details
     """
     task = create_task(service, task_list_id, title, notes, due)
+    record_task_change(task_list_id, task)
     return f"""
 Task created successfully:
 ID: {task.get("id", "Unknown")}
@@ -140,6 +312,7 @@ def update_task_tool(
         Confirmation message with updated task details
     """
     task = update_task(service, task_list_id, task_id, title, notes, due)
+    record_task_change(task_list_id, task)
 
     result = f"Task updated successfully (ID: {task_id}):\n"
     result += f"Title: {task.get('title', 'Untitled')}\n"
@@ -163,6 +336,7 @@ def complete_task_tool(task_list_id: str, task_id: str) -> str:
         Confirmation message
     """
     task = complete_task(service, task_list_id, task_id)
+    record_task_change(task_list_id, task)
     return (
         f"Task '{task.get('title', 'Untitled')}' (ID: {task_id}) marked as completed."
     )
@@ -180,6 +354,7 @@ def delete_task_tool(task_list_id: str, task_id: str) -> str:
         Confirmation message
     """
     delete_task(service, task_list_id, task_id)
+    record_task_change(task_list_id, deleted_task_id=task_id)
     return f"Task (ID: {task_id}) deleted successfully."
 
 
@@ -212,6 +387,8 @@ def delete_task_list_tool(task_list_id: str) -> str:
         Confirmation message
     """
     delete_task_list(service, task_list_id)
+    if settings.tasks_store_enabled:
+        get_task_store(settings.cache_dir).clear(task_list_id)
     return f"Task list (ID: {task_list_id}) deleted successfully."
 
 
@@ -222,6 +399,7 @@ def register_tools_tasks(mcp: Any):
     """
     # Register tools
     mcp.tool()(list_task_lists_tool)
+    mcp.tool()(list_tasks_tool)
     mcp.tool()(create_task_tool)
     mcp.tool()(update_task_tool)
     mcp.tool()(complete_task_tool)